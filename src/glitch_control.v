@@ -2,7 +2,8 @@
 
 module glitch_control #(
     parameter CLK_FREQ = 50_000_000,
-    parameter BAUD_RATE = 115200
+    parameter BAUD_RATE = 115200,
+    parameter WAVE_ENTRIES = 4
 ) (
     input  wire  rst_n,
     input  wire  clk,
@@ -22,6 +23,11 @@ module glitch_control #(
     wire [15:0] pulse_spacing;
     wire [15:0] reset_length;
 
+    wire [WAVE_ENTRIES*16-1:0] wave_table;
+    wire [7:0]  wave_length;
+
+    wire        config_commit; // A sequence starts, the registers take the values written since the last one
+    wire        sequence_done; // The edge that ends a pulse sequence, a sweep moves on
     wire        uart_pulse_en;
     wire        uart_reset_en;
 
@@ -54,7 +60,8 @@ module glitch_control #(
 
     uart_handler #(
         .CLK_FREQ(CLK_FREQ),
-        .BAUD_RATE(BAUD_RATE)
+        .BAUD_RATE(BAUD_RATE),
+        .WAVE_ENTRIES(WAVE_ENTRIES)
     ) uart_hdlr (
         .rst_n(rst_n),
         .clk(clk),
@@ -68,7 +75,11 @@ module glitch_control #(
         .reset_en_o(uart_reset_en),
         .reset_length_o(reset_length),
         .reset_behavior_o(reset_behavior),
-        .arm_o(uart_arm_signal)
+        .arm_o(uart_arm_signal),
+        .commit_i(config_commit),
+        .sequence_done_i(sequence_done),
+        .wave_table_o(wave_table),
+        .wave_length_o(wave_length)
     );
 
     reg [2:0] state;
@@ -84,11 +95,29 @@ module glitch_control #(
     assign target_reset_o = (state == STATE_RESET_TARGET);
     assign pulse_o = (state == STATE_PULSE_ACTIVE);
     assign busy_o = (state != STATE_IDLE);
+    assign config_commit = (state == STATE_IDLE) && (uart_reset_en || uart_pulse_en || (armed && trigger_synced));
+
+    // Waveform table. While its length is not 0, pulse i of a sequence takes the width of
+    // entry i and is followed by the spacing of entry i, and the table length is the number
+    // of pulses. A sweep in uart_hdlr then only moves the delay. The spacing of an entry is
+    // a byte, so unlike the spacing register it goes up to 255 cycles.
+    localparam WAVE_INDEX_WIDTH = (WAVE_ENTRIES > 1) ? $clog2(WAVE_ENTRIES) : 1;
+    reg  [WAVE_INDEX_WIDTH-1:0] wave_entry;
+    wire [15:0] wave_point = wave_table[wave_entry * 16 +: 16];
+    wire wave_on = (wave_length != 8'd0);
+
+    wire [7:0]  width_value = wave_on ? wave_point[15:8] : pulse_width;
+    wire [15:0] spacing_value = wave_on ? {8'd0, wave_point[7:0]} : pulse_spacing;
+    wire [7:0]  num_pulses_value = wave_on ? wave_length : num_pulses;
 
     wire [15:0] reset_target = (reset_length == 16'd0) ? 16'd0 : (reset_length - 16'b1);
     wire [15:0] delay_target = (pulse_delay == 16'd0) ? 16'd0 : (pulse_delay - 16'b1);
-    wire [15:0] width_target = (pulse_width == 8'd0) ? 16'd0 : ({8'd0, pulse_width} - 16'b1);
-    wire [15:0] spacing_target = (pulse_spacing == 16'd0) ? 16'd0 : (pulse_spacing - 16'b1);
+    wire [15:0] width_target = (width_value == 8'd0) ? 16'd0 : ({8'd0, width_value} - 16'b1);
+    wire [15:0] spacing_target = (spacing_value == 16'd0) ? 16'd0 : (spacing_value - 16'b1);
+
+    // The edge that ends a pulse sequence and returns to idle
+    assign sequence_done = (state == STATE_DELAY && phase_cnt == delay_target && num_pulses_value == 8'd0) ||
+                           (state == STATE_PULSE_ACTIVE && phase_cnt == width_target && pulse_cnt == 8'd0);
 
     wire   pulse_en = uart_pulse_en | (armed && trigger_synced) | (reset_done_strobe && reset_behavior == RESET_PULSE);
     assign pulse_en_o = pulse_en;
@@ -98,6 +127,7 @@ module glitch_control #(
             armed <= 1'b0;
             phase_cnt <= 16'd0;
             pulse_cnt <= 8'd0;
+            wave_entry <= 0;
             state <= STATE_IDLE;
             reset_done_strobe <= 1'b0;
 
@@ -141,9 +171,10 @@ module glitch_control #(
 
                 STATE_DELAY: begin
                     if (phase_cnt == delay_target) begin
-                        if (num_pulses != 8'd0) begin
+                        if (num_pulses_value != 8'd0) begin
                             state <= STATE_PULSE_ACTIVE;
-                            pulse_cnt <= num_pulses - 1'b1;
+                            pulse_cnt <= num_pulses_value - 1'b1;
+                            wave_entry <= 0;
                         end else begin
                             state <= STATE_IDLE;
                             pulse_cnt <= 8'd0;
@@ -173,6 +204,7 @@ module glitch_control #(
                     if (phase_cnt == spacing_target) begin
                         state <= STATE_PULSE_ACTIVE;
                         phase_cnt <= 16'd0;
+                        wave_entry <= wave_entry + 1'b1;
                     end else begin
                         phase_cnt <= phase_cnt + 1'b1;
                     end
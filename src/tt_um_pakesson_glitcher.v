@@ -5,7 +5,11 @@
 
 `default_nettype none
 
-module tt_um_pakesson_glitcher (
+module tt_um_pakesson_glitcher #(
+    parameter CLK_FREQ = 50_000_000,
+    parameter BAUD_RATE = 115200,
+    parameter WAVE_ENTRIES = 4
+) (
     input  wire [7:0] ui_in,    // Dedicated inputs
     output wire [7:0] uo_out,   // Dedicated outputs
     input  wire [7:0] uio_in,   // IOs: Input path
@@ -55,8 +59,9 @@ module tt_um_pakesson_glitcher (
     assign uio_out[1] = ~target_reset_out;
 
     glitch_control #(
-        .CLK_FREQ(50_000_000),
-        .BAUD_RATE(115200)
+        .CLK_FREQ(CLK_FREQ),
+        .BAUD_RATE(BAUD_RATE),
+        .WAVE_ENTRIES(WAVE_ENTRIES)
     ) glitch_ctrl (
         .rst_n(rst_n_sync),
         .clk(clk),
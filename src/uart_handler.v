@@ -2,7 +2,9 @@
 
 module uart_handler #(
     parameter CLK_FREQ = 50_000_000,
-    parameter BAUD_RATE = 115200
+    parameter BAUD_RATE = 115200,
+    parameter TIMEOUT = CLK_FREQ / 20, // Clock cycles to wait for a baud rate confirmation or a frame byte (50 ms)
+    parameter WAVE_ENTRIES = 4         // Entries of the waveform table, 1 to 255
 ) (
     input wire        rst_n,
     input wire        clk,
@@ -16,19 +18,58 @@ module uart_handler #(
     output reg        reset_en_o,
     output reg [15:0] reset_length_o,
     output reg [1:0]  reset_behavior_o,
-    output reg        arm_o
+    output reg        arm_o,
+    input  wire       commit_i, // glitch_control starts a sequence, the active bank takes the staging bank
+    input  wire       sequence_done_i, // glitch_control completes a pulse sequence, the sweep moves on
+    output reg  [WAVE_ENTRIES*16-1:0] wave_table_o, // Entry i: width in bits 16i+15:16i+8, spacing below
+    output reg  [7:0]  wave_length_o
 );
 
+    // Baud rates selectable with the 'b' command, as clock cycles per bit in sixteenths.
+    // Rate 0 is BAUD_RATE, the rate after reset, with the bit time of a plain integer divider.
+    localparam integer BIT_TIME_0 = 16 * (CLK_FREQ / BAUD_RATE);
+    localparam integer BIT_TIME_1 = (16 * CLK_FREQ + 230400 / 2) / 230400;
+    localparam integer BIT_TIME_2 = (16 * CLK_FREQ + 460800 / 2) / 460800;
+    localparam integer BIT_TIME_3 = (16 * CLK_FREQ + 1000000 / 2) / 1000000;
+    localparam integer BIT_TIME_4 = (16 * CLK_FREQ + 3000000 / 2) / 3000000;
+    localparam [7:0] NUM_BAUD_RATES = 8'd5;
+
+    // Wide enough for the slowest rate, one cycle longer for a fractional bit
+    localparam CLK_CNT_WIDTH = $clog2((BIT_TIME_0 > BIT_TIME_1 ? BIT_TIME_0 : BIT_TIME_1) / 16 + 2);
+    localparam TIMEOUT_WIDTH = $clog2(TIMEOUT + 1);
+
+    reg [2:0] baud_rate;
+    reg [2:0] new_baud_rate;
+    reg [TIMEOUT_WIDTH-1:0] timer;
+    localparam integer TIMEOUT_LAST = TIMEOUT - 1;
+
+    reg [CLK_CNT_WIDTH+3:0] bit_time;
+    always @(*) begin
+        case (baud_rate)
+            3'd1: bit_time = BIT_TIME_1[CLK_CNT_WIDTH+3:0];
+            3'd2: bit_time = BIT_TIME_2[CLK_CNT_WIDTH+3:0];
+            3'd3: bit_time = BIT_TIME_3[CLK_CNT_WIDTH+3:0];
+            3'd4: bit_time = BIT_TIME_4[CLK_CNT_WIDTH+3:0];
+            default: bit_time = BIT_TIME_0[CLK_CNT_WIDTH+3:0];
+        endcase
+    end
+
+    wire [CLK_CNT_WIDTH-1:0] clks_per_bit = bit_time[CLK_CNT_WIDTH+3:4];
+    wire [3:0] clks_per_bit_frac = bit_time[3:0];
+
     wire uart_rx_valid;
     wire [7:0] uart_rx_data;
     
     uart_rx #(
         .CLK_FREQ(CLK_FREQ),
-        .BAUD_RATE(BAUD_RATE)
+        .BAUD_RATE(BAUD_RATE),
+        .CLK_CNT_WIDTH(CLK_CNT_WIDTH)
     ) rxi (
         .clk(clk),
         .rst_n(rst_n),
         .rx_i(uart_rx_i),
+        .clks_per_bit_i(clks_per_bit),
+        .clks_per_bit_frac_i(clks_per_bit_frac),
         .data_o(uart_rx_data),
         .data_valid_o(uart_rx_valid)
     );
@@ -40,28 +81,108 @@ module uart_handler #(
 
     uart_tx #(
         .CLK_FREQ(CLK_FREQ),
-        .BAUD_RATE(BAUD_RATE)
+        .BAUD_RATE(BAUD_RATE),
+        .CLK_CNT_WIDTH(CLK_CNT_WIDTH)
     ) txi (
         .clk(clk),
         .rst_n(rst_n),
+        .clks_per_bit_i(clks_per_bit),
+        .clks_per_bit_frac_i(clks_per_bit_frac),
         .tx_data_i(uart_tx_data),
         .tx_enable_i(uart_tx_en),
         .tx_o(uart_tx_o),
         .tx_busy_o(uart_tx_busy)
     );
 
-    reg [3:0] state;
-    localparam STATE_IDLE = 4'd0;
-    localparam STATE_SEND_ECHO = 4'd1;
-    localparam STATE_DELAY1 = 4'd2;
-    localparam STATE_DELAY0 = 4'd3;
-    localparam STATE_WIDTH = 4'd4;
-    localparam STATE_NUM_PULSES = 4'd5;
-    localparam STATE_PULSE_SPACING1 = 4'd6;
-    localparam STATE_PULSE_SPACING0 = 4'd7;
-    localparam STATE_RESET_LENGTH1 = 4'd8;
-    localparam STATE_RESET_LENGTH0 = 4'd9;
-    localparam STATE_SEND_HELLO = 4'd10;
+    reg [4:0] state;
+    localparam STATE_IDLE = 5'd0;
+    localparam STATE_SEND_ECHO = 5'd1;
+    localparam STATE_DELAY1 = 5'd2;
+    localparam STATE_DELAY0 = 5'd3;
+    localparam STATE_WIDTH = 5'd4;
+    localparam STATE_NUM_PULSES = 5'd5;
+    localparam STATE_PULSE_SPACING1 = 5'd6;
+    localparam STATE_PULSE_SPACING0 = 5'd7;
+    localparam STATE_RESET_LENGTH1 = 5'd8;
+    localparam STATE_RESET_LENGTH0 = 5'd9;
+    localparam STATE_SEND_HELLO = 5'd10;
+    localparam STATE_BAUD_RATE = 5'd11;
+    localparam STATE_BAUD_ACK = 5'd12;
+    localparam STATE_BAUD_SWITCH = 5'd13;
+    localparam STATE_BAUD_CONFIRM = 5'd14;
+    localparam STATE_CONFIG = 5'd15;
+    localparam STATE_SWEEP_OP = 5'd16;
+    localparam STATE_SEND_SWEEP = 5'd17;
+    localparam STATE_WAVE_ENTRY = 5'd18;
+    localparam STATE_WAVE_LENGTH = 5'd19;
+    localparam STATE_SEND_WAVE = 5'd20;
+
+    localparam BAUD_ACK = 8'h42; // 'B'
+    localparam CONFIG_ERROR = 8'h21; // '!'
+
+    // Configuration frame of the 'c' command: delay (2 bytes), width, number of pulses,
+    // spacing (2 bytes), reset length (2 bytes), flags and a checksum. Each byte goes
+    // straight into its staging register as it arrives. No sequence takes the staging bank
+    // over before the checksum, and a bad or incomplete frame puts the active bank back.
+    localparam [3:0] CONFIG_LENGTH = 4'd10;
+    reg [3:0] config_count;
+    reg config_sweep; // The frame is a 'v' sweep settings frame instead
+    reg config_bad;   // A byte of the frame was out of range, refused at the checksum
+    reg [7:0] config_sum;
+    wire [7:0] config_check = config_sum + uart_rx_data; // Zero for a good frame
+
+    // Flags: reset behavior in bits 1-0, trigger in bit 2, reset target in bit 3. The
+    // trigger and reset target bits wait here for the checksum.
+    reg [1:0] config_action;
+    wire config_flags_valid = uart_rx_data[7:4] == 4'd0 && uart_rx_data[1:0] != 2'b11 && uart_rx_data[3:2] != 2'b11;
+
+    // Sweep settings of the 'v' command, a frame like the 'c' one: a step and a limit for
+    // the delay, width, spacing and number of pulses, the order and a checksum. The steps
+    // are a byte each, the limits as wide as the registers. Each byte goes straight into
+    // its setting as it arrives, so a sweep cannot start until a frame has been completed
+    // with the right checksum.
+    localparam [3:0] SWEEP_LENGTH = 4'd12;
+    reg [7:0]  sweep_delay_step;
+    reg [15:0] sweep_delay_limit;
+    reg [7:0]  sweep_width_step;
+    reg [7:0]  sweep_width_limit;
+    reg [7:0]  sweep_spacing_step;
+    reg [15:0] sweep_spacing_limit;
+    reg [7:0]  sweep_num_pulses_step;
+    reg [7:0]  sweep_num_pulses_limit;
+    reg        sweep_lockstep;
+    reg        sweep_settings_valid;
+
+    // Operations of the 'g' command, carried over to the sweep with sweep_op_en
+    localparam SWEEP_OP_STOP = 2'd0;
+    localparam SWEEP_OP_START = 2'd1;
+    localparam SWEEP_OP_PAUSE = 2'd2;
+    localparam SWEEP_OP_RESUME = 2'd3;
+    reg [1:0] sweep_op;
+    reg       sweep_op_en;
+
+    localparam SWEEP_OFF = 2'd0;
+    localparam SWEEP_RUNNING = 2'd1;
+    localparam SWEEP_PAUSED = 2'd2;
+    reg [1:0]  sweep_state;
+    reg [15:0] sweep_index; // Completed sequences since the start of the sweep
+    reg        sweep_load;  // Started, the next commit takes the staging registers as the first point
+
+    // Waveform table: a width and a spacing per pulse, played instead of the width, spacing
+    // and number of pulses registers while the length is not 0. The 'l' command writes an
+    // entry (index, width, spacing), 'm' sets the length and 'k' reads everything back.
+    // The table and its length are staged like the registers, see below.
+    localparam WAVE_INDEX_WIDTH = (WAVE_ENTRIES > 1) ? $clog2(WAVE_ENTRIES + 1) : 1;
+    localparam integer WAVE_ENTRIES_COUNT = WAVE_ENTRIES;
+    reg [WAVE_ENTRIES*16-1:0] wave_table;
+    reg [7:0] wave_length;
+    reg [WAVE_INDEX_WIDTH-1:0] wave_write; // Entry the 'l' command writes
+    reg [7:0] wave_width;                  // Its width, written together with the spacing
+    reg [WAVE_INDEX_WIDTH-1:0] wave_read;  // Entry the 'k' command sends
+    wire [15:0] wave_read_entry = wave_table[wave_read * 16 +: 16];
+
+    // The byte being sent by 'q' or 'k'
+    reg [1:0] report_byte;
 
     reg [2:0] hello_state;
 
@@ -69,28 +190,171 @@ module uart_handler #(
     localparam RESET_PULSE = 2'b01;
     localparam RESET_ARM = 2'b10;
 
+    // Staging bank, written by the commands at any time. glitch_control runs its sequences
+    // from the active bank on the outputs, which takes over the staging bank once, on the
+    // edge a sequence starts (commit_i). A write during a sequence, or while armed, is
+    // therefore held back until the next sequence, and a configuration frame goes over in
+    // a single cycle. So do the waveform table and its length. A sequence that starts
+    // half-way through a two byte write or a configuration frame keeps the active bank as
+    // it is.
+    reg [15:0] delay;
+    reg [7:0]  width;
+    reg [7:0]  num_pulses;
+    reg [15:0] pulse_spacing;
+    reg [15:0] reset_length;
+    reg [1:0]  reset_behavior;
+    // The staging bank as it was before a configuration frame, put back when the frame
+    // is bad or never ends, so that single writes staged before it are not lost. Outside
+    // of a frame, the low 18 bits hold the index and state of the sweep as the 'q' command
+    // found them while it sends them.
+    reg [65:0] config_undo;
+    wire write_pending = (state == STATE_DELAY0) || (state == STATE_PULSE_SPACING0) || (state == STATE_RESET_LENGTH0)
+        || (state == STATE_CONFIG && !config_sweep);
+    wire commit = commit_i && !write_pending;
+
+    // Parameter sweep. While a sweep is on, it owns the parameters of the active bank with
+    // a step other than 0, and every completed pulse sequence moves them on by the steps.
+    // Each goes from its staging value up to its limit and then starts over. In nested
+    // order the delay moves every sequence, the width when the delay starts over, then the
+    // spacing, then the number of pulses, and the sweep stops after the last point. In
+    // lockstep order all of them move every sequence and the sweep runs until it is
+    // stopped. The others take the staging bank at the commits, like without a sweep.
+    wire sweep_owns = (sweep_state != SWEEP_OFF) && !sweep_load;
+    wire sweep_delay = sweep_delay_step != 8'd0;
+    wire sweep_width = sweep_width_step != 8'd0;
+    wire sweep_spacing = sweep_spacing_step != 8'd0;
+    wire sweep_num_pulses = sweep_num_pulses_step != 8'd0;
+
+    // A parameter with a step of 0, or past its limit, starts over
+    wire [16:0] delay_next = {1'b0, delay_o} + {9'd0, sweep_delay_step};
+    wire [8:0]  width_next = {1'b0, width_o} + {1'b0, sweep_width_step};
+    wire [16:0] spacing_next = {1'b0, pulse_spacing_o} + {9'd0, sweep_spacing_step};
+    wire [8:0]  num_pulses_next = {1'b0, num_pulses_o} + {1'b0, sweep_num_pulses_step};
+    wire delay_wrap = !sweep_delay || (delay_next > {1'b0, sweep_delay_limit});
+    wire width_wrap = !sweep_width || (width_next > {1'b0, sweep_width_limit});
+    wire spacing_wrap = !sweep_spacing || (spacing_next > {1'b0, sweep_spacing_limit});
+    wire num_pulses_wrap = !sweep_num_pulses || (num_pulses_next > {1'b0, sweep_num_pulses_limit});
+    wire width_advance = sweep_lockstep || delay_wrap;
+    wire spacing_advance = sweep_lockstep || (delay_wrap && width_wrap);
+    wire num_pulses_advance = sweep_lockstep || (delay_wrap && width_wrap && spacing_wrap);
+    wire sweep_done = !sweep_lockstep && delay_wrap && width_wrap && spacing_wrap && num_pulses_wrap;
+
     always @(posedge clk or negedge rst_n) begin
         if (!rst_n) begin
             delay_o <= 16'd0;
-            width_o <= 8'd1; // Default to 1 clock cycle pulse width
-            num_pulses_o <= 8'd1; // Default to 1 pulse
+            width_o <= 8'd1;
+            num_pulses_o <= 8'd1;
             pulse_spacing_o <= 16'd0;
+            reset_length_o <= 16'd0;
+            reset_behavior_o <= RESET_PULSE;
+            wave_table_o <= {WAVE_ENTRIES{16'h0100}}; // Like the registers, width 1 and spacing 0
+            wave_length_o <= 8'd0;
+            sweep_state <= SWEEP_OFF;
+            sweep_index <= 16'd0;
+            sweep_load <= 1'b0;
+        end else begin
+            if (commit) begin
+                if (!sweep_owns || !sweep_delay)
+                    delay_o <= delay;
+                if (!sweep_owns || !sweep_width)
+                    width_o <= width;
+                if (!sweep_owns || !sweep_num_pulses)
+                    num_pulses_o <= num_pulses;
+                if (!sweep_owns || !sweep_spacing)
+                    pulse_spacing_o <= pulse_spacing;
+                reset_length_o <= reset_length;
+                reset_behavior_o <= reset_behavior;
+                wave_table_o <= wave_table;
+                wave_length_o <= wave_length;
+                sweep_load <= 1'b0;
+            end else if (sweep_state == SWEEP_RUNNING && !sweep_load && sequence_done_i) begin
+                sweep_index <= sweep_index + 1'b1;
+                if (sweep_delay)
+                    delay_o <= delay_wrap ? delay : delay_next[15:0];
+                if (sweep_width && width_advance)
+                    width_o <= width_wrap ? width : width_next[7:0];
+                if (sweep_spacing && spacing_advance)
+                    pulse_spacing_o <= spacing_wrap ? pulse_spacing : spacing_next[15:0];
+                if (sweep_num_pulses && num_pulses_advance)
+                    num_pulses_o <= num_pulses_wrap ? num_pulses : num_pulses_next[7:0];
+                if (sweep_done)
+                    sweep_state <= SWEEP_OFF;
+            end
+
+            if (sweep_op_en) begin
+                case (sweep_op)
+                    SWEEP_OP_START: begin
+                        sweep_state <= SWEEP_RUNNING;
+                        sweep_index <= 16'd0;
+                        sweep_load <= 1'b1;
+                    end
+                    SWEEP_OP_PAUSE:
+                        if (sweep_state == SWEEP_RUNNING)
+                            sweep_state <= SWEEP_PAUSED;
+                    SWEEP_OP_RESUME:
+                        if (sweep_state == SWEEP_PAUSED)
+                            sweep_state <= SWEEP_RUNNING;
+                    default:
+                        sweep_state <= SWEEP_OFF;
+                endcase
+            end
+        end
+    end
+
+    always @(posedge clk or negedge rst_n) begin
+        if (!rst_n) begin
+            delay <= 16'd0;
+            width <= 8'd1; // Default to 1 clock cycle pulse width
+            num_pulses <= 8'd1; // Default to 1 pulse
+            pulse_spacing <= 16'd0;
             pulse_en_o <= 1'b0;
             reset_en_o <= 1'b0;
-            reset_length_o <= 16'd0;
+            reset_length <= 16'd0;
             arm_o <= 1'b0;
             uart_tx_en <= 1'b0;
             uart_tx_data <= 8'd0;
 
-            reset_behavior_o <= RESET_PULSE;
+            reset_behavior <= RESET_PULSE;
 
             state <= STATE_IDLE;
             hello_state <= 3'd0;
+
+            baud_rate <= 3'd0;
+            new_baud_rate <= 3'd0;
+            timer <= 0;
+
+            config_action <= 2'd0;
+            config_undo <= 66'd0;
+            config_count <= 4'd0;
+            config_sum <= 8'd0;
+            config_sweep <= 1'b0;
+            config_bad <= 1'b0;
+
+            // Steps of 0, a sweep of a single point
+            sweep_delay_step <= 8'd0;
+            sweep_delay_limit <= 16'd0;
+            sweep_width_step <= 8'd0;
+            sweep_width_limit <= 8'd0;
+            sweep_spacing_step <= 8'd0;
+            sweep_spacing_limit <= 16'd0;
+            sweep_num_pulses_step <= 8'd0;
+            sweep_num_pulses_limit <= 8'd0;
+            sweep_lockstep <= 1'b0;
+            sweep_settings_valid <= 1'b1;
+            sweep_op <= SWEEP_OP_STOP;
+            sweep_op_en <= 1'b0;
+            wave_table <= {WAVE_ENTRIES{16'h0100}};
+            wave_length <= 8'd0;
+            wave_write <= 0;
+            wave_width <= 8'd0;
+            wave_read <= 0;
+            report_byte <= 2'd0;
         end else begin
             uart_tx_en <= 1'b0;
             pulse_en_o <= 1'b0;
             reset_en_o <= 1'b0;
             arm_o <= 1'b0;
+            sweep_op_en <= 1'b0;
 
             case(state)
                 STATE_IDLE:
@@ -105,9 +369,52 @@ module uart_handler #(
                             8'h68: state <= STATE_SEND_HELLO;       // 'h', send hello message
                             8'h61: arm_o <= 1'b1;                   // 'a', arm toggle
                             8'h70: reset_en_o <= 1'b1;              // 'p', target power cycle (reset) command
-                            8'h79: reset_behavior_o <= RESET_NONE;  // 'y', set reset behavior to none
-                            8'h75: reset_behavior_o <= RESET_PULSE; // 'u', set reset behavior to pulse (execute pulse after resetting)
-                            8'h69: reset_behavior_o <= RESET_ARM;   // 'i', set reset behavior to arm (arm after resetting)
+                            8'h79: reset_behavior <= RESET_NONE;    // 'y', set reset behavior to none
+                            8'h75: reset_behavior <= RESET_PULSE;   // 'u', set reset behavior to pulse (execute pulse after resetting)
+                            8'h69: reset_behavior <= RESET_ARM;     // 'i', set reset behavior to arm (arm after resetting)
+                            8'h62: state <= STATE_BAUD_RATE;        // 'b', switch baud rate
+                            8'h63:                                  // 'c', configuration frame
+                                begin
+                                    config_undo <= {delay, width, num_pulses, pulse_spacing, reset_length, reset_behavior};
+                                    config_count <= 4'd0;
+                                    config_sum <= 8'd0;
+                                    config_sweep <= 1'b0;
+                                    timer <= 0;
+                                    state <= STATE_CONFIG;
+                                end
+                            8'h76:                                  // 'v', sweep settings frame, stops a sweep
+                                begin
+                                    config_count <= 4'd0;
+                                    config_sum <= 8'd0;
+                                    config_sweep <= 1'b1;
+                                    config_bad <= 1'b0;
+                                    sweep_settings_valid <= 1'b0;
+                                    sweep_op <= SWEEP_OP_STOP;
+                                    sweep_op_en <= 1'b1;
+                                    timer <= 0;
+                                    state <= STATE_CONFIG;
+                                end
+                            8'h67: state <= STATE_SWEEP_OP;         // 'g', start, stop, pause or resume the sweep
+                            8'h71:                                  // 'q', query the sweep index and state
+                                begin
+                                    config_undo[17:0] <= {sweep_index, sweep_state};
+                                    report_byte <= 2'd0;
+                                    state <= STATE_SEND_SWEEP;
+                                end
+                            8'h6C:                                  // 'l', write a waveform table entry
+                                begin
+                                    config_count <= 4'd0;
+                                    timer <= 0;
+                                    state <= STATE_WAVE_ENTRY;
+                                end
+                            8'h6D: state <= STATE_WAVE_LENGTH;      // 'm', set the waveform table length
+                            8'h6B:                                  // 'k', read back the waveform table
+                                begin
+                                    // The length and the number of entries first, then the entries
+                                    report_byte <= 2'd0;
+                                    wave_read <= 0;
+                                    state <= STATE_SEND_WAVE;
+                                end
                             default: 
                                 begin
                                     // Echo back the received byte for unrecognized commands
@@ -123,42 +430,42 @@ module uart_handler #(
                     end
                 STATE_DELAY1:
                     if (uart_rx_valid) begin
-                        delay_o[15:8] <= uart_rx_data;
+                        delay[15:8] <= uart_rx_data;
                         state <= STATE_DELAY0;
                     end
                 STATE_DELAY0:
                     if (uart_rx_valid) begin
-                        delay_o[7:0] <= uart_rx_data;
+                        delay[7:0] <= uart_rx_data;
                         state <= STATE_IDLE;
                     end
                 STATE_WIDTH:
                     if (uart_rx_valid) begin
-                        width_o <= uart_rx_data;
+                        width <= uart_rx_data;
                         state <= STATE_IDLE;
                     end
                 STATE_NUM_PULSES:
                     if (uart_rx_valid) begin
-                        num_pulses_o <= uart_rx_data;
+                        num_pulses <= uart_rx_data;
                         state <= STATE_IDLE;
                     end
                 STATE_PULSE_SPACING1:
                     if (uart_rx_valid) begin
-                        pulse_spacing_o[15:8] <= uart_rx_data;
+                        pulse_spacing[15:8] <= uart_rx_data;
                         state <= STATE_PULSE_SPACING0;
                     end
                 STATE_PULSE_SPACING0:
                     if (uart_rx_valid) begin
-                        pulse_spacing_o[7:0] <= uart_rx_data;
+                        pulse_spacing[7:0] <= uart_rx_data;
                         state <= STATE_IDLE;
                     end
                 STATE_RESET_LENGTH1:
                     if (uart_rx_valid) begin
-                        reset_length_o[15:8] <= uart_rx_data;
+                        reset_length[15:8] <= uart_rx_data;
                         state <= STATE_RESET_LENGTH0;
                     end
                 STATE_RESET_LENGTH0:
                     if (uart_rx_valid) begin
-                        reset_length_o[7:0] <= uart_rx_data;
+                        reset_length[7:0] <= uart_rx_data;
                         state <= STATE_IDLE;
                     end
                 STATE_SEND_HELLO:
@@ -197,6 +504,207 @@ module uart_handler #(
                                 end
                         endcase
                     end
+                STATE_BAUD_RATE:
+                    if (uart_rx_valid) begin
+                        if (uart_rx_data < NUM_BAUD_RATES) begin
+                            new_baud_rate <= uart_rx_data[2:0];
+                            uart_tx_data <= BAUD_ACK;
+                            state <= STATE_BAUD_ACK;
+                        end else begin
+                            // Unknown rate, echo it back and stay at the current rate
+                            uart_tx_data <= uart_rx_data;
+                            state <= STATE_SEND_ECHO;
+                        end
+                    end
+                STATE_BAUD_ACK:
+                    // Acknowledge at the current rate
+                    if (uart_tx_rdy) begin
+                        uart_tx_en <= 1'b1;
+                        state <= STATE_BAUD_SWITCH;
+                    end
+                STATE_BAUD_SWITCH:
+                    // Switch once the acknowledgement is out
+                    if (uart_tx_rdy && !uart_tx_en) begin
+                        baud_rate <= new_baud_rate;
+                        timer <= 0;
+                        state <= STATE_BAUD_CONFIRM;
+                    end
+                STATE_BAUD_CONFIRM:
+                    // The host confirms with an acknowledgement at the new rate, which is
+                    // answered with one. Anything else, or nothing in time, falls back to
+                    // the rate after reset.
+                    if (uart_rx_valid) begin
+                        if (uart_rx_data == BAUD_ACK) begin
+                            uart_tx_data <= BAUD_ACK;
+                            state <= STATE_SEND_ECHO;
+                        end else begin
+                            baud_rate <= 3'd0;
+                            state <= STATE_IDLE;
+                        end
+                    end else if (timer == TIMEOUT_LAST[TIMEOUT_WIDTH-1:0]) begin
+                        baud_rate <= 3'd0;
+                        state <= STATE_IDLE;
+                    end else begin
+                        timer <= timer + 1'b1;
+                    end
+                STATE_CONFIG:
+                    // A good sweep settings frame is applied at the checksum, a bad or
+                    // incomplete one leaves no settings to start a sweep with
+                    if (uart_rx_valid) begin
+                        timer <= 0;
+                        if (config_sweep) begin
+                            if (config_count == SWEEP_LENGTH - 1'b1) begin
+                                if (config_check == 8'd0 && !config_bad) begin
+                                    sweep_settings_valid <= 1'b1;
+                                    state <= STATE_IDLE;
+                                end else begin
+                                    uart_tx_data <= CONFIG_ERROR;
+                                    state <= STATE_SEND_ECHO;
+                                end
+                            end else begin
+                                case (config_count)
+                                    4'd0: sweep_delay_step <= uart_rx_data;
+                                    4'd1: sweep_delay_limit[15:8] <= uart_rx_data;
+                                    4'd2: sweep_delay_limit[7:0] <= uart_rx_data;
+                                    4'd3: sweep_width_step <= uart_rx_data;
+                                    4'd4: sweep_width_limit <= uart_rx_data;
+                                    4'd5: sweep_spacing_step <= uart_rx_data;
+                                    4'd6: sweep_spacing_limit[15:8] <= uart_rx_data;
+                                    4'd7: sweep_spacing_limit[7:0] <= uart_rx_data;
+                                    4'd8: sweep_num_pulses_step <= uart_rx_data;
+                                    4'd9: sweep_num_pulses_limit <= uart_rx_data;
+                                    default:
+                                        begin
+                                            // The order, 0 for nested or 1 for lockstep
+                                            sweep_lockstep <= uart_rx_data[0];
+                                            config_bad <= uart_rx_data[7:1] != 7'd0;
+                                        end
+                                endcase
+                                config_sum <= config_check;
+                                config_count <= config_count + 1'b1;
+                            end
+                        end else if (config_count == CONFIG_LENGTH - 1'b1) begin
+                            if (config_check == 8'd0 && !config_bad) begin
+                                pulse_en_o <= config_action[0];
+                                reset_en_o <= config_action[1];
+                                state <= STATE_IDLE;
+                            end else begin
+                                {delay, width, num_pulses, pulse_spacing, reset_length, reset_behavior} <= config_undo;
+                                uart_tx_data <= CONFIG_ERROR;
+                                state <= STATE_SEND_ECHO;
+                            end
+                        end else begin
+                            case (config_count)
+                                4'd0: delay[15:8] <= uart_rx_data;
+                                4'd1: delay[7:0] <= uart_rx_data;
+                                4'd2: width <= uart_rx_data;
+                                4'd3: num_pulses <= uart_rx_data;
+                                4'd4: pulse_spacing[15:8] <= uart_rx_data;
+                                4'd5: pulse_spacing[7:0] <= uart_rx_data;
+                                4'd6: reset_length[15:8] <= uart_rx_data;
+                                4'd7: reset_length[7:0] <= uart_rx_data;
+                                default:
+                                    begin
+                                        reset_behavior <= uart_rx_data[1:0];
+                                        config_action <= uart_rx_data[3:2];
+                                        config_bad <= !config_flags_valid;
+                                    end
+                            endcase
+                            config_sum <= config_check;
+                            config_count <= config_count + 1'b1;
+                        end
+                    end else if (timer == TIMEOUT_LAST[TIMEOUT_WIDTH-1:0]) begin
+                        // The rest of the frame never came
+                        if (!config_sweep)
+                            {delay, width, num_pulses, pulse_spacing, reset_length, reset_behavior} <= config_undo;
+                        state <= STATE_IDLE;
+                    end else begin
+                        timer <= timer + 1'b1;
+                    end
+                STATE_SWEEP_OP:
+                    if (uart_rx_valid) begin
+                        if (uart_rx_data[7:2] != 6'd0 || (uart_rx_data[1:0] == SWEEP_OP_START && !sweep_settings_valid)) begin
+                            // Unknown operation, or no settings to start with
+                            uart_tx_data <= uart_rx_data[7:2] != 6'd0 ? uart_rx_data : CONFIG_ERROR;
+                            state <= STATE_SEND_ECHO;
+                        end else begin
+                            sweep_op <= uart_rx_data[1:0];
+                            sweep_op_en <= 1'b1;
+                            state <= STATE_IDLE;
+                        end
+                    end
+                STATE_SEND_SWEEP:
+                    if (uart_tx_rdy && !uart_tx_en) begin
+                        uart_tx_en <= 1'b1;
+                        report_byte <= report_byte + 1'b1;
+                        case (report_byte)
+                            2'd0: uart_tx_data <= config_undo[17:10];
+                            2'd1: uart_tx_data <= config_undo[9:2];
+                            default:
+                                begin
+                                    uart_tx_data <= {6'd0, config_undo[1:0]};
+                                    state <= STATE_IDLE;
+                                end
+                        endcase
+                    end
+                STATE_WAVE_ENTRY:
+                    // An index past the end of the table is only refused after the whole
+                    // entry, so the rest of it is not taken for commands
+                    if (uart_rx_valid) begin
+                        timer <= 0;
+                        config_count <= config_count + 1'b1;
+                        case (config_count)
+                            4'd0:
+                                begin
+                                    wave_write <= uart_rx_data[WAVE_INDEX_WIDTH-1:0];
+                                    config_bad <= uart_rx_data >= WAVE_ENTRIES_COUNT[7:0];
+                                end
+                            4'd1: wave_width <= uart_rx_data;
+                            default:
+                                if (config_bad) begin
+                                    uart_tx_data <= CONFIG_ERROR;
+                                    state <= STATE_SEND_ECHO;
+                                end else begin
+                                    wave_table[wave_write * 16 +: 16] <= {wave_width, uart_rx_data};
+                                    state <= STATE_IDLE;
+                                end
+                        endcase
+                    end else if (timer == TIMEOUT_LAST[TIMEOUT_WIDTH-1:0]) begin
+                        state <= STATE_IDLE;
+                    end else begin
+                        timer <= timer + 1'b1;
+                    end
+                STATE_WAVE_LENGTH:
+                    if (uart_rx_valid) begin
+                        if (uart_rx_data > WAVE_ENTRIES_COUNT[7:0]) begin
+                            // Longer than the table, echoed back and ignored
+                            uart_tx_data <= uart_rx_data;
+                            state <= STATE_SEND_ECHO;
+                        end else begin
+                            wave_length <= uart_rx_data;
+                            state <= STATE_IDLE;
+                        end
+                    end
+                STATE_SEND_WAVE:
+                    // Straight from the staging table, the width and then the spacing of
+                    // every entry
+                    if (uart_tx_rdy && !uart_tx_en) begin
+                        uart_tx_en <= 1'b1;
+                        report_byte <= report_byte + 1'b1;
+                        case (report_byte)
+                            2'd0: uart_tx_data <= wave_length;
+                            2'd1: uart_tx_data <= WAVE_ENTRIES_COUNT[7:0];
+                            2'd2: uart_tx_data <= wave_read_entry[15:8];
+                            default:
+                                begin
+                                    uart_tx_data <= wave_read_entry[7:0];
+                                    report_byte <= 2'd2;
+                                    wave_read <= wave_read + 1'b1;
+                                    if (wave_read == WAVE_ENTRIES_COUNT[WAVE_INDEX_WIDTH-1:0] - 1'b1)
+                                        state <= STATE_IDLE;
+                                end
+                        endcase
+                    end
                 default:
                     state <= STATE_IDLE;
             endcase
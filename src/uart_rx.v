@@ -2,19 +2,18 @@
 
 module uart_rx #(
     parameter CLK_FREQ = 50_000_000,
-    parameter BAUD_RATE = 115200
+    parameter BAUD_RATE = 115200,
+    parameter CLK_CNT_WIDTH = $clog2(CLK_FREQ / BAUD_RATE + 1)
 ) (
-    input wire       rst_n,
-    input wire       clk,
-    input wire       rx_i,
-    output reg [7:0] data_o,
-    output reg       data_valid_o
+    input wire                     rst_n,
+    input wire                     clk,
+    input wire                     rx_i,
+    input wire [CLK_CNT_WIDTH-1:0] clks_per_bit_i,      // Whole clock cycles per bit
+    input wire [3:0]               clks_per_bit_frac_i, // Sixteenths of a clock cycle per bit on top
+    output reg [7:0]               data_o,
+    output reg                     data_valid_o
 );
 
-localparam CLKS_PER_BIT = CLK_FREQ / BAUD_RATE;
-localparam CLKS_PER_HALF_BIT = CLK_FREQ / (2 * BAUD_RATE);
-localparam CLK_CNT_WIDTH = $clog2(CLKS_PER_BIT);
-
 reg [1:0] state;
 localparam UART_IDLE = 2'd0;
 localparam UART_DATA = 2'd1;
@@ -23,8 +22,14 @@ localparam UART_STOP = 2'd2;
 reg [2:0] bit_cnt;
 reg [CLK_CNT_WIDTH-1:0] clk_cnt;
 
-wire rx_strobe = (clk_cnt == CLK_CNT_WIDTH'(CLKS_PER_BIT - 1));
-wire rx_strobe_half = (clk_cnt == CLK_CNT_WIDTH'(CLKS_PER_HALF_BIT - 1));
+// Fractional bit timing: the sixteenths add up from the start of the frame, and a
+// bit lasts one clock cycle longer each time they make a whole cycle
+reg [3:0] frac_acc;
+wire [4:0] frac_sum = {1'b0, frac_acc} + {1'b0, clks_per_bit_frac_i};
+wire [CLK_CNT_WIDTH-1:0] bit_last = frac_sum[4] ? clks_per_bit_i : clks_per_bit_i - 1'b1;
+
+wire rx_strobe = (clk_cnt == bit_last);
+wire rx_strobe_half = (clk_cnt == (clks_per_bit_i >> 1) - 1'b1);
 
 always @(posedge clk or negedge rst_n) begin
     if (!rst_n) begin
@@ -34,6 +39,7 @@ always @(posedge clk or negedge rst_n) begin
         state <= UART_IDLE;
         bit_cnt <= 3'd0;
         clk_cnt <= 0;
+        frac_acc <= 4'd0;
 
     end else begin
 
@@ -50,6 +56,7 @@ always @(posedge clk or negedge rst_n) begin
                             clk_cnt <= 0;
                             bit_cnt <= 3'd0;
                             data_o <= 8'd0;
+                            frac_acc <= 4'd0;
                         end
                     end else begin
                         // Reset the counter on high (idle) while waiting for the start bit
@@ -61,6 +68,7 @@ always @(posedge clk or negedge rst_n) begin
             UART_DATA:
                 if (rx_strobe) begin
                     clk_cnt <= 0;
+                    frac_acc <= frac_sum[3:0];
                     data_o <= {rx_i, data_o[7:1]};
 
                     bit_cnt <= bit_cnt + 1'b1;
@@ -2,19 +2,19 @@
 
 module uart_tx #(
     parameter CLK_FREQ = 50_000_000,
-    parameter BAUD_RATE = 115200
+    parameter BAUD_RATE = 115200,
+    parameter CLK_CNT_WIDTH = $clog2(CLK_FREQ / BAUD_RATE + 1)
 ) (
-    input wire       rst_n,
-    input wire       clk,
-    output reg       tx_o,
-    input wire [7:0] tx_data_i,
-    input wire       tx_enable_i,
-    output wire      tx_busy_o
+    input wire                     rst_n,
+    input wire                     clk,
+    input wire [CLK_CNT_WIDTH-1:0] clks_per_bit_i,      // Whole clock cycles per bit
+    input wire [3:0]               clks_per_bit_frac_i, // Sixteenths of a clock cycle per bit on top
+    output reg                     tx_o,
+    input wire [7:0]               tx_data_i,
+    input wire                     tx_enable_i,
+    output wire                    tx_busy_o
 );
 
-localparam CLKS_PER_BIT = CLK_FREQ / BAUD_RATE;
-localparam CLK_CNT_WIDTH = $clog2(CLKS_PER_BIT);
-
 reg [1:0] state;
 localparam UART_IDLE            = 2'd0;
 localparam UART_DATA            = 2'd1;
@@ -25,7 +25,12 @@ reg [7:0] data;
 reg [2:0] bit_cnt;
 reg [CLK_CNT_WIDTH-1:0] clk_cnt;
 
-wire tx_strobe = (clk_cnt == CLK_CNT_WIDTH'(CLKS_PER_BIT - 1));
+// Fractional bit timing, as in uart_rx
+reg [3:0] frac_acc;
+wire [4:0] frac_sum = {1'b0, frac_acc} + {1'b0, clks_per_bit_frac_i};
+wire [CLK_CNT_WIDTH-1:0] bit_last = frac_sum[4] ? clks_per_bit_i : clks_per_bit_i - 1'b1;
+
+wire tx_strobe = (clk_cnt == bit_last);
 
 assign tx_busy_o = (state != UART_IDLE);
 
@@ -37,6 +42,7 @@ always @(posedge clk or negedge rst_n) begin
         state <= UART_IDLE;
         bit_cnt <= 3'd0;
         clk_cnt <= 0;
+        frac_acc <= 4'd0;
     end else begin
 
         clk_cnt <= clk_cnt + 1'b1;
@@ -49,11 +55,13 @@ always @(posedge clk or negedge rst_n) begin
                     state <= UART_DATA;
                     clk_cnt <= 0;
                     bit_cnt <= 3'd0;
+                    frac_acc <= 4'd0;
                 end
 
             UART_DATA:
                 if (tx_strobe) begin
                     clk_cnt <= 0;
+                    frac_acc <= frac_sum[3:0];
                     bit_cnt <= bit_cnt + 1'b1;
 
                     tx_o <= data[0];
@@ -66,6 +74,7 @@ always @(posedge clk or negedge rst_n) begin
             UART_LAST_DATA_WAIT:
                 if (tx_strobe) begin
                     clk_cnt <= 0;
+                    frac_acc <= frac_sum[3:0];
                     tx_o <= 1'b1; // Stop bit
                     state <= UART_STOP_WAIT;
                 end
@@ -73,6 +82,7 @@ always @(posedge clk or negedge rst_n) begin
             UART_STOP_WAIT:
                 if (tx_strobe) begin
                     clk_cnt <= 0;
+                    frac_acc <= frac_sum[3:0];
                     state <= UART_IDLE;
                 end
             default:
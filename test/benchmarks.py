@@ -0,0 +1,130 @@
+"""Representative simulation workloads for `python tests.py bench`.
+
+The same workloads run on tb_tt, tb_glitch_control and tb_uart_handler, always
+through the serial line. Each one records the simulated clock cycles and the
+wall-clock time it took, and the peak RSS of the simulator process so far,
+in the JSON file BENCH_REPORT (default bench.json).
+
+tb_uart_handler has no state machine behind the handler, so there the
+workloads end when the last command has been decoded.
+"""
+
+import json
+import os
+import resource
+import time
+from functools import wraps
+
+import cocotb
+from cocotb.simtime import get_sim_time
+from cocotb.triggers import ClockCycles, FallingEdge
+
+from cocotbext.uart import UartSource
+
+from tt_glitcher import protocol
+
+from .common import UartMonitor, clks_per_bit, start_clock_and_reset, uart_baud
+
+BENCH_REPORT = os.getenv("BENCH_REPORT", "bench.json")
+
+CLK_PERIOD_NS = 20
+
+# Every command byte the handler knows, any other byte is echoed
+COMMANDS = set(b"".join([
+    *(command for command, _ in protocol.REGISTERS.values()),
+    *protocol.RESET_BEHAVIOR_COMMANDS.values(),
+    protocol.TRIGGER, protocol.ARM, protocol.RESET_TARGET, protocol.HELLO, protocol.SET_BAUD_RATE,
+    protocol.CONFIGURE, protocol.SWEEP_SETTINGS, protocol.SWEEP, protocol.SWEEP_QUERY,
+    protocol.WAVE_ENTRY, protocol.WAVE_LENGTH, protocol.WAVE_READ,
+]))
+
+ECHO_BURST = 32
+
+
+def benchmark(workload):
+    """Decorator recording the simulated cycles and wall-clock time of `workload`, goes below @cocotb.test."""
+    @wraps(workload)
+    async def wrapper(dut):
+        await start_clock_and_reset(dut)
+
+        started_ns = get_sim_time("ns")
+        started = time.perf_counter()
+        await workload(dut)
+        seconds = time.perf_counter() - started
+        cycles = int((get_sim_time("ns") - started_ns) // CLK_PERIOD_NS)
+
+        report = {}
+        if os.path.exists(BENCH_REPORT):
+            with open(BENCH_REPORT) as f:
+                report = json.load(f)
+        report[workload.__name__] = {
+            "cycles": cycles,
+            "seconds": seconds,
+            "cycles_per_second": cycles / seconds,
+            # Kilobytes on Linux
+            "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        }
+        with open(BENCH_REPORT, "w") as f:
+            json.dump(report, f, indent=2)
+
+        dut._log.info("%s: %d cycles in %.2f s, %.0f cycles/s", workload.__name__, cycles, seconds, cycles / seconds)
+
+    return wrapper
+
+
+async def wait_idle(dut):
+    """Wait for the glitcher to finish its sequence (no-op on tb_uart_handler)."""
+    busy = next((getattr(dut, name) for name in ["busy_out", "busy"] if hasattr(dut, name)), None)
+    await ClockCycles(dut.clk, 4)
+    if busy is not None:
+        while busy.value:
+            await FallingEdge(busy)
+
+
+async def send(uart_source, data):
+    await uart_source.write(data)
+    await uart_source.wait()
+
+
+@cocotb.test(timeout_time=100, timeout_unit="ms")
+@benchmark
+async def bench_long_reset(dut):
+    # Longest target reset, without a pulse afterwards
+    uart_source = UartSource(dut.uart_rx, baud=uart_baud(dut), bits=8)
+    await send(uart_source, b'r\xff\xff' + b'y' + b'p')
+    await wait_idle(dut)
+
+
+@cocotb.test(timeout_time=100, timeout_unit="ms")
+@benchmark
+async def bench_pulse_train(dut):
+    # 255 pulses of 16 cycles, 256 cycles apart
+    uart_source = UartSource(dut.uart_rx, baud=uart_baud(dut), bits=8)
+    await send(uart_source, b'd\x00\x10' + b'w\x10' + b'n\xff' + b's\x01\x00' + b't')
+    await wait_idle(dut)
+
+
+@cocotb.test(timeout_time=100, timeout_unit="ms")
+@benchmark
+async def bench_echo_storm(dut):
+    # Every byte that is not a command, in back-to-back bursts. The handler has no
+    # receive FIFO and its echo slowly falls behind a continuous stream, it drops
+    # a byte after about 80.
+    data = bytes(byte for byte in range(256) if byte not in COMMANDS)
+    uart_source = UartSource(dut.uart_rx, baud=uart_baud(dut), bits=8)
+    uart_monitor = UartMonitor(dut.uart_tx, clks_per_bit(dut))
+    for start in range(0, len(data), ECHO_BURST):
+        burst = data[start:start + ECHO_BURST]
+        await send(uart_source, burst)
+        echo = await uart_monitor.read(len(burst))
+        assert echo == burst, f"Echo storm lost or corrupted bytes: sent {burst.hex()}, got {echo.hex()}"
+
+
+@cocotb.test(timeout_time=100, timeout_unit="ms")
+@benchmark
+async def bench_config_trigger(dut):
+    # Full configuration followed by a triggered sequence, a few times over
+    uart_source = UartSource(dut.uart_rx, baud=uart_baud(dut), bits=8)
+    for i in range(8):
+        await send(uart_source, b'd\x01\x00' + b'w' + bytes([i + 1]) + b'n\x04' + b's\x00\x20' + b'r\x00\x40' + b'u' + b't')
+        await wait_idle(dut)
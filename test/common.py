@@ -1,11 +1,33 @@
+import os
+from collections import deque
+from functools import reduce, wraps
+from typing import NamedTuple
+
 import cocotb
 from cocotb.clock import Clock
-from cocotb.triggers import ClockCycles
+from cocotb.queue import Queue
+from cocotb.simtime import convert, get_sim_time
+from cocotb.triggers import ClockCycles, Event, FallingEdge, First, RisingEdge, Timer, with_timeout
+
+from cocotbext.uart import UartSource
+import numpy as np
+
+from tt_glitcher import protocol
+
+# Configure glitch sequences through the uart_rx backdoor instead of the serial line
+UART_BACKDOOR = os.getenv("UART_BACKDOOR", "0") in ["yes", "1", "true"]
+
+# Waveform file the testbench dumps to, relative to the test directory (set by tests.py
+# when WAVES is on)
+WAVES_FILE = os.getenv("WAVES_FILE")
 
 
 async def start_clock_and_reset(dut, *, clk_period_ns=20, reset_cycles=5):
     cocotb.start_soon(Clock(dut.clk, clk_period_ns, unit="ns").start())
+    await reset(dut, reset_cycles=reset_cycles)
 
+
+async def reset(dut, *, reset_cycles=5):
     dut.rst_n.value = 1
     await ClockCycles(dut.clk, 1)
     dut.rst_n.value = 0
@@ -14,11 +36,329 @@ async def start_clock_and_reset(dut, *, clk_period_ns=20, reset_cycles=5):
     await ClockCycles(dut.clk, 1)
 
 
-async def read_exact(uart_sink, length):
-    # uart_sink.read(n) should return n bytes, but it only waits for the first byte
-    # and then throws an exception because the queue is empty.
-    # Let's just read one byte at a time instead.
-    data = bytearray()
-    for _ in range(length):
-        data += await uart_sink.read()
-    return bytes(data)
+def uart_baud(dut):
+    """Baud rate the testbench was built with (see PROFILES in tests.py)."""
+    return int(dut.BAUD_RATE.value)
+
+
+def clks_per_bit(dut):
+    """Clock cycles per UART bit, the same integer division as uart_rx/uart_tx."""
+    return int(dut.CLK_FREQ.value) // int(dut.BAUD_RATE.value)
+
+
+def baud_rates(dut):
+    """Rates of the 'b' command, by index, for the rate the testbench was built with."""
+    return [uart_baud(dut)] + protocol.BAUD_RATES[1:]
+
+
+def bit_clks(dut, rate):
+    """Clock cycles per bit at `rate` (see baud_rates()), with the fraction the device adds."""
+    clk_freq = int(dut.CLK_FREQ.value)
+    if rate == uart_baud(dut):
+        return clk_freq // rate
+    return protocol.bit_time(rate, clk_freq) / 16
+
+
+class UartFrame(NamedTuple):
+    """A byte received by UartMonitor, and the simulation time (in steps) its start bit began."""
+    value: int
+    start: int
+
+
+class UartMonitor:
+    """Decode the UART frames on `line` into a deque of timestamped bytes.
+
+    Unlike UartSink, which wakes up in the middle of every bit, the monitor only
+    wakes up when the line changes and once at the stop bit of every frame, and
+    samples the bits from the recorded changes. The bit time is `clks_per_bit`
+    clock cycles, exactly like uart_rx/uart_tx (see clks_per_bit()), or a
+    fraction for the rates with a fractional bit time (see bit_clks()).
+
+    `frames` holds the received frames that have not been read yet, `starts` the
+    start times of every frame received so far. Frames with a broken stop bit are
+    counted in `framing_errors` and dropped.
+    """
+
+    def __init__(self, line, clks_per_bit, *, clk_period_ns=20):
+        self._line = line
+        self._bit = round(convert(clks_per_bit * clk_period_ns, "ns", to="step"))
+        self._received = Event()
+        self.frames = deque()
+        self.starts = []
+        self.framing_errors = 0
+        self._task = cocotb.start_soon(self._run())
+
+    def stop(self):
+        self._task.cancel()
+
+    def count(self):
+        return len(self.frames)
+
+    def clear(self):
+        self.frames.clear()
+
+    def gaps(self, unit="ns"):
+        """Time from each start bit to the next, over every frame received so far."""
+        return [convert(b - a, "step", to=unit) for a, b in zip(self.starts, self.starts[1:])]
+
+    async def read_frames(self, count, *, timeout=None, timeout_unit="ns"):
+        """Wait for `count` frames and return them, raises SimTimeoutError after `timeout`."""
+        await self._wait(lambda: len(self.frames) >= count, timeout, timeout_unit)
+        return [self.frames.popleft() for _ in range(count)]
+
+    async def read(self, count, *, timeout=None, timeout_unit="ns"):
+        """Wait for exactly `count` bytes and return them, raises SimTimeoutError after `timeout`."""
+        return bytes(frame.value for frame in await self.read_frames(count, timeout=timeout, timeout_unit=timeout_unit))
+
+    async def read_until(self, delimiter, *, timeout=None, timeout_unit="ns"):
+        """Wait for `delimiter` and return the bytes up to and including it."""
+        def end():
+            index = bytes(frame.value for frame in self.frames).find(delimiter)
+            return index + len(delimiter) if index >= 0 else 0
+
+        await self._wait(end, timeout, timeout_unit)
+        return await self.read(end())
+
+    async def _wait(self, ready, timeout, timeout_unit):
+        async def wait():
+            while not ready():
+                self._received.clear()
+                await self._received.wait()
+
+        if timeout is None:
+            await wait()
+        else:
+            await with_timeout(wait(), timeout, timeout_unit)
+
+    async def _run(self):
+        line = self._line
+        while True:
+            await FallingEdge(line)
+            start = get_sim_time()
+            stop = start + 9 * self._bit + self._bit // 2
+            changes = [(start, 0)]
+            while True:
+                trigger = await First(line.value_change, Timer(stop - get_sim_time(), unit="step"))
+                if isinstance(trigger, Timer):
+                    break
+                changes.append((get_sim_time(), int(line.value)))
+
+            def sample(bit):
+                time = start + bit * self._bit + self._bit // 2
+                return [value for changed, value in changes if changed <= time][-1]
+
+            if sample(0) != 0:
+                # A glitch, not a start bit
+                continue
+            if int(line.value) != 1:
+                self.framing_errors += 1
+                continue
+
+            self.frames.append(UartFrame(sum(sample(1 + i) << i for i in range(8)), start))
+            self.starts.append(start)
+            self._received.set()
+
+
+class UartBackdoor:
+    """Load received bytes straight into a uart_rx instance, skipping the serial line.
+
+    Each byte is put on data_o with data_valid_o high for one clock cycle, exactly
+    like uart_rx does after a stop bit, so the uart_handler behind it sees the same
+    transaction in one cycle instead of ten bit times. Has the same write()/wait()
+    interface as UartSource.
+
+    `gap_cycles` idle cycles follow every byte, which gives the handler time to
+    leave its one-cycle states (like the echo) before the next byte arrives.
+    """
+
+    def __init__(self, uart_rx, clk, *, gap_cycles=2):
+        self._data = uart_rx.data_o
+        self._valid = uart_rx.data_valid_o
+        self._rst_n = uart_rx.rst_n
+        self._clk = clk
+        self._gap_cycles = gap_cycles
+        self._queue = Queue()
+        self._idle = Event()
+        self._idle.set()
+        cocotb.start_soon(self._run())
+
+    async def write(self, data):
+        self.write_nowait(data)
+
+    def write_nowait(self, data):
+        for byte in data:
+            self._queue.put_nowait(byte)
+        self._idle.clear()
+
+    async def wait(self):
+        await self._idle.wait()
+
+    async def _run(self):
+        while True:
+            byte = await self._queue.get()
+
+            # Load between clock edges, uart_rx clears data_valid_o again on the next edge
+            await FallingEdge(self._clk)
+            while not self._rst_n.value:
+                # A synchronized reset can be released a few cycles after the top-level one
+                await FallingEdge(self._clk)
+            self._data.value = byte
+            self._valid.value = 1
+            await RisingEdge(self._clk)
+            await ClockCycles(self._clk, self._gap_cycles)
+
+            if self._queue.empty():
+                self._idle.set()
+
+
+def config_source(dut, uart_rx):
+    """UART source for configuring glitch sequences.
+
+    This is the serial line by default, or the backdoor into the uart_rx
+    instance at the dotted path `uart_rx` when UART_BACKDOOR is set. Tests of the serial protocol itself
+    should use UartSource directly.
+    """
+    if UART_BACKDOOR:
+        return UartBackdoor(reduce(getattr, uart_rx.split("."), dut), dut.clk)
+    return UartSource(dut.uart_rx, baud=uart_baud(dut), bits=8)
+
+
+class EdgeMonitor:
+    """Record value changes on a set of signals as (cycle, value) edge lists.
+
+    Only value changes wake the monitor up, so the cost scales with the number
+    of edges rather than the number of clock cycles. Cycle 0 starts at the clock
+    edge where the monitor is started, and an edge recorded at cycle k is the
+    value the signal holds from cycle k onwards.
+
+    Signals are given by name, relative to the dut (e.g. "pulse_out" or
+    "glitch_ctrl.pulse_en").
+    """
+
+    def __init__(self, dut, names, *, clk_period_ns=20):
+        self._signals = {name: reduce(getattr, name.split("."), dut) for name in names}
+        self._period = convert(clk_period_ns, "ns", to="step")
+        self._tasks = []
+        self._t0 = None
+        self.initial = {}
+        self.edges = {}
+
+    def start(self):
+        self._t0 = get_sim_time()
+        self.initial = {name: int(signal.value) for name, signal in self._signals.items()}
+        self.edges = {name: [] for name in self._signals}
+        self._tasks = [cocotb.start_soon(self._watch(name, signal)) for name, signal in self._signals.items()]
+        return self
+
+    def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+
+    @property
+    def cycle(self):
+        return (get_sim_time() - self._t0) // self._period
+
+    async def wait(self, cycles):
+        """Wait until `cycles` full cycles have passed since the monitor was started."""
+        remaining = self._t0 + cycles * self._period - get_sim_time()
+        if remaining > 0:
+            await Timer(remaining, unit="step")
+
+    async def expect(self, timeline):
+        """Wait for a timeline of fixed-length phases to pass, then check it."""
+        await self.wait(sum(cycles for cycles, _ in timeline))
+        self.check(timeline)
+
+    async def _watch(self, name, signal):
+        while True:
+            await signal.value_change
+            self._record(name, int(signal.value))
+
+    def _record(self, name, value):
+        edges = self.edges[name]
+        cycle = self.cycle
+
+        # Collapse zero-time glitches, only the settled value within a cycle counts
+        while edges and edges[-1][0] == cycle:
+            edges.pop()
+
+        previous = edges[-1][1] if edges else self.initial[name]
+        if value != previous:
+            edges.append((cycle, value))
+
+    def observed(self, name, end):
+        """Edges of `name` in the cycles 0 to `end` - 1, starting with its value in cycle 0."""
+        value = self.initial[name]
+        observed = []
+        for cycle, new_value in self.edges[name]:
+            if cycle <= 0:
+                value = new_value
+            elif cycle < end:
+                observed.append((cycle, new_value))
+        return [(0, value)] + observed
+
+    def values(self, name, cycles):
+        """Value of `name` in each of the cycles 0 to `cycles` - 1, as a NumPy array."""
+        edges = self.observed(name, cycles)
+        values = np.empty(cycles, dtype=np.uint8)
+        for (start, value), (end, _) in zip(edges, edges[1:] + [(cycles, None)]):
+            values[start:end] = value
+        return values
+
+    def check(self, timeline):
+        """Check the recorded edges against an expected phase timeline.
+
+        `timeline` is a list of (cycles, {name: value}) phases starting at cycle 0.
+        Signals keep their value from the previous phase unless given again, so the
+        first phase must list every monitored signal. The last phase may use None
+        as its length to extend it up to the current cycle.
+        """
+        missing = set(self._signals) - set(timeline[0][1])
+        assert not missing, f"First phase is missing values for {sorted(missing)}"
+
+        current = self.cycle
+        length = sum(cycles for cycles, _ in timeline[:-1])
+        end = current if timeline[-1][0] is None else length + timeline[-1][0]
+        assert current >= end, f"Timeline ends at cycle {end}, but only {current} cycles have passed"
+
+        self.stop()
+
+        expected = {name: [] for name in self._signals}
+        start = 0
+        for cycles, values in timeline:
+            for name, value in values.items():
+                edges = expected[name]
+                if not edges or edges[-1][1] != value:
+                    edges.append((start, value))
+            start += cycles if cycles is not None else 0
+
+        for name in self._signals:
+            expected_edges = [edge for edge in expected[name] if edge[0] < end]
+            observed = self.observed(name, end)
+            assert observed == expected_edges, f"{name}: expected edges {expected_edges}, got {observed}"
+
+
+def waves_on_failure(test):
+    """Decorator dumping the waveforms of `test`, and logging where they are if it fails.
+
+    Goes below @cocotb.test. The testbench dumps only while dump_on is set, so the dump
+    holds the tests and the simulator does the recording (see tb_*.v). Which signals
+    go in is set with WAVES_SCOPE and WAVES_DEPTH in tests.py.
+    """
+    @wraps(test)
+    async def wrapper(dut, *args, **kwargs):
+        started = get_sim_time("ns")
+        dut.dump_on.value = 1
+        try:
+            return await test(dut, *args, **kwargs)
+        except BaseException:
+            # Also catches the cancellation when the test times out
+            if WAVES_FILE:
+                dut._log.info("The waveforms of %s are in %s, from %g to %g ns", test.__name__,
+                              os.path.abspath(WAVES_FILE), started, get_sim_time("ns"))
+            raise
+        finally:
+            dut.dump_on.value = 0
+
+    return wrapper
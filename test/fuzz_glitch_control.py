@@ -0,0 +1,229 @@
+"""Constrained-random differential fuzzing of glitch_control against glitch_model.StepModel.
+
+Each scenario resets the design and plays a random stream of configuration
+commands (over the full register ranges), 't', 'p' and 'a' commands, reset
+behaviors and trigger pulses, without waiting for the glitcher to go idle in
+between. So triggers and commands regularly land while a sequence is running,
+while armed or in the same cycle as each other.
+
+The inputs of the state machine (the strobes and staging registers of the UART
+handler and the trigger pin) are recorded while the stream plays, and the model
+is run on exactly those inputs. Its outputs must match the recorded outputs edge
+for edge, and the staging registers must end up at the last value written.
+
+This module is run by `python tests.py fuzz`, which shards it over a process
+pool, but a single shard can be run directly through the runner as well:
+  FUZZ_SEED     - seed of the first scenario, scenario i uses FUZZ_SEED + i (default random)
+  FUZZ_SCENARIOS - number of scenarios (default 20)
+  FUZZ_MAX_CYCLES - longest pulse sequence a scenario may configure (default 200000)
+  FUZZ_REPORT   - JSON file the coverage and failures are written to (default fuzz.json)
+The shards of tests.py get their seed, scenarios and report as FUZZ_SHARD_SEED,
+FUZZ_SHARD_SCENARIOS and FUZZ_SHARD_REPORT, which go before the ones above.
+"""
+
+import json
+import os
+import random
+
+import cocotb
+from cocotb.triggers import ClockCycles, FallingEdge, RisingEdge, with_timeout
+
+import numpy as np
+
+from . import glitch_model
+from .common import EdgeMonitor, UartBackdoor, reset, start_clock_and_reset
+
+FUZZ_SEED = int(os.getenv("FUZZ_SHARD_SEED") or os.getenv("FUZZ_SEED") or random.getrandbits(32))
+FUZZ_SCENARIOS = int(os.getenv("FUZZ_SHARD_SCENARIOS") or os.getenv("FUZZ_SCENARIOS") or 20)
+FUZZ_MAX_CYCLES = int(os.getenv("FUZZ_MAX_CYCLES", 200_000))
+FUZZ_REPORT = os.getenv("FUZZ_SHARD_REPORT") or os.getenv("FUZZ_REPORT") or "fuzz.json"
+
+OUTPUTS = ["pulse_out", "target_reset_out", "busy_out", "armed_out", "pulse_en_out"]
+INPUTS = [
+    "trigger_in" if name == "trigger_i" else f"glitch_ctrl.{name}" if name in glitch_model.STROBES else f"glitch_ctrl.uart_hdlr.{name}"
+    for name in glitch_model.INPUTS
+]
+
+# Command byte and value length of every register
+REGISTER_COMMANDS = {
+    "pulse_delay": (b'd', 2),
+    "pulse_width": (b'w', 1),
+    "num_pulses": (b'n', 1),
+    "pulse_spacing": (b's', 2),
+    "reset_length": (b'r', 2),
+}
+
+RESET_DEFAULTS = {
+    "pulse_delay": 0,
+    "pulse_width": 1,
+    "num_pulses": 1,
+    "pulse_spacing": 0,
+    "reset_length": 0,
+}
+
+RESET_BEHAVIOR_COMMANDS = [b'y', b'u', b'i']
+
+# Relative weights of the operations in a stream
+OPERATIONS = {
+    "register": 8,
+    "reset_behavior": 2,
+    "start": 3,     # 't'
+    "reset": 2,     # 'p'
+    "arm": 3,       # 'a'
+    "trigger": 4,
+    "wait": 3,
+    "drain": 2,     # wait for the commands so far to be received
+}
+
+
+def random_value(rng, limit):
+    """A register value, biased towards the boundaries and small values."""
+    choice = rng.random()
+    if choice < 0.3:
+        return int(rng.choice([0, 1, 2, limit - 1, limit]))
+    if choice < 0.7:
+        return int(rng.integers(0, 17))
+    return int(rng.integers(0, limit + 1))
+
+
+def sequence_cycles(registers):
+    """Upper bound of the length of a reset and pulse sequence with these registers."""
+    num_pulses = registers["num_pulses"]
+    return (
+        max(registers["reset_length"], 1)
+        + max(registers["pulse_delay"], 1)
+        + num_pulses * max(registers["pulse_width"], 1)
+        + max(num_pulses - 1, 0) * max(registers["pulse_spacing"], 1)
+    )
+
+
+def random_stream(rng, max_cycles):
+    """A random list of operations, and the register values it leaves behind.
+
+    Register values are redrawn while they would make a sequence longer than
+    `max_cycles`, so every value stays reachable with small enough neighbours.
+    """
+    registers = dict(RESET_DEFAULTS)
+    names = list(OPERATIONS)
+    weights = np.array(list(OPERATIONS.values()), dtype=float)
+
+    stream = []
+    for kind in rng.choice(names, int(rng.integers(4, 25)), p=weights / weights.sum()):
+        if kind == "register":
+            name = str(rng.choice(list(REGISTER_COMMANDS)))
+            command, length = REGISTER_COMMANDS[name]
+            for _ in range(10):
+                value = random_value(rng, glitch_model.REGISTER_LIMITS[name])
+                if sequence_cycles({**registers, name: value}) <= max_cycles:
+                    break
+            else:
+                value = 0
+            registers[name] = value
+            stream.append(("write", command + value.to_bytes(length, "big")))
+        elif kind == "reset_behavior":
+            stream.append(("write", RESET_BEHAVIOR_COMMANDS[int(rng.integers(0, 3))]))
+        elif kind == "start":
+            stream.append(("write", b't'))
+        elif kind == "reset":
+            stream.append(("write", b'p'))
+        elif kind == "arm":
+            stream.append(("write", b'a'))
+        elif kind == "trigger":
+            stream.append(("trigger", int(rng.integers(1, 5))))
+        elif kind == "wait":
+            stream.append(("wait", int(rng.integers(0, 64))))
+        else:
+            stream.append(("drain", None))
+
+    return stream, registers
+
+
+async def play(dut, uart, stream, max_cycles):
+    for operation, argument in stream:
+        if operation == "write":
+            await uart.write(argument)
+        elif operation == "trigger":
+            dut.trigger_in.value = 1
+            await ClockCycles(dut.clk, argument)
+            dut.trigger_in.value = 0
+        elif operation == "wait":
+            await ClockCycles(dut.clk, argument + 1)
+        else:
+            await uart.wait()
+
+    await uart.wait()
+    # Let a trigger or strobe from the last cycles start its sequence, then wait it out
+    await ClockCycles(dut.clk, 4)
+    while dut.busy_out.value:
+        await FallingEdge(dut.busy_out)
+    await ClockCycles(dut.clk, 4)
+
+
+async def run_scenario(dut, uart, seed, model):
+    """Play one random stream and compare it against the model, returning a failure message or None."""
+    rng = np.random.default_rng(seed)
+    stream, registers = random_stream(rng, FUZZ_MAX_CYCLES)
+
+    await reset(dut)
+    await RisingEdge(dut.clk)
+    monitor = EdgeMonitor(dut, INPUTS + OUTPUTS).start()
+
+    # Every operation starts at most one sequence, plus some slack for the commands
+    budget = (len(stream) + 1) * (FUZZ_MAX_CYCLES + 1000) * 20
+    await with_timeout(play(dut, uart, stream, FUZZ_MAX_CYCLES), budget, "ns")
+    monitor.stop()
+    cycles = monitor.cycle
+
+    inputs = {name: monitor.observed(signal, cycles) for name, signal in zip(glitch_model.INPUTS, INPUTS)}
+    expected = model.run(inputs, cycles)
+
+    for signal, name in zip(OUTPUTS, glitch_model.OUTPUTS):
+        observed = monitor.observed(signal, cycles)
+        if observed != expected[name]:
+            first = next(
+                (i for i, (a, b) in enumerate(zip(observed, expected[name])) if a != b),
+                min(len(observed), len(expected[name]))
+            )
+            return (
+                f"seed {seed}: {signal} edges differ from the model at edge {first}: "
+                f"got {observed[first:first + 4]}, expected {expected[name][first:first + 4]} "
+                f"(stream {stream})"
+            )
+
+    for name, value in registers.items():
+        staged = glitch_model.STAGED[name]
+        if inputs[staged][-1][1] != value:
+            return f"seed {seed}: {staged} is {inputs[staged][-1][1]}, expected {value} (stream {stream})"
+
+    return None
+
+
+@cocotb.test()
+async def fuzz_glitch_control(dut):
+    dut._log.info("Start")
+
+    await start_clock_and_reset(dut)
+
+    dut._log.info("Fuzz %d scenarios from seed %d", FUZZ_SCENARIOS, FUZZ_SEED)
+
+    # Configuration goes through the backdoor, the serial line adds nothing but time here
+    uart = UartBackdoor(dut.glitch_ctrl.uart_hdlr.rxi, dut.clk)
+    model = glitch_model.StepModel()
+    failures = []
+
+    for i in range(FUZZ_SCENARIOS):
+        failure = await run_scenario(dut, uart, FUZZ_SEED + i, model)
+        if failure:
+            dut._log.error(failure)
+            failures.append(failure)
+
+    with open(FUZZ_REPORT, "w") as f:
+        json.dump({
+            "seed": FUZZ_SEED,
+            "scenarios": FUZZ_SCENARIOS,
+            "bins": glitch_model.coverage_bins(),
+            "coverage": model.coverage,
+            "failures": failures,
+        }, f, indent=2)
+
+    assert not failures, f"{len(failures)} of {FUZZ_SCENARIOS} scenarios differ from the model"
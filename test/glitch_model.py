@@ -0,0 +1,429 @@
+"""Cycle-accurate reference model of the glitch_control state machine.
+
+The model computes the per-cycle values of the glitch_control outputs for a whole
+batch of configurations at once, as NumPy arrays of shape (batch, cycles).
+
+Cycle 0 is the cycle in which the sequence is started:
+  "uart"    - the cycle in which the 't' command strobes pulse_en
+  "trigger" - the first cycle trigger_i is high, the glitcher is armed before it
+  "reset"   - the cycle in which the 'p' command is decoded (target_reset rises at cycle 1)
+
+Like the RTL, a delay, width, spacing or reset length of 0 behaves like 1, and
+num_pulses = 0 runs the delay without any pulse. trigger_i goes through a two
+stage synchronizer, so pulse_en follows a trigger two cycles later.
+
+StepModel runs arbitrary streams of commands and triggers instead, one at a time,
+and counts functional coverage for the fuzzer.
+"""
+
+import numpy as np
+
+RESET_NONE = 0
+RESET_PULSE = 1
+RESET_ARM = 2
+
+SOURCES = ["uart", "trigger", "reset"]
+OUTPUTS = ["pulse_o", "target_reset_o", "busy_o", "armed_o", "pulse_en_o"]
+
+TRIGGER_SYNC_CYCLES = 2
+
+# Larger than any timeline, used for events that never happen
+NEVER = np.iinfo(np.int64).max // 4
+
+
+def _phases(source, delay, width, num_pulses, spacing, reset_length, reset_behavior, trigger_cycle):
+    """Start and end cycles of every phase, as (batch, 1) columns."""
+    if source not in SOURCES:
+        raise ValueError(f"source must be one of {SOURCES}, not {source!r}")
+
+    delay, width, num_pulses, spacing, reset_length, reset_behavior, trigger_cycle = (
+        np.asarray(value, dtype=np.int64).reshape(-1, 1)
+        for value in np.broadcast_arrays(
+            delay, width, num_pulses, spacing, reset_length, reset_behavior, trigger_cycle
+        )
+    )
+    for name, value, limit in [
+        ("delay", delay, 0xFFFF),
+        ("width", width, 0xFF),
+        ("num_pulses", num_pulses, 0xFF),
+        ("spacing", spacing, 0xFFFF),
+        ("reset_length", reset_length, 0xFFFF),
+    ]:
+        if np.any((value < 0) | (value > limit)):
+            raise ValueError(f"{name} must be between 0 and {limit}")
+
+    # 0 and 1 both mean one cycle
+    delay_cycles = np.maximum(delay, 1)
+    width_cycles = np.maximum(width, 1)
+    spacing_cycles = np.maximum(spacing, 1)
+    reset_cycles = np.maximum(reset_length, 1)
+
+    never = np.full_like(delay, NEVER)
+    reset_start = never
+    reset_end = never
+    armed_start = never
+    armed_end = never
+
+    if source == "uart":
+        fire = np.zeros_like(delay)
+        delay_start = fire + 1
+    elif source == "trigger":
+        fire = trigger_cycle + TRIGGER_SYNC_CYCLES
+        delay_start = fire + 1
+        armed_start = np.zeros_like(delay)
+        armed_end = fire + 1
+    else:
+        reset_start = np.ones_like(delay)
+        reset_end = reset_start + reset_cycles
+        triggered = trigger_cycle + TRIGGER_SYNC_CYCLES
+
+        # RESET_PULSE goes straight from the reset into the delay, strobing pulse_en on the way
+        pulse = reset_behavior == RESET_PULSE
+        # RESET_ARM arms when the reset is done, a trigger synchronized before that is lost
+        arm = reset_behavior == RESET_ARM
+        arm_fires = arm & (triggered >= reset_end)
+
+        fire = np.where(pulse, reset_end, np.where(arm_fires, triggered, never))
+        delay_start = np.where(pulse, reset_end, np.where(arm_fires, triggered + 1, never))
+        armed_start = np.where(arm, reset_end, never)
+        armed_end = np.where(arm_fires, triggered + 1, never)
+
+    pulses_start = delay_start + delay_cycles
+    end = np.where(
+        num_pulses > 0,
+        pulses_start + num_pulses * width_cycles + (num_pulses - 1) * spacing_cycles,
+        pulses_start,
+    )
+    end = np.where(fire == NEVER, never, end)
+
+    return {
+        "fire": fire,
+        "delay_start": delay_start,
+        "pulses_start": pulses_start,
+        "end": end,
+        "period": width_cycles + spacing_cycles,
+        "width": width_cycles,
+        "reset_start": reset_start,
+        "reset_end": reset_end,
+        "armed_start": armed_start,
+        "armed_end": armed_end,
+    }
+
+
+def timelines(cycles, *, source="uart", delay=0, width=1, num_pulses=1, spacing=0,
+              reset_length=0, reset_behavior=RESET_PULSE, trigger_cycle=0):
+    """Expected outputs for cycles 0 to `cycles` - 1 of every configuration in the batch.
+
+    The configuration arguments are scalars or arrays that broadcast to a 1-D batch,
+    defaulting to the register values after reset. `trigger_cycle` is the cycle in
+    which trigger_i is high for one cycle, used by the "trigger" source and by
+    "reset" with RESET_ARM (where it only fires if it arrives after the reset).
+
+    Returns a dict from output name (see OUTPUTS) to a uint8 array of shape (batch, cycles).
+    """
+    phases = _phases(source, delay, width, num_pulses, spacing, reset_length, reset_behavior, trigger_cycle)
+    t = np.arange(cycles, dtype=np.int64)[np.newaxis, :]
+
+    reset = (t >= phases["reset_start"]) & (t < phases["reset_end"])
+    sequence = (t >= phases["delay_start"]) & (t < phases["end"])
+    since_pulses = t - phases["pulses_start"]
+    pulse = sequence & (since_pulses >= 0) & (since_pulses % phases["period"] < phases["width"])
+
+    return {
+        "pulse_o": pulse.astype(np.uint8),
+        "target_reset_o": reset.astype(np.uint8),
+        "busy_o": (reset | sequence).astype(np.uint8),
+        "armed_o": ((t >= phases["armed_start"]) & (t < phases["armed_end"])).astype(np.uint8),
+        "pulse_en_o": (t == phases["fire"]).astype(np.uint8),
+    }
+
+
+def sequence_end(*, source="uart", delay=0, width=1, num_pulses=1, spacing=0,
+                 reset_length=0, reset_behavior=RESET_PULSE, trigger_cycle=0):
+    """First cycle in which the glitcher is idle again, for every configuration in the batch.
+
+    Configurations that never start a pulse sequence end with their reset (or at
+    cycle 0 without one).
+    """
+    phases = _phases(source, delay, width, num_pulses, spacing, reset_length, reset_behavior, trigger_cycle)
+    end = np.where(phases["end"] == NEVER, phases["reset_end"], phases["end"])
+    return np.where(end == NEVER, 0, end).ravel()
+
+
+# State encoding of glitch_control.v
+STATE_IDLE = 0
+STATE_RESET_TARGET = 1
+STATE_DELAY = 2
+STATE_PULSE_ACTIVE = 3
+STATE_PULSE_SPACE = 4
+
+STATE_NAMES = {
+    STATE_IDLE: "IDLE",
+    STATE_RESET_TARGET: "RESET_TARGET",
+    STATE_DELAY: "DELAY",
+    STATE_PULSE_ACTIVE: "PULSE_ACTIVE",
+    STATE_PULSE_SPACE: "PULSE_SPACE",
+}
+
+# Registers of the state machine as named inside glitch_control.v, and the staging
+# registers of uart_handler.v they take over when a sequence starts
+STAGED = {
+    "pulse_delay": "delay",
+    "pulse_width": "width",
+    "num_pulses": "num_pulses",
+    "pulse_spacing": "pulse_spacing",
+    "reset_length": "reset_length",
+    "reset_behavior": "reset_behavior",
+}
+
+# Inputs of the state machine: the strobes as named inside glitch_control.v, then the
+# staging registers and write_pending (half of a register written, no commit) of
+# uart_handler.v
+STROBES = ["uart_pulse_en", "uart_reset_en", "uart_arm_signal", "trigger_i"]
+INPUTS = STROBES + list(STAGED.values()) + ["write_pending"]
+
+REGISTER_LIMITS = {
+    "pulse_delay": 0xFFFF,
+    "pulse_width": 0xFF,
+    "num_pulses": 0xFF,
+    "pulse_spacing": 0xFFFF,
+    "reset_length": 0xFFFF,
+}
+
+TRANSITIONS = [
+    ("IDLE", "RESET_TARGET"),
+    ("IDLE", "DELAY"),
+    ("RESET_TARGET", "DELAY"),
+    ("RESET_TARGET", "IDLE"),
+    ("DELAY", "PULSE_ACTIVE"),
+    ("DELAY", "IDLE"),
+    ("PULSE_ACTIVE", "PULSE_SPACE"),
+    ("PULSE_ACTIVE", "IDLE"),
+    ("PULSE_SPACE", "PULSE_ACTIVE"),
+]
+
+EVENTS = [
+    "uart_trigger_while_busy",
+    "armed_trigger_while_busy",
+    "trigger_while_disarmed",
+    "reset_while_busy",
+    "arm_while_busy",
+    "disarm",
+    "arm_and_trigger",
+    "reset_and_trigger",
+    "reset_trigger_lost",
+    "write_while_busy",
+    "write_while_armed",
+]
+
+# Boundary classes of a register value when a phase starts
+VALUE_CLASSES = ["0", "1", "mid", "max-1", "max"]
+
+
+def value_class(value, limit):
+    if value in (0, 1):
+        return str(value)
+    if value == limit:
+        return "max"
+    if value == limit - 1:
+        return "max-1"
+    return "mid"
+
+
+def coverage_bins():
+    """Every functional coverage bin StepModel can hit."""
+    bins = [f"transition {a}->{b}" for a, b in TRANSITIONS]
+    bins += [f"reset_behavior {name}" for name in ["none", "pulse", "arm"]]
+    bins += [f"{name}={cls}" for name in REGISTER_LIMITS for cls in VALUE_CLASSES]
+    bins += [f"event {event}" for event in EVENTS]
+    return bins
+
+
+class StepModel:
+    """Cycle-accurate model of the glitch_control state machine, driven by input edges.
+
+    Unlike timelines(), this runs any stream of commands and triggers, including
+    ones that arrive while the glitcher is busy. The inputs are given as edge lists
+    [(cycle, value), ...] in the EdgeMonitor convention, starting at cycle 0 with
+    the state machine idle and disarmed and both register banks the same. Like
+    uart_handler, the registers are latched from the staging inputs on the edge
+    a sequence starts, unless write_pending is set. Quiet stretches (counting down a phase
+    with no input changing) are skipped in one step, so the cost scales with the
+    number of input and output edges rather than cycles.
+
+    `coverage` counts the functional coverage bins (see coverage_bins()) hit by the run.
+    """
+
+    def __init__(self):
+        self.coverage = {}
+
+    def _hit(self, name):
+        self.coverage[name] = self.coverage.get(name, 0) + 1
+
+    def run(self, inputs, cycles):
+        """Return the output edge lists for cycles 0 to `cycles` - 1."""
+        inputs = {name: list(inputs[name]) for name in INPUTS}
+        change_cycles = sorted({cycle for edges in inputs.values() for cycle, _ in edges if cycle > 0})
+        next_change = 0
+
+        position = {name: 0 for name in INPUTS}
+        value = {name: inputs[name][0][1] for name in INPUTS}
+
+        active = {name: value[staged] for name, staged in STAGED.items()}
+        staged_before = {staged: value[staged] for staged in STAGED.values()}
+
+        state = STATE_IDLE
+        phase_cnt = 0
+        pulse_cnt = 0
+        armed = 0
+        strobe = 0
+        # The synchronizer is not reset, assume the trigger has been stable for a while
+        sync1 = sync2 = value["trigger_i"]
+
+        outputs = {name: [] for name in OUTPUTS}
+
+        c = 0
+        while c < cycles:
+            for name in INPUTS:
+                edges = inputs[name]
+                while position[name] + 1 < len(edges) and edges[position[name] + 1][0] <= c:
+                    position[name] += 1
+                value[name] = edges[position[name]][1]
+            while next_change < len(change_cycles) and change_cycles[next_change] <= c:
+                next_change += 1
+
+            uart_pulse_en = value["uart_pulse_en"]
+            uart_reset_en = value["uart_reset_en"]
+            uart_arm = value["uart_arm_signal"]
+            behavior = active["reset_behavior"]
+
+            targets = {
+                STATE_RESET_TARGET: max(active["reset_length"], 1) - 1,
+                STATE_DELAY: max(active["pulse_delay"], 1) - 1,
+                STATE_PULSE_ACTIVE: max(active["pulse_width"], 1) - 1,
+                STATE_PULSE_SPACE: max(active["pulse_spacing"], 1) - 1,
+            }
+
+            pulse_en = int(bool(uart_pulse_en or (armed and sync2) or (strobe and behavior == RESET_PULSE)))
+            busy = state != STATE_IDLE
+
+            for name, output in [
+                ("pulse_o", int(state == STATE_PULSE_ACTIVE)),
+                ("target_reset_o", int(state == STATE_RESET_TARGET)),
+                ("busy_o", int(busy)),
+                ("armed_o", armed),
+                ("pulse_en_o", pulse_en),
+            ]:
+                edges = outputs[name]
+                if not edges or edges[-1][1] != output:
+                    edges.append((c, output))
+
+            # A write to the staging bank, held back until the next sequence
+            if any(value[staged] != staged_before[staged] for staged in STAGED.values()):
+                if busy:
+                    self._hit("event write_while_busy")
+                if armed:
+                    self._hit("event write_while_armed")
+                staged_before = {staged: value[staged] for staged in STAGED.values()}
+
+            # Skip ahead while only a phase counter is counting
+            quiet = not (uart_pulse_en or uart_reset_en or uart_arm or pulse_en or strobe)
+            quiet = quiet and sync1 == sync2 == value["trigger_i"]
+            if quiet:
+                until = change_cycles[next_change] if next_change < len(change_cycles) else cycles
+                if state != STATE_IDLE:
+                    until = min(until, c + (targets[state] - phase_cnt) % 0x10000)
+                if until > c:
+                    if state != STATE_IDLE:
+                        phase_cnt = (phase_cnt + until - c) % 0x10000
+                    c = until
+                    continue
+
+            self._events(state, busy, armed, sync2, pulse_en, uart_pulse_en, uart_reset_en, uart_arm)
+
+            # Clock edge
+            next_state = state
+            next_armed = armed
+            next_strobe = 0
+
+            if uart_arm:
+                next_armed = 1 - armed
+            elif pulse_en:
+                next_armed = 0
+
+            if state == STATE_IDLE:
+                if (uart_reset_en or uart_pulse_en or (armed and sync2)) and not value["write_pending"]:
+                    active = {name: value[staged] for name, staged in STAGED.items()}
+                if uart_reset_en:
+                    next_state = STATE_RESET_TARGET
+                    phase_cnt = 0
+                    self._hit(f"reset_length={value_class(active['reset_length'], 0xFFFF)}")
+                elif uart_pulse_en or (armed and sync2):
+                    next_state = STATE_DELAY
+                    phase_cnt = 0
+                    self._sequence_started(active)
+            elif phase_cnt == targets[state]:
+                phase_cnt = 0
+                if state == STATE_RESET_TARGET:
+                    next_strobe = 1
+                    if behavior == RESET_PULSE:
+                        next_state = STATE_DELAY
+                        self._hit("reset_behavior pulse")
+                        self._sequence_started(active)
+                    elif behavior == RESET_ARM:
+                        next_armed = 1
+                        next_state = STATE_IDLE
+                        self._hit("reset_behavior arm")
+                    else:
+                        next_state = STATE_IDLE
+                        self._hit("reset_behavior none")
+                elif state == STATE_DELAY:
+                    if active["num_pulses"]:
+                        next_state = STATE_PULSE_ACTIVE
+                        pulse_cnt = active["num_pulses"] - 1
+                    else:
+                        next_state = STATE_IDLE
+                        pulse_cnt = 0
+                elif state == STATE_PULSE_ACTIVE:
+                    if pulse_cnt:
+                        next_state = STATE_PULSE_SPACE
+                        pulse_cnt -= 1
+                    else:
+                        next_state = STATE_IDLE
+                else:
+                    next_state = STATE_PULSE_ACTIVE
+            else:
+                phase_cnt = (phase_cnt + 1) % 0x10000
+
+            if next_state != state:
+                self._hit(f"transition {STATE_NAMES[state]}->{STATE_NAMES[next_state]}")
+
+            state, armed, strobe = next_state, next_armed, next_strobe
+            sync1, sync2 = value["trigger_i"], sync1
+            c += 1
+
+        return outputs
+
+    def _sequence_started(self, active):
+        for name in ["pulse_delay", "pulse_width", "num_pulses", "pulse_spacing"]:
+            self._hit(f"{name}={value_class(active[name], REGISTER_LIMITS[name])}")
+
+    def _events(self, state, busy, armed, sync2, pulse_en, uart_pulse_en, uart_reset_en, uart_arm):
+        if busy and uart_pulse_en:
+            self._hit("event uart_trigger_while_busy")
+        if busy and armed and sync2:
+            self._hit("event armed_trigger_while_busy")
+        if sync2 and not armed and not busy:
+            self._hit("event trigger_while_disarmed")
+        if busy and uart_reset_en:
+            self._hit("event reset_while_busy")
+        if busy and uart_arm:
+            self._hit("event arm_while_busy")
+        if uart_arm and armed:
+            self._hit("event disarm")
+        if uart_arm and pulse_en:
+            self._hit("event arm_and_trigger")
+        if not busy and uart_reset_en and pulse_en:
+            self._hit("event reset_and_trigger")
+        if state == STATE_RESET_TARGET and sync2 and not armed:
+            self._hit("event reset_trigger_lost")
@@ -1,14 +1,30 @@
 `default_nettype none
 `timescale 1ns / 1ps
 
-module tb_glitch_control ();
+module tb_glitch_control #(
+    parameter CLK_FREQ = 50_000_000,
+    parameter BAUD_RATE = 115200
+) ();
 
+    // Dump the signals below `DUMP_SCOPE, `DUMP_DEPTH levels deep like $dumpvars, to a FST
+    // file (tests.py defines both when WAVES is on). The dump only runs while the tests
+    // set dump_on, see waves_on_failure in common.py.
+    reg dump_on = 1'b0;
+`ifndef VERILATOR
+`ifdef DUMP_SCOPE
+    // Verilator traces the whole run through the simulation executable instead (see tests.py)
     initial begin
         $dumpfile("tb_glitch_control.fst");
-        $dumpvars(0, tb_glitch_control);
-        #1;
+        $dumpvars(`DUMP_DEPTH, `DUMP_SCOPE);
+        $dumpoff;
     end
 
+    always @(dump_on)
+        if (dump_on) $dumpon;
+        else $dumpoff;
+`endif
+`endif
+
     reg clk;
     reg rst_n;
 
@@ -29,8 +45,8 @@ module tb_glitch_control ();
     end
 
     glitch_control #(
-        .CLK_FREQ(50_000_000),
-        .BAUD_RATE(115200)
+        .CLK_FREQ(CLK_FREQ),
+        .BAUD_RATE(BAUD_RATE)
     ) glitch_ctrl (
         .rst_n(rst_n),
         .clk(clk),
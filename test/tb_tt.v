@@ -4,15 +4,30 @@
 /* This testbench just instantiates the module and makes some convenient wires
    that can be driven / tested by the cocotb tests.py.
 */
-module tb_tt ();
+module tb_tt #(
+    parameter CLK_FREQ = 50_000_000,
+    parameter BAUD_RATE = 115200
+) ();
 
-    // Dump the signals to a FST file. You can view it with gtkwave or surfer.
+    // Dump the signals below `DUMP_SCOPE, `DUMP_DEPTH levels deep like $dumpvars, to a FST
+    // file (tests.py defines both when WAVES is on). The dump only runs while the tests
+    // set dump_on, see waves_on_failure in common.py.
+    reg dump_on = 1'b0;
+`ifndef VERILATOR
+`ifdef DUMP_SCOPE
+    // Verilator traces the whole run through the simulation executable instead (see tests.py)
     initial begin
         $dumpfile("tb_tt.fst");
-        $dumpvars(0, tb_tt);
-        #1;
+        $dumpvars(`DUMP_DEPTH, `DUMP_SCOPE);
+        $dumpoff;
     end
 
+    always @(dump_on)
+        if (dump_on) $dumpon;
+        else $dumpoff;
+`endif
+`endif
+
     // Wire up the inputs and outputs:
     reg clk;
     reg rst_n;
@@ -51,7 +66,15 @@ module tb_tt ();
         trigger_in = 0;
     end
 
+`ifdef GL_TEST
+    // The netlist is synthesized with the default parameters
     tt_um_pakesson_glitcher user_project (
+`else
+    tt_um_pakesson_glitcher #(
+        .CLK_FREQ(CLK_FREQ),
+        .BAUD_RATE(BAUD_RATE)
+    ) user_project (
+`endif
         .ui_in  (ui_in),    // Dedicated inputs
         .uo_out (uo_out),   // Dedicated outputs
         .uio_in (uio_in),   // IOs: Input path
@@ -1,28 +1,52 @@
 `default_nettype none
 `timescale 1ns / 1ps
 
-module tb_uart ();
+module tb_uart #(
+    parameter CLK_FREQ = 50_000_000,
+    parameter BAUD_RATE = 115200
+) ();
 
+    // Dump the signals below `DUMP_SCOPE, `DUMP_DEPTH levels deep like $dumpvars, to a FST
+    // file (tests.py defines both when WAVES is on). The dump only runs while the tests
+    // set dump_on, see waves_on_failure in common.py.
+    reg dump_on = 1'b0;
+`ifndef VERILATOR
+`ifdef DUMP_SCOPE
+    // Verilator traces the whole run through the simulation executable instead (see tests.py)
     initial begin
         $dumpfile("tb_uart.fst");
-        $dumpvars(0, tb_uart);
-        #1;
+        $dumpvars(`DUMP_DEPTH, `DUMP_SCOPE);
+        $dumpoff;
     end
 
+    always @(dump_on)
+        if (dump_on) $dumpon;
+        else $dumpoff;
+`endif
+`endif
+
     reg clk;
     reg rst_n;
 
     reg uart_rx;
     wire [7:0] uart_rx_data;
+
+    // Bit time, driven by the tests to run at other rates
+    localparam integer CLKS_PER_BIT = CLK_FREQ / BAUD_RATE;
+    reg [15:0] clks_per_bit;
+    reg [3:0] clks_per_bit_frac;
     wire uart_rx_valid;
 
     uart_rx #(
-        .CLK_FREQ(50_000_000),
-        .BAUD_RATE(115200)
+        .CLK_FREQ(CLK_FREQ),
+        .BAUD_RATE(BAUD_RATE),
+        .CLK_CNT_WIDTH(16)
     ) rxi (
         .rst_n(rst_n),
         .clk(clk),
         .rx_i(uart_rx),
+        .clks_per_bit_i(clks_per_bit),
+        .clks_per_bit_frac_i(clks_per_bit_frac),
         .data_o(uart_rx_data),
         .data_valid_o(uart_rx_valid)
     );
@@ -35,11 +59,14 @@ module tb_uart ();
     reg [7:0] uart_tx_data;
 
     uart_tx #(
-        .CLK_FREQ(50_000_000),
-        .BAUD_RATE(115200)
+        .CLK_FREQ(CLK_FREQ),
+        .BAUD_RATE(BAUD_RATE),
+        .CLK_CNT_WIDTH(16)
     ) txi (
         .rst_n(rst_n),
         .clk(clk),
+        .clks_per_bit_i(clks_per_bit),
+        .clks_per_bit_frac_i(clks_per_bit_frac),
         .tx_o(uart_tx),
         .tx_data_i(uart_tx_data),
         .tx_enable_i(uart_tx_en),
@@ -50,6 +77,8 @@ module tb_uart ();
         clk = 0;
         rst_n = 1;
         uart_rx = 1;
+        clks_per_bit = CLKS_PER_BIT[15:0];
+        clks_per_bit_frac = 0;
         uart_tx_en = 0;
         uart_tx_data = 0;
     end
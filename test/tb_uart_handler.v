@@ -1,14 +1,32 @@
 `default_nettype none
 `timescale 1ns / 1ps
 
-module tb_uart_handler ();
+module tb_uart_handler #(
+    parameter CLK_FREQ = 50_000_000,
+    parameter BAUD_RATE = 115200,
+    parameter TIMEOUT = CLK_FREQ / 20,
+    parameter WAVE_ENTRIES = 4
+) ();
 
+    // Dump the signals below `DUMP_SCOPE, `DUMP_DEPTH levels deep like $dumpvars, to a FST
+    // file (tests.py defines both when WAVES is on). The dump only runs while the tests
+    // set dump_on, see waves_on_failure in common.py.
+    reg dump_on = 1'b0;
+`ifndef VERILATOR
+`ifdef DUMP_SCOPE
+    // Verilator traces the whole run through the simulation executable instead (see tests.py)
     initial begin
         $dumpfile("tb_uart_handler.fst");
-        $dumpvars(0, tb_uart_handler);
-        #1;
+        $dumpvars(`DUMP_DEPTH, `DUMP_SCOPE);
+        $dumpoff;
     end
 
+    always @(dump_on)
+        if (dump_on) $dumpon;
+        else $dumpoff;
+`endif
+`endif
+
     reg clk;
     reg rst_n;
 
@@ -21,16 +39,29 @@ module tb_uart_handler ();
     wire [7:0]  num_pulses;
     wire [15:0] pulse_spacing;
     wire        pulse_en;
+    wire        reset_en;
+    wire [15:0] reset_length;
+    wire [1:0]  reset_behavior;
+    wire        arm;
+    reg         commit; // Driven by the test, glitch_control being idle
+
+    reg         sequence_done; // Driven by the test, the end of a pulse sequence
+    wire [WAVE_ENTRIES*16-1:0] wave_table;
+    wire [7:0]  wave_length;
 
     initial begin
         clk = 0;
         rst_n = 1;
         uart_rx = 1;
+        commit = 1;
+        sequence_done = 0;
     end
 
     uart_handler #(
-        .CLK_FREQ(50_000_000),
-        .BAUD_RATE(115200)
+        .CLK_FREQ(CLK_FREQ),
+        .BAUD_RATE(BAUD_RATE),
+        .TIMEOUT(TIMEOUT),
+        .WAVE_ENTRIES(WAVE_ENTRIES)
     ) uart_hdlr (
         .rst_n(rst_n),
         .clk(clk),
@@ -40,7 +71,15 @@ module tb_uart_handler ();
         .width_o(pulse_width),
         .num_pulses_o(num_pulses),
         .pulse_spacing_o(pulse_spacing),
-        .pulse_en_o(pulse_en)
+        .pulse_en_o(pulse_en),
+        .reset_en_o(reset_en),
+        .reset_length_o(reset_length),
+        .reset_behavior_o(reset_behavior),
+        .arm_o(arm),
+        .commit_i(commit),
+        .sequence_done_i(sequence_done),
+        .wave_table_o(wave_table),
+        .wave_length_o(wave_length)
     );
 
 endmodule
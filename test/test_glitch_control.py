@@ -1,11 +1,41 @@
+import os
+import random
+
 import cocotb
 from cocotb.triggers import ClockCycles, FallingEdge, RisingEdge
 
-from cocotbext.uart import UartSink, UartSource
+from cocotbext.uart import UartSource
+import numpy as np
+
+from tt_glitcher import protocol
+
+from . import glitch_model
+from .common import EdgeMonitor, UartBackdoor, UartMonitor, clks_per_bit, config_source, start_clock_and_reset, uart_baud, waves_on_failure
+
+OUTPUTS = ["pulse_out", "target_reset_out", "busy_out", "armed_out", "pulse_en_out"]
+
+# Random configurations per trigger source in the reference model test
+MODEL_CONFIGS = int(os.getenv("MODEL_CONFIGS", 2000))
+
+RESET_COMMANDS = {
+    glitch_model.RESET_NONE: b'y',
+    glitch_model.RESET_PULSE: b'u',
+    glitch_model.RESET_ARM: b'i',
+}
+
+
+def outputs(*, pulse=0, reset=0, busy=1, armed=0, pulse_en=0):
+    return {
+        "pulse_out": pulse,
+        "target_reset_out": reset,
+        "busy_out": busy,
+        "armed_out": armed,
+        "pulse_en_out": pulse_en,
+    }
 
-from .common import read_exact, start_clock_and_reset
 
 @cocotb.test(timeout_time=10, timeout_unit="ms")
+@waves_on_failure
 async def test_glitch_control_echo(dut):
     dut._log.info("Start")
 
@@ -13,18 +43,19 @@ async def test_glitch_control_echo(dut):
 
     dut._log.info("Test glitch control echo")
 
-    uart_source = UartSource(dut.uart_rx, baud=115200, bits=8)
-    uart_sink = UartSink(dut.uart_tx, baud=115200, bits=8)
+    uart_source = UartSource(dut.uart_rx, baud=uart_baud(dut), bits=8)
+    uart_monitor = UartMonitor(dut.uart_tx, clks_per_bit(dut))
 
     # Unrecognized command bytes will be echoed back
     for x in range(0x10, 0x20):
         await uart_source.write(bytes([x]))
         await uart_source.wait()
 
-        data = await uart_sink.read()
+        data = await uart_monitor.read(1)
         assert data == bytes([x]), f"Expected {x:#02x}, got {data[0]:#02x}"
 
 @cocotb.test(timeout_time=10, timeout_unit="ms")
+@waves_on_failure
 async def test_glitch_control_hello(dut):
     dut._log.info("Start")
 
@@ -32,16 +63,17 @@ async def test_glitch_control_hello(dut):
 
     dut._log.info("Test glitch control hello")
 
-    uart_source = UartSource(dut.uart_rx, baud=115200, bits=8)
-    uart_sink = UartSink(dut.uart_tx, baud=115200, bits=8)
+    uart_source = UartSource(dut.uart_rx, baud=uart_baud(dut), bits=8)
+    uart_monitor = UartMonitor(dut.uart_tx, clks_per_bit(dut))
 
     await uart_source.write(b'h')
     await uart_source.wait()
 
-    data = await read_exact(uart_sink, 5)
+    data = await uart_monitor.read(5)
     assert data == b"Erika", f"Expected 'Erika', got {data}"
 
 @cocotb.test(timeout_time=10, timeout_unit="ms")
+@waves_on_failure
 async def test_project_full_glitch_sequence_without_reset(dut):
     dut._log.info("Start")
 
@@ -49,7 +81,7 @@ async def test_project_full_glitch_sequence_without_reset(dut):
 
     dut._log.info("Test glitch control full glitch sequence without reset")
 
-    uart_source = UartSource(dut.uart_rx, baud=115200, bits=8)
+    uart_source = config_source(dut, "glitch_ctrl.uart_hdlr.rxi")
 
     await uart_source.write(b'd\x00\x12') # Set delay
     await uart_source.write(b'w\x01')     # Set width
@@ -60,26 +92,17 @@ async def test_project_full_glitch_sequence_without_reset(dut):
     await RisingEdge(dut.glitch_ctrl.pulse_en)
     await ClockCycles(dut.clk, 1)
 
-    for _ in range(0x12): # Delay
-        await ClockCycles(dut.clk, 1)
-        assert dut.pulse_out.value == 0, "Expected pulse_out to be 0"
-
-    for _ in range(0x01): # Width
-        await ClockCycles(dut.clk, 1)
-        assert dut.pulse_out.value == 1, "Expected pulse_out to be 1"
-
-    for _ in range(0x03): # Spacing
-        await ClockCycles(dut.clk, 1)
-        assert dut.pulse_out.value == 0, "Expected pulse_out to be 0"
-
-    for _ in range(0x01): # Width
-        await ClockCycles(dut.clk, 1)
-        assert dut.pulse_out.value == 1, "Expected pulse_out to be 1"
-
-    await ClockCycles(dut.clk, 1)
-    assert dut.pulse_out.value == 0, "Expected pulse_out to be 0"
+    monitor = EdgeMonitor(dut, OUTPUTS).start()
+    await monitor.expect([
+        (0x12, outputs()),             # Delay
+        (0x01, outputs(pulse=1)),      # Width
+        (0x03, outputs()),             # Spacing
+        (0x01, outputs(pulse=1)),      # Width
+        (1, outputs(busy=0)),
+    ])
 
 @cocotb.test(timeout_time=10, timeout_unit="ms")
+@waves_on_failure
 async def test_glitch_control_full_glitch_sequence_with_reset(dut):
     dut._log.info("Start")
 
@@ -87,7 +110,7 @@ async def test_glitch_control_full_glitch_sequence_with_reset(dut):
 
     dut._log.info("Test glitch control full glitch sequence with reset")
 
-    uart_source = UartSource(dut.uart_rx, baud=115200, bits=8)
+    uart_source = config_source(dut, "glitch_ctrl.uart_hdlr.rxi")
 
     await uart_source.write(b'd\x00\x12') # Set delay
     await uart_source.write(b'w\x01')     # Set width
@@ -98,36 +121,19 @@ async def test_glitch_control_full_glitch_sequence_with_reset(dut):
 
     await RisingEdge(dut.target_reset_out)
 
-    for _ in range(0x50): # Reset
-        await ClockCycles(dut.clk, 1)
-        assert dut.pulse_out.value == 0, "Expected pulse_out to be 0"
-        assert dut.target_reset_out.value == 1, "Expected target_reset_out to be 1"
-
-    for _ in range(0x12): # Delay
-        await ClockCycles(dut.clk, 1)
-        assert dut.pulse_out.value == 0, "Expected pulse_out to be 0"
-        assert dut.target_reset_out.value == 0, "Expected target_reset_out to be 0"
-
-    for _ in range(0x01): # Width
-        await ClockCycles(dut.clk, 1)
-        assert dut.pulse_out.value == 1, "Expected pulse_out to be 1"
-        assert dut.target_reset_out.value == 0, "Expected target_reset_out to be 0"
-
-    for _ in range(0x03): # Spacing
-        await ClockCycles(dut.clk, 1)
-        assert dut.pulse_out.value == 0, "Expected pulse_out to be 0"
-        assert dut.target_reset_out.value == 0, "Expected target_reset_out to be 0"
-
-    for _ in range(0x01): # Width
-        await ClockCycles(dut.clk, 1)
-        assert dut.pulse_out.value == 1, "Expected pulse_out to be 1"
-        assert dut.target_reset_out.value == 0, "Expected target_reset_out to be 0"
-
-    await ClockCycles(dut.clk, 1)
-    assert dut.pulse_out.value == 0, "Expected pulse_out to be 0"
-    assert dut.target_reset_out.value == 0, "Expected target_reset_out to be 0"
+    monitor = EdgeMonitor(dut, OUTPUTS).start()
+    await monitor.expect([
+        (0x50, outputs(reset=1)),      # Reset
+        (0x01, outputs(pulse_en=1)),   # Delay, the pulse sequence starts when the reset is done
+        (0x11, outputs()),             # Delay
+        (0x01, outputs(pulse=1)),      # Width
+        (0x03, outputs()),             # Spacing
+        (0x01, outputs(pulse=1)),      # Width
+        (1, outputs(busy=0)),
+    ])
 
 @cocotb.test(timeout_time=10, timeout_unit="ms")
+@waves_on_failure
 async def test_glitch_control_trigger(dut):
     dut._log.info("Start")
 
@@ -135,7 +141,7 @@ async def test_glitch_control_trigger(dut):
 
     dut._log.info("Test glitch control full glitch sequence")
 
-    uart_source = UartSource(dut.uart_rx, baud=115200, bits=8)
+    uart_source = config_source(dut, "glitch_ctrl.uart_hdlr.rxi")
 
     await uart_source.write(b'd\x00\x12') # Set delay
     await uart_source.write(b'w\x01')     # Set width
@@ -146,33 +152,25 @@ async def test_glitch_control_trigger(dut):
 
     await ClockCycles(dut.clk, 1)
 
+    monitor = EdgeMonitor(dut, OUTPUTS).start()
+
     dut.trigger_in.value = 1
     await ClockCycles(dut.clk, 1)
     dut.trigger_in.value = 0
 
-    # The trigger is synchronized internally, so we need to wait two cycles before the delay starts
-    await ClockCycles(dut.clk, 2)
-
-    for _ in range(0x12): # Delay
-        await ClockCycles(dut.clk, 1)
-        assert dut.pulse_out.value == 0, "Expected pulse_out to be 0"
-
-    for _ in range(0x01): # Width
-        await ClockCycles(dut.clk, 1)
-        assert dut.pulse_out.value == 1, "Expected pulse_out to be 1"
-
-    for _ in range(0x03): # Spacing
-        await ClockCycles(dut.clk, 1)
-        assert dut.pulse_out.value == 0, "Expected pulse_out to be 0"
-
-    for _ in range(0x01): # Width
-        await ClockCycles(dut.clk, 1)
-        assert dut.pulse_out.value == 1, "Expected pulse_out to be 1"
-
-    await ClockCycles(dut.clk, 1)
-    assert dut.pulse_out.value == 0, "Expected pulse_out to be 0"
+    # The trigger is synchronized internally, so the delay starts three cycles after the trigger
+    await monitor.expect([
+        (0x02, outputs(busy=0, armed=1)),
+        (0x01, outputs(busy=0, armed=1, pulse_en=1)),
+        (0x12, outputs()),             # Delay
+        (0x01, outputs(pulse=1)),      # Width
+        (0x03, outputs()),             # Spacing
+        (0x01, outputs(pulse=1)),      # Width
+        (1, outputs(busy=0)),
+    ])
 
 @cocotb.test(timeout_time=10, timeout_unit="ms")
+@waves_on_failure
 async def test_glitch_control_target_reset_only(dut):
     dut._log.info("Start")
 
@@ -180,24 +178,23 @@ async def test_glitch_control_target_reset_only(dut):
 
     dut._log.info("Test glitch control target reset only")
 
-    uart_source = UartSource(dut.uart_rx, baud=115200, bits=8)
+    uart_source = config_source(dut, "glitch_ctrl.uart_hdlr.rxi")
+
     await uart_source.write(b'y')         # Reset mode 'none' (reset only)
     await uart_source.write(b'r\x12\x34') # Set reset length
     await uart_source.write(b'p')         # Power cycle (reset) target
 
     await RisingEdge(dut.target_reset_out)
 
-    for _ in range(0x1234): # Reset
-        await ClockCycles(dut.clk, 1)
-        assert dut.pulse_out.value == 0, "Expected pulse_out to be 0"
-        assert dut.target_reset_out.value == 1, "Expected target_reset_out to be 1"
-
-    await ClockCycles(dut.clk, 1)
-    assert dut.pulse_out.value == 0, "Expected pulse_out to be 0"
-    assert dut.target_reset_out.value == 0, "Expected target_reset_out to be 0"
+    monitor = EdgeMonitor(dut, OUTPUTS).start()
+    await monitor.expect([
+        (0x1234, outputs(reset=1)),    # Reset
+        (1, outputs(busy=0)),
+    ])
 
 
 @cocotb.test(timeout_time=10, timeout_unit="ms")
+@waves_on_failure
 async def test_glitch_control_reset_arm_trigger(dut):
     dut._log.info("Start")
 
@@ -205,7 +202,8 @@ async def test_glitch_control_reset_arm_trigger(dut):
 
     dut._log.info("Test glitch control reset, arm and trigger")
 
-    uart_source = UartSource(dut.uart_rx, baud=115200, bits=8)
+    uart_source = config_source(dut, "glitch_ctrl.uart_hdlr.rxi")
+
     await uart_source.write(b'i')         # Reset mode 'arm'
     await uart_source.write(b'd\x00\x12') # Set delay
     await uart_source.write(b'w\x01')     # Set width
@@ -214,43 +212,25 @@ async def test_glitch_control_reset_arm_trigger(dut):
 
     await RisingEdge(dut.target_reset_out)
 
-    for _ in range(0x80): # Reset
-        await ClockCycles(dut.clk, 1)
-        assert dut.pulse_out.value == 0, "Expected pulse_out to be 0"
-        assert dut.target_reset_out.value == 1, "Expected target_reset_out to be 1"
-        assert dut.armed_out.value == 0, "Expected armed_out to be 0"
+    monitor = EdgeMonitor(dut, OUTPUTS).start()
 
-    await ClockCycles(dut.clk, 1)
-    assert dut.pulse_out.value == 0, "Expected pulse_out to be 0"
-    assert dut.target_reset_out.value == 0, "Expected target_reset_out to be 0"
-
-    # Trigger should now be armed
-    assert dut.armed_out.value == 1, "Expected armed_out to be 1"
-
-    await ClockCycles(dut.clk, 1)
+    await ClockCycles(dut.clk, 0x80 + 2)
     dut.trigger_in.value = 1
     await ClockCycles(dut.clk, 1)
     dut.trigger_in.value = 0
 
-    # The trigger is synchronized internally, so we need to wait two cycles before the delay starts
-    await ClockCycles(dut.clk, 2)
-
-    for _ in range(0x12): # Delay
-        await ClockCycles(dut.clk, 1)
-        assert dut.pulse_out.value == 0, "Expected pulse_out to be 0"
-        assert dut.armed_out.value == 0, "Expected armed_out to be 0"
-
-    for _ in range(0x01): # Width
-        await ClockCycles(dut.clk, 1)
-        assert dut.pulse_out.value == 1, "Expected pulse_out to be 1"
-        assert dut.armed_out.value == 0, "Expected armed_out to be 0"
-
-    await ClockCycles(dut.clk, 1)
-    assert dut.pulse_out.value == 0, "Expected pulse_out to be 0"
-    assert dut.armed_out.value == 0, "Expected armed_out to be 0"
+    await monitor.expect([
+        (0x80, outputs(reset=1)),      # Reset
+        (0x04, outputs(busy=0, armed=1)), # Trigger should now be armed
+        (0x01, outputs(busy=0, armed=1, pulse_en=1)),
+        (0x12, outputs()),             # Delay
+        (0x01, outputs(pulse=1)),      # Width
+        (1, outputs(busy=0)),
+    ])
 
 
 @cocotb.test(timeout_time=10, timeout_unit="ms")
+@waves_on_failure
 async def test_glitch_control_num_pulses_zero_no_pulse(dut):
     dut._log.info("Start")
 
@@ -258,7 +238,7 @@ async def test_glitch_control_num_pulses_zero_no_pulse(dut):
 
     dut._log.info("Test num_pulses=0 yields no pulse")
 
-    uart_source = UartSource(dut.uart_rx, baud=115200, bits=8)
+    uart_source = config_source(dut, "glitch_ctrl.uart_hdlr.rxi")
 
     await uart_source.write(b'd\x00\x02') # Set delay
     await uart_source.write(b'w\x01')     # Set width
@@ -268,16 +248,16 @@ async def test_glitch_control_num_pulses_zero_no_pulse(dut):
 
     await RisingEdge(dut.glitch_ctrl.pulse_en)
 
-    for _ in range(0x02):
-        await ClockCycles(dut.clk, 1)
-        assert dut.pulse_out.value == 0, "Expected pulse_out to be 0"
-
-    for _ in range(4):
-        await ClockCycles(dut.clk, 1)
-        assert dut.pulse_out.value == 0, "Expected pulse_out to stay 0"
+    monitor = EdgeMonitor(dut, OUTPUTS).start()
+    await monitor.expect([
+        (1, outputs(busy=0, pulse_en=1)),
+        (0x02, outputs()),             # Delay
+        (3, outputs(busy=0)),          # Pulse output stays low
+    ])
 
 
 @cocotb.test(timeout_time=10, timeout_unit="ms")
+@waves_on_failure
 async def test_glitch_control_num_pulses_one_no_spacing(dut):
     dut._log.info("Start")
 
@@ -285,7 +265,7 @@ async def test_glitch_control_num_pulses_one_no_spacing(dut):
 
     dut._log.info("Test num_pulses=1 no spacing phase")
 
-    uart_source = UartSource(dut.uart_rx, baud=115200, bits=8)
+    uart_source = config_source(dut, "glitch_ctrl.uart_hdlr.rxi")
 
     await uart_source.write(b'd\x00\x01') # Set delay
     await uart_source.write(b'w\x02')     # Set width
@@ -296,21 +276,16 @@ async def test_glitch_control_num_pulses_one_no_spacing(dut):
     await RisingEdge(dut.glitch_ctrl.pulse_en)
     await ClockCycles(dut.clk, 1)
 
-    await ClockCycles(dut.clk, 1)
-    assert dut.pulse_out.value == 0, "Expected pulse_out to be 0 during delay"
-    assert dut.busy_out.value == 1, "Expected busy_out to be 1 during delay"
-
-    for _ in range(0x02):
-        await ClockCycles(dut.clk, 1)
-        assert dut.pulse_out.value == 1, "Expected pulse_out to be 1"
-        assert dut.busy_out.value == 1, "Expected busy_out to be 1 during pulse"
-
-    await ClockCycles(dut.clk, 1)
-    assert dut.pulse_out.value == 0, "Expected pulse_out to be 0 after pulse"
-    assert dut.busy_out.value == 0, "Expected busy_out to be 0 after pulse"
+    monitor = EdgeMonitor(dut, OUTPUTS).start()
+    await monitor.expect([
+        (0x01, outputs()),             # Delay
+        (0x02, outputs(pulse=1)),      # Width
+        (1, outputs(busy=0)),          # No spacing phase after the last pulse
+    ])
 
 
 @cocotb.test(timeout_time=10, timeout_unit="ms")
+@waves_on_failure
 async def test_glitch_control_zero_delay_immediate_pulse(dut):
     dut._log.info("Start")
 
@@ -318,7 +293,7 @@ async def test_glitch_control_zero_delay_immediate_pulse(dut):
 
     dut._log.info("Test zero delay starts pulse immediately")
 
-    uart_source = UartSource(dut.uart_rx, baud=115200, bits=8)
+    uart_source = config_source(dut, "glitch_ctrl.uart_hdlr.rxi")
 
     await uart_source.write(b'd\x00\x00') # Set delay = 0
     await uart_source.write(b'w\x01')     # Set width = 1
@@ -328,17 +303,16 @@ async def test_glitch_control_zero_delay_immediate_pulse(dut):
     await RisingEdge(dut.glitch_ctrl.pulse_en)
     await ClockCycles(dut.clk, 1) # Settle after pulse_en goes high
 
-    await ClockCycles(dut.clk, 1)
-    assert dut.pulse_out.value == 0, "Expected one delay cycle even with zero delay"
-
-    await ClockCycles(dut.clk, 1)
-    assert dut.pulse_out.value == 1, "Expected pulse_out to be 1"
-
-    await ClockCycles(dut.clk, 1)
-    assert dut.pulse_out.value == 0, "Expected pulse_out to return low"
+    monitor = EdgeMonitor(dut, OUTPUTS).start()
+    await monitor.expect([
+        (1, outputs()),                # One delay cycle even with zero delay
+        (1, outputs(pulse=1)),
+        (1, outputs(busy=0)),
+    ])
 
 
 @cocotb.test(timeout_time=10, timeout_unit="ms")
+@waves_on_failure
 async def test_glitch_control_zero_width_one_cycle(dut):
     dut._log.info("Start")
 
@@ -346,7 +320,7 @@ async def test_glitch_control_zero_width_one_cycle(dut):
 
     dut._log.info("Test zero width is one cycle")
 
-    uart_source = UartSource(dut.uart_rx, baud=115200, bits=8)
+    uart_source = config_source(dut, "glitch_ctrl.uart_hdlr.rxi")
 
     await uart_source.write(b'd\x00\x01') # Set delay
     await uart_source.write(b'w\x00')     # Set width = 0
@@ -356,17 +330,16 @@ async def test_glitch_control_zero_width_one_cycle(dut):
     await RisingEdge(dut.glitch_ctrl.pulse_en)
     await ClockCycles(dut.clk, 1) # Settle
 
-    await ClockCycles(dut.clk, 1)
-    assert dut.pulse_out.value == 0, "Expected pulse_out to be 0 during delay"
-
-    await ClockCycles(dut.clk, 1)
-    assert dut.pulse_out.value == 1, "Expected pulse_out high for one cycle"
-
-    await ClockCycles(dut.clk, 1)
-    assert dut.pulse_out.value == 0, "Expected pulse_out to return low"
+    monitor = EdgeMonitor(dut, OUTPUTS).start()
+    await monitor.expect([
+        (1, outputs()),                # Delay
+        (1, outputs(pulse=1)),         # Pulse high for one cycle
+        (1, outputs(busy=0)),
+    ])
 
 
 @cocotb.test(timeout_time=10, timeout_unit="ms")
+@waves_on_failure
 async def test_glitch_control_zero_spacing_one_low_cycle(dut):
     dut._log.info("Start")
 
@@ -374,7 +347,7 @@ async def test_glitch_control_zero_spacing_one_low_cycle(dut):
 
     dut._log.info("Test zero spacing yields single low cycle")
 
-    uart_source = UartSource(dut.uart_rx, baud=115200, bits=8)
+    uart_source = config_source(dut, "glitch_ctrl.uart_hdlr.rxi")
 
     await uart_source.write(b'd\x00\x01') # Set delay = 1
     await uart_source.write(b'w\x01')     # Set width = 1
@@ -385,23 +358,18 @@ async def test_glitch_control_zero_spacing_one_low_cycle(dut):
     await RisingEdge(dut.glitch_ctrl.pulse_en)
     await ClockCycles(dut.clk, 1)
 
-    await ClockCycles(dut.clk, 1)
-    assert dut.pulse_out.value == 0, "Expected pulse_out to be 0 during delay"
-
-    await ClockCycles(dut.clk, 1)
-    assert dut.pulse_out.value == 1, "Expected first pulse high"
-
-    await ClockCycles(dut.clk, 1)
-    assert dut.pulse_out.value == 0, "Expected single low cycle spacing"
-
-    await ClockCycles(dut.clk, 1)
-    assert dut.pulse_out.value == 1, "Expected second pulse high"
-
-    await ClockCycles(dut.clk, 1)
-    assert dut.pulse_out.value == 0, "Expected pulse_out to return low"
+    monitor = EdgeMonitor(dut, OUTPUTS).start()
+    await monitor.expect([
+        (1, outputs()),                # Delay
+        (1, outputs(pulse=1)),         # First pulse
+        (1, outputs()),                # Single low cycle spacing
+        (1, outputs(pulse=1)),         # Second pulse
+        (1, outputs(busy=0)),
+    ])
 
 
 @cocotb.test(timeout_time=10, timeout_unit="ms")
+@waves_on_failure
 async def test_glitch_control_trigger_ignored_when_not_armed(dut):
     dut._log.info("Start")
 
@@ -409,7 +377,7 @@ async def test_glitch_control_trigger_ignored_when_not_armed(dut):
 
     dut._log.info("Test trigger ignored when not armed")
 
-    uart_source = UartSource(dut.uart_rx, baud=115200, bits=8)
+    uart_source = config_source(dut, "glitch_ctrl.uart_hdlr.rxi")
 
     await uart_source.write(b'd\x00\x01') # Set delay = 1
     await uart_source.write(b'w\x01')     # Set width = 1
@@ -418,17 +386,19 @@ async def test_glitch_control_trigger_ignored_when_not_armed(dut):
     await ClockCycles(dut.clk, 1)
     assert dut.armed_out.value == 0, "Expected armed_out to be 0"
 
+    monitor = EdgeMonitor(dut, OUTPUTS).start()
+
     dut.trigger_in.value = 1
     await ClockCycles(dut.clk, 1)
     dut.trigger_in.value = 0
 
-    for _ in range(6):
-        await ClockCycles(dut.clk, 1)
-        assert dut.pulse_out.value == 0, "Expected pulse_out to stay low"
-        assert dut.busy_out.value == 0, "Expected busy_out to stay low"
+    await monitor.expect([
+        (7, outputs(busy=0)),          # Pulse output and busy stay low
+    ])
 
 
 @cocotb.test(timeout_time=10, timeout_unit="ms")
+@waves_on_failure
 async def test_glitch_control_arm_toggle_disarms(dut):
     dut._log.info("Start")
 
@@ -436,7 +406,7 @@ async def test_glitch_control_arm_toggle_disarms(dut):
 
     dut._log.info("Test arm toggle disarms")
 
-    uart_source = UartSource(dut.uart_rx, baud=115200, bits=8)
+    uart_source = config_source(dut, "glitch_ctrl.uart_hdlr.rxi")
 
     await uart_source.write(b'd\x00\x01') # Set delay = 1
     await uart_source.write(b'w\x01')     # Set width = 1
@@ -453,17 +423,19 @@ async def test_glitch_control_arm_toggle_disarms(dut):
     await ClockCycles(dut.clk, 1)
     assert dut.armed_out.value == 0, "Expected armed_out to be 0"
 
+    monitor = EdgeMonitor(dut, OUTPUTS).start()
+
     dut.trigger_in.value = 1
     await ClockCycles(dut.clk, 1)
     dut.trigger_in.value = 0
 
-    for _ in range(6):
-        await ClockCycles(dut.clk, 1)
-        assert dut.pulse_out.value == 0, "Expected pulse_out to stay low"
-        assert dut.busy_out.value == 0, "Expected busy_out to stay low"
+    await monitor.expect([
+        (7, outputs(busy=0)),          # Pulse output and busy stay low
+    ])
 
 
 @cocotb.test(timeout_time=10, timeout_unit="ms")
+@waves_on_failure
 async def test_glitch_control_armed_clears_on_trigger(dut):
     dut._log.info("Start")
 
@@ -471,7 +443,7 @@ async def test_glitch_control_armed_clears_on_trigger(dut):
 
     dut._log.info("Test armed clears when trigger fires")
 
-    uart_source = UartSource(dut.uart_rx, baud=115200, bits=8)
+    uart_source = config_source(dut, "glitch_ctrl.uart_hdlr.rxi")
 
     await uart_source.write(b'd\x00\x02') # Set delay = 2
     await uart_source.write(b'w\x01')     # Set width = 1
@@ -482,27 +454,24 @@ async def test_glitch_control_armed_clears_on_trigger(dut):
     await ClockCycles(dut.clk, 1)
     assert dut.armed_out.value == 1, "Expected armed_out to be 1"
 
+    monitor = EdgeMonitor(dut, OUTPUTS).start()
+
     dut.trigger_in.value = 1
     await ClockCycles(dut.clk, 1)
     dut.trigger_in.value = 0
 
-    # The trigger is synchronized internally, so we need to wait two cycles before the delay starts
-    await ClockCycles(dut.clk, 2)
-
-    for _ in range(0x02):
-        await ClockCycles(dut.clk, 1)
-        assert dut.armed_out.value == 0, "Expected armed_out to be 0 after trigger"
-        assert dut.busy_out.value == 1, "Expected busy_out to be 1 during delay"
-
-    await ClockCycles(dut.clk, 1)
-    assert dut.pulse_out.value == 1, "Expected pulse_out to be 1"
-
-    await ClockCycles(dut.clk, 1)
-    assert dut.pulse_out.value == 0, "Expected pulse_out to be 0"
-    assert dut.busy_out.value == 0, "Expected busy_out to be 0 after pulse"
+    # The trigger is synchronized internally, so the delay starts three cycles after the trigger
+    await monitor.expect([
+        (0x02, outputs(busy=0, armed=1)),
+        (0x01, outputs(busy=0, armed=1, pulse_en=1)),
+        (0x02, outputs()),             # Delay, armed is cleared by the trigger
+        (0x01, outputs(pulse=1)),      # Width
+        (1, outputs(busy=0)),
+    ])
 
 
 @cocotb.test(timeout_time=10, timeout_unit="ms")
+@waves_on_failure
 async def test_glitch_control_busy_during_reset_and_pulse(dut):
     dut._log.info("Start")
 
@@ -510,7 +479,7 @@ async def test_glitch_control_busy_during_reset_and_pulse(dut):
 
     dut._log.info("Test busy_out high during reset and pulse sequence")
 
-    uart_source = UartSource(dut.uart_rx, baud=115200, bits=8)
+    uart_source = config_source(dut, "glitch_ctrl.uart_hdlr.rxi")
 
     await uart_source.write(b'd\x00\x02') # Set delay = 2
     await uart_source.write(b'w\x01')     # Set width = 1
@@ -519,30 +488,19 @@ async def test_glitch_control_busy_during_reset_and_pulse(dut):
     await uart_source.write(b'p')         # Reset and then pulse
 
     await RisingEdge(dut.target_reset_out)
-    await FallingEdge(dut.clk) # Settle
-
-    assert dut.busy_out.value == 1, "Expected busy_out to be 1 during reset"
-
-    for _ in range(0x03):
-        await ClockCycles(dut.clk, 1)
-        assert dut.busy_out.value == 1, "Expected busy_out to stay 1 during reset"
-
-    await ClockCycles(dut.clk, 1)
-    assert dut.busy_out.value == 1, "Expected busy_out to stay 1 during delay"
 
-    await ClockCycles(dut.clk, 1)
-    assert dut.pulse_out.value == 0, "Expected pulse_out low during delay"
-
-    await ClockCycles(dut.clk, 1)
-    assert dut.pulse_out.value == 1, "Expected pulse_out high during pulse"
-    assert dut.busy_out.value == 1, "Expected busy_out high during pulse"
-
-    await ClockCycles(dut.clk, 1)
-    assert dut.pulse_out.value == 0, "Expected pulse_out low after pulse"
-    assert dut.busy_out.value == 0, "Expected busy_out low after sequence"
+    monitor = EdgeMonitor(dut, OUTPUTS).start()
+    await monitor.expect([
+        (0x03, outputs(reset=1)),      # Reset
+        (0x01, outputs(pulse_en=1)),   # Delay
+        (0x01, outputs()),             # Delay
+        (0x01, outputs(pulse=1)),      # Width
+        (1, outputs(busy=0)),
+    ])
 
 
 @cocotb.test(timeout_time=10, timeout_unit="ms")
+@waves_on_failure
 async def test_glitch_control_ignore_trigger_while_busy(dut):
     dut._log.info("Start")
 
@@ -550,9 +508,10 @@ async def test_glitch_control_ignore_trigger_while_busy(dut):
 
     dut._log.info("Test trigger ignored while busy")
 
-    uart_source = UartSource(dut.uart_rx, baud=115200, bits=8)
+    uart_source = config_source(dut, "glitch_ctrl.uart_hdlr.rxi")
 
-    await uart_source.write(b'd\x00\x10') # Set delay
+    # The delay outlasts a byte on the serial line, so the second 't' arrives while busy
+    await uart_source.write(b'd\x20\x00') # Set delay
     await uart_source.write(b'w\x01')     # Set width
     await uart_source.write(b'n\x01')     # Set num pulses = 1
     await uart_source.write(b't')         # Trigger pulse
@@ -560,29 +519,25 @@ async def test_glitch_control_ignore_trigger_while_busy(dut):
     await RisingEdge(dut.glitch_ctrl.pulse_en)
     await ClockCycles(dut.clk, 1) # Settle
 
-    await ClockCycles(dut.clk, 1)
-    assert dut.busy_out.value == 1, "Expected busy_out to be 1 during delay"
-    assert dut.pulse_out.value == 0, "Expected pulse_out to be 0 during delay"
-
-    await uart_source.write(b't') # Trigger again while busy
-
-    for _ in range(0x10 - 1): # Remaining delay cycles
-        await ClockCycles(dut.clk, 1)
-        assert dut.pulse_out.value == 0, "Expected pulse_out to be 0 during delay"
+    monitor = EdgeMonitor(dut, OUTPUTS).start()
 
     await ClockCycles(dut.clk, 1)
-    assert dut.pulse_out.value == 1, "Expected single pulse"
+    await uart_source.write(b't') # Trigger again while busy
 
-    await ClockCycles(dut.clk, 1)
-    assert dut.pulse_out.value == 0, "Expected pulse_out to return low"
-    assert dut.busy_out.value == 0, "Expected busy_out to return low"
+    await RisingEdge(dut.glitch_ctrl.pulse_en)
+    strobe = monitor.cycle
 
-    for _ in range(4):
-        await ClockCycles(dut.clk, 1)
-        assert dut.pulse_out.value == 0, "Expected no extra pulses"
+    await monitor.expect([
+        (strobe, outputs()),                  # Delay
+        (1, outputs(pulse_en=1)),             # Second trigger, ignored
+        (0x2000 - strobe - 1, outputs()),     # Delay
+        (0x01, outputs(pulse=1)),             # Single pulse
+        (5, outputs(busy=0)),                 # No extra pulses
+    ])
 
 
 @cocotb.test(timeout_time=10, timeout_unit="ms")
+@waves_on_failure
 async def test_glitch_control_ignore_external_trigger_while_busy(dut):
     dut._log.info("Start")
 
@@ -590,7 +545,7 @@ async def test_glitch_control_ignore_external_trigger_while_busy(dut):
 
     dut._log.info("Test external trigger ignored while busy")
 
-    uart_source = UartSource(dut.uart_rx, baud=115200, bits=8)
+    uart_source = config_source(dut, "glitch_ctrl.uart_hdlr.rxi")
 
     await uart_source.write(b'd\x00\x10') # Set delay
     await uart_source.write(b'w\x01')     # Set width
@@ -601,37 +556,30 @@ async def test_glitch_control_ignore_external_trigger_while_busy(dut):
     await ClockCycles(dut.clk, 1)
     assert dut.armed_out.value == 1, "Expected armed_out to be 1"
 
+    monitor = EdgeMonitor(dut, OUTPUTS).start()
+
     dut.trigger_in.value = 1
     await ClockCycles(dut.clk, 1)
     dut.trigger_in.value = 0
 
-    # The trigger is synchronized internally, so we need to wait two cycles before the delay starts
-    await ClockCycles(dut.clk, 2)
-
-    await ClockCycles(dut.clk, 1)
-    assert dut.busy_out.value == 1, "Expected busy_out to be 1 during delay"
+    # The trigger is synchronized internally, so the delay starts three cycles after the trigger
+    await ClockCycles(dut.clk, 3)
 
     dut.trigger_in.value = 1
     await ClockCycles(dut.clk, 1)
     dut.trigger_in.value = 0
 
-    for _ in range(0x10 - 2): # Remaining delay cycles
-        await ClockCycles(dut.clk, 1)
-        assert dut.pulse_out.value == 0, "Expected pulse_out to be 0 during delay"
-
-    await ClockCycles(dut.clk, 1)
-    assert dut.pulse_out.value == 1, "Expected single pulse"
-
-    await ClockCycles(dut.clk, 1)
-    assert dut.pulse_out.value == 0, "Expected pulse_out to return low"
-    assert dut.busy_out.value == 0, "Expected busy_out to return low"
-
-    for _ in range(4):
-        await ClockCycles(dut.clk, 1)
-        assert dut.pulse_out.value == 0, "Expected no extra pulses"
+    await monitor.expect([
+        (0x02, outputs(busy=0, armed=1)),
+        (0x01, outputs(busy=0, armed=1, pulse_en=1)),
+        (0x10, outputs()),             # Delay
+        (0x01, outputs(pulse=1)),      # Single pulse
+        (5, outputs(busy=0)),          # No extra pulses
+    ])
 
 
 @cocotb.test(timeout_time=10, timeout_unit="ms")
+@waves_on_failure
 async def test_glitch_control_no_pulse_en_on_reset_only(dut):
     dut._log.info("Start")
 
@@ -639,18 +587,25 @@ async def test_glitch_control_no_pulse_en_on_reset_only(dut):
 
     dut._log.info("Test pulse_en stays low for reset-only")
 
-    uart_source = UartSource(dut.uart_rx, baud=115200, bits=8)
+    uart_source = config_source(dut, "glitch_ctrl.uart_hdlr.rxi")
 
     await uart_source.write(b'y')         # Reset mode 'none'
     await uart_source.write(b'r\x00\x03') # Set reset length = 3
     await uart_source.write(b'p')         # Reset target only
 
-    for _ in range(6):
-        await ClockCycles(dut.clk, 1)
-        assert dut.glitch_ctrl.pulse_en.value == 0, "Expected pulse_en to stay low"
+    monitor = EdgeMonitor(dut, ["pulse_en_out"]).start()
+
+    await RisingEdge(dut.target_reset_out)
+    await FallingEdge(dut.target_reset_out)
+    await ClockCycles(dut.clk, 6)
+
+    monitor.check([
+        (None, {"pulse_en_out": 0}),
+    ])
 
 
 @cocotb.test(timeout_time=10, timeout_unit="ms")
+@waves_on_failure
 async def test_glitch_control_armed_clears_on_uart_trigger(dut):
     dut._log.info("Start")
 
@@ -658,7 +613,7 @@ async def test_glitch_control_armed_clears_on_uart_trigger(dut):
 
     dut._log.info("Test armed clears on UART trigger")
 
-    uart_source = UartSource(dut.uart_rx, baud=115200, bits=8)
+    uart_source = config_source(dut, "glitch_ctrl.uart_hdlr.rxi")
 
     await uart_source.write(b'd\x00\x01') # Set delay
     await uart_source.write(b'w\x01')     # Set width
@@ -679,6 +634,7 @@ async def test_glitch_control_armed_clears_on_uart_trigger(dut):
 
 
 @cocotb.test(timeout_time=10, timeout_unit="ms")
+@waves_on_failure
 async def test_glitch_control_defaults_uart_trigger(dut):
     dut._log.info("Start")
 
@@ -686,23 +642,23 @@ async def test_glitch_control_defaults_uart_trigger(dut):
 
     dut._log.info("Test defaults: UART trigger without configuration")
 
-    uart_source = UartSource(dut.uart_rx, baud=115200, bits=8)
+    uart_source = config_source(dut, "glitch_ctrl.uart_hdlr.rxi")
 
     await uart_source.write(b't')  # Trigger pulse with defaults
 
     await RisingEdge(dut.glitch_ctrl.pulse_en)
     await ClockCycles(dut.clk, 1) # Settle after pulse_en goes high
 
-    highs = 0
-    for _ in range(6):
-        await ClockCycles(dut.clk, 1)
-        if dut.pulse_out.value == 1:
-            highs += 1
-
-    assert highs == 1, f"Expected one pulse with defaults, got {highs}"
+    monitor = EdgeMonitor(dut, OUTPUTS).start()
+    await monitor.expect([
+        (1, outputs()),                # Delay
+        (1, outputs(pulse=1)),         # One pulse with defaults
+        (4, outputs(busy=0)),
+    ])
 
 
 @cocotb.test(timeout_time=10, timeout_unit="ms")
+@waves_on_failure
 async def test_glitch_control_defaults_reset_then_pulse(dut):
     dut._log.info("Start")
 
@@ -710,20 +666,303 @@ async def test_glitch_control_defaults_reset_then_pulse(dut):
 
     dut._log.info("Test defaults: reset then pulse")
 
-    uart_source = UartSource(dut.uart_rx, baud=115200, bits=8)
+    uart_source = config_source(dut, "glitch_ctrl.uart_hdlr.rxi")
 
     await uart_source.write(b'p') # Reset target, then pulse (default)
 
     await RisingEdge(dut.target_reset_out)
 
+    monitor = EdgeMonitor(dut, OUTPUTS).start()
+    await monitor.expect([
+        (1, outputs(reset=1)),         # Reset
+        (1, outputs(pulse_en=1)),      # Delay
+        (1, outputs(pulse=1)),         # One pulse after reset
+        (4, outputs(busy=0)),
+    ])
+
+
+def random_configs(rng, source, count):
+    """Small random configurations, with every 0/1 corner likely to come up."""
+    configs = {
+        "delay": rng.integers(0, 40, count),
+        "width": rng.integers(0, 5, count),
+        "num_pulses": rng.integers(0, 5, count),
+        "spacing": rng.integers(0, 5, count),
+        "reset_length": rng.integers(0, 20, count),
+        "reset_behavior": np.full(count, glitch_model.RESET_PULSE),
+        "trigger_cycle": np.zeros(count, dtype=np.int64),
+    }
+    if source == "reset":
+        configs["reset_behavior"] = rng.choice(list(RESET_COMMANDS), count)
+        # Around the end of the reset, so the trigger is sometimes lost
+        configs["trigger_cycle"] = np.maximum(np.maximum(configs["reset_length"], 1) + rng.integers(-3, 6, count), 0)
+    return configs
+
+
+@cocotb.test(timeout_time=1000, timeout_unit="ms")
+@waves_on_failure
+async def test_glitch_control_matches_model(dut):
+    dut._log.info("Start")
+
+    await start_clock_and_reset(dut)
+
+    dut._log.info("Test random configurations against the reference model")
+
+    # Configuration goes through the backdoor, the serial line would take most of the
+    # time and adds nothing here, so thousands of configurations fit in one simulation
+    uart_source = UartBackdoor(dut.glitch_ctrl.uart_hdlr.rxi, dut.clk)
+    rng = np.random.default_rng(random.getrandbits(32))
+
+    for source in glitch_model.SOURCES:
+        configs = random_configs(rng, source, MODEL_CONFIGS)
+        ends = glitch_model.sequence_end(source=source, **configs)
+        expected = glitch_model.timelines(ends.max() + 2, source=source, **configs)
+
+        for i in range(MODEL_CONFIGS):
+            config = {name: int(values[i]) for name, values in configs.items()}
+            cycles = ends[i] + 2
+
+            await uart_source.write(b'd' + config["delay"].to_bytes(2, "big"))
+            await uart_source.write(b'w' + config["width"].to_bytes(1, "big"))
+            await uart_source.write(b'n' + config["num_pulses"].to_bytes(1, "big"))
+            await uart_source.write(b's' + config["spacing"].to_bytes(2, "big"))
+            await uart_source.write(b'r' + config["reset_length"].to_bytes(2, "big"))
+            await uart_source.write(RESET_COMMANDS[config["reset_behavior"]])
+
+            if source == "uart":
+                await uart_source.write(b't')
+                await RisingEdge(dut.glitch_ctrl.pulse_en)
+                monitor = EdgeMonitor(dut, OUTPUTS).start()
+            elif source == "trigger":
+                await uart_source.write(b'a')
+                await uart_source.wait()
+                await ClockCycles(dut.clk, 1)
+                monitor = EdgeMonitor(dut, OUTPUTS).start()
+            else:
+                await uart_source.write(b'p')
+                await RisingEdge(dut.glitch_ctrl.uart_reset_en)
+                monitor = EdgeMonitor(dut, OUTPUTS).start()
+
+            if source == "trigger" or config["reset_behavior"] == glitch_model.RESET_ARM:
+                # Right after the clock edge, a write at the same time as the edge would race it
+                if config["trigger_cycle"]:
+                    await ClockCycles(dut.clk, config["trigger_cycle"])
+                dut.trigger_in.value = 1
+                await ClockCycles(dut.clk, 1)
+                dut.trigger_in.value = 0
+
+            await monitor.wait(cycles)
+            monitor.stop()
+
+            observed = np.stack([monitor.values(name, cycles) for name in OUTPUTS])
+            model = np.stack([expected[name][i, :cycles] for name in glitch_model.OUTPUTS])
+            mismatches = np.argwhere(observed != model)
+            if mismatches.size:
+                signal, cycle = mismatches[0]
+                assert False, (
+                    f"{source} {config}: {OUTPUTS[signal]} is {observed[signal, cycle]} in cycle {cycle}, "
+                    f"the model expects {model[signal, cycle]}"
+                )
+
+            # A lost trigger leaves the glitcher armed
+            if dut.armed_out.value:
+                await uart_source.write(b'a')
+                await uart_source.wait()
+                await ClockCycles(dut.clk, 1)
+
+
+async def sweep_sequence(dut, uart_source):
+    """Trigger one sequence and return its (delay, width, number of pulses, spacing), the spacing after the first pulse."""
+    await uart_source.write(b't')
+    await RisingEdge(dut.glitch_ctrl.pulse_en)
+    monitor = EdgeMonitor(dut, ["busy_out", "pulse_out"]).start()
+    await FallingEdge(dut.busy_out)
     await ClockCycles(dut.clk, 1)
-    assert dut.target_reset_out.value == 1, "Expected reset asserted"
-    assert dut.pulse_out.value == 0, "Expected pulse_out low during reset"
+    end = monitor.cycle
+    monitor.stop()
+
+    start = monitor.observed("busy_out", end)[1][0]
+    pulse = monitor.observed("pulse_out", end)[1:]
+    rises = [cycle for cycle, value in pulse if value]
+    falls = [cycle for cycle, value in pulse if not value]
+    spacing = rises[1] - falls[0] if len(rises) > 1 else None
+    return rises[0] - start, falls[0] - rises[0], len(rises), spacing
 
-    highs = 0
-    for _ in range(6):
+def sweep_status(dut):
+    return int(dut.glitch_ctrl.uart_hdlr.sweep_index.value), int(dut.glitch_ctrl.uart_hdlr.sweep_state.value)
+
+@cocotb.test(timeout_time=20, timeout_unit="ms")
+@waves_on_failure
+async def test_glitch_control_sweep(dut):
+    dut._log.info("Start")
+
+    await start_clock_and_reset(dut)
+
+    dut._log.info("Test glitch control stepping through a parameter sweep")
+
+    uart_source = config_source(dut, "glitch_ctrl.uart_hdlr.rxi")
+
+    registers = dict(delay=4, width=1, num_pulses=1, spacing=2)
+    sweeps = dict(delay=(2, 8), width=(1, 2))
+    await uart_source.write(b'd\x00\x04') # Set delay
+    await uart_source.write(b'w\x01')     # Set width
+    await uart_source.write(b'n\x01')     # Set num pulses
+
+    # Nested: the delay moves every sequence, the width when the delay starts over, then it stops
+    await uart_source.write(protocol.sweep_settings(**sweeps) + protocol.sweep("start"))
+    points = list(protocol.sweep_points(registers, **sweeps))
+    assert len(points) == 6
+    for index, point in enumerate(points):
+        observed = await sweep_sequence(dut, uart_source)
+        assert observed == (point["delay"], point["width"], 1, None), f"Point {index}: expected {point}, got {observed}"
+        state = protocol.SWEEP_RUNNING if index < len(points) - 1 else protocol.SWEEP_OFF
+        assert sweep_status(dut) == (index + 1, state), f"Point {index}: expected index {index + 1} and state {state}, got {sweep_status(dut)}"
+
+    # Done, the registers are used again
+    observed = await sweep_sequence(dut, uart_source)
+    assert observed == (4, 1, 1, None), f"Expected the registers after the sweep, got {observed}"
+
+    # Paused, the sweep holds its point
+    await uart_source.write(protocol.sweep("start"))
+    await sweep_sequence(dut, uart_source)
+    await uart_source.write(protocol.sweep("pause"))
+    for _ in range(2):
+        observed = await sweep_sequence(dut, uart_source)
+        assert observed == (6, 1, 1, None), f"Expected the paused point, got {observed}"
+        assert sweep_status(dut) == (1, protocol.SWEEP_PAUSED), f"Expected index 1 and paused, got {sweep_status(dut)}"
+    await uart_source.write(protocol.sweep("resume"))
+    for point in points[1:3]:
+        observed = await sweep_sequence(dut, uart_source)
+        assert observed == (point["delay"], point["width"], 1, None), f"Expected {point} after resuming, got {observed}"
+
+    # Lockstep: both move every sequence, and it keeps going until stopped
+    sweeps = dict(delay=(2, 8), width=(1, 3))
+    await uart_source.write(protocol.sweep_settings(order="lockstep", **sweeps) + protocol.sweep("start"))
+    for index, point in zip(range(8), protocol.sweep_points(registers, order="lockstep", **sweeps)):
+        observed = await sweep_sequence(dut, uart_source)
+        expected = (point["delay"], point["width"], 1, None)
+        assert observed == expected, f"Lockstep point {index}: expected {expected}, got {observed}"
+    assert sweep_status(dut) == (8, protocol.SWEEP_RUNNING), f"Expected index 8 and running, got {sweep_status(dut)}"
+
+    await uart_source.write(protocol.sweep("stop"))
+    observed = await sweep_sequence(dut, uart_source)
+    assert observed == (4, 1, 1, None), f"Expected the registers after stopping, got {observed}"
+    assert sweep_status(dut)[1] == protocol.SWEEP_OFF, f"Expected the sweep off, got {sweep_status(dut)}"
+
+    # Nested over the spacing and the number of pulses, the delay and the width follow their registers
+    registers.update(num_pulses=2)
+    sweeps = dict(spacing=(2, 6), num_pulses=(1, 3))
+    await uart_source.write(b'n\x02')     # Set num pulses
+    await uart_source.write(b's\x00\x02') # Set spacing
+    await uart_source.write(protocol.sweep_settings(**sweeps) + protocol.sweep("start"))
+    points = list(protocol.sweep_points(registers, **sweeps))
+    assert len(points) == 6
+    for index, point in enumerate(points):
+        observed = await sweep_sequence(dut, uart_source)
+        expected = (4, 1, point["num_pulses"], point["spacing"])
+        assert observed == expected, f"Point {index}: expected {expected}, got {observed}"
+    assert sweep_status(dut) == (6, protocol.SWEEP_OFF), f"Expected index 6 and off, got {sweep_status(dut)}"
+
+@cocotb.test(timeout_time=10, timeout_unit="ms")
+@waves_on_failure
+async def test_glitch_control_waveform_table(dut):
+    dut._log.info("Start")
+
+    await start_clock_and_reset(dut)
+
+    dut._log.info("Test glitch control playing the waveform table")
+
+    uart_source = config_source(dut, "glitch_ctrl.uart_hdlr.rxi")
+
+    await uart_source.write(b'd\x00\x12') # Set delay
+    await uart_source.write(b'w\x01')     # Set width
+    await uart_source.write(b'n\x02')     # Set num pulses
+    await uart_source.write(b's\x00\x03') # Set pulse spacing
+    await uart_source.write(protocol.waveform([(0x02, 0x0005), (0x00, 0x0000), (0x07, 0x0001), (0x03, 0x80)]))
+    await uart_source.write(b't')         # Trigger pulse
+
+    await RisingEdge(dut.glitch_ctrl.pulse_en)
+    await ClockCycles(dut.clk, 1)
+
+    monitor = EdgeMonitor(dut, OUTPUTS).start()
+    await monitor.expect([
+        (0x12, outputs()),             # Delay
+        (0x02, outputs(pulse=1)),      # Width of entry 0
+        (0x05, outputs()),             # Spacing of entry 0
+        (0x01, outputs(pulse=1)),      # Width of entry 1, 0 is one cycle like the register
+        (0x01, outputs()),             # Spacing of entry 1
+        (0x07, outputs(pulse=1)),      # Width of entry 2
+        (0x01, outputs()),             # Spacing of entry 2
+        (0x03, outputs(pulse=1)),      # Width of entry 3, its spacing is not used
+        (1, outputs(busy=0)),
+    ])
+    monitor.stop()
+
+    # Length 0 goes back to the registers
+    await uart_source.write(protocol.set_wave_length(0))
+    await uart_source.write(b't')
+    await RisingEdge(dut.glitch_ctrl.pulse_en)
+    await ClockCycles(dut.clk, 1)
+
+    monitor = EdgeMonitor(dut, OUTPUTS).start()
+    await monitor.expect([
+        (0x12, outputs()),             # Delay
+        (0x01, outputs(pulse=1)),      # Width
+        (0x03, outputs()),             # Spacing
+        (0x01, outputs(pulse=1)),      # Width
+        (1, outputs(busy=0)),
+    ])
+
+@cocotb.test(timeout_time=20, timeout_unit="ms")
+@waves_on_failure
+async def test_glitch_control_write_during_sequence(dut):
+    dut._log.info("Start")
+
+    await start_clock_and_reset(dut)
+
+    dut._log.info("Test glitch control holding back a write until the sequence is over")
+
+    uart_source = config_source(dut, "glitch_ctrl.uart_hdlr.rxi")
+
+    await uart_source.write(b'd\x40\x00') # Set delay, long enough for the next write to arrive
+    await uart_source.write(b'w\x01')     # Set width
+    await uart_source.write(b't')         # Trigger pulse
+
+    await RisingEdge(dut.glitch_ctrl.pulse_en)
+    await uart_source.write(b'w\x05')     # Set width while the delay runs
+    await uart_source.wait()
+    assert dut.busy_out.value == 1, "Expected the sequence still running"
+
+    for width in (0x01, 0x05):
+        await RisingEdge(dut.pulse_out)
+        monitor = EdgeMonitor(dut, ["pulse_out"]).start()
+        await FallingEdge(dut.pulse_out)
         await ClockCycles(dut.clk, 1)
-        if dut.pulse_out.value == 1 and dut.target_reset_out.value == 0:
-            highs += 1
+        end = monitor.cycle
+        monitor.stop()
+        observed = monitor.observed("pulse_out", end)
+        assert observed == [(0, 1), (width, 0)], f"Expected a pulse of {width} cycles, got {observed}"
+        if width == 0x01:
+            # The sequence ended with its only pulse, the next one has the new width
+            assert dut.busy_out.value == 0, "Expected the sequence over"
+            await uart_source.write(b't')
+
+    # The waveform table is held back the same way, the running sequence keeps its pulses
+    await uart_source.write(b'd\xff\xff') # Set delay, long enough for a whole table to arrive
+    await uart_source.write(b't')
+    await RisingEdge(dut.glitch_ctrl.pulse_en)
+    await uart_source.write(protocol.waveform([(0x03, 0x02), (0x02, 0x00)]))
+    await uart_source.wait()
+    assert dut.busy_out.value == 1, "Expected the sequence still running"
 
-    assert highs == 1, f"Expected one pulse after reset, got {highs}"
+    for widths in ([0x05], [0x03, 0x02]):
+        monitor = EdgeMonitor(dut, ["pulse_out"]).start()
+        await FallingEdge(dut.busy_out)
+        await ClockCycles(dut.clk, 1)
+        end = monitor.cycle
+        monitor.stop()
+        pulse = monitor.observed("pulse_out", end)[1:]
+        observed = [fall - rise for (rise, _), (fall, _) in zip(pulse[::2], pulse[1::2])]
+        assert observed == widths, f"Expected pulses of {widths} cycles, got {observed}"
+        if widths == [0x05]:
+            await uart_source.write(b't')
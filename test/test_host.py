@@ -0,0 +1,495 @@
+"""Tests of the host package (tt_glitcher) against a scripted glitcher and target, no simulator needed.
+
+    pytest test_host.py
+"""
+
+import asyncio
+import random
+import shutil
+from collections import Counter
+from contextlib import aclosing
+
+import pytest
+
+from tt_glitcher import (
+    RESET_ARM, RESET_PULSE, TIMEOUT, AdaptiveSearch, Axis, Campaign, CampaignPool, Checkpoint, Emulator, Glitcher,
+    InProcessTransport, SweepPlan, Transport, protocol,
+)
+from tt_glitcher import store as result_store
+from tt_glitcher.campaign import Result
+from tt_glitcher.pool import PoolResult
+from tt_glitcher.sampling import METHODS, SamplingPlan
+from tt_glitcher.store import ResultStore
+
+DEADLINE = 0.05
+
+
+class Board:
+    """A glitcher with a target that prints a line `latency` seconds after each attempt starts.
+
+    The line is `answer(registers)` of the registers the attempt ran with, by default the
+    delay. The target answers the first `answers` attempts (all of them with None), after
+    that it is dead.
+    """
+
+    def __init__(self, latency, answers=None, answer=lambda registers: b"%d" % registers["delay"]):
+        self.latency = latency
+        self.answers = answers
+        self.answer = answer
+        self.console = asyncio.StreamReader()
+        self.transport = InProcessTransport(self._device)
+        self.glitcher = Glitcher(self.transport)
+
+    def _device(self, data):
+        # Configuration and action come in one write, the action last
+        if data.endswith(protocol.HELLO):
+            return protocol.HELLO_RESPONSE
+        if data[-1:] in (protocol.TRIGGER, protocol.RESET_TARGET):
+            self._answer(self.glitcher.registers)
+        return b""
+
+    def _answer(self, registers):
+        if self.answers == 0:
+            return
+        if self.answers is not None:
+            self.answers -= 1
+        line = self.answer(registers) + b"\n"
+        asyncio.get_running_loop().call_later(self.latency, self.console.feed_data, line)
+
+    def campaign(self):
+        return Campaign(self.glitcher, self.console, classify, deadline=DEADLINE)
+
+
+def classify(output):
+    return output.decode().strip() if output.endswith(b"\n") else None
+
+
+def run_campaign(plan, board=lambda: Board(0.001), **kwargs):
+    async def main():
+        target = board()
+        campaign = Campaign(target.glitcher, target.console, classify, deadline=DEADLINE, **kwargs)
+        return target, campaign, [result async for result in campaign.run(plan)]
+
+    return asyncio.run(main())
+
+
+def test_campaign_one_write_per_attempt():
+    plan = [dict(delay=delay, width=delay % 3 + 1) for delay in range(10, 20)]
+    board, campaign, results = run_campaign(plan)
+
+    assert [result.index for result in results] == list(range(len(plan)))
+    assert [result.config for result in results] == plan
+    assert [result.verdict for result in results] == [str(config["delay"]) for config in plan]
+    assert campaign.counts == {str(config["delay"]): 1 for config in plan}
+    assert board.transport.writes == len(plan)
+
+
+def test_campaign_dead_target():
+    plan = [dict(delay=delay) for delay in range(1, 5)]
+    board, campaign, results = run_campaign(plan, board=lambda: Board(0.001, answers=2))
+
+    assert [result.verdict for result in results] == ["1", "2", TIMEOUT, TIMEOUT]
+    assert all(result.seconds >= DEADLINE for result in results[2:])
+    assert campaign.counts == {"1": 1, "2": 1, TIMEOUT: 2}
+
+
+def test_campaign_unknown_action():
+    with pytest.raises(ValueError):
+        run_campaign([], action="fire")
+
+
+PLAN_AXES = [
+    Axis("delay", 100, 2000, 100, exclude=range(500, 700)),
+    Axis("width", 1, 4),
+    Axis("num_pulses", 1, 3),
+]
+
+
+@pytest.mark.parametrize("order", ["gray", "serpentine"])
+def test_sweep_plan_single_register_steps(order):
+    plan = SweepPlan(PLAN_AXES, order=order, fixed={"reset_behavior": RESET_PULSE})
+    points = list(plan)
+
+    expected = {(delay, width, num_pulses) for delay in PLAN_AXES[0].values
+                for width in PLAN_AXES[1].values for num_pulses in PLAN_AXES[2].values}
+    assert len(points) == len(plan) == len(expected)
+    assert {(point["delay"], point["width"], point["num_pulses"]) for point in points} == expected
+    assert all(point["reset_behavior"] == RESET_PULSE for point in points)
+
+    # Every step moves one register to a neighbouring value of its axis
+    for before, after in zip(points, points[1:]):
+        moved = [axis for axis in PLAN_AXES if before[axis.name] != after[axis.name]]
+        assert len(moved) == 1, f"{before} -> {after}"
+        (axis,) = moved
+        assert abs(axis.values.index(before[axis.name]) - axis.values.index(after[axis.name])) == 1
+
+
+@pytest.mark.parametrize("order", ["gray", "serpentine", "lexicographic"])
+@pytest.mark.parametrize("known", [False, True])
+def test_sweep_plan_cost_bytes(order, known):
+    plan = SweepPlan(PLAN_AXES, order=order, fixed={"reset_behavior": RESET_PULSE})
+    transport = InProcessTransport()
+    glitcher = Glitcher(transport)
+    if known:
+        glitcher.device_reset()
+    cost = plan.cost(action="reset_target", registers=glitcher.registers)
+
+    for point in plan:
+        glitcher.attempt("reset_target", **point)
+    assert cost.bytes == len(transport.written)
+    assert cost.attempts == transport.writes == len(plan)
+
+
+def test_sweep_plan_gray_sends_least():
+    sent = {order: SweepPlan(PLAN_AXES, order=order).cost().bytes for order in ["gray", "serpentine", "lexicographic"]}
+    assert sent["gray"] <= sent["serpentine"] < sent["lexicographic"]
+
+
+def in_zone(config):
+    """The faulting zone of the search tests, 0.3% of their space."""
+    return 1200 <= config["delay"] <= 1300 and 8 <= config["width"] <= 12
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_adaptive_search_converges(seed):
+    rng = random.Random(seed)
+    search = AdaptiveSearch([Axis("delay", 0, 4000), Axis("width", 1, 40)], budget=2000, seed=seed, stop_on_found=False)
+    hits = []
+    for config in search:
+        hits.append(in_zone(config))
+        faulted = in_zone(config) and rng.random() < 0.8
+        search.tell(config, "glitch" if faulted else "normal")
+
+    assert search.attempts == 2000
+    assert search.found and all(in_zone(found.config) for found in search.found)
+    # Most of the second half goes to the zone, against 0.3% for random points
+    assert sum(hits[1000:]) > 500
+
+
+def test_adaptive_search_campaign():
+    async def main():
+        board = Board(0.001, answer=lambda registers: b"glitch" if in_zone(registers) else b"normal")
+        campaign = Campaign(board.glitcher, board.console, classify, deadline=DEADLINE)
+        search = AdaptiveSearch([Axis("delay", 1000, 1500), Axis("width", 1, 20)], budget=1000, seed=1)
+        results = [result async for result in search.run(campaign)]
+        return search, results
+
+    search, results = asyncio.run(main())
+    assert len(search.found) == 1 and in_zone(search.found[0].config)
+    assert search.attempts == len(results) < 1000
+
+
+SAMPLING_AXES = [Axis("delay", 0, 65535), Axis("width", 0, 255), Axis("spacing", 0, 1000, 10)]
+
+
+def sample(method, count, chunk, **kwargs):
+    plan = SamplingPlan(SAMPLING_AXES, count, method=method, seed=1234, chunk=chunk, **kwargs)
+    return [tuple(point.values()) for point in plan]
+
+
+@pytest.mark.parametrize("method", METHODS)
+@pytest.mark.parametrize("unique", [False, True])
+def test_sampling_plan_chunk_size(method, unique):
+    # Every point is a function of the seed and its index, whatever the chunk size
+    points = sample(method, 2000, 1 << 16, unique=unique)
+    for chunk in (3, 500, 1999):
+        assert sample(method, 2000, chunk, unique=unique) == points, f"chunk {chunk}"
+    if unique:
+        assert len(set(points)) == len(points)
+    else:
+        assert len(points) == 2000
+    other = [tuple(point.values()) for point in SamplingPlan(SAMPLING_AXES, 2000, method=method, seed=4321)]
+    assert other != points
+    assert all(point[0] != 0 and point[1] != 0 for point in points)
+
+
+def test_sampling_plan_latin_hypercube_strata():
+    # As many points as values, so every value of every axis comes up exactly once
+    axes = [Axis("width", 1, 200), Axis("num_pulses", 1, 200)]
+    plan = SamplingPlan(axes, 200, method="lhs", seed=5, chunk=64)
+    for axis in axes:
+        assert sorted(point[axis.name] for point in plan) == axis.values
+
+
+def run_pool(boards, plan, **kwargs):
+    async def main():
+        campaigns = [board().campaign() for board in boards]
+        pool = CampaignPool(campaigns, **kwargs)
+        results = [result async for result in pool.run(plan)]
+        return pool, campaigns, results
+
+    return asyncio.run(main())
+
+
+def test_pool_slow_and_dead_boards():
+    plan = [dict(delay=delay) for delay in range(1, 25)]
+    boards = [lambda: Board(0.001), lambda: Board(0.02), lambda: Board(0.001, answers=0)]
+    pool, campaigns, results = run_pool(boards, plan, max_hangs=2)
+
+    assert [result.index for result in results] == list(range(len(plan)))
+    assert [result.config for result in results] == plan
+    assert [result.verdict for result in results] == [str(config["delay"]) for config in plan]
+    assert list(pool.retired) == [2]
+    # The dead board hung twice and gave those attempts to the others, which ran every attempt once
+    assert campaigns[2].counts == {TIMEOUT: 2}
+    assert pool.attempts[2] == 0
+    assert sum(pool.attempts) == len(plan)
+    assert sum(sum(campaign.counts.values()) for campaign in campaigns[:2]) == len(plan)
+    assert pool.attempts[0] > pool.attempts[1]
+
+
+def test_pool_board_dead_at_the_end():
+    # The second board dies after one answer, the plan runs out before it hangs max_hangs times
+    plan = [dict(delay=delay) for delay in range(1, 7)]
+    boards = [lambda: Board(0.001), lambda: Board(0.001, answers=1)]
+    pool, campaigns, results = run_pool(boards, plan, max_hangs=100)
+
+    assert [result.verdict for result in results] == [str(config["delay"]) for config in plan]
+    assert list(pool.retired) == [1]
+    hung = campaigns[1].counts[TIMEOUT]
+    assert hung > 0
+    assert sum(pool.attempts) == len(plan)
+    assert sum(campaign.counts["%d" % config["delay"]] for campaign in campaigns for config in plan) == len(plan)
+
+
+def test_pool_last_board_retries_itself():
+    plan = [dict(delay=delay) for delay in range(1, 4)]
+    pool, campaigns, results = run_pool([lambda: Board(0.001, answers=1)], plan, max_hangs=100)
+
+    # Nobody else to retry with, so the board runs its hung attempts again and the second timeout stands
+    assert [result.verdict for result in results] == ["1", TIMEOUT, TIMEOUT]
+    assert not pool.retired
+    assert campaigns[0].counts == {"1": 1, TIMEOUT: 4}
+    assert pool.attempts == [3]
+
+
+def store_results(count, seed):
+    rng = random.Random(seed)
+    results = []
+    for index in range(count):
+        config = dict(delay=rng.randrange(0, 40) * 100, width=rng.randrange(1, 5))
+        verdict = rng.choice(["normal", "glitch", TIMEOUT])
+        output = b"x" * rng.randrange(0, 20)
+        results.append(PoolResult(index, config, verdict, output, rng.random(), index % 3))
+    return results
+
+
+def test_result_store_reopen(tmp_path):
+    path = tmp_path / "run"
+    results = store_results(500, 1)
+    with ResultStore(path, mode="a", registers={"reset_behavior": RESET_PULSE}) as store:
+        for result in results[:300]:
+            store.append(result)
+
+    # Appending after a reopen carries on, a reader sees the new records after a refresh
+    reader = ResultStore(path)
+    assert len(reader) == 300
+    with ResultStore(path, mode="a", registers={"reset_behavior": RESET_PULSE}) as store:
+        for result in results[300:]:
+            store.append(result)
+    reader.refresh()
+
+    records = reader.records
+    assert len(records) == len(results)
+    assert records["index"].tolist() == [result.index for result in results]
+    assert records["delay"].tolist() == [result.config["delay"] for result in results]
+    assert records["width"].tolist() == [result.config["width"] for result in results]
+    assert records["device"].tolist() == [result.device for result in results]
+    assert (records["reset_behavior"] == RESET_PULSE).all()
+    assert [reader.verdicts[code] for code in records["verdict"]] == [result.verdict for result in results]
+    assert [reader.output(i) for i in range(len(results))] == [result.output for result in results]
+    assert reader.count("glitch") == sum(result.verdict == "glitch" for result in results)
+    reader.close()
+
+
+def test_result_store_torn_append(tmp_path):
+    path = tmp_path / "run"
+    results = [Result(index, dict(delay=index), "normal", b"out%d" % index, 0.1) for index in range(10)]
+    with ResultStore(path, mode="a") as store:
+        for result in results[:9]:
+            store.append(result)
+    # A crash after the output of the last attempt and half of its record
+    with open(path / "output.bin", "ab") as f:
+        f.write(results[9].output)
+    with open(path / "records.bin", "ab") as f:
+        f.write(bytes(result_store.RECORD.itemsize // 2))
+
+    with ResultStore(path, mode="a") as store:
+        assert len(store) == 9
+        store.append(results[9])
+        assert [store.output(i) for i in range(10)] == [result.output for result in results]
+
+
+@pytest.mark.parametrize("dense_cells", [result_store.DENSE_CELLS, 0])
+def test_result_store_rate(tmp_path, monkeypatch, dense_cells):
+    # Counters per cell, or sorting
+    monkeypatch.setattr(result_store, "DENSE_CELLS", dense_cells)
+    results = store_results(2000, 2)
+    with ResultStore(tmp_path / "run", mode="a") as store:
+        for result in results:
+            store.append(result)
+        table = store.rate("glitch", by=("delay", "width"))
+
+        attempts = Counter((result.config["delay"], result.config["width"]) for result in results)
+        hits = Counter((result.config["delay"], result.config["width"]) for result in results if result.verdict == "glitch")
+        assert [(row["delay"], row["width"]) for row in table] == sorted(attempts)
+        for row in table:
+            cell = (int(row["delay"]), int(row["width"]))
+            assert (row["attempts"], row["hits"]) == (attempts[cell], hits[cell])
+            assert row["rate"] == hits[cell] / attempts[cell]
+
+        # Restricted to one device, and a verdict no record has
+        device = store.records["device"] == 1
+        assert store.rate("glitch", by=("device",), where=device)["attempts"].tolist() == [sum(r.device == 1 for r in results)]
+        assert store.rate("reboot")["hits"].sum() == 0
+
+
+class Interrupted(Exception):
+    pass
+
+
+def run_checkpoint(path, plan, *, stop=None, store=None, copy_at=None):
+    """Run `plan` from the checkpoint at `path`, interrupted after `stop` results.
+
+    Returns the indices of the results. Results also go to `store`, and with `copy_at`
+    the checkpoint file is copied aside once that many results are in.
+    """
+    async def main():
+        board = Board(0.001)
+        campaign = Campaign(board.glitcher, board.console, classify, deadline=DEADLINE)
+        indices = []
+        async with aclosing(Checkpoint(path, every=5).run(campaign, plan, store=store)) as results:
+            async for result in results:
+                assert result.verdict == str(result.config["delay"])
+                if isinstance(plan, list):
+                    assert result.config == plan[result.index]
+                indices.append(result.index)
+                if store is not None:
+                    store.append(result)
+                if len(indices) == copy_at:
+                    shutil.copy(path, f"{path}.copy")
+                if len(indices) == stop:
+                    raise Interrupted
+        return indices
+
+    return asyncio.run(main())
+
+
+def test_checkpoint_resume(tmp_path):
+    path = str(tmp_path / "run.checkpoint")
+    plan = list(SweepPlan([Axis("delay", 1, 40), Axis("width", 1, 2)]))
+    with pytest.raises(Interrupted):
+        run_checkpoint(path, plan, stop=23)
+    # Saved on the way out, so the second run starts right after the 23rd attempt
+    indices = run_checkpoint(path, plan)
+    assert indices == list(range(23, len(plan)))
+    assert run_checkpoint(path, plan) == []
+
+
+def test_checkpoint_resume_after_crash(tmp_path):
+    # Only the checkpoint after attempt 15 survives the crash at attempt 22, the store has them all
+    path = str(tmp_path / "run.checkpoint")
+    plan = list(SweepPlan([Axis("delay", 1, 40), Axis("width", 1, 2)]))
+    with ResultStore(tmp_path / "run", mode="a") as store:
+        with pytest.raises(Interrupted):
+            run_checkpoint(path, plan, stop=22, store=store, copy_at=17)
+        shutil.copy(f"{path}.copy", path)
+        run_checkpoint(path, plan, store=store)
+
+        indices = store.records["index"].tolist()
+        assert sorted(indices) == list(range(len(plan)))
+
+
+def test_checkpoint_resume_search(tmp_path):
+    path = str(tmp_path / "run.checkpoint")
+
+    def search():
+        return AdaptiveSearch([Axis("delay", 1000, 1500), Axis("width", 1, 20)], budget=60, stop_on_found=False, seed=3)
+
+    with pytest.raises(Interrupted):
+        run_checkpoint(path, search(), stop=25)
+    resumed = search()
+    indices = run_checkpoint(path, resumed)
+    assert indices == list(range(25, 60))
+    assert resumed.attempts == 60
+
+
+class EmulatedBoard(Board):
+    """The same target behind the emulated glitcher, answering when a sequence ends with the registers it ran with."""
+
+    def __init__(self, latency, **kwargs):
+        super().__init__(latency, **kwargs)
+        self.emulator = Emulator(listener=self._event)
+        self.transport = InProcessTransport(self.emulator)
+        self.glitcher = Glitcher(self.transport)
+
+    def _event(self, event):
+        if event.signal == "busy" and not event.value:
+            self._answer(self.emulator.active)
+
+
+def test_campaign_overlap():
+    # The next configuration goes out while the target runs, each attempt still runs its own
+    plan = [dict(delay=delay, width=delay % 3 + 1) for delay in range(10, 20)]
+    board, campaign, results = run_campaign(plan, board=lambda: EmulatedBoard(0.001), overlap=True)
+
+    assert [result.verdict for result in results] == [str(config["delay"]) for config in plan]
+    assert board.emulator.registers["delay"] == plan[-1]["delay"]
+
+
+def test_campaign_overlap_refuses_arm():
+    with pytest.raises(ValueError):
+        run_campaign([dict(delay=1)], action="arm", overlap=True)
+
+    # The arm reset behavior, in an attempt or already in the client
+    with pytest.raises(ValueError):
+        run_campaign([dict(delay=1), dict(delay=2, reset_behavior=RESET_ARM)], overlap=True)
+
+    async def main():
+        board = Board(0.001)
+        board.glitcher.configure(reset_behavior=RESET_ARM)
+        with pytest.raises(ValueError):
+            Campaign(board.glitcher, board.console, classify, overlap=True)
+        Campaign(board.glitcher, board.console, classify, action="trigger", overlap=True)
+
+    asyncio.run(main())
+
+
+def test_transport_is_abstract():
+    class Incomplete(Transport):
+        def write(self, data):
+            pass
+
+    with pytest.raises(TypeError):
+        Transport()
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+@pytest.mark.parametrize("command", [protocol.SWEEP, protocol.WAVE_LENGTH, protocol.SET_BAUD_RATE, b"d"])
+def test_resync_keeps_sweep_and_waveform(command):
+    transport = InProcessTransport(Emulator())
+    glitcher = Glitcher(transport)
+    glitcher.device_reset()
+    glitcher.configure(delay=100, width=2).set_sweep(delay=(1, 200)).waveform([(3, 4), (5, 6)]).start_sweep()
+
+    # A host that died right after the command byte
+    transport.write(command)
+    assert glitcher.resync(settle=False)
+    assert glitcher.registers == {}
+    assert glitcher.sweep_status()[1] == protocol.SWEEP_RUNNING
+    length, entries = glitcher.read_waveform()
+    assert (length, entries[:2]) == (2, [(3, 4), (5, 6)])
+
+
+@pytest.mark.parametrize("index, width, spacing, error", [
+    (0, 1, protocol.WAVE_SPACING_MAX + 1, ValueError),
+    (0, 1, -1, ValueError),
+    (0x100, 1, 0, ValueError),
+    (0, 1, 2.0, TypeError),
+    (True, 1, 0, TypeError),
+])
+def test_wave_entry_checks_values(index, width, spacing, error):
+    assert protocol.wave_entry(0, 1, protocol.WAVE_SPACING_MAX) == protocol.WAVE_ENTRY + bytes([0, 1, 0xFF])
+    with pytest.raises(error):
+        protocol.wave_entry(index, width, spacing)
@@ -1,11 +1,30 @@
 import cocotb
 from cocotb.triggers import ClockCycles, FallingEdge, RisingEdge
 
-from cocotbext.uart import UartSink, UartSource
+from cocotbext.uart import UartSource
+
+from tt_glitcher import Emulator, Glitcher, InProcessTransport, RESET_PULSE, protocol
+
+from .common import EdgeMonitor, UartMonitor, clks_per_bit, config_source, start_clock_and_reset, uart_baud, waves_on_failure
+
+OUTPUTS = ["pulse_out", "pulse_out_n", "target_reset", "target_reset_n", "pulse_or_reset", "busy", "armed", "pulse_en"]
+
+
+def outputs(*, pulse=0, reset=0, busy=1, armed=0, pulse_en=0):
+    return {
+        "pulse_out": pulse,
+        "pulse_out_n": 1 - pulse,
+        "target_reset": reset,
+        "target_reset_n": 1 - reset,
+        "pulse_or_reset": pulse | reset,
+        "busy": busy,
+        "armed": armed,
+        "pulse_en": pulse_en,
+    }
 
-from .common import read_exact, start_clock_and_reset
 
 @cocotb.test(timeout_time=10, timeout_unit="ms")
+@waves_on_failure
 async def test_project_echo(dut):
     dut._log.info("Start")
 
@@ -13,18 +32,19 @@ async def test_project_echo(dut):
 
     dut._log.info("Test project echo")
 
-    uart_source = UartSource(dut.uart_rx, baud=115200, bits=8)
-    uart_sink = UartSink(dut.uart_tx, baud=115200, bits=8)
+    uart_source = UartSource(dut.uart_rx, baud=uart_baud(dut), bits=8)
+    uart_monitor = UartMonitor(dut.uart_tx, clks_per_bit(dut))
 
     # Unrecognized command bytes will be echoed back
     for x in range(0x10, 0x20):
         await uart_source.write(bytes([x]))
         await uart_source.wait()
 
-        data = await uart_sink.read()
+        data = await uart_monitor.read(1)
         assert data == bytes([x]), f"Expected {x:#02x}, got {data[0]:#02x}"
 
 @cocotb.test(timeout_time=10, timeout_unit="ms")
+@waves_on_failure
 async def test_project_hello(dut):
     dut._log.info("Start")
 
@@ -32,16 +52,17 @@ async def test_project_hello(dut):
 
     dut._log.info("Test project hello")
 
-    uart_source = UartSource(dut.uart_rx, baud=115200, bits=8)
-    uart_sink = UartSink(dut.uart_tx, baud=115200, bits=8)
+    uart_source = UartSource(dut.uart_rx, baud=uart_baud(dut), bits=8)
+    uart_monitor = UartMonitor(dut.uart_tx, clks_per_bit(dut))
 
     await uart_source.write(b'h')
     await uart_source.wait()
 
-    data = await read_exact(uart_sink, 5)
+    data = await uart_monitor.read(5)
     assert data == b"Erika", f"Expected 'Erika', got {data}"
 
 @cocotb.test(timeout_time=10, timeout_unit="ms")
+@waves_on_failure
 async def test_project_full_glitch_sequence_without_reset(dut):
     dut._log.info("Start")
 
@@ -49,7 +70,7 @@ async def test_project_full_glitch_sequence_without_reset(dut):
 
     dut._log.info("Test project full glitch sequence without reset")
 
-    uart_source = UartSource(dut.uart_rx, baud=115200, bits=8, stop_bits=1)
+    uart_source = config_source(dut, "user_project.glitch_ctrl.uart_hdlr.rxi")
 
     await uart_source.write(b'd\x00\x12') # Set delay
     await uart_source.write(b'w\x01')     # Set width
@@ -60,37 +81,18 @@ async def test_project_full_glitch_sequence_without_reset(dut):
     await RisingEdge(dut.pulse_en)
     await ClockCycles(dut.clk, 1)
 
-    for _ in range(0x12): # Delay
-        await ClockCycles(dut.clk, 1)
-        assert dut.pulse_out.value == 0, "Expected pulse_out to be 0"
-        assert dut.pulse_out_n.value == 1, "Expected pulse_out_n to be 1"
-        assert dut.pulse_or_reset.value == 0, "Expected pulse_or_reset to be 0"
-
-    for _ in range(0x01): # Width
-        await ClockCycles(dut.clk, 1)
-        assert dut.pulse_out.value == 1, "Expected pulse_out to be 1"
-        assert dut.pulse_out_n.value == 0, "Expected pulse_out_n to be 0"
-        assert dut.pulse_or_reset.value == 1, "Expected pulse_or_reset to be 1"
-
-    for _ in range(0x03): # Spacing
-        await ClockCycles(dut.clk, 1)
-        assert dut.pulse_out.value == 0, "Expected pulse_out to be 0"
-        assert dut.pulse_out_n.value == 1, "Expected pulse_out_n to be 1"
-        assert dut.pulse_or_reset.value == 0, "Expected pulse_or_reset to be 0"
-
-    for _ in range(0x01): # Width
-        await ClockCycles(dut.clk, 1)
-        assert dut.pulse_out.value == 1, "Expected pulse_out to be 1"
-        assert dut.pulse_out_n.value == 0, "Expected pulse_out_n to be 0"
-        assert dut.pulse_or_reset.value == 1, "Expected pulse_or_reset to be 1"
-
-    await ClockCycles(dut.clk, 1)
-    assert dut.pulse_out.value == 0, "Expected pulse_out to be 0"
-    assert dut.pulse_out_n.value == 1, "Expected pulse_out_n to be 1"
-    assert dut.pulse_or_reset.value == 0, "Expected pulse_or_reset to be 0"
+    monitor = EdgeMonitor(dut, OUTPUTS).start()
+    await monitor.expect([
+        (0x12, outputs()),             # Delay
+        (0x01, outputs(pulse=1)),      # Width
+        (0x03, outputs()),             # Spacing
+        (0x01, outputs(pulse=1)),      # Width
+        (1, outputs(busy=0)),
+    ])
 
 
 @cocotb.test(timeout_time=10, timeout_unit="ms")
+@waves_on_failure
 async def test_project_full_glitch_sequence_with_reset(dut):
     dut._log.info("Start")
 
@@ -98,7 +100,7 @@ async def test_project_full_glitch_sequence_with_reset(dut):
 
     dut._log.info("Test project full glitch sequence with reset")
 
-    uart_source = UartSource(dut.uart_rx, baud=115200, bits=8)
+    uart_source = config_source(dut, "user_project.glitch_ctrl.uart_hdlr.rxi")
 
     await uart_source.write(b'd\x00\x12') # Set delay
     await uart_source.write(b'w\x01')     # Set width
@@ -109,54 +111,19 @@ async def test_project_full_glitch_sequence_with_reset(dut):
 
     await RisingEdge(dut.target_reset)
 
-    for x in range(0x50): # Reset
-        await ClockCycles(dut.clk, 1)
-        assert dut.pulse_out.value == 0, "Expected pulse_out to be 0"
-        assert dut.target_reset.value == 1, "Expected target_reset to be 1"
-        assert dut.pulse_out_n.value == 1, "Expected pulse_out_n to be 1 during reset"
-        assert dut.target_reset_n.value == 0, "Expected target_reset_n to be 0 during reset"
-        assert dut.pulse_or_reset.value == 1, "Expected pulse_or_reset to be 1 during reset"
-
-    for _ in range(0x12): # Delay
-        await ClockCycles(dut.clk, 1)
-        assert dut.pulse_out.value == 0, "Expected pulse_out to be 0 during delay"
-        assert dut.target_reset.value == 0, "Expected target_reset to be 0 during delay"
-        assert dut.pulse_out_n.value == 1, "Expected pulse_out_n to be 1 during delay"
-        assert dut.target_reset_n.value == 1, "Expected target_reset_n to be 1 during delay"
-        assert dut.pulse_or_reset.value == 0, "Expected pulse_or_reset to be 0 during delay"
-
-    for _ in range(0x01): # Width
-        await ClockCycles(dut.clk, 1)
-        assert dut.pulse_out.value == 1, "Expected pulse_out to be 1"
-        assert dut.target_reset.value == 0, "Expected target_reset to be 0"
-        assert dut.pulse_out_n.value == 0, "Expected pulse_out_n to be 0"
-        assert dut.target_reset_n.value == 1, "Expected target_reset_n to be 1"
-        assert dut.pulse_or_reset.value == 1, "Expected pulse_or_reset to be 1"
-
-    for _ in range(0x03): # Spacing
-        await ClockCycles(dut.clk, 1)
-        assert dut.pulse_out.value == 0, "Expected pulse_out to be 0"
-        assert dut.target_reset.value == 0, "Expected target_reset to be 0"
-        assert dut.pulse_out_n.value == 1, "Expected pulse_out_n to be 1"
-        assert dut.target_reset_n.value == 1, "Expected target_reset_n to be 1"
-        assert dut.pulse_or_reset.value == 0, "Expected pulse_or_reset to be 0 during spacing"
-
-    for _ in range(0x01): # Width
-        await ClockCycles(dut.clk, 1)
-        assert dut.pulse_out.value == 1, "Expected pulse_out to be 1"
-        assert dut.target_reset.value == 0, "Expected target_reset to be 0"
-        assert dut.pulse_out_n.value == 0, "Expected pulse_out_n to be 0"
-        assert dut.target_reset_n.value == 1, "Expected target_reset_n to be 1"
-        assert dut.pulse_or_reset.value == 1, "Expected pulse_or_reset to be 1"
-
-    await ClockCycles(dut.clk, 1)
-    assert dut.pulse_out.value == 0, "Expected pulse_out to be 0"
-    assert dut.target_reset.value == 0, "Expected target_reset to be 0"
-    assert dut.pulse_out_n.value == 1, "Expected pulse_out_n to be 1"
-    assert dut.target_reset_n.value == 1, "Expected target_reset_n to be 1"
-    assert dut.pulse_or_reset.value == 0, "Expected pulse_or_reset to be 0"
+    monitor = EdgeMonitor(dut, OUTPUTS).start()
+    await monitor.expect([
+        (0x50, outputs(reset=1)),      # Reset
+        (0x01, outputs(pulse_en=1)),   # Delay, the pulse sequence starts when the reset is done
+        (0x11, outputs()),             # Delay
+        (0x01, outputs(pulse=1)),      # Width
+        (0x03, outputs()),             # Spacing
+        (0x01, outputs(pulse=1)),      # Width
+        (1, outputs(busy=0)),
+    ])
 
 @cocotb.test(timeout_time=10, timeout_unit="ms")
+@waves_on_failure
 async def test_project_trigger(dut):
     dut._log.info("Start")
 
@@ -164,7 +131,7 @@ async def test_project_trigger(dut):
 
     dut._log.info("Test project full glitch sequence")
 
-    uart_source = UartSource(dut.uart_rx, baud=115200, bits=8, stop_bits=1)
+    uart_source = config_source(dut, "user_project.glitch_ctrl.uart_hdlr.rxi")
 
     await uart_source.write(b'd\x00\x12') # Set delay
     await uart_source.write(b'w\x01')     # Set width
@@ -175,33 +142,25 @@ async def test_project_trigger(dut):
 
     await ClockCycles(dut.clk, 1)
 
+    monitor = EdgeMonitor(dut, OUTPUTS).start()
+
     dut.trigger_in.value = 1
     await ClockCycles(dut.clk, 1)
     dut.trigger_in.value = 0
 
-    # The trigger is synchronized internally, so we need to wait two cycles before the delay starts
-    await ClockCycles(dut.clk, 2)
-
-    for _ in range(0x12): # Delay
-        await ClockCycles(dut.clk, 1)
-        assert dut.pulse_out.value == 0, "Expected pulse_out to be 0"
-
-    for _ in range(0x01): # Width
-        await ClockCycles(dut.clk, 1)
-        assert dut.pulse_out.value == 1, "Expected pulse_out to be 1"
-
-    for _ in range(0x03): # Spacing
-        await ClockCycles(dut.clk, 1)
-        assert dut.pulse_out.value == 0, "Expected pulse_out to be 0"
-
-    for _ in range(0x01): # Width
-        await ClockCycles(dut.clk, 1)
-        assert dut.pulse_out.value == 1, "Expected pulse_out to be 1"
-
-    await ClockCycles(dut.clk, 1)
-    assert dut.pulse_out.value == 0, "Expected pulse_out to be 0"
+    # The trigger is synchronized internally, so the delay starts three cycles after the trigger
+    await monitor.expect([
+        (0x02, outputs(busy=0, armed=1)),
+        (0x01, outputs(busy=0, armed=1, pulse_en=1)),
+        (0x12, outputs()),             # Delay
+        (0x01, outputs(pulse=1)),      # Width
+        (0x03, outputs()),             # Spacing
+        (0x01, outputs(pulse=1)),      # Width
+        (1, outputs(busy=0)),
+    ])
 
 @cocotb.test(timeout_time=10, timeout_unit="ms")
+@waves_on_failure
 async def test_project_target_reset_only(dut):
     dut._log.info("Start")
 
@@ -209,30 +168,23 @@ async def test_project_target_reset_only(dut):
 
     dut._log.info("Test project target reset only")
 
-    uart_source = UartSource(dut.uart_rx, baud=115200, bits=8)
+    uart_source = config_source(dut, "user_project.glitch_ctrl.uart_hdlr.rxi")
+
     await uart_source.write(b'y')         # Reset mode 'none' (reset only)
     await uart_source.write(b'r\x12\x34') # Set reset length
     await uart_source.write(b'p')         # Power cycle (reset) target
 
     await RisingEdge(dut.target_reset)
 
-    for _ in range(0x1234): # Reset
-        await ClockCycles(dut.clk, 1)
-        assert dut.pulse_out.value == 0, "Expected pulse_out to be 0"
-        assert dut.target_reset.value == 1, "Expected target_reset to be 1"
-        assert dut.pulse_out_n.value == 1, "Expected pulse_out_n to be 1"
-        assert dut.target_reset_n.value == 0, "Expected target_reset_n to be 0"
-        assert dut.pulse_or_reset.value == 1, "Expected pulse_or_reset to be 1"
-
-    await ClockCycles(dut.clk, 1)
-    assert dut.pulse_out.value == 0, "Expected pulse_out to be 0"
-    assert dut.target_reset.value == 0, "Expected target_reset to be 0"
-    assert dut.pulse_out_n.value == 1, "Expected pulse_out_n to be 1"
-    assert dut.target_reset_n.value == 1, "Expected target_reset_n to be 1"
-    assert dut.pulse_or_reset.value == 0, "Expected pulse_or_reset to be 0"
+    monitor = EdgeMonitor(dut, OUTPUTS).start()
+    await monitor.expect([
+        (0x1234, outputs(reset=1)),    # Reset
+        (1, outputs(busy=0)),
+    ])
 
 
 @cocotb.test(timeout_time=10, timeout_unit="ms")
+@waves_on_failure
 async def test_project_reset_arm_trigger(dut):
     dut._log.info("Start")
 
@@ -240,7 +192,8 @@ async def test_project_reset_arm_trigger(dut):
 
     dut._log.info("Test project reset, arm and trigger")
 
-    uart_source = UartSource(dut.uart_rx, baud=115200, bits=8)
+    uart_source = config_source(dut, "user_project.glitch_ctrl.uart_hdlr.rxi")
+
     await uart_source.write(b'i')         # Reset mode 'arm'
     await uart_source.write(b'd\x00\x12') # Set delay
     await uart_source.write(b'w\x01')     # Set width
@@ -249,55 +202,25 @@ async def test_project_reset_arm_trigger(dut):
 
     await RisingEdge(dut.target_reset)
 
-    for _ in range(0x80): # Reset
-        await ClockCycles(dut.clk, 1)
-        assert dut.pulse_out.value == 0, "Expected pulse_out to be 0"
-        assert dut.target_reset.value == 1, "Expected target_reset to be 1"
-        assert dut.pulse_or_reset.value == 1, "Expected pulse_or_reset to be 1"
-        assert dut.pulse_out_n.value == 1, "Expected pulse_out_n to be 1"
-        assert dut.target_reset_n.value == 0, "Expected target_reset_n to be 0"
-        assert dut.armed.value == 0, "Expected armed to be 0"
-
-    await ClockCycles(dut.clk, 1)
-    assert dut.pulse_out.value == 0, "Expected pulse_out to be 0"
-    assert dut.pulse_or_reset.value == 0, "Expected pulse_or_reset to be 0"
-    assert dut.pulse_out_n.value == 1, "Expected pulse_out_n to be 1"
-    assert dut.target_reset_n.value == 1, "Expected target_reset_n to be 1"
-    assert dut.target_reset.value == 0, "Expected target_reset to be 0"
+    monitor = EdgeMonitor(dut, OUTPUTS).start()
 
-    # Trigger should now be armed
-    assert dut.armed.value == 1, "Expected armed to be 1"
-
-    await ClockCycles(dut.clk, 1)
+    await ClockCycles(dut.clk, 0x80 + 2)
     dut.trigger_in.value = 1
     await ClockCycles(dut.clk, 1)
     dut.trigger_in.value = 0
 
-    # The trigger is synchronized internally, so we need to wait two cycles before the delay starts
-    await ClockCycles(dut.clk, 2)
-
-    for _ in range(0x12): # Delay
-        await ClockCycles(dut.clk, 1)
-        assert dut.pulse_out.value == 0, "Expected pulse_out to be 0"
-        assert dut.pulse_out_n.value == 1, "Expected pulse_out_n to be 1"
-        assert dut.armed.value == 0, "Expected armed to be 0"
-        assert dut.pulse_or_reset.value == 0, "Expected pulse_or_reset to be 0"
-
-    for _ in range(0x01): # Width
-        await ClockCycles(dut.clk, 1)
-        assert dut.pulse_out.value == 1, "Expected pulse_out to be 1"
-        assert dut.pulse_out_n.value == 0, "Expected pulse_out_n to be 0"
-        assert dut.armed.value == 0, "Expected armed to be 0"
-        assert dut.pulse_or_reset.value == 1, "Expected pulse_or_reset to be 1"
-
-    await ClockCycles(dut.clk, 1)
-    assert dut.pulse_out.value == 0, "Expected pulse_out to be 0"
-    assert dut.pulse_out_n.value == 1, "Expected pulse_out_n to be 1"
-    assert dut.armed.value == 0, "Expected armed to be 0"
-    assert dut.pulse_or_reset.value == 0, "Expected pulse_or_reset to be 0"
+    await monitor.expect([
+        (0x80, outputs(reset=1)),      # Reset
+        (0x04, outputs(busy=0, armed=1)), # Trigger should now be armed
+        (0x01, outputs(busy=0, armed=1, pulse_en=1)),
+        (0x12, outputs()),             # Delay
+        (0x01, outputs(pulse=1)),      # Width
+        (1, outputs(busy=0)),
+    ])
 
 
 @cocotb.test(timeout_time=10, timeout_unit="ms")
+@waves_on_failure
 async def test_project_num_pulses_zero_no_pulse(dut):
     dut._log.info("Start")
 
@@ -305,7 +228,7 @@ async def test_project_num_pulses_zero_no_pulse(dut):
 
     dut._log.info("Test num_pulses=0 yields no pulse")
 
-    uart_source = UartSource(dut.uart_rx, baud=115200, bits=8)
+    uart_source = config_source(dut, "user_project.glitch_ctrl.uart_hdlr.rxi")
 
     await uart_source.write(b'd\x00\x02') # Set delay
     await uart_source.write(b'w\x01')     # Set width
@@ -315,16 +238,16 @@ async def test_project_num_pulses_zero_no_pulse(dut):
 
     await RisingEdge(dut.pulse_en)
 
-    for _ in range(0x02):
-        await ClockCycles(dut.clk, 1)
-        assert dut.pulse_out.value == 0, "Expected pulse_out to be 0"
-
-    for _ in range(4):
-        await ClockCycles(dut.clk, 1)
-        assert dut.pulse_out.value == 0, "Expected pulse_out to stay 0"
+    monitor = EdgeMonitor(dut, OUTPUTS).start()
+    await monitor.expect([
+        (1, outputs(busy=0, pulse_en=1)),
+        (0x02, outputs()),             # Delay
+        (3, outputs(busy=0)),          # Pulse output stays low
+    ])
 
 
 @cocotb.test(timeout_time=10, timeout_unit="ms")
+@waves_on_failure
 async def test_project_num_pulses_one_no_spacing(dut):
     dut._log.info("Start")
 
@@ -332,7 +255,7 @@ async def test_project_num_pulses_one_no_spacing(dut):
 
     dut._log.info("Test num_pulses=1 no spacing phase")
 
-    uart_source = UartSource(dut.uart_rx, baud=115200, bits=8)
+    uart_source = config_source(dut, "user_project.glitch_ctrl.uart_hdlr.rxi")
 
     await uart_source.write(b'd\x00\x01') # Set delay
     await uart_source.write(b'w\x02')     # Set width
@@ -343,21 +266,16 @@ async def test_project_num_pulses_one_no_spacing(dut):
     await RisingEdge(dut.pulse_en)
     await ClockCycles(dut.clk, 1)
 
-    await ClockCycles(dut.clk, 1)
-    assert dut.pulse_out.value == 0, "Expected pulse_out to be 0 during delay"
-    assert dut.busy.value == 1, "Expected busy to be 1 during delay"
-
-    for _ in range(0x02):
-        await ClockCycles(dut.clk, 1)
-        assert dut.pulse_out.value == 1, "Expected pulse_out to be 1"
-        assert dut.busy.value == 1, "Expected busy to be 1 during pulse"
-
-    await ClockCycles(dut.clk, 1)
-    assert dut.pulse_out.value == 0, "Expected pulse_out to be 0 after pulse"
-    assert dut.busy.value == 0, "Expected busy to be 0 after pulse"
+    monitor = EdgeMonitor(dut, OUTPUTS).start()
+    await monitor.expect([
+        (0x01, outputs()),             # Delay
+        (0x02, outputs(pulse=1)),      # Width
+        (1, outputs(busy=0)),          # No spacing phase after the last pulse
+    ])
 
 
 @cocotb.test(timeout_time=10, timeout_unit="ms")
+@waves_on_failure
 async def test_project_zero_delay_immediate_pulse(dut):
     dut._log.info("Start")
 
@@ -365,7 +283,7 @@ async def test_project_zero_delay_immediate_pulse(dut):
 
     dut._log.info("Test zero delay starts pulse immediately")
 
-    uart_source = UartSource(dut.uart_rx, baud=115200, bits=8)
+    uart_source = config_source(dut, "user_project.glitch_ctrl.uart_hdlr.rxi")
 
     await uart_source.write(b'd\x00\x00') # Set delay = 0
     await uart_source.write(b'w\x01')     # Set width = 1
@@ -375,17 +293,16 @@ async def test_project_zero_delay_immediate_pulse(dut):
     await RisingEdge(dut.pulse_en)
     await ClockCycles(dut.clk, 1) # Settle after pulse_en goes high
 
-    await ClockCycles(dut.clk, 1)
-    assert dut.pulse_out.value == 0, "Expected one delay cycle even with zero delay"
-
-    await ClockCycles(dut.clk, 1)
-    assert dut.pulse_out.value == 1, "Expected pulse_out to be 1"
-
-    await ClockCycles(dut.clk, 1)
-    assert dut.pulse_out.value == 0, "Expected pulse_out to return low"
+    monitor = EdgeMonitor(dut, OUTPUTS).start()
+    await monitor.expect([
+        (1, outputs()),                # One delay cycle even with zero delay
+        (1, outputs(pulse=1)),
+        (1, outputs(busy=0)),
+    ])
 
 
 @cocotb.test(timeout_time=10, timeout_unit="ms")
+@waves_on_failure
 async def test_project_zero_width_one_cycle(dut):
     dut._log.info("Start")
 
@@ -393,7 +310,7 @@ async def test_project_zero_width_one_cycle(dut):
 
     dut._log.info("Test zero width is one cycle")
 
-    uart_source = UartSource(dut.uart_rx, baud=115200, bits=8)
+    uart_source = config_source(dut, "user_project.glitch_ctrl.uart_hdlr.rxi")
 
     await uart_source.write(b'd\x00\x01') # Set delay
     await uart_source.write(b'w\x00')     # Set width = 0
@@ -403,17 +320,16 @@ async def test_project_zero_width_one_cycle(dut):
     await RisingEdge(dut.pulse_en)
     await ClockCycles(dut.clk, 1) # Settle
 
-    await ClockCycles(dut.clk, 1)
-    assert dut.pulse_out.value == 0, "Expected pulse_out to be 0 during delay"
-
-    await ClockCycles(dut.clk, 1)
-    assert dut.pulse_out.value == 1, "Expected pulse_out high for one cycle"
-
-    await ClockCycles(dut.clk, 1)
-    assert dut.pulse_out.value == 0, "Expected pulse_out to return low"
+    monitor = EdgeMonitor(dut, OUTPUTS).start()
+    await monitor.expect([
+        (1, outputs()),                # Delay
+        (1, outputs(pulse=1)),         # Pulse high for one cycle
+        (1, outputs(busy=0)),
+    ])
 
 
 @cocotb.test(timeout_time=10, timeout_unit="ms")
+@waves_on_failure
 async def test_project_zero_spacing_one_low_cycle(dut):
     dut._log.info("Start")
 
@@ -421,7 +337,7 @@ async def test_project_zero_spacing_one_low_cycle(dut):
 
     dut._log.info("Test zero spacing yields single low cycle")
 
-    uart_source = UartSource(dut.uart_rx, baud=115200, bits=8)
+    uart_source = config_source(dut, "user_project.glitch_ctrl.uart_hdlr.rxi")
 
     await uart_source.write(b'd\x00\x01') # Set delay = 1
     await uart_source.write(b'w\x01')     # Set width = 1
@@ -432,23 +348,18 @@ async def test_project_zero_spacing_one_low_cycle(dut):
     await RisingEdge(dut.pulse_en)
     await ClockCycles(dut.clk, 1)
 
-    await ClockCycles(dut.clk, 1)
-    assert dut.pulse_out.value == 0, "Expected pulse_out to be 0 during delay"
-
-    await ClockCycles(dut.clk, 1)
-    assert dut.pulse_out.value == 1, "Expected first pulse high"
-
-    await ClockCycles(dut.clk, 1)
-    assert dut.pulse_out.value == 0, "Expected single low cycle spacing"
-
-    await ClockCycles(dut.clk, 1)
-    assert dut.pulse_out.value == 1, "Expected second pulse high"
-
-    await ClockCycles(dut.clk, 1)
-    assert dut.pulse_out.value == 0, "Expected pulse_out to return low"
+    monitor = EdgeMonitor(dut, OUTPUTS).start()
+    await monitor.expect([
+        (1, outputs()),                # Delay
+        (1, outputs(pulse=1)),         # First pulse
+        (1, outputs()),                # Single low cycle spacing
+        (1, outputs(pulse=1)),         # Second pulse
+        (1, outputs(busy=0)),
+    ])
 
 
 @cocotb.test(timeout_time=10, timeout_unit="ms")
+@waves_on_failure
 async def test_project_trigger_ignored_when_not_armed(dut):
     dut._log.info("Start")
 
@@ -456,7 +367,7 @@ async def test_project_trigger_ignored_when_not_armed(dut):
 
     dut._log.info("Test trigger ignored when not armed")
 
-    uart_source = UartSource(dut.uart_rx, baud=115200, bits=8)
+    uart_source = config_source(dut, "user_project.glitch_ctrl.uart_hdlr.rxi")
 
     await uart_source.write(b'd\x00\x01') # Set delay = 1
     await uart_source.write(b'w\x01')     # Set width = 1
@@ -465,20 +376,19 @@ async def test_project_trigger_ignored_when_not_armed(dut):
     await ClockCycles(dut.clk, 1)
     assert dut.armed.value == 0, "Expected armed to be 0"
 
+    monitor = EdgeMonitor(dut, OUTPUTS).start()
+
     dut.trigger_in.value = 1
     await ClockCycles(dut.clk, 1)
     dut.trigger_in.value = 0
 
-    # The trigger is synchronized internally, so we need to wait two cycles before the delay starts
-    await ClockCycles(dut.clk, 2)
-
-    for _ in range(6):
-        await ClockCycles(dut.clk, 1)
-        assert dut.pulse_out.value == 0, "Expected pulse_out to stay low"
-        assert dut.busy.value == 0, "Expected busy to stay low"
+    await monitor.expect([
+        (9, outputs(busy=0)),          # Pulse output and busy stay low
+    ])
 
 
 @cocotb.test(timeout_time=10, timeout_unit="ms")
+@waves_on_failure
 async def test_project_arm_toggle_disarms(dut):
     dut._log.info("Start")
 
@@ -486,7 +396,7 @@ async def test_project_arm_toggle_disarms(dut):
 
     dut._log.info("Test arm toggle disarms")
 
-    uart_source = UartSource(dut.uart_rx, baud=115200, bits=8)
+    uart_source = config_source(dut, "user_project.glitch_ctrl.uart_hdlr.rxi")
 
     await uart_source.write(b'd\x00\x01') # Set delay = 1
     await uart_source.write(b'w\x01')     # Set width = 1
@@ -503,17 +413,19 @@ async def test_project_arm_toggle_disarms(dut):
     await ClockCycles(dut.clk, 1)
     assert dut.armed.value == 0, "Expected armed to be 0"
 
+    monitor = EdgeMonitor(dut, OUTPUTS).start()
+
     dut.trigger_in.value = 1
     await ClockCycles(dut.clk, 1)
     dut.trigger_in.value = 0
 
-    for _ in range(6):
-        await ClockCycles(dut.clk, 1)
-        assert dut.pulse_out.value == 0, "Expected pulse_out to stay low"
-        assert dut.busy.value == 0, "Expected busy to stay low"
+    await monitor.expect([
+        (7, outputs(busy=0)),          # Pulse output and busy stay low
+    ])
 
 
 @cocotb.test(timeout_time=10, timeout_unit="ms")
+@waves_on_failure
 async def test_project_armed_clears_on_trigger(dut):
     dut._log.info("Start")
 
@@ -521,7 +433,7 @@ async def test_project_armed_clears_on_trigger(dut):
 
     dut._log.info("Test armed clears when trigger fires")
 
-    uart_source = UartSource(dut.uart_rx, baud=115200, bits=8)
+    uart_source = config_source(dut, "user_project.glitch_ctrl.uart_hdlr.rxi")
 
     await uart_source.write(b'd\x00\x02') # Set delay = 2
     await uart_source.write(b'w\x01')     # Set width = 1
@@ -532,27 +444,24 @@ async def test_project_armed_clears_on_trigger(dut):
     await ClockCycles(dut.clk, 1)
     assert dut.armed.value == 1, "Expected armed to be 1"
 
+    monitor = EdgeMonitor(dut, OUTPUTS).start()
+
     dut.trigger_in.value = 1
     await ClockCycles(dut.clk, 1)
     dut.trigger_in.value = 0
 
-    # The trigger is synchronized internally, so we need to wait two cycles before the delay starts
-    await ClockCycles(dut.clk, 2)
-
-    for _ in range(0x02):
-        await ClockCycles(dut.clk, 1)
-        assert dut.armed.value == 0, "Expected armed to be 0 after trigger"
-        assert dut.busy.value == 1, "Expected busy to be 1 during delay"
-
-    await ClockCycles(dut.clk, 1)
-    assert dut.pulse_out.value == 1, "Expected pulse_out to be 1"
-
-    await ClockCycles(dut.clk, 1)
-    assert dut.pulse_out.value == 0, "Expected pulse_out to be 0"
-    assert dut.busy.value == 0, "Expected busy to be 0 after pulse"
+    # The trigger is synchronized internally, so the delay starts three cycles after the trigger
+    await monitor.expect([
+        (0x02, outputs(busy=0, armed=1)),
+        (0x01, outputs(busy=0, armed=1, pulse_en=1)),
+        (0x02, outputs()),             # Delay, armed is cleared by the trigger
+        (0x01, outputs(pulse=1)),      # Width
+        (1, outputs(busy=0)),
+    ])
 
 
 @cocotb.test(timeout_time=10, timeout_unit="ms")
+@waves_on_failure
 async def test_project_busy_during_reset_and_pulse(dut):
     dut._log.info("Start")
 
@@ -560,7 +469,7 @@ async def test_project_busy_during_reset_and_pulse(dut):
 
     dut._log.info("Test busy high during reset and pulse sequence")
 
-    uart_source = UartSource(dut.uart_rx, baud=115200, bits=8)
+    uart_source = config_source(dut, "user_project.glitch_ctrl.uart_hdlr.rxi")
 
     await uart_source.write(b'd\x00\x02') # Set delay = 2
     await uart_source.write(b'w\x01')     # Set width = 1
@@ -569,30 +478,19 @@ async def test_project_busy_during_reset_and_pulse(dut):
     await uart_source.write(b'p')         # Reset and then pulse
 
     await RisingEdge(dut.target_reset)
-    await FallingEdge(dut.clk) # Settle
-
-    assert dut.busy.value == 1, "Expected busy to be 1 during reset"
 
-    for _ in range(0x03):
-        await ClockCycles(dut.clk, 1)
-        assert dut.busy.value == 1, "Expected busy to stay 1 during reset"
-
-    await ClockCycles(dut.clk, 1)
-    assert dut.busy.value == 1, "Expected busy to stay 1 during delay"
-
-    await ClockCycles(dut.clk, 1)
-    assert dut.pulse_out.value == 0, "Expected pulse_out low during delay"
-
-    await ClockCycles(dut.clk, 1)
-    assert dut.pulse_out.value == 1, "Expected pulse_out high during pulse"
-    assert dut.busy.value == 1, "Expected busy high during pulse"
-
-    await ClockCycles(dut.clk, 1)
-    assert dut.pulse_out.value == 0, "Expected pulse_out low after pulse"
-    assert dut.busy.value == 0, "Expected busy low after sequence"
+    monitor = EdgeMonitor(dut, OUTPUTS).start()
+    await monitor.expect([
+        (0x03, outputs(reset=1)),      # Reset
+        (0x01, outputs(pulse_en=1)),   # Delay
+        (0x01, outputs()),             # Delay
+        (0x01, outputs(pulse=1)),      # Width
+        (1, outputs(busy=0)),
+    ])
 
 
 @cocotb.test(timeout_time=10, timeout_unit="ms")
+@waves_on_failure
 async def test_project_ignore_trigger_while_busy(dut):
     dut._log.info("Start")
 
@@ -600,9 +498,10 @@ async def test_project_ignore_trigger_while_busy(dut):
 
     dut._log.info("Test trigger ignored while busy")
 
-    uart_source = UartSource(dut.uart_rx, baud=115200, bits=8)
+    uart_source = config_source(dut, "user_project.glitch_ctrl.uart_hdlr.rxi")
 
-    await uart_source.write(b'd\x00\x10') # Set delay
+    # The delay outlasts a byte on the serial line, so the second 't' arrives while busy
+    await uart_source.write(b'd\x20\x00') # Set delay
     await uart_source.write(b'w\x01')     # Set width
     await uart_source.write(b'n\x01')     # Set num pulses = 1
     await uart_source.write(b't')         # Trigger pulse
@@ -610,29 +509,25 @@ async def test_project_ignore_trigger_while_busy(dut):
     await RisingEdge(dut.pulse_en)
     await ClockCycles(dut.clk, 1) # Settle
 
-    await ClockCycles(dut.clk, 1)
-    assert dut.busy.value == 1, "Expected busy to be 1 during delay"
-    assert dut.pulse_out.value == 0, "Expected pulse_out to be 0 during delay"
-
-    await uart_source.write(b't') # Trigger again while busy
-
-    for _ in range(0x10 - 1): # Remaining delay cycles
-        await ClockCycles(dut.clk, 1)
-        assert dut.pulse_out.value == 0, "Expected pulse_out to be 0 during delay"
+    monitor = EdgeMonitor(dut, OUTPUTS).start()
 
     await ClockCycles(dut.clk, 1)
-    assert dut.pulse_out.value == 1, "Expected single pulse"
+    await uart_source.write(b't') # Trigger again while busy
 
-    await ClockCycles(dut.clk, 1)
-    assert dut.pulse_out.value == 0, "Expected pulse_out to return low"
-    assert dut.busy.value == 0, "Expected busy to return low"
+    await RisingEdge(dut.pulse_en)
+    strobe = monitor.cycle
 
-    for _ in range(4):
-        await ClockCycles(dut.clk, 1)
-        assert dut.pulse_out.value == 0, "Expected no extra pulses"
+    await monitor.expect([
+        (strobe, outputs()),                  # Delay
+        (1, outputs(pulse_en=1)),             # Second trigger, ignored
+        (0x2000 - strobe - 1, outputs()),     # Delay
+        (0x01, outputs(pulse=1)),             # Single pulse
+        (5, outputs(busy=0)),                 # No extra pulses
+    ])
 
 
 @cocotb.test(timeout_time=10, timeout_unit="ms")
+@waves_on_failure
 async def test_project_ignore_external_trigger_while_busy(dut):
     dut._log.info("Start")
 
@@ -640,7 +535,7 @@ async def test_project_ignore_external_trigger_while_busy(dut):
 
     dut._log.info("Test external trigger ignored while busy")
 
-    uart_source = UartSource(dut.uart_rx, baud=115200, bits=8)
+    uart_source = config_source(dut, "user_project.glitch_ctrl.uart_hdlr.rxi")
 
     await uart_source.write(b'd\x00\x10') # Set delay
     await uart_source.write(b'w\x01')     # Set width
@@ -651,37 +546,30 @@ async def test_project_ignore_external_trigger_while_busy(dut):
     await ClockCycles(dut.clk, 1)
     assert dut.armed.value == 1, "Expected armed to be 1"
 
+    monitor = EdgeMonitor(dut, OUTPUTS).start()
+
     dut.trigger_in.value = 1
     await ClockCycles(dut.clk, 1)
     dut.trigger_in.value = 0
 
-    # The trigger is synchronized internally, so we need to wait two cycles before the delay starts
-    await ClockCycles(dut.clk, 2)
-
-    await ClockCycles(dut.clk, 1)
-    assert dut.busy.value == 1, "Expected busy to be 1 during delay"
+    # The trigger is synchronized internally, so the delay starts three cycles after the trigger
+    await ClockCycles(dut.clk, 3)
 
     dut.trigger_in.value = 1
     await ClockCycles(dut.clk, 1)
     dut.trigger_in.value = 0
 
-    for _ in range(0x10 - 2): # Remaining delay cycles
-        await ClockCycles(dut.clk, 1)
-        assert dut.pulse_out.value == 0, "Expected pulse_out to be 0 during delay"
-
-    await ClockCycles(dut.clk, 1)
-    assert dut.pulse_out.value == 1, "Expected single pulse"
-
-    await ClockCycles(dut.clk, 1)
-    assert dut.pulse_out.value == 0, "Expected pulse_out to return low"
-    assert dut.busy.value == 0, "Expected busy to return low"
-
-    for _ in range(4):
-        await ClockCycles(dut.clk, 1)
-        assert dut.pulse_out.value == 0, "Expected no extra pulses"
+    await monitor.expect([
+        (0x02, outputs(busy=0, armed=1)),
+        (0x01, outputs(busy=0, armed=1, pulse_en=1)),
+        (0x10, outputs()),             # Delay
+        (0x01, outputs(pulse=1)),      # Single pulse
+        (5, outputs(busy=0)),          # No extra pulses
+    ])
 
 
 @cocotb.test(timeout_time=10, timeout_unit="ms")
+@waves_on_failure
 async def test_project_no_pulse_en_on_reset_only(dut):
     dut._log.info("Start")
 
@@ -689,18 +577,25 @@ async def test_project_no_pulse_en_on_reset_only(dut):
 
     dut._log.info("Test pulse_en stays low for reset-only")
 
-    uart_source = UartSource(dut.uart_rx, baud=115200, bits=8)
+    uart_source = config_source(dut, "user_project.glitch_ctrl.uart_hdlr.rxi")
 
     await uart_source.write(b'y')         # Reset mode 'none'
     await uart_source.write(b'r\x00\x03') # Set reset length = 3
     await uart_source.write(b'p')         # Reset target only
 
-    for _ in range(6):
-        await ClockCycles(dut.clk, 1)
-        assert dut.pulse_en.value == 0, "Expected pulse_en to stay low"
+    monitor = EdgeMonitor(dut, ["pulse_en"]).start()
+
+    await RisingEdge(dut.target_reset)
+    await FallingEdge(dut.target_reset)
+    await ClockCycles(dut.clk, 6)
+
+    monitor.check([
+        (None, {"pulse_en": 0}),
+    ])
 
 
 @cocotb.test(timeout_time=10, timeout_unit="ms")
+@waves_on_failure
 async def test_project_armed_clears_on_uart_trigger(dut):
     dut._log.info("Start")
 
@@ -708,7 +603,7 @@ async def test_project_armed_clears_on_uart_trigger(dut):
 
     dut._log.info("Test armed clears on UART trigger")
 
-    uart_source = UartSource(dut.uart_rx, baud=115200, bits=8)
+    uart_source = config_source(dut, "user_project.glitch_ctrl.uart_hdlr.rxi")
 
     await uart_source.write(b'd\x00\x01') # Set delay
     await uart_source.write(b'w\x01')     # Set width
@@ -729,6 +624,7 @@ async def test_project_armed_clears_on_uart_trigger(dut):
 
 
 @cocotb.test(timeout_time=10, timeout_unit="ms")
+@waves_on_failure
 async def test_project_defaults_uart_trigger(dut):
     dut._log.info("Start")
 
@@ -736,23 +632,23 @@ async def test_project_defaults_uart_trigger(dut):
 
     dut._log.info("Test defaults: UART trigger without configuration")
 
-    uart_source = UartSource(dut.uart_rx, baud=115200, bits=8)
+    uart_source = config_source(dut, "user_project.glitch_ctrl.uart_hdlr.rxi")
 
     await uart_source.write(b't')  # Trigger pulse with defaults
 
     await RisingEdge(dut.pulse_en)
     await ClockCycles(dut.clk, 1) # Settle after pulse_en goes high
 
-    highs = 0
-    for _ in range(6):
-        await ClockCycles(dut.clk, 1)
-        if dut.pulse_out.value == 1:
-            highs += 1
-
-    assert highs == 1, f"Expected one pulse with defaults, got {highs}"
+    monitor = EdgeMonitor(dut, OUTPUTS).start()
+    await monitor.expect([
+        (1, outputs()),                # Delay
+        (1, outputs(pulse=1)),         # One pulse with defaults
+        (4, outputs(busy=0)),
+    ])
 
 
 @cocotb.test(timeout_time=10, timeout_unit="ms")
+@waves_on_failure
 async def test_project_defaults_reset_then_pulse(dut):
     dut._log.info("Start")
 
@@ -760,23 +656,224 @@ async def test_project_defaults_reset_then_pulse(dut):
 
     dut._log.info("Test defaults: reset then pulse")
 
-    uart_source = UartSource(dut.uart_rx, baud=115200, bits=8)
+    uart_source = config_source(dut, "user_project.glitch_ctrl.uart_hdlr.rxi")
 
     await uart_source.write(b'p') # Reset target, then pulse (default)
 
     await RisingEdge(dut.target_reset)
 
+    monitor = EdgeMonitor(dut, OUTPUTS).start()
+    await monitor.expect([
+        (1, outputs(reset=1)),         # Reset
+        (1, outputs(pulse_en=1)),      # Delay
+        (1, outputs(pulse=1)),         # One pulse after reset
+        (4, outputs(busy=0)),
+    ])
+
+
+@cocotb.test(timeout_time=10, timeout_unit="ms")
+@waves_on_failure
+async def test_project_host_client(dut):
+    dut._log.info("Start")
+
+    await start_clock_and_reset(dut)
+
+    dut._log.info("Test the host client library")
+
+    uart_source = config_source(dut, "user_project.glitch_ctrl.uart_hdlr.rxi")
+    transport = InProcessTransport()
+    glitcher = Glitcher(transport)
+
+    # A full configuration and the reset goes out in one write
+    glitcher.attempt(
+        "reset_target", delay=0x12, width=1, num_pulses=2, spacing=3, reset_length=0x50, reset_behavior=RESET_PULSE
+    )
+    assert transport.writes == 1, f"Expected a single write, got {transport.writes}"
+    await uart_source.write(transport.take())
+
+    await RisingEdge(dut.target_reset)
+
+    monitor = EdgeMonitor(dut, OUTPUTS).start()
+    await monitor.expect([
+        (0x50, outputs(reset=1)),      # Reset
+        (0x01, outputs(pulse_en=1)),   # Delay, the pulse sequence starts when the reset is done
+        (0x11, outputs()),             # Delay
+        (0x01, outputs(pulse=1)),      # Width
+        (0x03, outputs()),             # Spacing
+        (0x01, outputs(pulse=1)),      # Width
+        (1, outputs(busy=0)),
+    ])
+
+    # Out of range values are refused before anything is queued
+    try:
+        glitcher.configure(delay=0x34, width=0x100)
+    except ValueError:
+        pass
+    else:
+        assert False, "Expected a width of 0x100 to be refused"
+    assert glitcher.pending == b"", f"Expected nothing queued, got {glitcher.pending}"
+
+
+@cocotb.test(timeout_time=10, timeout_unit="ms")
+@waves_on_failure
+async def test_project_host_client_shadow_registers(dut):
+    dut._log.info("Start")
+
+    await start_clock_and_reset(dut)
+
+    dut._log.info("Test the host client only sends changed registers")
+
+    uart_source = config_source(dut, "user_project.glitch_ctrl.uart_hdlr.rxi")
+    uart_monitor = UartMonitor(dut.uart_tx, clks_per_bit(dut))
+    transport = InProcessTransport()
+    glitcher = Glitcher(transport)
+    glitcher.device_reset()
+
+    # Width and number of pulses are at their defaults already
+    glitcher.attempt("trigger", delay=0x10, width=1, num_pulses=1, spacing=3)
+    assert transport.written == b'd\x00\x10s\x00\x03t', f"Unexpected bytes {bytes(transport.written)}"
+    await uart_source.write(transport.take())
+    await RisingEdge(dut.pulse_en)
+    await FallingEdge(dut.busy)
+
+    # A step of a delay sweep only sends the delay
+    glitcher.attempt("trigger", delay=0x12, width=1, num_pulses=1, spacing=3)
+    assert transport.written == b'd\x00\x12t', f"Unexpected bytes {bytes(transport.written)}"
+    await uart_source.write(transport.take())
+
+    await RisingEdge(dut.pulse_en)
     await ClockCycles(dut.clk, 1)
-    assert dut.target_reset.value == 1, "Expected reset asserted"
-    assert dut.pulse_out.value == 0, "Expected pulse_out low during reset"
-    assert dut.pulse_out_n.value == 1, "Expected pulse_out_n to be 1"
-    assert dut.target_reset_n.value == 0, "Expected target_reset_n to be 0"
-    assert dut.pulse_or_reset.value == 1, "Expected pulse_or_reset to be 1 during reset"
-
-    highs = 0
-    for _ in range(6):
-        await ClockCycles(dut.clk, 1)
-        if dut.pulse_out.value == 1 and dut.target_reset.value == 0:
-            highs += 1
-
-    assert highs == 1, f"Expected one pulse after reset, got {highs}"
+
+    monitor = EdgeMonitor(dut, OUTPUTS).start()
+    await monitor.expect([
+        (0x12, outputs()),             # Delay
+        (0x01, outputs(pulse=1)),      # Width
+        (1, outputs(busy=0)),
+    ])
+
+    # A host that died halfway through a delay command: the handler waits for one
+    # more value byte. The resync bytes finish it and get an answer to the hello.
+    # Only a frame cut short needs the device timeout to pass first, which would be
+    # waited for in simulated time, so the client does not wait.
+    await uart_source.write(b'd\x01')
+    # The in-process transport cannot wait for the answer, read it from the monitor instead
+    assert not glitcher.resync(timeout=0, settle=False)
+    assert transport.written == protocol.RESYNC_FILLER + protocol.HELLO, f"Unexpected bytes {bytes(transport.written)}"
+    await uart_source.write(transport.take())
+    received = await uart_monitor.read_until(protocol.HELLO_RESPONSE, timeout=2, timeout_unit="ms")
+    assert received == protocol.RESYNC_FILLER[1:] + protocol.HELLO_RESPONSE, f"Expected the second filler echoed and a hello, got {received}"
+    assert glitcher.registers == {}, f"Expected the shadow registers to be forgotten, got {glitcher.registers}"
+
+
+# Outputs of the design and the emulator signal they correspond to
+EMULATED = {"pulse_out": "pulse", "target_reset": "target_reset", "pulse_en": "pulse_en", "busy": "busy", "armed": "armed"}
+
+
+def frame_starts(edges, clks_per_bit):
+    """Cycles the start bits begin in, from the (cycle, value) edges of an idle-high serial line."""
+    starts = []
+    for cycle, value in edges:
+        if value == 0 and (not starts or cycle >= starts[-1] + 9 * clks_per_bit + clks_per_bit // 2):
+            starts.append(cycle)
+    return starts
+
+
+@cocotb.test(timeout_time=20, timeout_unit="ms")
+@waves_on_failure
+async def test_project_matches_emulator(dut):
+    dut._log.info("Start")
+
+    await start_clock_and_reset(dut)
+    # Let the reset synchronizer release the design, so it starts from its reset state like the emulator
+    await ClockCycles(dut.clk, 2)
+
+    dut._log.info("Test the emulator against the design, cycle for cycle")
+
+    bit = clks_per_bit(dut)
+    uart_source = UartSource(dut.uart_rx, baud=uart_baud(dut), bits=8)
+    uart_monitor = UartMonitor(dut.uart_tx, bit)
+    monitor = EdgeMonitor(dut, ["uart_rx", "uart_tx", "trigger_in"] + list(EMULATED)).start()
+    sent = bytearray()
+
+    async def send(data):
+        sent.extend(data)
+        # Bit times are whole cycles, so every change of the line lands between two rising edges
+        await FallingEdge(dut.clk)
+        await uart_source.write(data)
+        await uart_source.wait()
+
+    async def trigger(cycles):
+        dut.trigger_in.value = 1
+        await ClockCycles(dut.clk, cycles)
+        dut.trigger_in.value = 0
+
+    # A hello with a byte right behind it, dropped while the hello is sent, then an echo
+    await send(b'hQ')
+    await ClockCycles(dut.clk, 60 * bit)
+    await send(b'R')
+
+    # A delay written halfway through a sequence waits for the sequence to end
+    await send(b'd\x80\x00w\x03n\x02s\x00\x05t')
+    await send(b'd\x00\x10')
+    await FallingEdge(dut.busy)
+
+    # Armed and triggered, and triggered again while busy
+    await send(b'a')
+    await trigger(1)
+    await ClockCycles(dut.clk, 0x10)
+    await trigger(3)
+    await FallingEdge(dut.busy)
+
+    # The three reset behaviors
+    await send(b'r\x00\x20ip')
+    await ClockCycles(dut.clk, 0x40)
+    await trigger(2)
+    await ClockCycles(dut.clk, 0x60)
+    await send(b'up')
+    await ClockCycles(dut.clk, 0x100)
+    await send(b'yp')
+    await ClockCycles(dut.clk, 0x100)
+
+    # A configuration frame resetting the target then pulsing, and a damaged one
+    frame = protocol.config_frame(delay=0x20, width=2, num_pulses=3, spacing=4, reset_length=0x10,
+                                  reset_behavior=protocol.RESET_PULSE, action="reset_target")
+    await send(frame)
+    await ClockCycles(dut.clk, 0x100)
+    await send(frame[:-1] + b'\x00')
+    await ClockCycles(dut.clk, 12 * bit)
+
+    # Two sequences of a lockstep sweep, then the sweep status
+    await send(protocol.sweep_settings(delay=(2, 0x28), width=(1, 4), spacing=(3, 0x10), num_pulses=(1, 3), order="lockstep") + protocol.sweep("start") + b'tt')
+    await ClockCycles(dut.clk, 0x100)
+    await send(protocol.SWEEP_QUERY)
+    await ClockCycles(dut.clk, 40 * bit)
+
+    # A sequence from the waveform table, then the table read back
+    await send(protocol.waveform([(3, 2), (1, 4)]) + b't')
+    await ClockCycles(dut.clk, 0x100)
+    await send(protocol.WAVE_READ)
+    await ClockCycles(dut.clk, (2 + 2 * protocol.WAVE_ENTRIES) * 12 * bit)
+
+    end = monitor.cycle
+    monitor.stop()
+    uart_monitor.stop()
+
+    emulator = Emulator(clk_freq=int(dut.CLK_FREQ.value), baud_rate=uart_baud(dut))
+    starts = frame_starts(monitor.observed("uart_rx", end), bit)
+    assert len(starts) == len(sent), f"Expected {len(sent)} frames on uart_rx, found {len(starts)}"
+    for start, byte in zip(starts, sent):
+        emulator.receive(bytes([byte]), at=start)
+    for cycle, value in monitor.observed("trigger_in", end)[1:]:
+        emulator.set_trigger(value, at=cycle)
+    emulator.run(end)
+
+    for name, signal in EMULATED.items():
+        emulated = [(0, 0)] + [(event.cycle, event.value) for event in emulator.events if event.signal == signal and 0 < event.cycle < end]
+        observed = monitor.observed(name, end)
+        assert emulated == observed, f"{name}: the design has edges {observed}, the emulator {emulated}"
+
+    observed = list(zip(frame_starts(monitor.observed("uart_tx", end), bit), (frame.value for frame in uart_monitor.frames)))
+    emulated = [(event.cycle, event.value) for event in emulator.events if event.signal == "uart_tx"]
+    assert observed == emulated, f"uart_tx: the design sent {observed}, the emulator {emulated}"
+    table = bytes([2, protocol.WAVE_ENTRIES, 3, 2, 1, 4]) + bytes([1, 0]) * (protocol.WAVE_ENTRIES - 2)
+    assert bytes(value for _, value in observed) == b'ErikaR' + protocol.CONFIG_ERROR + bytes([0, 2, protocol.SWEEP_RUNNING]) + table, f"Unexpected bytes {bytes(value for _, value in observed)}"
@@ -1,9 +1,10 @@
 import cocotb
+from cocotb.simtime import convert, get_sim_time
 from cocotb.triggers import ClockCycles, FallingEdge, RisingEdge
 
-from cocotbext.uart import UartSink, UartSource
+from cocotbext.uart import UartSource
 
-from .common import start_clock_and_reset
+from .common import UartMonitor, clks_per_bit, start_clock_and_reset, uart_baud, waves_on_failure
 
 async def send_uart_tx_byte(dut, value):
     while dut.uart_tx_busy.value:
@@ -14,6 +15,7 @@ async def send_uart_tx_byte(dut, value):
     dut.uart_tx_en.value = 0
 
 @cocotb.test(timeout_time=10, timeout_unit="ms")
+@waves_on_failure
 async def test_uart_tx_a(dut):
     dut._log.info("Start")
 
@@ -21,11 +23,11 @@ async def test_uart_tx_a(dut):
 
     dut._log.info("Test UART TX A")
 
-    uart_sink = UartSink(dut.uart_tx, baud=115200, bits=8)
+    uart_monitor = UartMonitor(dut.uart_tx, clks_per_bit(dut))
 
     await send_uart_tx_byte(dut, ord('A'))
 
-    data = await uart_sink.read()
+    data = await uart_monitor.read(1)
     assert data == b'A', f"Expected 'A', got {data}"
 
     await FallingEdge(dut.uart_tx_busy)
@@ -33,6 +35,7 @@ async def test_uart_tx_a(dut):
     assert dut.uart_tx_busy.value == 0, "Expected uart_tx_busy to be 0"
 
 @cocotb.test(timeout_time=10, timeout_unit="ms")
+@waves_on_failure
 async def test_uart_tx_more(dut):
     dut._log.info("Start")
 
@@ -40,12 +43,12 @@ async def test_uart_tx_more(dut):
 
     dut._log.info("Test UART TX, bytes 0x00 to 0x0f")
 
-    uart_sink = UartSink(dut.uart_tx, baud=115200, bits=8)
+    uart_monitor = UartMonitor(dut.uart_tx, clks_per_bit(dut))
 
     for x in range(0x0, 0x10):
         await send_uart_tx_byte(dut, x)
 
-        data = await uart_sink.read()
+        data = await uart_monitor.read(1)
         assert data == bytes([x]), f"Expected {x:02x}, got {data.hex()}"
 
         await FallingEdge(dut.uart_tx_busy)
@@ -53,6 +56,7 @@ async def test_uart_tx_more(dut):
         assert dut.uart_tx_busy.value == 0, "Expected uart_tx_busy to be 0"
 
 @cocotb.test(timeout_time=10, timeout_unit="ms")
+@waves_on_failure
 async def test_uart_rx_a(dut):
     dut._log.info("Start")
 
@@ -60,7 +64,7 @@ async def test_uart_rx_a(dut):
 
     dut._log.info("Test UART RX A")
 
-    uart_source = UartSource(dut.uart_rx, baud=115200, bits=8)
+    uart_source = UartSource(dut.uart_rx, baud=uart_baud(dut), bits=8)
 
     await uart_source.write(b'A')
 
@@ -69,6 +73,7 @@ async def test_uart_rx_a(dut):
     assert dut.uart_rx_data.value == ord('A'), f"Expected uart_rx_data to be 'A' (0x41), got {dut.uart_rx_data.value:02x}"
 
 @cocotb.test(timeout_time=10, timeout_unit="ms")
+@waves_on_failure
 async def test_uart_tx_ignores_enable_while_busy(dut):
     dut._log.info("Start")
 
@@ -76,7 +81,7 @@ async def test_uart_tx_ignores_enable_while_busy(dut):
 
     dut._log.info("Test UART TX ignores uart_tx_en while busy")
 
-    uart_sink = UartSink(dut.uart_tx, baud=115200, bits=8)
+    uart_monitor = UartMonitor(dut.uart_tx, clks_per_bit(dut))
 
     dut.uart_tx_data.value = 0x12
     dut.uart_tx_en.value = 1
@@ -92,7 +97,7 @@ async def test_uart_tx_ignores_enable_while_busy(dut):
     await ClockCycles(dut.clk, 1)
     dut.uart_tx_en.value = 0
 
-    first = await uart_sink.read()
+    first = await uart_monitor.read(1)
     assert first == b'\x12', f"Expected first byte 0x12, got {first.hex()}"
 
     await FallingEdge(dut.uart_tx_busy)
@@ -100,5 +105,48 @@ async def test_uart_tx_ignores_enable_while_busy(dut):
     assert dut.uart_tx_busy.value == 0, "Expected uart_tx_busy to be 0 after first frame"
 
     await send_uart_tx_byte(dut, 0xA5)
-    second = await uart_sink.read()
+    second = await uart_monitor.read(1)
     assert second == b'\xA5', f"Expected second byte 0xA5, got {second.hex()}"
+
+@cocotb.test(timeout_time=10, timeout_unit="ms")
+@waves_on_failure
+async def test_uart_tx_latency_and_throughput(dut):
+    dut._log.info("Start")
+
+    await start_clock_and_reset(dut)
+
+    dut._log.info("Test UART TX start bit latency and back-to-back throughput")
+
+    uart_monitor = UartMonitor(dut.uart_tx, clks_per_bit(dut))
+
+    # The start bit begins on the clock edge that samples uart_tx_en
+    dut.uart_tx_data.value = 0x55
+    dut.uart_tx_en.value = 1
+    await RisingEdge(dut.clk)
+    sampled = get_sim_time()
+    dut.uart_tx_en.value = 0
+
+    (frame,) = await uart_monitor.read_frames(1)
+    assert frame.value == 0x55, f"Expected 0x55, got {frame.value:#04x}"
+    latency = convert(frame.start - sampled, "step", to="ns")
+    assert latency == 0, f"Expected the start bit on the sampling clock edge, got it {latency} ns later"
+
+    # With uart_tx_en held high a new frame starts after ten bits, plus the one
+    # idle cycle in which uart_tx_en is sampled
+    data = bytes(range(0xA0, 0xA8))
+    dut.uart_tx_data.value = data[0]
+    dut.uart_tx_en.value = 1
+    for x in data[1:]:
+        # The previous byte was taken
+        await RisingEdge(dut.uart_tx_busy)
+        dut.uart_tx_data.value = x
+    await RisingEdge(dut.uart_tx_busy)
+    dut.uart_tx_en.value = 0
+
+    received = await uart_monitor.read(len(data))
+    assert received == data, f"Expected {data.hex()}, got {received.hex()}"
+
+    expected_gap = (10 * clks_per_bit(dut) + 1) * 20
+    gaps = uart_monitor.gaps()[-(len(data) - 1):]
+    assert gaps == [expected_gap] * (len(data) - 1), f"Expected {expected_gap} ns between start bits, got {gaps}"
+    assert uart_monitor.framing_errors == 0, f"Got {uart_monitor.framing_errors} framing errors"
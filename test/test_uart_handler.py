@@ -1,11 +1,14 @@
 import cocotb
-from cocotb.triggers import ClockCycles, RisingEdge
+from cocotb.triggers import ClockCycles, FallingEdge, RisingEdge
 
-from cocotbext.uart import UartSink, UartSource
+from cocotbext.uart import UartSource
 
-from .common import read_exact, start_clock_and_reset
+from tt_glitcher import protocol
+
+from .common import EdgeMonitor, UartMonitor, baud_rates, bit_clks, clks_per_bit, reset, start_clock_and_reset, uart_baud, waves_on_failure
 
 @cocotb.test(timeout_time=10, timeout_unit="ms")
+@waves_on_failure
 async def test_uart_handler_echo(dut):
     dut._log.info("Start")
 
@@ -13,18 +16,19 @@ async def test_uart_handler_echo(dut):
 
     dut._log.info("Test UART handler echo")
 
-    uart_source = UartSource(dut.uart_rx, baud=115200, bits=8)
-    uart_sink = UartSink(dut.uart_tx, baud=115200, bits=8)
+    uart_source = UartSource(dut.uart_rx, baud=uart_baud(dut), bits=8)
+    uart_monitor = UartMonitor(dut.uart_tx, clks_per_bit(dut))
 
     # Unrecognized command bytes will be echoed back
     for x in range(0x10, 0x20):
         await uart_source.write(bytes([x]))
         await uart_source.wait()
 
-        data = await uart_sink.read()
+        data = await uart_monitor.read(1)
         assert data == bytes([x]), f"Expected {x:#02x}, got {data[0]:#02x}"
 
 @cocotb.test(timeout_time=10, timeout_unit="ms")
+@waves_on_failure
 async def test_uart_handler_hello(dut):
     dut._log.info("Start")
 
@@ -32,16 +36,17 @@ async def test_uart_handler_hello(dut):
 
     dut._log.info("Test UART handler hello")
 
-    uart_source = UartSource(dut.uart_rx, baud=115200, bits=8)
-    uart_sink = UartSink(dut.uart_tx, baud=115200, bits=8)
+    uart_source = UartSource(dut.uart_rx, baud=uart_baud(dut), bits=8)
+    uart_monitor = UartMonitor(dut.uart_tx, clks_per_bit(dut))
 
     await uart_source.write(b'h')
     await uart_source.wait()
 
-    data = await read_exact(uart_sink, 5)
+    data = await uart_monitor.read(5)
     assert data == b"Erika", f"Expected 'Erika', got {data}"
 
 @cocotb.test(timeout_time=10, timeout_unit="ms")
+@waves_on_failure
 async def test_uart_handler_set_delay(dut):
     dut._log.info("Start")
 
@@ -49,7 +54,7 @@ async def test_uart_handler_set_delay(dut):
 
     dut._log.info("Test UART handler set delay")
 
-    uart_source = UartSource(dut.uart_rx, baud=115200, bits=8)
+    uart_source = UartSource(dut.uart_rx, baud=uart_baud(dut), bits=8)
 
     await uart_source.write(b'd\x12\x34') # Set delay command (d, 0x64), high byte of delay (0x12), low byte of delay (0x34)
     await uart_source.wait()
@@ -64,6 +69,7 @@ async def test_uart_handler_set_delay(dut):
     assert dut.pulse_delay.value == 0xffff, f"Expected pulse_delay to be 0xffff, got {dut.pulse_delay.value}"
 
 @cocotb.test(timeout_time=10, timeout_unit="ms")
+@waves_on_failure
 async def test_uart_handler_set_width(dut):
     dut._log.info("Start")
 
@@ -71,7 +77,7 @@ async def test_uart_handler_set_width(dut):
 
     dut._log.info("Test UART handler set width")
 
-    uart_source = UartSource(dut.uart_rx, baud=115200, bits=8)
+    uart_source = UartSource(dut.uart_rx, baud=uart_baud(dut), bits=8)
 
     await uart_source.write(b'w\x12') # Set width command (w, 0x77), width (0x12)
     await uart_source.wait()
@@ -86,6 +92,7 @@ async def test_uart_handler_set_width(dut):
     assert dut.pulse_width.value == 0xff, f"Expected pulse_width to be 0xff, got {dut.pulse_width.value}"
 
 @cocotb.test(timeout_time=10, timeout_unit="ms")
+@waves_on_failure
 async def test_uart_handler_set_num_pulses(dut):
     dut._log.info("Start")
 
@@ -93,7 +100,7 @@ async def test_uart_handler_set_num_pulses(dut):
 
     dut._log.info("Test UART handler set num pulses")
 
-    uart_source = UartSource(dut.uart_rx, baud=115200, bits=8)
+    uart_source = UartSource(dut.uart_rx, baud=uart_baud(dut), bits=8)
 
     await uart_source.write(b'n\x12') # Set num pulses command (n, 0x6e), num pulses (0x12)
     await uart_source.wait()
@@ -108,6 +115,7 @@ async def test_uart_handler_set_num_pulses(dut):
     assert dut.num_pulses.value == 0xff, f"Expected num_pulses to be 0xff, got {dut.num_pulses.value}"
 
 @cocotb.test(timeout_time=10, timeout_unit="ms")
+@waves_on_failure
 async def test_uart_handler_set_pulse_spacing(dut):
     dut._log.info("Start")
 
@@ -115,7 +123,7 @@ async def test_uart_handler_set_pulse_spacing(dut):
 
     dut._log.info("Test UART handler set pulse spacing")
 
-    uart_source = UartSource(dut.uart_rx, baud=115200, bits=8)
+    uart_source = UartSource(dut.uart_rx, baud=uart_baud(dut), bits=8)
 
     await uart_source.write(b's\x12\x34') # Set pulse spacing command (s, 0x73), pulse spacing (0x1234)
     await uart_source.wait()
@@ -130,6 +138,7 @@ async def test_uart_handler_set_pulse_spacing(dut):
     assert dut.pulse_spacing.value == 0xffff, f"Expected pulse spacing to be 0xffff, got {dut.pulse_spacing.value}"
 
 @cocotb.test(timeout_time=10, timeout_unit="ms")
+@waves_on_failure
 async def test_uart_handler_trigger_pulse(dut):
     dut._log.info("Start")
 
@@ -137,7 +146,7 @@ async def test_uart_handler_trigger_pulse(dut):
 
     dut._log.info("Test UART handler trigger pulse")
 
-    uart_source = UartSource(dut.uart_rx, baud=115200, bits=8)
+    uart_source = UartSource(dut.uart_rx, baud=uart_baud(dut), bits=8)
 
     assert dut.pulse_en.value == 0, "Expected pulse_en to be 0"
 
@@ -148,3 +157,481 @@ async def test_uart_handler_trigger_pulse(dut):
     assert dut.pulse_en.value == 1, "Expected pulse_en to be 1"
     await ClockCycles(dut.clk, 1)
     assert dut.pulse_en.value == 0, "Expected pulse_en to be 0"
+
+class BaudLink:
+    """A UART source and monitor on the handler at one baud rate."""
+
+    def __init__(self, dut, rate):
+        self.source = UartSource(dut.uart_rx, baud=rate, bits=8)
+        self.monitor = UartMonitor(dut.uart_tx, bit_clks(dut, rate))
+
+    async def write(self, data):
+        await self.source.write(data)
+        await self.source.wait()
+
+    async def read(self, count):
+        return await self.monitor.read(count, timeout=1, timeout_unit="ms")
+
+
+async def request_baud_rate(dut, base, index):
+    """Send the 'b' command at the rate after reset and wait for its acknowledgement."""
+    await base.write(protocol.SET_BAUD_RATE + bytes([index]))
+    data = await base.read(1)
+    assert data == protocol.BAUD_ACK, f"Expected the acknowledgement {protocol.BAUD_ACK}, got {data}"
+    # Let monitors at other rates finish decoding the acknowledgement as noise
+    await ClockCycles(dut.clk, 12 * max(int(bit_clks(dut, rate)) for rate in baud_rates(dut)))
+
+@cocotb.test(timeout_time=20, timeout_unit="ms")
+@waves_on_failure
+async def test_uart_handler_baud_rates(dut):
+    dut._log.info("Start")
+
+    await start_clock_and_reset(dut)
+
+    dut._log.info("Test UART handler switching to every baud rate")
+
+    for index, rate in enumerate(baud_rates(dut)):
+        await reset(dut)
+        base = BaudLink(dut, uart_baud(dut))
+        link = BaudLink(dut, rate)
+
+        await request_baud_rate(dut, base, index)
+        link.monitor.clear()
+
+        # The host confirms at the new rate, and the handler answers at it
+        await link.write(protocol.BAUD_ACK)
+        data = await link.read(1)
+        assert data == protocol.BAUD_ACK, f"{rate} baud: expected the confirmation answered, got {data}"
+        assert dut.uart_hdlr.baud_rate.value == index, f"{rate} baud: expected rate {index}, got {dut.uart_hdlr.baud_rate.value}"
+
+        await link.write(b'h')
+        data = await link.read(5)
+        assert data == protocol.HELLO_RESPONSE, f"{rate} baud: expected {protocol.HELLO_RESPONSE}, got {data}"
+
+        await link.write(b'd\x12\x34')
+        assert dut.pulse_delay.value == 0x1234, f"{rate} baud: expected pulse_delay to be 0x1234, got {dut.pulse_delay.value}"
+
+        for monitor in (base.monitor, link.monitor):
+            monitor.stop()
+
+@cocotb.test(timeout_time=10, timeout_unit="ms")
+@waves_on_failure
+async def test_uart_handler_baud_rate_timeout(dut):
+    dut._log.info("Start")
+
+    await start_clock_and_reset(dut)
+
+    dut._log.info("Test UART handler falling back when a new baud rate is not confirmed")
+
+    base = BaudLink(dut, uart_baud(dut))
+    timeout = int(dut.uart_hdlr.TIMEOUT.value)
+
+    await base.source.write(protocol.SET_BAUD_RATE + b'\x04')
+    await dut.uart_hdlr.baud_rate.value_change
+    assert dut.uart_hdlr.baud_rate.value == 4, f"Expected rate 4, got {dut.uart_hdlr.baud_rate.value}"
+    data = await base.read(1)
+    assert data == protocol.BAUD_ACK, f"Expected the acknowledgement {protocol.BAUD_ACK}, got {data}"
+
+    # No confirmation: back at the rate after reset once the timeout, counted from the switch, is over
+    await ClockCycles(dut.clk, timeout - 2)
+    assert dut.uart_hdlr.baud_rate.value == 4, "Expected the new rate to hold until the timeout"
+    await ClockCycles(dut.clk, 4)
+    assert dut.uart_hdlr.baud_rate.value == 0, f"Expected rate 0 after the timeout, got {dut.uart_hdlr.baud_rate.value}"
+
+    await base.write(b'h')
+    data = await base.read(5)
+    assert data == protocol.HELLO_RESPONSE, f"Expected {protocol.HELLO_RESPONSE}, got {data}"
+
+@cocotb.test(timeout_time=10, timeout_unit="ms")
+@waves_on_failure
+async def test_uart_handler_baud_rate_wrong_confirmation(dut):
+    dut._log.info("Start")
+
+    await start_clock_and_reset(dut)
+
+    dut._log.info("Test UART handler falling back on a wrong confirmation")
+
+    base = BaudLink(dut, uart_baud(dut))
+    link = BaudLink(dut, protocol.BAUD_RATES[3])
+
+    await request_baud_rate(dut, base, 3)
+    link.monitor.clear()
+    await link.write(b'x')
+    await ClockCycles(dut.clk, 2)
+    assert dut.uart_hdlr.baud_rate.value == 0, f"Expected rate 0 after a wrong confirmation, got {dut.uart_hdlr.baud_rate.value}"
+    assert link.monitor.count() == 0, "Expected no answer to a wrong confirmation"
+
+    base.monitor.clear()
+    await base.write(b'h')
+    data = await base.read(5)
+    assert data == protocol.HELLO_RESPONSE, f"Expected {protocol.HELLO_RESPONSE}, got {data}"
+
+@cocotb.test(timeout_time=10, timeout_unit="ms")
+@waves_on_failure
+async def test_uart_handler_baud_rate_unknown(dut):
+    dut._log.info("Start")
+
+    await start_clock_and_reset(dut)
+
+    dut._log.info("Test UART handler echoing an unknown baud rate")
+
+    base = BaudLink(dut, uart_baud(dut))
+
+    await base.write(protocol.SET_BAUD_RATE + b'\x07')
+    data = await base.read(1)
+    assert data == b'\x07', f"Expected the unknown rate echoed, got {data}"
+    assert dut.uart_hdlr.baud_rate.value == 0, f"Expected rate 0, got {dut.uart_hdlr.baud_rate.value}"
+
+    await base.write(b'h')
+    data = await base.read(5)
+    assert data == protocol.HELLO_RESPONSE, f"Expected {protocol.HELLO_RESPONSE}, got {data}"
+
+# Registers of the handler and the values of a configuration frame for them
+CONFIG_REGISTERS = {
+    "pulse_delay": "delay",
+    "pulse_width": "width",
+    "num_pulses": "num_pulses",
+    "pulse_spacing": "spacing",
+    "reset_length": "reset_length",
+    "reset_behavior": "reset_behavior",
+}
+
+def registers(dut):
+    return {name: int(getattr(dut, signal).value) for signal, name in CONFIG_REGISTERS.items()}
+
+# The same in the staging bank of the handler
+STAGING_REGISTERS = {
+    "delay": "delay",
+    "width": "width",
+    "num_pulses": "num_pulses",
+    "pulse_spacing": "spacing",
+    "reset_length": "reset_length",
+    "reset_behavior": "reset_behavior",
+}
+
+def staged(dut):
+    return {name: int(getattr(dut.uart_hdlr, signal).value) for signal, name in STAGING_REGISTERS.items()}
+
+@cocotb.test(timeout_time=10, timeout_unit="ms")
+@waves_on_failure
+async def test_uart_handler_config_frame(dut):
+    dut._log.info("Start")
+
+    await start_clock_and_reset(dut)
+
+    dut._log.info("Test UART handler loading every register from one frame")
+
+    uart_source = UartSource(dut.uart_rx, baud=uart_baud(dut), bits=8)
+    uart_monitor = UartMonitor(dut.uart_tx, clks_per_bit(dut))
+
+    configs = [
+        (dict(delay=0x1234, width=0x56, num_pulses=0x07, spacing=0x89AB, reset_length=0xCDEF, reset_behavior=protocol.RESET_ARM), None, None),
+        (dict(delay=0x0010, width=0x02, num_pulses=0x03, spacing=0x0004, reset_length=0x0005, reset_behavior=protocol.RESET_NONE), "trigger", "pulse_en"),
+        (dict(delay=0xFFFF, width=0xFF, num_pulses=0xFF, spacing=0xFFFF, reset_length=0xFFFF, reset_behavior=protocol.RESET_PULSE), "reset_target", "reset_en"),
+    ]
+    for config, action, strobe in configs:
+        monitor = EdgeMonitor(dut, list(CONFIG_REGISTERS) + ["pulse_en", "reset_en"]).start()
+        await uart_source.write(protocol.config_frame(action=action, **config))
+        await uart_source.wait()
+        await ClockCycles(dut.clk, 2)
+        end = monitor.cycle
+        monitor.stop()
+
+        assert registers(dut) == config, f"Expected the registers {config}, got {registers(dut)}"
+
+        # Every register that changed did so in the same cycle. The action goes out the cycle
+        # before, so an idle glitch_control starts it on the edge the registers take the frame.
+        cycles = {cycle for name in CONFIG_REGISTERS for cycle, _ in monitor.observed(name, end)[1:]}
+        assert len(cycles) == 1, f"Expected the registers to change in one cycle, they changed in {sorted(cycles)}"
+        (cycle,) = cycles
+        for name in ("pulse_en", "reset_en"):
+            expected = [(0, 0), (cycle - 1, 1), (cycle, 0)] if name == strobe else [(0, 0)]
+            assert monitor.observed(name, end) == expected, f"{action}: expected {name} edges {expected}, got {monitor.observed(name, end)}"
+
+    assert uart_monitor.count() == 0, "Expected no answer to good frames"
+
+@cocotb.test(timeout_time=20, timeout_unit="ms")
+@waves_on_failure
+async def test_uart_handler_config_frame_rejected(dut):
+    dut._log.info("Start")
+
+    await start_clock_and_reset(dut)
+
+    dut._log.info("Test UART handler putting the registers back for bad or incomplete frames")
+
+    uart_source = UartSource(dut.uart_rx, baud=uart_baud(dut), bits=8)
+    uart_monitor = UartMonitor(dut.uart_tx, clks_per_bit(dut))
+    timeout = int(dut.uart_hdlr.TIMEOUT.value)
+    before = registers(dut)
+
+    frame = protocol.config_frame(delay=0x1234, width=0x56, num_pulses=0x07, spacing=0x89AB, reset_length=0xCDEF,
+                                  reset_behavior=protocol.RESET_ARM, action="trigger")
+    bad_checksum = frame[:-1] + bytes([frame[-1] ^ 0x01])
+    # Trigger and reset target at once, with a checksum that matches
+    both_actions = frame[:9] + bytes([frame[9] | 0x08, (frame[10] - 0x08) & 0xFF])
+    bad_behavior = frame[:9] + bytes([frame[9] | 0x03, (frame[10] - 0x01) & 0xFF])
+
+    for name, data in [("bad checksum", bad_checksum), ("both actions", both_actions), ("bad reset behavior", bad_behavior)]:
+        await uart_source.write(data)
+        data = await uart_monitor.read(1, timeout=3, timeout_unit="ms")
+        assert data == protocol.CONFIG_ERROR, f"{name}: expected {protocol.CONFIG_ERROR}, got {data}"
+        assert registers(dut) == before, f"{name}: expected the registers unchanged, got {registers(dut)}"
+        assert staged(dut) == before, f"{name}: expected the staging registers put back, got {staged(dut)}"
+        assert dut.pulse_en.value == 0, f"{name}: expected no trigger"
+
+    # A frame cut short is dropped after the timeout. Its bytes went into the staging
+    # registers, but no sequence takes them over, and they are put back.
+    await uart_source.write(frame[:6])
+    await uart_source.wait()
+    await ClockCycles(dut.clk, 2)
+    assert staged(dut)["delay"] == 0x1234, f"Expected the delay staged, got {staged(dut)}"
+    assert registers(dut) == before, f"Expected the registers unchanged, got {registers(dut)}"
+    await ClockCycles(dut.clk, timeout)
+    assert registers(dut) == before, f"Expected the registers unchanged, got {registers(dut)}"
+    assert staged(dut) == before, f"Expected the staging registers put back, got {staged(dut)}"
+
+    await uart_source.write(b'h')
+    data = await uart_monitor.read(5, timeout=3, timeout_unit="ms")
+    assert data == protocol.HELLO_RESPONSE, f"Expected {protocol.HELLO_RESPONSE}, got {data}"
+
+    # A good frame is still applied afterwards
+    await uart_source.write(frame)
+    await RisingEdge(dut.pulse_en)
+    await ClockCycles(dut.clk, 2)
+    assert registers(dut)["delay"] == 0x1234, f"Expected the frame applied, got {registers(dut)}"
+
+@cocotb.test(timeout_time=10, timeout_unit="ms")
+@waves_on_failure
+async def test_uart_handler_config_frame_rejected_keeps_writes(dut):
+    dut._log.info("Start")
+
+    await start_clock_and_reset(dut)
+
+    dut._log.info("Test UART handler keeping the writes staged before a bad or incomplete frame")
+
+    uart_source = UartSource(dut.uart_rx, baud=uart_baud(dut), bits=8)
+    uart_monitor = UartMonitor(dut.uart_tx, clks_per_bit(dut))
+    timeout = int(dut.uart_hdlr.TIMEOUT.value)
+    before = registers(dut)
+
+    # No sequence starts, so the single writes stay in the staging bank
+    await FallingEdge(dut.clk)
+    dut.commit.value = 0
+    await uart_source.write(b'w\x09d\x01\x02')
+    await uart_source.wait()
+    await ClockCycles(dut.clk, 2)
+    expected = {**before, "width": 0x09, "delay": 0x0102}
+    assert staged(dut) == expected, f"Expected the writes staged, got {staged(dut)}"
+
+    frame = protocol.config_frame(delay=0x1234, width=0x56, num_pulses=0x07, spacing=0x89AB, reset_length=0xCDEF,
+                                  reset_behavior=protocol.RESET_ARM)
+    await uart_source.write(frame[:-1] + bytes([frame[-1] ^ 0x01]))
+    data = await uart_monitor.read(1, timeout=3, timeout_unit="ms")
+    assert data == protocol.CONFIG_ERROR, f"Expected {protocol.CONFIG_ERROR}, got {data}"
+    assert staged(dut) == expected, f"Bad frame: expected the writes before it staged, got {staged(dut)}"
+
+    await uart_source.write(frame[:6])
+    await uart_source.wait()
+    await ClockCycles(dut.clk, timeout + 2)
+    assert staged(dut) == expected, f"Frame cut short: expected the writes before it staged, got {staged(dut)}"
+
+    # The next sequence takes them over
+    assert registers(dut) == before, f"Expected the registers unchanged, got {registers(dut)}"
+    await FallingEdge(dut.clk)
+    dut.commit.value = 1
+    await ClockCycles(dut.clk, 2)
+    assert registers(dut) == expected, f"Expected the staged writes committed, got {registers(dut)}"
+
+SWEEP_SETTINGS = {
+    "sweep_delay_step": 0x12,
+    "sweep_delay_limit": 0xF0E0,
+    "sweep_width_step": 0x03,
+    "sweep_width_limit": 0x40,
+    "sweep_spacing_step": 0x05,
+    "sweep_spacing_limit": 0x1234,
+    "sweep_num_pulses_step": 0x02,
+    "sweep_num_pulses_limit": 0x09,
+    "sweep_lockstep": 1,
+}
+
+def sweep_settings(dut):
+    return {name: int(getattr(dut.uart_hdlr, name).value) for name in SWEEP_SETTINGS}
+
+@cocotb.test(timeout_time=20, timeout_unit="ms")
+@waves_on_failure
+async def test_uart_handler_sweep(dut):
+    dut._log.info("Start")
+
+    await start_clock_and_reset(dut)
+
+    dut._log.info("Test UART handler sweep settings, operations and query")
+
+    uart_source = UartSource(dut.uart_rx, baud=uart_baud(dut), bits=8)
+    uart_monitor = UartMonitor(dut.uart_tx, clks_per_bit(dut))
+    s = SWEEP_SETTINGS
+    sweeps = {name: (s[f"sweep_{name}_step"], s[f"sweep_{name}_limit"]) for name in protocol.SWEEP_REGISTERS}
+    sweeps["order"] = "lockstep"
+    frame = protocol.sweep_settings(**sweeps)
+
+    # The settings frame stops the sweep, then the operations are strobed as they come
+    monitor = EdgeMonitor(dut, ["uart_hdlr.sweep_op", "uart_hdlr.sweep_op_en"]).start()
+    await uart_source.write(frame + protocol.sweep("start") + protocol.sweep("pause") + protocol.sweep("resume"))
+    await uart_source.wait()
+    await ClockCycles(dut.clk, 2)
+    end = monitor.cycle
+    monitor.stop()
+
+    assert sweep_settings(dut) == SWEEP_SETTINGS, f"Expected the settings {SWEEP_SETTINGS}, got {sweep_settings(dut)}"
+    strobes = monitor.observed("uart_hdlr.sweep_op_en", end)[1:]
+    assert all(value == (i % 2 == 0) for i, (_, value) in enumerate(strobes)), f"Expected single cycle strobes, got {strobes}"
+    assert all(strobes[i + 1][0] == strobes[i][0] + 1 for i in range(0, len(strobes), 2)), f"Expected single cycle strobes, got {strobes}"
+    # The operation that goes with each strobe, the last change of sweep_op up to it
+    ops = [[value for cycle, value in monitor.observed("uart_hdlr.sweep_op", end) if cycle <= strobe][-1] for strobe, _ in strobes[::2]]
+    expected = [protocol.SWEEP_OPERATIONS[name] for name in ("stop", "start", "pause", "resume")]
+    assert ops == expected, f"Expected the operations {expected}, got {ops}"
+    assert uart_monitor.count() == 0, "Expected no answer to a good frame and operations"
+
+    # Every sequence glitch_control completes moves the swept registers of the active bank
+    points = protocol.sweep_points({name: registers(dut)[name] for name in protocol.SWEEP_REGISTERS}, **sweeps)
+    await FallingEdge(dut.clk)
+    dut.commit.value = 0
+    for index, point in zip(range(4), points):
+        observed = {name: registers(dut)[name] for name in protocol.SWEEP_REGISTERS}
+        assert observed == point, f"Point {index}: expected {point}, got {observed}"
+        dut.sequence_done.value = 1
+        await FallingEdge(dut.clk)
+        dut.sequence_done.value = 0
+        await FallingEdge(dut.clk)
+    dut.commit.value = 1
+
+    # The query answers the index and state
+    await uart_source.write(protocol.SWEEP_QUERY)
+    data = await uart_monitor.read(protocol.SWEEP_STATUS_LENGTH, timeout=3, timeout_unit="ms")
+    assert protocol.parse_sweep_status(data) == (4, protocol.SWEEP_RUNNING), f"Expected index 4 and running, got {data}"
+
+    # Unknown operations are echoed
+    await uart_source.write(protocol.SWEEP + b'\x05')
+    data = await uart_monitor.read(1, timeout=3, timeout_unit="ms")
+    assert data == b'\x05', f"Expected the unknown operation echoed, got {data}"
+
+    # A damaged frame is answered with an error, and the sweep cannot start until a good one came
+    bad = frame[:-1] + bytes([frame[-1] ^ 0x01])
+    await uart_source.write(bad)
+    data = await uart_monitor.read(1, timeout=3, timeout_unit="ms")
+    assert data == protocol.CONFIG_ERROR, f"Expected {protocol.CONFIG_ERROR}, got {data}"
+    await uart_source.write(protocol.sweep("start"))
+    data = await uart_monitor.read(1, timeout=3, timeout_unit="ms")
+    assert data == protocol.CONFIG_ERROR, f"Expected the start refused with {protocol.CONFIG_ERROR}, got {data}"
+
+    # So is an unknown order, even with the right checksum
+    payload = frame[1:-2] + b'\x02'
+    await uart_source.write(protocol.SWEEP_SETTINGS + payload + bytes([-sum(payload) & 0xFF]))
+    data = await uart_monitor.read(1, timeout=3, timeout_unit="ms")
+    assert data == protocol.CONFIG_ERROR, f"Expected {protocol.CONFIG_ERROR}, got {data}"
+
+    await uart_source.write(frame + protocol.sweep("start"))
+    await RisingEdge(dut.uart_hdlr.sweep_op_en)
+    await RisingEdge(dut.uart_hdlr.sweep_op_en)
+    await ClockCycles(dut.clk, 1)
+    assert int(dut.uart_hdlr.sweep_op.value) == protocol.SWEEP_OPERATIONS["start"], f"Expected a start, got {dut.uart_hdlr.sweep_op.value}"
+    assert uart_monitor.count() == 0, "Expected the start accepted"
+
+def wave_table(dut):
+    value = int(dut.wave_table.value)
+    return [(value >> (16 * i + 8) & 0xFF, value >> (16 * i) & 0xFF) for i in range(int(dut.uart_hdlr.WAVE_ENTRIES.value))]
+
+@cocotb.test(timeout_time=20, timeout_unit="ms")
+@waves_on_failure
+async def test_uart_handler_waveform_table(dut):
+    dut._log.info("Start")
+
+    await start_clock_and_reset(dut)
+
+    dut._log.info("Test UART handler waveform table writes, length and readback")
+
+    uart_source = UartSource(dut.uart_rx, baud=uart_baud(dut), bits=8)
+    uart_monitor = UartMonitor(dut.uart_tx, clks_per_bit(dut))
+    entries = int(dut.uart_hdlr.WAVE_ENTRIES.value)
+    default = [(1, 0)] * entries
+    assert wave_table(dut) == default, f"Expected the table at its defaults, got {wave_table(dut)}"
+
+    pulses = [(0x12, 0x34), (0x78, 0x9A), (0xFF, 0xFF)]
+    await uart_source.write(protocol.waveform(pulses))
+    await uart_source.wait()
+    await ClockCycles(dut.clk, 2)
+    expected = pulses + default[len(pulses):]
+    assert wave_table(dut) == expected, f"Expected the table {expected}, got {wave_table(dut)}"
+    assert dut.wave_length.value == len(pulses), f"Expected length {len(pulses)}, got {dut.wave_length.value}"
+    assert uart_monitor.count() == 0, "Expected no answer to good writes"
+
+    # An entry past the end of the table is refused, a length longer than the table is echoed
+    await uart_source.write(protocol.wave_entry(entries, 0x01, 0x02))
+    data = await uart_monitor.read(1, timeout=3, timeout_unit="ms")
+    assert data == protocol.CONFIG_ERROR, f"Expected {protocol.CONFIG_ERROR}, got {data}"
+    await uart_source.write(protocol.set_wave_length(entries + 1))
+    data = await uart_monitor.read(1, timeout=3, timeout_unit="ms")
+    assert data == bytes([entries + 1]), f"Expected the length echoed, got {data}"
+    assert wave_table(dut) == expected, f"Expected the table unchanged, got {wave_table(dut)}"
+    assert dut.wave_length.value == len(pulses), f"Expected the length unchanged, got {dut.wave_length.value}"
+
+    # The readback has the length, the size of the table and every entry
+    await uart_source.write(protocol.WAVE_READ)
+    data = await uart_monitor.read(2 + 2 * entries, timeout=10, timeout_unit="ms")
+    assert data[:2] == bytes([len(pulses), entries]), f"Expected length {len(pulses)} and {entries} entries, got {data[:2]}"
+    assert protocol.parse_wave_entries(data[2:]) == expected, f"Expected the entries {expected}, got {data[2:]}"
+
+@cocotb.test(timeout_time=20, timeout_unit="ms")
+@waves_on_failure
+async def test_uart_handler_staged_registers(dut):
+    dut._log.info("Start")
+
+    await start_clock_and_reset(dut)
+
+    dut._log.info("Test UART handler holding register writes back until a sequence starts")
+
+    uart_source = UartSource(dut.uart_rx, baud=uart_baud(dut), bits=8)
+    before = registers(dut)
+    config = dict(delay=0x1234, width=0x56, num_pulses=0x07, spacing=0x89AB, reset_length=0xCDEF, reset_behavior=protocol.RESET_ARM)
+
+    # No sequence starts: single register writes, a frame and the waveform table are staged,
+    # the outputs keep their values
+    table = wave_table(dut)
+    pulses = [(0x05, 0x06), (0x07, 0x08)]
+    dut.commit.value = 0
+    await uart_source.write(b'd\x00\x10w\x02y')
+    await uart_source.write(protocol.config_frame(**config))
+    await uart_source.write(protocol.waveform(pulses))
+    await uart_source.wait()
+    await ClockCycles(dut.clk, 2)
+    assert registers(dut) == before, f"Expected the registers held back, got {registers(dut)}"
+    assert wave_table(dut) == table and dut.wave_length.value == 0, f"Expected the table held back, got {wave_table(dut)}"
+
+    # A sequence starts: everything goes over on the same edge
+    monitor = EdgeMonitor(dut, list(CONFIG_REGISTERS) + ["wave_table", "wave_length"]).start()
+    await FallingEdge(dut.clk)
+    dut.commit.value = 1
+    await ClockCycles(dut.clk, 2)
+    end = monitor.cycle
+    monitor.stop()
+    assert registers(dut) == config, f"Expected the registers {config}, got {registers(dut)}"
+    expected = pulses + table[len(pulses):]
+    assert wave_table(dut) == expected, f"Expected the table {expected}, got {wave_table(dut)}"
+    assert dut.wave_length.value == len(pulses), f"Expected length {len(pulses)}, got {dut.wave_length.value}"
+    cycles = {cycle for name in monitor.edges for cycle, _ in monitor.observed(name, end)[1:]}
+    assert len(cycles) == 1, f"Expected the registers to change in one cycle, they changed in {sorted(cycles)}"
+
+    # With a start on every edge, writes go straight through (one cycle later)
+    await uart_source.write(b'w\x09')
+    await uart_source.wait()
+    await ClockCycles(dut.clk, 2)
+    assert registers(dut)["width"] == 0x09, f"Expected the width written, got {registers(dut)}"
+
+    # ...but never half of a two byte register
+    await uart_source.write(b'd\x56')
+    await uart_source.wait()
+    await ClockCycles(dut.clk, 2)
+    assert registers(dut)["delay"] == config["delay"], f"Expected the delay held back, got {registers(dut)}"
+    await uart_source.write(b'\x78')
+    await uart_source.wait()
+    await ClockCycles(dut.clk, 2)
+    assert registers(dut)["delay"] == 0x5678, f"Expected the delay 0x5678, got {registers(dut)}"
@@ -1,35 +1,45 @@
 import cocotb
-from cocotb.triggers import ClockCycles, FallingEdge, RisingEdge, with_timeout
+from cocotb.simtime import get_sim_time
+from cocotb.triggers import ClockCycles, FallingEdge, RisingEdge, Timer, with_timeout
 
-from .common import start_clock_and_reset
+from .common import baud_rates, bit_clks, clks_per_bit, start_clock_and_reset, waves_on_failure
 
-CLK_FREQ = 50_000_000
-BAUD_RATE = 115200
-CLKS_PER_BIT = CLK_FREQ // BAUD_RATE
-CLKS_PER_HALF_BIT = CLKS_PER_BIT // 2
 BAD_STOP_WAIT_BIT_PERIODS = 3
 
+CLK_PERIOD_PS = 20_000
+
+# A host clock this far off (as a fraction of the bit time) must still be received
+RX_CLOCK_TOLERANCE = 0.025
+# Largest distance of a transmitted bit edge from where an exact clock would put it, in clock cycles
+TX_EDGE_TOLERANCE = 1.25
+
 
 async def drive_uart_frame(dut, value, stop_bit=1):
     """Drive one UART frame on uart_rx (1 start bit, 8 LSB-first data bits, 1 stop bit)."""
+    bit_clks = clks_per_bit(dut)
+
     dut.uart_rx.value = 0
-    await ClockCycles(dut.clk, CLKS_PER_BIT)
+    await ClockCycles(dut.clk, bit_clks)
 
     for i in range(8):
         dut.uart_rx.value = (value >> i) & 1
-        await ClockCycles(dut.clk, CLKS_PER_BIT)
+        await ClockCycles(dut.clk, bit_clks)
 
     dut.uart_rx.value = stop_bit
-    await ClockCycles(dut.clk, CLKS_PER_BIT)
+    await ClockCycles(dut.clk, bit_clks)
 
     dut.uart_rx.value = 1
 
 
 @cocotb.test(timeout_time=20, timeout_unit="ms")
+@waves_on_failure
 async def test_uart_tx_raw_frame_bits(dut):
     dut._log.info("Start")
     await start_clock_and_reset(dut)
 
+    bit_clks = clks_per_bit(dut)
+    half_bit_clks = bit_clks // 2
+
     tx_byte = 0xA6
     expected_bits = [(tx_byte >> i) & 1 for i in range(8)]
 
@@ -43,12 +53,12 @@ async def test_uart_tx_raw_frame_bits(dut):
     assert dut.uart_tx_busy.value == 1, "Expected uart_tx_busy high during frame"
 
     # Mid start bit
-    await ClockCycles(dut.clk, CLKS_PER_HALF_BIT)
+    await ClockCycles(dut.clk, half_bit_clks)
     assert dut.uart_tx.value == 0, "Expected start bit low"
 
     # Mid each data bit
     for i, bit in enumerate(expected_bits):
-        await ClockCycles(dut.clk, CLKS_PER_BIT)
+        await ClockCycles(dut.clk, bit_clks)
         assert int(dut.uart_tx.value) == bit, f"Unexpected TX bit {i}"
 
     # Implementation detail (see uart_tx state machine around UART_DATA ->
@@ -56,7 +66,7 @@ async def test_uart_tx_raw_frame_bits(dut):
     # appears one full bit-time after the last sampled data bit. This is a
     # core-specific timing quirk (not a protocol requirement), so this raw test
     # samples two bit periods later to match this UART implementation.
-    await ClockCycles(dut.clk, 2 * CLKS_PER_BIT)
+    await ClockCycles(dut.clk, 2 * bit_clks)
     assert dut.uart_tx.value == 1, "Expected stop bit high"
 
     if dut.uart_tx_busy.value:
@@ -66,6 +76,7 @@ async def test_uart_tx_raw_frame_bits(dut):
 
 
 @cocotb.test(timeout_time=20, timeout_unit="ms")
+@waves_on_failure
 async def test_uart_rx_raw_frame_decode(dut):
     dut._log.info("Start")
     await start_clock_and_reset(dut)
@@ -85,21 +96,96 @@ async def test_uart_rx_raw_frame_decode(dut):
 
 
 @cocotb.test(timeout_time=20, timeout_unit="ms")
+@waves_on_failure
 async def test_uart_rx_raw_rejects_bad_stop_bit(dut):
     dut._log.info("Start")
     await start_clock_and_reset(dut)
 
+    bit_clks = clks_per_bit(dut)
+
     dut.uart_rx.value = 1
     await ClockCycles(dut.clk, 10)
 
     await drive_uart_frame(dut, 0xC1, stop_bit=0)
 
     # Hold low for one bit period to avoid accidentally creating a new frame right away.
-    await ClockCycles(dut.clk, CLKS_PER_BIT)
+    await ClockCycles(dut.clk, bit_clks)
     dut.uart_rx.value = 1
 
     # No valid pulse should occur for this malformed frame. A few bit-times are
     # enough to observe any delayed valid pulse from the completed frame decode.
-    for _ in range(CLKS_PER_BIT * BAD_STOP_WAIT_BIT_PERIODS):
+    for _ in range(bit_clks * BAD_STOP_WAIT_BIT_PERIODS):
         await ClockCycles(dut.clk, 1)
         assert dut.uart_rx_valid.value == 0, "Did not expect uart_rx_valid for bad stop bit"
+
+
+def set_bit_time(dut, rate):
+    """Run uart_rx and uart_tx at `rate`, with the bit time uart_handler gives them."""
+    clks = bit_clks(dut, rate)
+    dut.clks_per_bit.value = int(clks)
+    dut.clks_per_bit_frac.value = round((clks - int(clks)) * 16)
+
+
+async def drive_uart_frame_ps(dut, value, bit_ps):
+    """Drive one UART frame on uart_rx with a bit time of `bit_ps` picoseconds, not tied to the clock."""
+    start = get_sim_time("ps")
+    bits = [0] + [(value >> i) & 1 for i in range(8)] + [1]
+    for i, bit in enumerate(bits):
+        dut.uart_rx.value = bit
+        await Timer(start + round((i + 1) * bit_ps) - get_sim_time("ps"), "ps")
+
+
+@cocotb.test(timeout_time=20, timeout_unit="ms")
+@waves_on_failure
+async def test_uart_rx_clock_tolerance(dut):
+    dut._log.info("Start")
+    await start_clock_and_reset(dut)
+
+    for rate in baud_rates(dut):
+        set_bit_time(dut, rate)
+        dut.uart_rx.value = 1
+        await ClockCycles(dut.clk, 20)
+
+        # The host bit time off by the tolerance either way, starting anywhere within a clock cycle
+        ideal_ps = 1e12 / rate
+        for skew in (-RX_CLOCK_TOLERANCE, 0, RX_CLOCK_TOLERANCE):
+            for offset, value in enumerate([0x00, 0xFF, 0x55, 0xA6]):
+                await Timer(offset * CLK_PERIOD_PS // 4 + 1000, "ps")
+                wait_valid_task = cocotb.start_soon(with_timeout(RisingEdge(dut.uart_rx_valid), 1, "ms"))
+                await drive_uart_frame_ps(dut, value, ideal_ps * (1 + skew))
+                await wait_valid_task
+                received = int(dut.uart_rx_data.value)
+                assert received == value, f"{rate} baud, bit time {skew:+.1%}: expected 0x{value:02x}, got 0x{received:02x}"
+
+
+@cocotb.test(timeout_time=20, timeout_unit="ms")
+@waves_on_failure
+async def test_uart_tx_bit_timing(dut):
+    dut._log.info("Start")
+    await start_clock_and_reset(dut)
+
+    for rate in baud_rates(dut):
+        set_bit_time(dut, rate)
+        await ClockCycles(dut.clk, 1)
+
+        # Every bit of 0x55 differs from the one before it, so the line changes at every bit boundary
+        edges = []
+
+        async def record():
+            while True:
+                await dut.uart_tx.value_change
+                edges.append(get_sim_time("ps"))
+
+        recorder = cocotb.start_soon(record())
+        dut.uart_tx_data.value = 0x55
+        dut.uart_tx_en.value = 1
+        await ClockCycles(dut.clk, 1)
+        dut.uart_tx_en.value = 0
+        await with_timeout(FallingEdge(dut.uart_tx_busy), 1, "ms")
+        recorder.cancel()
+
+        assert len(edges) == 10, f"{rate} baud: expected 10 edges (start bit to stop bit), got {len(edges)}"
+        ideal_ps = 1e12 / rate
+        errors = [(edge - edges[0] - i * ideal_ps) / CLK_PERIOD_PS for i, edge in enumerate(edges)]
+        worst = max(errors, key=abs)
+        assert abs(worst) <= TX_EDGE_TOLERANCE, f"{rate} baud: a bit edge is {worst:+.2f} cycles off, errors {errors}"
@@ -1,131 +1,497 @@
+import fcntl
+import hashlib
+import json
 import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from functools import lru_cache
 from pathlib import Path
 
-from cocotb_tools.runner import get_runner
+import cocotb
+from cocotb_tools.runner import get_results, get_runner
 import pytest
 
 PDK_ROOT = Path(os.getenv("PDK_ROOT"))
 
 SIM = os.getenv("SIM", "icarus")
-WAVES = os.getenv("WAVES", 1)
+# Taken out of the environment, as the cocotb runner would otherwise add a full dump of its own
+WAVES = os.environ.pop("WAVES", 1)
 GL_TEST = os.getenv("GATES", False) in ["yes", "1", "true", True]
 
-def test_project_runner():
-    test_dir = Path(__file__).resolve().parent
-    src_dir = test_dir.parent / "src"
+# Testbench parameters. "fast" runs the UART at 16 clocks per bit instead of 434,
+# "production" matches the hardware and is what gate-level tests always use.
+CLK_FREQ = 50_000_000
+PROFILES = {
+    "production": {"CLK_FREQ": CLK_FREQ, "BAUD_RATE": 115200},
+    "fast": {"CLK_FREQ": CLK_FREQ, "BAUD_RATE": CLK_FREQ // 16},
+}
+PROFILE = "production" if GL_TEST else os.getenv("PROFILE", "production")
 
-    sources = []
-    if GL_TEST:
-        sources += [test_dir / "gate_level_netlist.v"]
-        sources += [PDK_ROOT / "ihp-sg13g2/libs.ref/sg13g2_io/verilog/sg13g2_io.v"]
-        sources += [PDK_ROOT / "ihp-sg13g2/libs.ref/sg13g2_stdcell/verilog/sg13g2_stdcell.v"]
+# Baud rate confirmation timeout of the uart_handler testbench, 1 ms instead of 50 ms
+# so the timeout test does not have to simulate 2.5 million cycles
+UART_HANDLER_TIMEOUT = CLK_FREQ // 1000
 
-    else:
-        sources += [
-            src_dir / "tt_um_pakesson_glitcher.v",
-            src_dir / "glitch_control.v",
-            src_dir / "uart_handler.v",
-            src_dir / "uart_rx.v",
-            src_dir / "uart_tx.v"
-        ]
+# Verilator only: number of simulation threads and waveform format ("fst" or "vcd")
+VERILATOR_THREADS = int(os.getenv("VERILATOR_THREADS", 1))
+VERILATOR_TRACE_FORMAT = os.getenv("VERILATOR_TRACE_FORMAT", "fst")
+
+# Waveform dump of the testbenches while the tests run (see tb_*.v): the signals below
+# WAVES_SCOPE, a dotted path below the testbench ("" for all of it), down to WAVES_DEPTH
+# levels like $dumpvars (0 for all). Verilator always dumps the whole testbench.
+WAVES_SCOPE = os.getenv("WAVES_SCOPE", "")
+WAVES_DEPTH = int(os.getenv("WAVES_DEPTH", 0))
+
+TEST_DIR = Path(__file__).resolve().parent
+SRC_DIR = TEST_DIR.parent / "src"
+BUILD_ROOT = TEST_DIR / "sim_build"
+
+PROJECT_SOURCES = [
+    SRC_DIR / "tt_um_pakesson_glitcher.v",
+    SRC_DIR / "glitch_control.v",
+    SRC_DIR / "uart_handler.v",
+    SRC_DIR / "uart_rx.v",
+    SRC_DIR / "uart_tx.v",
+    TEST_DIR / "tb_tt.v"
+]
+
+UART_HANDLER_SOURCES = [
+    SRC_DIR / "uart_handler.v",
+    SRC_DIR / "uart_rx.v",
+    SRC_DIR / "uart_tx.v",
+    TEST_DIR / "tb_uart_handler.v"
+]
+
+GLITCH_CONTROL_SOURCES = [
+    SRC_DIR / "glitch_control.v",
+    SRC_DIR / "uart_handler.v",
+    SRC_DIR / "uart_rx.v",
+    SRC_DIR / "uart_tx.v",
+    TEST_DIR / "tb_glitch_control.v"
+]
+
+SIM_VERSION_COMMANDS = {
+    "icarus": ["iverilog", "-V"],
+    "verilator": ["verilator", "--version"],
+}
+
+
+@lru_cache(maxsize=None)
+def simulator_version():
+    cmd = SIM_VERSION_COMMANDS.get(SIM)
+    if cmd is None:
+        return SIM
+    try:
+        # iverilog -V complains about missing sources, but still prints the version first
+        result = subprocess.run(cmd, capture_output=True, text=True)
+    except FileNotFoundError:
+        return SIM
+    lines = (result.stdout or result.stderr).splitlines()
+    return f"{SIM} {lines[0] if lines else ''}"
+
+
+def build_hash(sources, **build_kwargs):
+    """Hash everything that affects the build output of one toplevel."""
+    digest = hashlib.sha256()
+    digest.update(simulator_version().encode())
+    digest.update(cocotb.__version__.encode())
+    for source in sources:
+        digest.update(str(source).encode())
+        digest.update(Path(source).read_bytes())
+    digest.update(repr(sorted(build_kwargs.items())).encode())
+    return digest.hexdigest()
+
+
+def simulator_build_args(waves):
+    """Extra build arguments for the selected simulator."""
+    if SIM != "verilator":
+        return []
+
+    if VERILATOR_TRACE_FORMAT not in ["fst", "vcd"]:
+        raise ValueError(f"VERILATOR_TRACE_FORMAT must be 'fst' or 'vcd', not {VERILATOR_TRACE_FORMAT!r}")
+
+    # The model refuses to start with more threads than the process may use
+    threads = max(1, min(VERILATOR_THREADS, len(os.sched_getaffinity(0))))
+    args = ["--threads", str(threads)]
+    # The runner already adds --trace (VCD) when waves are enabled
+    if waves and VERILATOR_TRACE_FORMAT == "fst":
+        args += ["--trace-fst"]
+    return args
+
+
+def simulator_defines(hdl_toplevel, waves):
+    """Defines that set up the testbench dump of the selected simulator."""
+    if SIM == "verilator" or not waves:
+        return {}
+
+    scope = ".".join(filter(None, [hdl_toplevel, WAVES_SCOPE]))
+    return {"DUMP_SCOPE": scope, "DUMP_DEPTH": WAVES_DEPTH}
+
+
+def waves_file(hdl_toplevel):
+    """Name of the dump of `hdl_toplevel`, in its test directory."""
+    return f"{hdl_toplevel}.{VERILATOR_TRACE_FORMAT if SIM == 'verilator' else 'fst'}"
 
-    sources += [test_dir / "tb_tt.v"]
+
+def simulator_test_args(hdl_toplevel, waves):
+    """Extra arguments for the simulation executable of the selected simulator."""
+    if SIM != "verilator" or not waves:
+        return []
+
+    # Name the trace <toplevel>.<format> like the testbenches do on Icarus
+    return ["--trace-file", waves_file(hdl_toplevel)]
+
+
+def build(sources, hdl_toplevel, *, build_dir=None, waves=None, **build_kwargs):
+    """Build `hdl_toplevel` unless an identical build already exists, and return its build directory.
+
+    Every toplevel gets its own build directory (by default). Runners sharing a
+    toplevel serialize on a lock while (re)building. `waves` defaults to WAVES.
+    """
+    waves = bool(int(WAVES)) if waves is None else waves
+    build_dir = build_dir or BUILD_ROOT / SIM / PROFILE / hdl_toplevel
+    build_dir.mkdir(parents=True, exist_ok=True)
 
     runner = get_runner(SIM)
-    runner.build(
-        sources=sources,
-        hdl_toplevel="tb_tt",
-        always=True
+
+    build_kwargs.setdefault("build_args", simulator_build_args(waves))
+    build_kwargs.setdefault("timescale", ("1ns", "1ps"))
+    build_kwargs.setdefault("parameters", PROFILES[PROFILE])
+    build_kwargs["defines"] = {**build_kwargs.get("defines", {}), **simulator_defines(hdl_toplevel, waves)}
+    digest = build_hash(sources, waves=waves, **build_kwargs)
+    stamp = build_dir / "build.hash"
+
+    with open(build_dir / "build.lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        if not stamp.exists() or stamp.read_text() != digest:
+            stamp.unlink(missing_ok=True)
+            runner.build(
+                sources=sources,
+                hdl_toplevel=hdl_toplevel,
+                build_dir=build_dir,
+                always=True,
+                # Only Verilator, on Icarus the testbench dumps by itself
+                waves=waves and SIM == "verilator",
+                **build_kwargs
+            )
+            stamp.write_text(digest)
+        else:
+            runner.log.info("Build of %s is up to date, skipping compilation", hdl_toplevel)
+
+    return build_dir
+
+
+def build_and_test(sources, hdl_toplevel, test_module, **build_kwargs):
+    """Build `hdl_toplevel` if needed, then run `test_module` on it.
+
+    Every test module gets its own test directory inside the build directory,
+    so runners can run in parallel.
+    """
+    waves = bool(int(WAVES))
+    build_dir = build(sources, hdl_toplevel, **build_kwargs)
+
+    get_runner(SIM).test(
+        hdl_toplevel=hdl_toplevel,
+        hdl_toplevel_lang="verilog",
+        test_module=test_module,
+        build_dir=build_dir,
+        test_dir=build_dir / test_module.rsplit(".", 1)[-1],
+        test_args=simulator_test_args(hdl_toplevel, waves),
+        # Icarus writes FST with -fst, the testbench names the file
+        plusargs=["-fst"] if waves and SIM != "verilator" else [],
+        extra_env={"WAVES_FILE": waves_file(hdl_toplevel)} if waves else {},
+        waves=waves and SIM == "verilator"
     )
 
-    runner.test(hdl_toplevel="tb_tt", test_module="test.test_tt", waves=WAVES)
+def test_project_runner():
+    if GL_TEST:
+        sources = [
+            TEST_DIR / "gate_level_netlist.v",
+            PDK_ROOT / "ihp-sg13g2/libs.ref/sg13g2_io/verilog/sg13g2_io.v",
+            PDK_ROOT / "ihp-sg13g2/libs.ref/sg13g2_stdcell/verilog/sg13g2_stdcell.v",
+            TEST_DIR / "tb_tt.v"
+        ]
+        build_and_test(sources, "tb_tt", "test.test_tt", defines={"GL_TEST": 1, "FUNCTIONAL": 1, "SIM": 1})
+    else:
+        build_and_test(PROJECT_SOURCES, "tb_tt", "test.test_tt")
 
 @pytest.mark.skipif(GL_TEST, reason="Gate-level test not supported")
 def test_uart_runner():
-    test_dir = Path(__file__).resolve().parent
-    src_dir = test_dir.parent / "src"
-
     sources = [
-        src_dir / "uart_rx.v",
-        src_dir / "uart_tx.v",
-        test_dir / "tb_uart.v"
+        SRC_DIR / "uart_rx.v",
+        SRC_DIR / "uart_tx.v",
+        TEST_DIR / "tb_uart.v"
     ]
 
-    runner = get_runner(SIM)
-    runner.build(
-        sources=sources,
-        hdl_toplevel="tb_uart",
-        always=True
-    )
-
-    runner.test(hdl_toplevel="tb_uart", test_module="test.test_uart", waves=WAVES)
+    build_and_test(sources, "tb_uart", "test.test_uart")
 
 @pytest.mark.skipif(GL_TEST, reason="Gate-level test not supported")
 def test_uart_raw_runner():
-    test_dir = Path(__file__).resolve().parent
-    src_dir = test_dir.parent / "src"
-
     sources = [
-        src_dir / "uart_rx.v",
-        src_dir / "uart_tx.v",
-        test_dir / "tb_uart.v"
+        SRC_DIR / "uart_rx.v",
+        SRC_DIR / "uart_tx.v",
+        TEST_DIR / "tb_uart.v"
     ]
 
-    runner = get_runner(SIM)
-    runner.build(
-        sources=sources,
-        hdl_toplevel="tb_uart",
-        always=True
-    )
-
-    runner.test(hdl_toplevel="tb_uart", test_module="test.test_uart_raw", waves=WAVES)
+    build_and_test(sources, "tb_uart", "test.test_uart_raw")
 
 @pytest.mark.skipif(GL_TEST, reason="Gate-level test not supported")
 def test_uart_handler_runner():
-    test_dir = Path(__file__).resolve().parent
-    src_dir = test_dir.parent / "src"
+    build_and_test(UART_HANDLER_SOURCES, "tb_uart_handler", "test.test_uart_handler",
+                   parameters={**PROFILES[PROFILE], "TIMEOUT": UART_HANDLER_TIMEOUT})
 
-    sources = [
-        src_dir / "uart_handler.v",
-        src_dir / "uart_rx.v",
-        src_dir / "uart_tx.v",
-        test_dir / "tb_uart_handler.v"
-    ]
+@pytest.mark.skipif(GL_TEST, reason="Gate-level test not supported")
+def test_glitch_control_runner():
+    build_and_test(GLITCH_CONTROL_SOURCES, "tb_glitch_control", "test.test_glitch_control")
 
-    runner = get_runner(SIM)
-    runner.build(
-        sources=sources,
-        hdl_toplevel="tb_uart_handler",
-        always=True
-    )
+def all_runners():
+    runners = [test_project_runner]
+    if not GL_TEST:
+        runners += [
+            test_uart_runner,
+            test_uart_raw_runner,
+            test_uart_handler_runner,
+            test_glitch_control_runner
+        ]
+    return runners
 
-    runner.test(hdl_toplevel="tb_uart_handler", test_module="test.test_uart_handler", waves=WAVES)
+def run_all():
+    runners = all_runners()
+    started = time.time()
 
-@pytest.mark.skipif(GL_TEST, reason="Gate-level test not supported")
-def test_glitch_control_runner():
-    test_dir = Path(__file__).resolve().parent
-    src_dir = test_dir.parent / "src"
+    # Each runner drives its own simulator process, so run them side by side
+    with ProcessPoolExecutor(max_workers=min(len(runners), os.cpu_count() or 1)) as pool:
+        for future in [pool.submit(runner) for runner in runners]:
+            future.result()
 
-    sources = [
-        src_dir / "glitch_control.v",
-        src_dir / "uart_handler.v",
-        src_dir / "uart_rx.v",
-        src_dir / "uart_tx.v",
-        test_dir / "tb_glitch_control.v"
-    ]
+    failed = 0
+    for results_file in sorted((BUILD_ROOT / SIM / PROFILE).glob("*/*/results.xml")):
+        if results_file.stat().st_mtime < started:
+            continue
+        num_tests, num_failed = get_results(results_file)
+        print(f"{results_file.parent.name}: {num_tests - num_failed}/{num_tests} passed")
+        failed += num_failed
 
-    runner = get_runner(SIM)
-    runner.build(
-        sources=sources,
+    return failed
+
+def compare_simulators(simulators=("icarus", "verilator")):
+    """Run every runner on each simulator in turn and print the wall-clock times side by side.
+
+    Runners are run one at a time so they do not compete for cores. The time includes
+    compilation when the build cache is cold, so run twice to compare simulation alone.
+    """
+    times = {}
+    for runner in all_runners():
+        for simulator in simulators:
+            started = time.time()
+            result = subprocess.run(
+                [sys.executable, "-m", "pytest", "-q", __file__, "-k", runner.__name__],
+                cwd=TEST_DIR,
+                env={**os.environ, "SIM": simulator},
+                capture_output=True
+            )
+            elapsed = time.time() - started
+            times[runner.__name__, simulator] = elapsed if result.returncode == 0 else None
+
+    print(f"{'runner':<28}" + "".join(f"{simulator:>12}" for simulator in simulators))
+    for runner in all_runners():
+        row = [times[runner.__name__, simulator] for simulator in simulators]
+        print(f"{runner.__name__:<28}" + "".join(
+            f"{elapsed:>11.1f}s" if elapsed is not None else f"{'failed':>12}" for elapsed in row
+        ))
+
+    return sum(elapsed is None for elapsed in times.values())
+
+def fuzz_shard(build_dir, shard_dir, seed, scenarios):
+    """Run one shard of fuzz_glitch_control and return its report."""
+    report = shard_dir / "fuzz.json"
+    report.unlink(missing_ok=True)
+    get_runner(SIM).test(
         hdl_toplevel="tb_glitch_control",
-        always=True
+        hdl_toplevel_lang="verilog",
+        test_module="test.fuzz_glitch_control",
+        build_dir=build_dir,
+        test_dir=shard_dir,
+        # Names of their own, as the runner lets the environment win over extra_env, and
+        # the FUZZ_SEED of a replay would otherwise give every shard the same seeds
+        extra_env={
+            "FUZZ_SHARD_SEED": str(seed),
+            "FUZZ_SHARD_SCENARIOS": str(scenarios),
+            "FUZZ_SHARD_REPORT": str(report),
+        }
     )
+    return json.loads(report.read_text())
+
+
+def fuzz():
+    """Fuzz glitch_control against the reference model until the functional coverage saturates.
+
+    Every round runs FUZZ_SHARDS simulator processes side by side, each playing
+    FUZZ_SCENARIOS random scenarios from its own range of seeds. Fuzzing stops
+    when FUZZ_PATIENCE rounds in a row hit no new coverage bin, when all bins
+    are hit, after FUZZ_ROUNDS rounds, or on the first round with a mismatch.
+    """
+    shards = int(os.getenv("FUZZ_SHARDS", os.cpu_count() or 1))
+    scenarios = int(os.getenv("FUZZ_SCENARIOS", 20))
+    rounds = int(os.getenv("FUZZ_ROUNDS", 50))
+    patience = int(os.getenv("FUZZ_PATIENCE", 2))
+    seed = int(os.getenv("FUZZ_SEED", random.getrandbits(24) * 1_000_000))
+
+    build_dir = build(GLITCH_CONTROL_SOURCES, "tb_glitch_control", waves=False)
+    coverage = {}
+    bins = []
+    failures = []
+    stale = 0
+
+    with ProcessPoolExecutor(max_workers=shards) as pool:
+        for round_index in range(rounds):
+            futures = []
+            for shard in range(shards):
+                first = seed + (round_index * shards + shard) * scenarios
+                futures.append(pool.submit(fuzz_shard, build_dir, build_dir / "fuzz" / str(shard), first, scenarios))
+
+            hit_before = len(coverage)
+            for future in futures:
+                report = future.result()
+                bins = report["bins"]
+                failures += report["failures"]
+                for name, count in report["coverage"].items():
+                    coverage[name] = coverage.get(name, 0) + count
+
+            new = len(coverage) - hit_before
+            stale = 0 if new else stale + 1
+            print(f"round {round_index}: {(round_index + 1) * shards * scenarios} scenarios, "
+                  f"{len(coverage)}/{len(bins)} bins hit ({new} new)")
+            if failures or stale >= patience or len(coverage) == len(bins):
+                break
+
+    for name in bins:
+        print(f"{coverage.get(name, 0):>10}  {name}")
+    for failure in failures:
+        print(failure)
+
+    return len(failures)
+
+BENCH_TOPLEVELS = {
+    "tb_tt": PROJECT_SOURCES,
+    "tb_glitch_control": GLITCH_CONTROL_SOURCES,
+    "tb_uart_handler": UART_HANDLER_SOURCES,
+}
+
+
+def bench_toplevel(hdl_toplevel, sources):
+    """Build `hdl_toplevel` from scratch and run the benchmark workloads on it."""
+    # Next to the regular builds, so those stay cached
+    build_dir = BUILD_ROOT / SIM / PROFILE / "bench" / hdl_toplevel
+    shutil.rmtree(build_dir, ignore_errors=True)
+
+    started = time.perf_counter()
+    build(sources, hdl_toplevel, build_dir=build_dir, waves=False)
+    build_seconds = time.perf_counter() - started
+
+    test_dir = build_dir / "benchmarks"
+    report = test_dir / "bench.json"
+    report.unlink(missing_ok=True)
+    results_file = get_runner(SIM).test(
+        hdl_toplevel=hdl_toplevel,
+        hdl_toplevel_lang="verilog",
+        test_module="test.benchmarks",
+        build_dir=build_dir,
+        test_dir=test_dir,
+        extra_env={"BENCH_REPORT": str(report)}
+    )
+    num_tests, num_failed = get_results(results_file)
+    if num_failed:
+        raise RuntimeError(f"{num_failed} of {num_tests} benchmarks failed on {hdl_toplevel}")
+
+    workloads = json.loads(report.read_text())
+    peak_rss_kb = max(workload.pop("peak_rss_kb") for workload in workloads.values())
+    return {"build_seconds": build_seconds, "peak_rss_kb": peak_rss_kb, "workloads": workloads}
+
+
+def bench_metrics(results):
+    """Flatten one benchmark run to {metric: (value, higher_is_better)}."""
+    metrics = {}
+    for hdl_toplevel, result in results.items():
+        metrics[f"{hdl_toplevel} build seconds"] = (result["build_seconds"], False)
+        metrics[f"{hdl_toplevel} peak RSS kB"] = (result["peak_rss_kb"], False)
+        for name, workload in result["workloads"].items():
+            metrics[f"{hdl_toplevel} {name} cycles/s"] = (workload["cycles_per_second"], True)
+    return metrics
+
+
+def bench_regressions(history, entry, threshold, window):
+    """Metrics of `entry` more than `threshold` worse than their median over the last `window` comparable runs."""
+    comparable = [
+        previous for previous in history
+        if (previous["host"], previous["simulator"], previous["profile"]) == (entry["host"], entry["simulator"], entry["profile"])
+    ][-window:]
+    if not comparable:
+        return []
+
+    previous_metrics = [bench_metrics(previous["results"]) for previous in comparable]
+    regressions = []
+    for metric, (value, higher_is_better) in bench_metrics(entry["results"]).items():
+        baseline = [metrics[metric][0] for metrics in previous_metrics if metric in metrics]
+        if not baseline:
+            continue
+        median = statistics.median(baseline)
+        change = (value - median) / median if median else 0.0
+        if (-change if higher_is_better else change) > threshold:
+            regressions.append((metric, median, value, change))
+    return regressions
+
+
+def bench():
+    """Benchmark every toplevel, append the results to the history and flag regressions.
+
+    Toplevels run one after another so they do not compete for cores. Each run is
+    compared with the median of the last BENCH_WINDOW runs on the same host, simulator
+    and profile, and any metric more than BENCH_THRESHOLD (a fraction) worse is flagged.
+    """
+    history_file = Path(os.getenv("BENCH_HISTORY", TEST_DIR / "bench_history.json"))
+    threshold = float(os.getenv("BENCH_THRESHOLD", 0.15))
+    window = int(os.getenv("BENCH_WINDOW", 5))
+
+    revision = subprocess.run(
+        ["git", "rev-parse", "--short", "HEAD"], cwd=TEST_DIR, capture_output=True, text=True
+    ).stdout.strip()
+    entry = {
+        "time": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "revision": revision,
+        "host": platform.node(),
+        "simulator": simulator_version(),
+        "profile": PROFILE,
+        "results": {hdl_toplevel: bench_toplevel(hdl_toplevel, sources) for hdl_toplevel, sources in BENCH_TOPLEVELS.items()},
+    }
+
+    history = json.loads(history_file.read_text()) if history_file.exists() else []
+    regressions = bench_regressions(history, entry, threshold, window)
+    history.append(entry)
+    history_file.write_text(json.dumps(history, indent=2) + "\n")
+
+    print(f"{'metric':<52}{'value':>14}")
+    for metric, (value, _) in bench_metrics(entry["results"]).items():
+        print(f"{metric:<52}{value:>14.1f}")
+    for metric, median, value, change in regressions:
+        print(f"REGRESSION {metric}: {value:.1f} vs median {median:.1f} ({change:+.0%})")
+    print(f"Appended to {history_file}")
 
-    runner.test(hdl_toplevel="tb_glitch_control", test_module="test.test_glitch_control", waves=WAVES)
+    return len(regressions)
 
 if __name__ == "__main__":
-    test_project_runner()
-    test_uart_runner()
-    test_uart_raw_runner()
-    test_uart_handler_runner()
-    test_glitch_control_runner()
\ No newline at end of file
+    # Make the test modules importable as test.<module> (like PYTHONPATH in the Makefile)
+    sys.path.insert(0, str(TEST_DIR.parent))
+    if sys.argv[1:] == ["compare"]:
+        sys.exit(1 if compare_simulators() else 0)
+    if sys.argv[1:] == ["fuzz"]:
+        sys.exit(1 if fuzz() else 0)
+    if sys.argv[1:] == ["bench"]:
+        sys.exit(1 if bench() else 0)
+    sys.exit(1 if run_all() else 0)
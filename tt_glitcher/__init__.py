@@ -0,0 +1,46 @@
+"""Host-side client for the Tiny Tapeout glitcher.
+
+    from tt_glitcher import Glitcher, SerialTransport, RESET_ARM
+
+    with SerialTransport("/dev/ttyUSB0") as transport:
+        glitcher = Glitcher(transport)
+        assert glitcher.hello()
+        glitcher.attempt("reset_target", delay=1200, width=8, reset_behavior=RESET_ARM)
+"""
+
+from .campaign import TIMEOUT, Campaign, Result, open_console
+from .checkpoint import Checkpoint
+from .client import Glitcher
+from .emulator import Emulator, PtyEmulator
+from .planner import Axis, PlanCost, SweepPlan
+from .pool import CampaignPool, PoolResult
+from .protocol import BAUD_RATE, CLK_FREQ, RESET_ARM, RESET_NONE, RESET_PULSE
+from .search import AdaptiveSearch, Found
+from .transports import InProcessTransport, PtyTransport, SerialTransport, Transport
+
+__all__ = [
+    "Glitcher",
+    "Emulator",
+    "PtyEmulator",
+    "Campaign",
+    "Result",
+    "TIMEOUT",
+    "open_console",
+    "CampaignPool",
+    "PoolResult",
+    "Checkpoint",
+    "SweepPlan",
+    "Axis",
+    "PlanCost",
+    "AdaptiveSearch",
+    "Found",
+    "Transport",
+    "SerialTransport",
+    "PtyTransport",
+    "InProcessTransport",
+    "BAUD_RATE",
+    "CLK_FREQ",
+    "RESET_NONE",
+    "RESET_PULSE",
+    "RESET_ARM",
+]
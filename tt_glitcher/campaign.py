@@ -0,0 +1,156 @@
+"""Asyncio campaign driver: run glitch attempts back to back while reading the target console.
+
+    async def main():
+        console = await open_console("/dev/ttyUSB1")
+        campaign = Campaign(glitcher, console, classify, deadline=0.5)
+        async for result in campaign.run(plan):
+            print(result.config, result.verdict)
+
+For every attempt the driver writes the configuration and the action (by
+default "reset_target") in one write, then collects the console output until
+`classify(output)` returns a verdict or the attempt's deadline passes (verdict
+TIMEOUT). The console is read by a background task the whole time, so no
+output is lost between attempts, and output that arrives before an attempt
+starts is dropped as left over from the previous one.
+
+While an attempt runs, the next configuration is already encoded and queued
+in the client, so starting the next attempt is one write. With overlap=True it
+is also sent right away: the glitcher holds register writes back until the
+next sequence starts, so the configuration goes over the line while the
+target runs and the next attempt only has its action left to send.
+"""
+
+import asyncio
+import os
+import tty
+from collections import Counter
+from typing import NamedTuple
+
+from .protocol import RESET_ARM
+
+TIMEOUT = "timeout"
+
+
+class Result(NamedTuple):
+    index: int
+    config: dict
+    verdict: str
+    output: bytes
+    seconds: float
+
+
+async def open_console(path):
+    """Open the target console at `path` (a tty or pty) in raw mode, as an asyncio.StreamReader."""
+    fd = os.open(path, os.O_RDONLY | os.O_NOCTTY | os.O_NONBLOCK)
+    tty.setraw(fd)
+    reader = asyncio.StreamReader()
+    await asyncio.get_running_loop().connect_read_pipe(
+        lambda: asyncio.StreamReaderProtocol(reader), os.fdopen(fd, "rb", buffering=0)
+    )
+    return reader
+
+
+class Campaign:
+    """Drive `glitcher` (a Glitcher) through attempts, judging each by the output on `console`.
+
+    `console` is an asyncio.StreamReader (see open_console(), or asyncio.open_connection()
+    for a network serial bridge). `classify(output)` gets all output of the attempt so
+    far every time more arrives, and returns a verdict string, or None to keep reading.
+    `counts` counts the verdicts.
+
+    `overlap` sends each configuration while the attempt before it runs. The
+    glitcher takes written registers over when a sequence starts, and after
+    the "arm" action, or "reset_target" with the RESET_ARM reset behavior,
+    that is only when the trigger input comes, after the next configuration
+    went out. So overlap refuses both (the reset behavior of each attempt as
+    it is configured).
+    """
+
+    def __init__(self, glitcher, console, classify, *, action="reset_target", deadline=1.0, overlap=False):
+        if action not in type(glitcher).ACTIONS:
+            raise ValueError(f"action must be one of {list(type(glitcher).ACTIONS)}, not {action!r}")
+        if overlap and action == "arm":
+            raise ValueError("overlap needs an action that starts the sequence at once, not 'arm'")
+        self.glitcher = glitcher
+        self.console = console
+        self.classify = classify
+        self.action = action
+        self.deadline = deadline
+        self.overlap = overlap
+        self.counts = Counter()
+        self._chunks = asyncio.Queue()
+        self._check({})
+
+    async def run(self, attempts):
+        """Run every configuration (a dict of Glitcher.configure() arguments) of `attempts` in turn.
+
+        An async generator of Result, one per attempt, in order.
+        """
+        loop = asyncio.get_running_loop()
+        reader = asyncio.create_task(self._read_console())
+        attempts = iter(attempts)
+        try:
+            config = next(attempts, None)
+            if config is not None:
+                self._check(config)
+                self.glitcher.configure(**config)
+
+            index = 0
+            while config is not None:
+                self._drop_output()
+                started = loop.time()
+                getattr(self.glitcher, self.action)()
+
+                # Encode the next attempt while the target is busy with this one
+                next_config = next(attempts, None)
+                if next_config is not None:
+                    self._check(next_config)
+                    self.glitcher.configure(**next_config)
+                    if self.overlap:
+                        self.glitcher.flush()
+
+                verdict, output = await self._collect(started + self.deadline)
+                self.counts[verdict] += 1
+                yield Result(index, config, verdict, output, loop.time() - started)
+
+                config = next_config
+                index += 1
+        finally:
+            reader.cancel()
+            # A queued configuration that never went out
+            self.glitcher.discard()
+
+    def _check(self, config):
+        """Refuse `config` if overlap cannot run it, the reset behavior being that of the client otherwise."""
+        if self.overlap and self.action == "reset_target":
+            behavior = config.get("reset_behavior", self.glitcher.registers.get("reset_behavior"))
+            if behavior == RESET_ARM:
+                raise ValueError("overlap needs a reset behavior that starts the sequence at once, not RESET_ARM")
+
+    async def _read_console(self):
+        while True:
+            chunk = await self.console.read(4096)
+            await self._chunks.put(chunk)
+            if not chunk:
+                return
+
+    def _drop_output(self):
+        while not self._chunks.empty():
+            if not self._chunks.get_nowait():
+                raise ConnectionError("The target console was closed")
+
+    async def _collect(self, deadline):
+        loop = asyncio.get_running_loop()
+        output = bytearray()
+        while True:
+            try:
+                chunk = await asyncio.wait_for(self._chunks.get(), max(deadline - loop.time(), 0))
+            except asyncio.TimeoutError:
+                return TIMEOUT, bytes(output)
+            if not chunk:
+                raise ConnectionError("The target console was closed")
+
+            output += chunk
+            verdict = self.classify(bytes(output))
+            if verdict is not None:
+                return verdict, bytes(output)
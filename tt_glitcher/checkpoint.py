@@ -0,0 +1,182 @@
+"""Checkpoints, so a long campaign picks up where it stopped.
+
+    checkpoint = Checkpoint("run1.checkpoint")
+    async for result in checkpoint.run(campaign, plan):
+        store.append(result)
+
+run() skips every attempt of the plan that already completed, and saves a
+checkpoint every `every` attempts, every `interval` seconds and whenever the
+run ends, including by an exception (a USB reset, say) or a cancellation.
+Running again with the same checkpoint file, campaign and plan continues
+where the last run stopped, without repeating or skipping an attempt.
+
+A checkpoint holds the completed attempts as a bitmap of plan indices: the
+index below which all attempts are done (the cursor), and a bit for every
+attempt done beyond it, for streams that finish out of order. For an
+AdaptiveSearch it holds the search state instead, its random number generator
+included. Other plans have to produce the same points in the same order every
+time, as SweepPlan does and SamplingPlan does for a given seed.
+
+A host crash loses the attempts after the last checkpoint. Pass the ResultStore
+the results go to as `store`, and attempts it has recorded are not run again
+either (for plans other than an AdaptiveSearch).
+
+The glitcher registers are unknown after an interruption (the board may have
+lost power), so run() resynchronizes every glitcher before it starts.
+"""
+
+import asyncio
+import base64
+import json
+import os
+import time
+import zlib
+from contextlib import aclosing
+
+from .protocol import TIMEOUT
+from .search import AdaptiveSearch
+
+VERSION = 1
+
+
+class Completed:
+    """A set of plan indices, as the cursor and a bitmap of the indices beyond it."""
+
+    def __init__(self, cursor=0, bits=b""):
+        self.cursor = cursor
+        # Bit i of the bitmap is index cursor rounded down to a byte, plus i
+        self._base = cursor - cursor % 8
+        self._bits = bytearray(bits)
+
+    def _bit(self, index):
+        offset = index - self._base
+        return offset // 8 < len(self._bits) and bool(self._bits[offset // 8] >> (offset % 8) & 1)
+
+    def __contains__(self, index):
+        return index < self.cursor or self._bit(index)
+
+    def add(self, index):
+        if index in self:
+            return
+        offset = index - self._base
+        if offset // 8 >= len(self._bits):
+            self._bits.extend(bytes(offset // 8 - len(self._bits) + 1))
+        self._bits[offset // 8] |= 1 << (offset % 8)
+
+        while self._bit(self.cursor):
+            self.cursor += 1
+        # Drop the bytes the cursor has passed
+        passed = (self.cursor - self._base) // 8
+        if passed:
+            del self._bits[:passed]
+            self._base += 8 * passed
+
+    def state(self):
+        return {"cursor": self.cursor, "bits": base64.b64encode(zlib.compress(bytes(self._bits))).decode()}
+
+    @classmethod
+    def from_state(cls, state):
+        return cls(state["cursor"], zlib.decompress(base64.b64decode(state["bits"])))
+
+
+class Checkpoint:
+    """Checkpoints of a campaign in the file `path`, saved every `every` attempts and `interval` seconds."""
+
+    def __init__(self, path, *, every=100, interval=60.0):
+        self.path = path
+        self.every = every
+        self.interval = interval
+        self.completed = Completed()
+        self.search = None
+        self.seed = None
+
+    def load(self):
+        """Load the checkpoint file, returns False if there is none yet."""
+        if not os.path.exists(self.path):
+            return False
+        with open(self.path) as f:
+            state = json.load(f)
+        if state["version"] != VERSION:
+            raise ValueError(f"{self.path} is a version {state['version']} checkpoint")
+        self.completed = Completed.from_state(state["completed"])
+        self.search = state["search"]
+        self.seed = state["seed"]
+        return True
+
+    def save(self, search=None):
+        """Write the checkpoint (with the state of `search`, an AdaptiveSearch), replacing the file in one rename."""
+        state = {
+            "version": VERSION,
+            "completed": self.completed.state(),
+            "search": search.state() if search is not None else None,
+            "seed": self.seed,
+            "saved": time.time(),
+        }
+        temporary = self.path + ".tmp"
+        with open(temporary, "w") as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, self.path)
+
+    async def run(self, campaign, plan, *, store=None, resync_timeout=1.0):
+        """Run the attempts of `plan` not completed yet on `campaign` (a Campaign or CampaignPool).
+
+        An async generator of the results like campaign.run(), with `index` the
+        index of the attempt in the plan (for an AdaptiveSearch, the attempt number).
+        """
+        self.load()
+        seed = getattr(plan, "seed", None)
+        if self.seed is not None and seed != self.seed:
+            raise ValueError(f"{self.path} is a checkpoint of a plan with seed {self.seed}, not {seed}")
+        self.seed = seed
+
+        campaigns = getattr(campaign, "campaigns", [campaign])
+        # Let the devices drop a frame cut short, without blocking the event loop
+        await asyncio.sleep(TIMEOUT)
+        for board in campaigns:
+            if not board.glitcher.resync(resync_timeout, settle=False):
+                raise ConnectionError(f"The glitcher of {board} did not answer after a resync")
+
+        search = plan if isinstance(plan, AdaptiveSearch) else None
+        if search is not None:
+            if self.search is not None:
+                search.restore(self.search)
+        elif store is not None:
+            for index in store.records["index"].tolist():
+                self.completed.add(index)
+
+        indices = {}
+        saved_at = time.monotonic()
+        unsaved = 0
+        try:
+            attempts = search if search is not None else self._remaining(plan, indices)
+            async with aclosing(campaign.run(attempts)) as results:
+                async for result in results:
+                    if search is not None:
+                        index = search.attempts
+                        search.tell(result.config, result.verdict)
+                    else:
+                        index = indices.pop(result.index)
+                        self.completed.add(index)
+                    yield result._replace(index=index)
+
+                    unsaved += 1
+                    if unsaved >= self.every or time.monotonic() - saved_at >= self.interval:
+                        self.save(search)
+                        saved_at = time.monotonic()
+                        unsaved = 0
+                    if search is not None and search.done:
+                        break
+        finally:
+            self.save(search)
+
+    def _remaining(self, plan, indices):
+        """Configurations of `plan` not completed yet, recording their plan index in `indices` by position."""
+        position = 0
+        for index, config in enumerate(plan):
+            if index in self.completed:
+                continue
+            indices[position] = index
+            position += 1
+            yield config
@@ -0,0 +1,294 @@
+"""The glitcher client."""
+
+import time
+
+from . import protocol
+
+
+class Glitcher:
+    """Client for the glitcher UART protocol on top of a transport (see transports.py).
+
+    Configuration calls only queue their command bytes. Actions (trigger, arm,
+    reset_target, hello) append theirs and then write everything queued in one
+    transport write, so a whole configuration-plus-action attempt costs a single
+    system call and no flush:
+
+        glitcher.configure(delay=1200, width=8).trigger()
+
+    or, equivalently, glitcher.attempt("trigger", delay=1200, width=8). When most
+    registers change at once, load() sends all of them and the action in one
+    11-byte frame instead.
+
+    The client keeps a shadow copy of the device registers and leaves out
+    commands that would write the value a register already has, so a delay
+    sweep sends 4 bytes per attempt instead of a full configuration. The shadow
+    starts out unknown (everything is sent). Call device_reset() when the
+    glitcher itself was reset, its registers are then at their defaults.
+    resync() and invalidate() forget the shadow again. Pass cache=False to
+    always send every register.
+    """
+
+    ACTIONS = {
+        "trigger": protocol.TRIGGER,
+        "arm": protocol.ARM,
+        "reset_target": protocol.RESET_TARGET,
+    }
+
+    def __init__(self, transport, *, cache=True):
+        self.transport = transport
+        self._pending = bytearray()
+        self._cache = cache
+        self._shadow = {}
+
+    @property
+    def registers(self):
+        """The register values the client knows the device has (or will have once pending bytes are written)."""
+        return dict(self._shadow)
+
+    def invalidate(self):
+        """Forget the shadow registers, the next configuration sends every register again."""
+        self._shadow.clear()
+
+    def device_reset(self):
+        """The glitcher was reset (power-on or rst_n), so its registers are at their defaults."""
+        self._pending.clear()
+        self._shadow = dict(protocol.DEFAULTS)
+
+    @property
+    def pending(self):
+        """Bytes queued but not written yet."""
+        return bytes(self._pending)
+
+    def configure(self, *, delay=None, width=None, num_pulses=None, spacing=None,
+                  reset_length=None, reset_behavior=None):
+        """Queue the registers that are not None, in the order of the arguments.
+
+        Registers the shadow says already have the value are left out.
+        """
+        values = {
+            "delay": delay,
+            "width": width,
+            "num_pulses": num_pulses,
+            "spacing": spacing,
+            "reset_length": reset_length,
+        }
+        # Encode everything first, so a bad value leaves nothing half queued
+        commands = {name: protocol.set_register(name, value) for name, value in values.items() if value is not None}
+        if reset_behavior is not None:
+            commands["reset_behavior"] = protocol.set_reset_behavior(reset_behavior)
+            values["reset_behavior"] = reset_behavior
+
+        for name, command in commands.items():
+            if self._cache and self._shadow.get(name) == values[name]:
+                continue
+            self._pending += command
+            self._shadow[name] = values[name]
+        return self
+
+    def delay(self, cycles):
+        return self.configure(delay=cycles)
+
+    def width(self, cycles):
+        return self.configure(width=cycles)
+
+    def num_pulses(self, count):
+        return self.configure(num_pulses=count)
+
+    def spacing(self, cycles):
+        return self.configure(spacing=cycles)
+
+    def reset_length(self, cycles):
+        return self.configure(reset_length=cycles)
+
+    def reset_behavior(self, behavior):
+        return self.configure(reset_behavior=behavior)
+
+    def load(self, action=None, **config):
+        """Load every register in one configuration frame, then run `action` (None, "trigger" or "reset_target").
+
+        The next sequence takes the whole frame over in a single clock cycle.
+        A damaged frame is not applied at all: the device answers
+        protocol.CONFIG_ERROR and puts back the registers as they were before
+        the frame, writes not yet taken over by a sequence included. Registers
+        left out of `config` keep the value the shadow has, so they have to be
+        known. Without an action the frame is only queued, like configure().
+        """
+        unknown = set(protocol.DEFAULTS) - set(config) - set(self._shadow)
+        if unknown:
+            raise ValueError(f"The values of {sorted(unknown)} are not known, pass them")
+        values = {**self._shadow, **config}
+        frame = protocol.config_frame(action=action, **{name: values[name] for name in protocol.DEFAULTS})
+        self._pending += frame
+        self._shadow.update(values)
+        if action is not None:
+            self.flush()
+        return self
+
+    def discard(self):
+        """Drop the queued bytes. The shadow counted them as written, so it is forgotten."""
+        if self._pending:
+            self._pending.clear()
+            self.invalidate()
+
+    def flush(self):
+        """Write everything queued in one transport write."""
+        if self._pending:
+            data = bytes(self._pending)
+            self._pending.clear()
+            try:
+                self.transport.write(data)
+            except BaseException:
+                # Some of the bytes may or may not have made it
+                self.invalidate()
+                raise
+
+    def _action(self, command):
+        self._pending += command
+        self.flush()
+        return self
+
+    def trigger(self):
+        """Start the pulse sequence now."""
+        return self._action(protocol.TRIGGER)
+
+    def arm(self):
+        """Toggle the arming of the trigger input."""
+        return self._action(protocol.ARM)
+
+    def reset_target(self):
+        """Reset the target, then do what the reset behavior says."""
+        return self._action(protocol.RESET_TARGET)
+
+    def attempt(self, action="trigger", **config):
+        """Configure (see configure()) and run `action` ("trigger", "arm" or "reset_target") in one write."""
+        if action not in self.ACTIONS:
+            raise ValueError(f"action must be one of {list(self.ACTIONS)}, not {action!r}")
+        self.configure(**config)
+        return self._action(self.ACTIONS[action])
+
+    def set_sweep(self, *, order="nested", **sweeps):
+        """Queue the sweep settings, a (step, limit) pair per register (see protocol.sweep_settings())."""
+        self._pending += protocol.sweep_settings(order=order, **sweeps)
+        return self
+
+    def start_sweep(self):
+        """Start the sweep from the current register values, the next pulse sequences step through it."""
+        return self._action(protocol.sweep("start"))
+
+    def stop_sweep(self):
+        """Stop the sweep, the sequences use the registers again."""
+        return self._action(protocol.sweep("stop"))
+
+    def pause_sweep(self):
+        """Hold the sweep at its current point until resume_sweep()."""
+        return self._action(protocol.sweep("pause"))
+
+    def resume_sweep(self):
+        return self._action(protocol.sweep("resume"))
+
+    def sweep_status(self, timeout=1.0):
+        """The (index, state) of the sweep, the state is one of protocol.SWEEP_OFF, SWEEP_RUNNING and SWEEP_PAUSED.
+
+        The index counts the pulse sequences since the sweep started, so a
+        result seen by the host belongs to the point at the index before it
+        (see protocol.sweep_points()). It is 16 bits wide and wraps around.
+        A start refused because the last settings frame arrived damaged shows
+        as SWEEP_OFF here, the device answered protocol.CONFIG_ERROR to it.
+        """
+        self._action(protocol.SWEEP_QUERY)
+        try:
+            return protocol.parse_sweep_status(self.transport.read(protocol.SWEEP_STATUS_LENGTH, timeout))
+        except TimeoutError:
+            self.invalidate()
+            raise
+
+    def waveform(self, pulses):
+        """Queue a waveform table of (width, spacing) pulses, played by every sequence from then on.
+
+        The table takes the place of the width, spacing and number of pulses
+        registers, and of a sweep of them. [] goes back to the registers.
+        Like the registers, a new table is only played from the next sequence.
+        """
+        self._pending += protocol.waveform(pulses)
+        return self
+
+    def read_waveform(self, timeout=1.0):
+        """The (length, entries) of the device table, entries has every (width, spacing) of the table."""
+        self._action(protocol.WAVE_READ)
+        try:
+            length, size = self.transport.read(2, timeout)
+            return length, protocol.parse_wave_entries(self.transport.read(2 * size, timeout))
+        except TimeoutError:
+            self.invalidate()
+            raise
+
+    def hello(self, timeout=1.0):
+        """Check that the glitcher answers, returns True if it does."""
+        self._action(protocol.HELLO)
+        try:
+            return self.transport.read(len(protocol.HELLO_RESPONSE), timeout) == protocol.HELLO_RESPONSE
+        except TimeoutError:
+            self.invalidate()
+            return False
+
+    def resync(self, timeout=1.0, *, settle=True):
+        """Bring the UART handler back to its idle state after an interrupted command.
+
+        A command cut short (say by a crashed host) leaves the handler waiting for
+        value bytes. Two filler bytes complete any command, then a hello shows the
+        handler is idle again. The fillers may have ended up in a register, so the
+        shadow is forgotten. A sweep operation, waveform length or baud rate cut
+        short refuses them (see protocol.RESYNC_FILLER), so the sweep and the
+        waveform table stay as they were.
+
+        A frame or table entry cut short can be longer than the fillers, so this
+        first waits protocol.TIMEOUT until the device has dropped it. A caller that
+        must not block (an event loop, a simulation) waits by itself and passes
+        settle=False. Returns True if the hello came back.
+        """
+        self._pending.clear()
+        self.invalidate()
+        if settle:
+            time.sleep(protocol.TIMEOUT)
+        self._pending += protocol.RESYNC_FILLER
+        self._action(protocol.HELLO)
+
+        # Unknown bytes are echoed, so up to two fillers come back before the hello
+        received = b""
+        try:
+            while not received.endswith(protocol.HELLO_RESPONSE):
+                if len(received) >= len(protocol.RESYNC_FILLER) + len(protocol.HELLO_RESPONSE):
+                    return False
+                received += self.transport.read(1, timeout)
+        except TimeoutError:
+            return False
+        return True
+
+    def set_baud_rate(self, rate, timeout=1.0):
+        """Switch the device and the transport to `rate` (one of protocol.BAUD_RATES), returns True if both did.
+
+        The device acknowledges the command at the current rate, then switches.
+        The client switches the transport and acknowledges at the new rate, and
+        the device answers that. Without the answer the device is back at
+        protocol.BAUD_RATE after protocol.TIMEOUT, so the transport goes
+        back to it too and this returns False.
+        """
+        command = protocol.set_baud_rate(rate)
+        self._action(command)
+        try:
+            if self.transport.read(1, timeout) != protocol.BAUD_ACK:
+                return False
+        except TimeoutError:
+            return False
+
+        self.transport.set_baud_rate(rate)
+        self.transport.write(protocol.BAUD_ACK)
+        try:
+            if self.transport.read(1, timeout) == protocol.BAUD_ACK:
+                return True
+        except TimeoutError:
+            pass
+        # Make sure the device gave up waiting as well
+        time.sleep(protocol.TIMEOUT)
+        self.transport.set_baud_rate(protocol.BAUD_RATE)
+        return False
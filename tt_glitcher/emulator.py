@@ -0,0 +1,756 @@
+"""Software emulator of tt_um_pakesson_glitcher, for host tools without hardware.
+
+    with PtyEmulator(speed=None) as emulator:
+        with PtyTransport(emulator.path) as transport:
+            glitcher = Glitcher(transport)
+            assert glitcher.hello()
+            glitcher.attempt("trigger", delay=100, width=5)
+        print(emulator.events)
+
+Emulator is the device itself, cycle for cycle: uart_rx (after the two-flop
+synchronizer), the command parsing of uart_handler, uart_tx, and the
+glitch_control state machine. `registers` are the values the host wrote (the
+staging bank), `active` the ones the sequences use, which take over the
+written ones at the clock edge a sequence starts (unless a two byte write or
+a configuration frame is half-way), but for the registers the parameter sweep moves
+while it is on. Likewise `wave_table` and
+`wave_length` are the waveform table the host wrote and `active_wave` the
+(table, length) the sequences play. That includes the
+odd corners, like bytes that arrive while an echo or the hello is waiting for
+the transmitter being dropped, the arm toggle, the three reset behaviors, a
+table entry lowered in the middle of a pulse making its counter wrap, the baud
+rate switch with the fractional bit timer of the faster rates, configuration
+frames that are written as they arrive and undone when incomplete or wrong, the parameter sweep
+moving on at the edge that ends each pulse sequence, and the waveform table. Stretches
+where only a counter or the serial line is busy are skipped in one step, so a
+sequence of millions of cycles takes a few hundred steps.
+
+Every edge of the pulse, target reset, pulse enable, busy and armed outputs goes
+to `events` (and to `listener`, to play a target that reacts to them), with the
+clock cycle it happened in, and so does every byte the device starts sending
+("uart_tx", the byte as the value). `events` only keeps the last `max_events`
+of them, so a long campaign does not fill up the memory. Cycle k starts at clock edge k, so an output
+changed by edge k has its new value from cycle k on, and an input that changes
+in cycle k is sampled by edge k + 1, like the edges an EdgeMonitor records.
+
+PtyEmulator serves an Emulator on a pseudo-terminal. The emulated clock follows
+the wall clock (speed 1.0, bytes take as long as at the baud rate), runs
+`speed` times faster, or with speed=None as fast as possible: every write is
+then processed at once, up to the end of whatever sequence it started, and
+the clock only keeps up with the wall clock while nothing happens (so a baud
+rate confirmation still times out). Bytes the host sends at another rate than
+the device uses (the speed set on the terminal) are lost.
+"""
+
+import os
+import select
+import termios
+import threading
+import time
+import tty
+from collections import deque
+from typing import NamedTuple
+
+from . import protocol
+
+# uart_handler states
+HANDLER_IDLE = "idle"
+HANDLER_SEND_ECHO = "send_echo"
+HANDLER_SEND_HELLO = "send_hello"
+HANDLER_BAUD_RATE = "baud_rate"
+HANDLER_BAUD_ACK = "baud_ack"
+HANDLER_BAUD_SWITCH = "baud_switch"
+HANDLER_BAUD_CONFIRM = "baud_confirm"
+HANDLER_CONFIG = "config"
+HANDLER_SWEEP_OP = "sweep_op"
+HANDLER_SEND_SWEEP = "send_sweep"
+HANDLER_WAVE_ENTRY = "wave_entry"
+HANDLER_WAVE_LENGTH = "wave_length"
+HANDLER_SEND_WAVE = "send_wave"
+
+# Command byte and the handler state it enters, (register, 1 while the high byte is next),
+# for the commands with a value
+VALUE_COMMANDS = {
+    ord('d'): ("delay", 1),
+    ord('w'): ("width", 0),
+    ord('n'): ("num_pulses", 0),
+    ord('s'): ("spacing", 1),
+    ord('r'): ("reset_length", 1),
+}
+
+# Register and bit position each byte of a configuration frame goes to, up to the flags
+CONFIG_BYTES = [
+    ("delay", 8), ("delay", 0), ("width", 0), ("num_pulses", 0), ("spacing", 8), ("spacing", 0),
+    ("reset_length", 8), ("reset_length", 0), ("reset_behavior", 0),
+]
+
+# Handler states that wait for the transmitter
+SENDING = (HANDLER_SEND_ECHO, HANDLER_SEND_HELLO, HANDLER_BAUD_ACK, HANDLER_BAUD_SWITCH, HANDLER_SEND_SWEEP, HANDLER_SEND_WAVE)
+
+RESET_BEHAVIORS = {ord(command): behavior for behavior, command in protocol.RESET_BEHAVIOR_COMMANDS.items()}
+
+# glitch_control states
+IDLE = 0
+RESET_TARGET = 1
+DELAY = 2
+PULSE_ACTIVE = 3
+PULSE_SPACE = 4
+
+OUTPUTS = ["pulse", "target_reset", "pulse_en", "busy", "armed"]
+
+
+class Event(NamedTuple):
+    cycle: int
+    signal: str
+    value: int
+
+
+class Emulator:
+    """The glitcher, advanced clock edge by clock edge (edge k at k / clk_freq seconds, `cycle` is the next one).
+
+    Feed it host bytes with receive(), move time forward with run() or
+    settle(), and collect what it sent back with take(). Calling it with
+    bytes does all three, which makes it a device for InProcessTransport.
+
+    `baud_rate` is the rate after reset, the other rates are the ones of
+    protocol.BAUD_RATES. `timeout` is how long a new rate waits for its
+    confirmation, and a configuration frame for its next byte, in seconds.
+    `wave_entries` is the size of the waveform table (WAVE_ENTRIES in the RTL).
+    `events` holds the last `max_events` events, all of them with None.
+    """
+
+    def __init__(self, *, clk_freq=protocol.CLK_FREQ, baud_rate=protocol.BAUD_RATE,
+                 timeout=protocol.TIMEOUT, wave_entries=protocol.WAVE_ENTRIES, listener=None,
+                 max_events=100_000):
+        self.clk_freq = clk_freq
+        self.wave_entries = wave_entries
+        self.baud_rates = [baud_rate] + protocol.BAUD_RATES[1:]
+        self._bit_times = [16 * (clk_freq // baud_rate)] + [protocol.bit_time(rate, clk_freq) for rate in protocol.BAUD_RATES[1:]]
+        self.timeout = round(timeout * clk_freq)
+        self.listener = listener
+        self.cycle = 0
+        self.events = deque(maxlen=max_events)
+        self._trigger_edges = deque()
+        self._trigger = 0
+        self._sync = [0, 0]
+        self._outputs = {name: 0 for name in OUTPUTS}
+        self.reset()
+
+    def reset(self):
+        """Reset the device (rst_n), like at power-on. Bytes on their way in are lost."""
+        self._rx = deque()  # (cycle the handler sees the byte, byte)
+        self._rx_free = self.cycle
+        self._tx = deque()  # (cycle the host has the byte, byte)
+        self._tx_free = self.cycle
+        self._tx_en = 0
+        self._tx_data = 0
+
+        self._handler = HANDLER_IDLE
+        self._hello = 0
+        self._baud = 0
+        self._new_baud = 0
+        self._deadline = None
+        self._frame = bytearray()
+        self._sweep_frame = False
+        # The staging registers before the configuration frame, put back if it fails
+        self._undo = {}
+        self._sweep_settings = {name: (0, 0) for name in protocol.SWEEP_REGISTERS}
+        self._sweep_lockstep = 0
+        self._sweep_valid = 1
+        self._sweep_op = None  # The operation strobed to the sweep, None when there is none
+        self._report = []
+        self.registers = dict(protocol.DEFAULTS)
+        self.active = dict(protocol.DEFAULTS)
+        self.wave_table = [(1, 0)] * self.wave_entries
+        self.wave_length = 0
+        self.active_wave = (tuple(self.wave_table), 0)
+        self._uart_pulse_en = 0
+        self._uart_reset_en = 0
+        self._uart_arm = 0
+
+        self._state = IDLE
+        self._phase = 0
+        self._pulses = 0
+        self._entry = 0
+        self._armed = 0
+        self._reset_done = 0
+        self._sweep_state = protocol.SWEEP_OFF
+        self._sweep_index = 0
+        self._sweep_load = False
+        self._output_edges(self.cycle)
+
+    # Serial line
+
+    @property
+    def baud_rate(self):
+        """The rate the device talks at now."""
+        return self.baud_rates[self._baud]
+
+    def _bits(self, count):
+        """Clock cycles `count` bits take at the current rate, from the start of a frame."""
+        bit_time = self._bit_times[self._baud]
+        # uart_rx/uart_tx add a cycle every time the sixteenths add up to one
+        return count * (bit_time >> 4) + count * (bit_time & 15) // 16
+
+    @property
+    def rx_latency(self):
+        """From the cycle a start bit begins to the edge the handler sees the byte.
+
+        The edge sampling it, the synchronizer, half a bit and nine bits.
+        """
+        return 3 + (self._bit_times[self._baud] >> 5) + self._bits(9)
+
+    # Host side
+
+    def receive(self, data, at=None, baud_rate=None):
+        """The host sends `data`, the first start bit in cycle `at` (default now) or when the line is free.
+
+        Bytes sent at a `baud_rate` other than the one of the device are lost.
+        Returns the cycle the handler has seen the last byte.
+        """
+        if baud_rate is not None and baud_rate != self.baud_rate:
+            return self.cycle
+        start = max(self.cycle if at is None else at, self._rx_free)
+        for byte in data:
+            self._rx.append((start + self.rx_latency, byte))
+            start += self._bits(10)
+        self._rx_free = start
+        return self._rx[-1][0] if self._rx else self.cycle
+
+    def set_trigger(self, value, at=None):
+        """Drive the trigger input to `value` from cycle `at` (default now), the edge after samples it."""
+        self._trigger_edges.append((self.cycle if at is None else max(at, self.cycle), int(bool(value))))
+
+    def take(self, until=None):
+        """The bytes the host has received by cycle `until` (default now), removed from the queue."""
+        until = self.cycle if until is None else until
+        data = bytearray()
+        while self._tx and self._tx[0][0] <= until:
+            data.append(self._tx.popleft()[1])
+        return bytes(data)
+
+    @property
+    def next_output(self):
+        """Cycle the next byte reaches the host, or None."""
+        return self._tx[0][0] if self._tx else None
+
+    def __call__(self, data):
+        self.receive(data)
+        self.settle()
+        return self.take()
+
+    # Time
+
+    @property
+    def sweep(self):
+        """(index, state) of the parameter sweep, as the 'q' command answers it."""
+        return self._sweep_index, self._sweep_state
+
+    @property
+    def settled(self):
+        """True when nothing happens until the host sends something or the trigger input changes (or the deadline)."""
+        return (
+            not self._rx and not self._trigger_edges and self._state == IDLE
+            and self._handler not in SENDING
+            and self.cycle >= self._tx_free and not self._tx_en and self._quiet()
+            and self._trigger_stable() and not (self._armed and self._sync[1])
+        )
+
+    def settle(self, limit=1 << 40):
+        """Run until settled (or `limit` more cycles passed), returns the cycle."""
+        end = self.cycle + limit
+        while not self.settled and self.cycle < end:
+            self.run(max(min(self._next_event(), end), self.cycle + 1) if self._quiet_now() else self.cycle + 1)
+        return self.cycle
+
+    @property
+    def deadline(self):
+        """Cycle the handler stops waiting for a baud rate confirmation or the rest of a frame or table entry, or None."""
+        return self._deadline
+
+    def run(self, until):
+        """Process the clock edges up to cycle `until`."""
+        while self.cycle < until:
+            if self._quiet_now():
+                skip = min(self._next_event(), until) - self.cycle
+                if skip > 0:
+                    if self._state != IDLE:
+                        self._phase = (self._phase + skip) % 0x10000
+                    self.cycle += skip
+                    continue
+            self._edge()
+
+    def _quiet(self):
+        return not (
+            self._uart_pulse_en or self._uart_reset_en or self._uart_arm or self._reset_done or self._tx_en
+            or self._sweep_op is not None
+        )
+
+    def _trigger_stable(self):
+        return self._sync[0] == self._sync[1] == self._trigger
+
+    def _quiet_now(self):
+        """True if the coming edge changes nothing but a phase counter."""
+        if not self._quiet() or not self._trigger_stable() or (self._armed and self._sync[1]):
+            return False
+        if self._rx and self._rx[0][0] <= self.cycle:
+            return False
+        if self._trigger_edges and self._trigger_edges[0][0] <= self.cycle:
+            return False
+        if self._handler in SENDING:
+            return self.cycle < self._tx_free
+        if self._deadline is not None:
+            return self.cycle < self._deadline
+        return True
+
+    def _next_event(self):
+        """The next cycle something other than a phase counter changes (only valid when quiet)."""
+        candidates = [1 << 62]
+        if self._rx:
+            candidates.append(self._rx[0][0])
+        if self._trigger_edges:
+            candidates.append(self._trigger_edges[0][0])
+        if self.cycle < self._tx_free:
+            candidates.append(self._tx_free)
+        if self._deadline is not None:
+            candidates.append(self._deadline)
+        if self._state != IDLE:
+            candidates.append(self.cycle + (self._target() - self._phase) % 0x10000)
+        return max(min(candidates), self.cycle)
+
+    def _value(self, name):
+        """The value the pulse sequences use: from the waveform table or the active bank."""
+        table, length = self.active_wave
+        if length and name in ("width", "spacing"):
+            # The entry counter has the width of the table index, and reads past the end give 0
+            entry = table[self._entry] if self._entry < self.wave_entries else (0, 0)
+            return entry[name == "spacing"]
+        if length and name == "num_pulses":
+            return length
+        return self.active[name]
+
+    def _target(self):
+        name = {RESET_TARGET: "reset_length", DELAY: "delay", PULSE_ACTIVE: "width", PULSE_SPACE: "spacing"}[self._state]
+        return max(self._value(name), 1) - 1
+
+    def _committed(self, registers):
+        """The active bank after a commit of the staging `registers`, a running sweep keeps its point."""
+        active = dict(registers)
+        if self._sweep_state != protocol.SWEEP_OFF and not self._sweep_load:
+            active.update((name, self.active[name]) for name in protocol.SWEEP_REGISTERS if self._sweep_settings[name][0])
+        return active
+
+    def _advance_sweep(self, registers):
+        """Move the sweep to its next point, at the edge that ends a pulse sequence."""
+        self._sweep_index = (self._sweep_index + 1) % 0x10000
+        active = dict(self.active)
+        carry = True
+        for name in protocol.SWEEP_REGISTERS:
+            step, limit = self._sweep_settings[name]
+            value = self.active[name]
+            wrap = step == 0 or value + step > limit
+            # A step of 0 leaves the register to the commits
+            if step and (carry or self._sweep_lockstep):
+                active[name] = registers[name] if wrap else value + step
+            carry = carry and wrap
+        if carry and not self._sweep_lockstep:
+            self._sweep_state = protocol.SWEEP_OFF
+        self.active = active
+
+    # One clock edge
+
+    def _edge(self):
+        k = self.cycle
+        while self._trigger_edges and self._trigger_edges[0][0] < k:
+            self._trigger = self._trigger_edges.popleft()[1]
+        valid = None
+        if self._rx and self._rx[0][0] <= k:
+            valid = self._rx.popleft()[1]
+        tx_ready = k >= self._tx_free
+
+        # Everything below reads the values from before the edge
+        registers, active = dict(self.registers), self.active
+        wave = (tuple(self.wave_table), self.wave_length)
+        # The second byte of a register is still to come, a sequence starting now keeps the active bank
+        write_pending = self._handler in (("delay", 0), ("spacing", 0), ("reset_length", 0)) or (
+            self._handler == HANDLER_CONFIG and not self._sweep_frame
+        )
+        num_pulses = self._value("num_pulses")
+        sweep_report = [self._sweep_index >> 8, self._sweep_index & 0xFF, self._sweep_state]
+        armed, sync2, behavior = self._armed, self._sync[1], active["reset_behavior"]
+        pulse_en = self._uart_pulse_en or (armed and sync2) or (self._reset_done and behavior == protocol.RESET_PULSE)
+
+        # uart_tx
+        if tx_ready and self._tx_en:
+            frame = self._bits(10)
+            self._tx_free = k + frame + 1
+            self._tx.append((k + frame, self._tx_data))
+            self._event(Event(k, "uart_tx", self._tx_data))
+
+        # glitch_control
+        next_armed = armed
+        if self._uart_arm:
+            next_armed = 1 - armed
+        elif pulse_en:
+            next_armed = 0
+        next_reset_done = 0
+        sequence_done = False
+        state = self._state
+        if state == IDLE:
+            if self._uart_reset_en:
+                state, self._phase = RESET_TARGET, 0
+            elif self._uart_pulse_en or (armed and sync2):
+                state, self._phase = DELAY, 0
+        elif self._phase == self._target():
+            self._phase = 0
+            if state == RESET_TARGET:
+                next_reset_done = 1
+                if behavior == protocol.RESET_PULSE:
+                    state = DELAY
+                else:
+                    if behavior == protocol.RESET_ARM:
+                        next_armed = 1
+                    state = IDLE
+            elif state == DELAY:
+                self._pulses = max(num_pulses - 1, 0)
+                self._entry = 0
+                state = PULSE_ACTIVE if num_pulses else IDLE
+                sequence_done = not num_pulses
+            elif state == PULSE_ACTIVE:
+                if self._pulses:
+                    self._pulses -= 1
+                    state = PULSE_SPACE
+                else:
+                    state = IDLE
+                    sequence_done = True
+            else:
+                state = PULSE_ACTIVE
+                self._entry = (self._entry + 1) % (1 << (self.wave_entries - 1).bit_length())
+        else:
+            self._phase = (self._phase + 1) % 0x10000
+        commit = self._state == IDLE and state != IDLE and not write_pending
+
+        # uart_handler
+        tx_en, uart_pulse_en, uart_reset_en, uart_arm, sweep_op = 0, 0, 0, 0, None
+        if self._handler == HANDLER_IDLE:
+            if valid is not None:
+                if valid in VALUE_COMMANDS:
+                    self._handler = VALUE_COMMANDS[valid]
+                elif valid == ord('t'):
+                    uart_pulse_en = 1
+                elif valid == ord('h'):
+                    self._handler = HANDLER_SEND_HELLO
+                elif valid == ord('a'):
+                    uart_arm = 1
+                elif valid == ord('p'):
+                    uart_reset_en = 1
+                elif valid == protocol.SET_BAUD_RATE[0]:
+                    self._handler = HANDLER_BAUD_RATE
+                elif valid == protocol.CONFIGURE[0]:
+                    self._undo = dict(self.registers)
+                    self._frame.clear()
+                    self._deadline = k + self.timeout
+                    self._sweep_frame = False
+                    self._handler = HANDLER_CONFIG
+                elif valid == protocol.SWEEP_SETTINGS[0]:
+                    self._frame.clear()
+                    self._deadline = k + self.timeout
+                    self._sweep_frame = True
+                    self._sweep_valid = 0
+                    sweep_op = protocol.SWEEP_OPERATIONS["stop"]
+                    self._handler = HANDLER_CONFIG
+                elif valid == protocol.SWEEP[0]:
+                    self._handler = HANDLER_SWEEP_OP
+                elif valid == protocol.SWEEP_QUERY[0]:
+                    self._report = sweep_report
+                    self._handler = HANDLER_SEND_SWEEP
+                elif valid == protocol.WAVE_ENTRY[0]:
+                    self._frame.clear()
+                    self._deadline = k + self.timeout
+                    self._handler = HANDLER_WAVE_ENTRY
+                elif valid == protocol.WAVE_LENGTH[0]:
+                    self._handler = HANDLER_WAVE_LENGTH
+                elif valid == protocol.WAVE_READ[0]:
+                    self._report = [self.wave_length, self.wave_entries]
+                    for entry in self.wave_table:
+                        self._report += entry
+                    self._handler = HANDLER_SEND_WAVE
+                elif valid in RESET_BEHAVIORS:
+                    self.registers["reset_behavior"] = RESET_BEHAVIORS[valid]
+                else:
+                    self._tx_data = valid
+                    self._handler = HANDLER_SEND_ECHO
+        elif self._handler == HANDLER_SEND_ECHO:
+            if tx_ready:
+                tx_en = 1
+                self._handler = HANDLER_IDLE
+        elif self._handler == HANDLER_SEND_HELLO:
+            if tx_ready and not self._tx_en:
+                self._tx_data = protocol.HELLO_RESPONSE[self._hello]
+                tx_en = 1
+                self._hello = (self._hello + 1) % len(protocol.HELLO_RESPONSE)
+                if not self._hello:
+                    self._handler = HANDLER_IDLE
+        elif self._handler == HANDLER_BAUD_RATE:
+            if valid is not None:
+                if valid < len(self.baud_rates):
+                    self._new_baud = valid
+                    self._tx_data = protocol.BAUD_ACK[0]
+                    self._handler = HANDLER_BAUD_ACK
+                else:
+                    self._tx_data = valid
+                    self._handler = HANDLER_SEND_ECHO
+        elif self._handler == HANDLER_BAUD_ACK:
+            if tx_ready:
+                tx_en = 1
+                self._handler = HANDLER_BAUD_SWITCH
+        elif self._handler == HANDLER_BAUD_SWITCH:
+            if tx_ready and not self._tx_en:
+                self._baud = self._new_baud
+                self._deadline = k + self.timeout
+                self._handler = HANDLER_BAUD_CONFIRM
+        elif self._handler == HANDLER_BAUD_CONFIRM:
+            if valid is not None or k == self._deadline:
+                if valid == protocol.BAUD_ACK[0]:
+                    self._tx_data = valid
+                    self._handler = HANDLER_SEND_ECHO
+                else:
+                    self._baud = 0
+                    self._handler = HANDLER_IDLE
+                self._deadline = None
+        elif self._handler == HANDLER_CONFIG:
+            if valid is not None:
+                self._frame.append(valid)
+                self._deadline = k + self.timeout
+                if self._sweep_frame and len(self._frame) == protocol.SWEEP_LENGTH:
+                    self._deadline = None
+                    frame = self._frame
+                    if sum(frame) & 0xFF == 0 and not frame[10] & 0xFE:
+                        self._sweep_settings = {
+                            "delay": (frame[0], frame[1] << 8 | frame[2]),
+                            "width": (frame[3], frame[4]),
+                            "spacing": (frame[5], frame[6] << 8 | frame[7]),
+                            "num_pulses": (frame[8], frame[9]),
+                        }
+                        self._sweep_lockstep = frame[10]
+                        self._sweep_valid = 1
+                        self._handler = HANDLER_IDLE
+                    else:
+                        self._tx_data = protocol.CONFIG_ERROR[0]
+                        self._handler = HANDLER_SEND_ECHO
+                elif not self._sweep_frame and len(self._frame) == protocol.CONFIG_LENGTH:
+                    self._deadline = None
+                    frame, flags = self._frame, self._frame[8]
+                    if sum(frame) & 0xFF == 0 and not flags & 0xF0 and flags & 3 != 3 and flags & 12 != 12:
+                        uart_pulse_en, uart_reset_en = flags >> 2 & 1, flags >> 3 & 1
+                        self._handler = HANDLER_IDLE
+                    else:
+                        self.registers.update(self._undo)
+                        self._tx_data = protocol.CONFIG_ERROR[0]
+                        self._handler = HANDLER_SEND_ECHO
+                elif not self._sweep_frame:
+                    # Straight into the staging register
+                    name, shift = CONFIG_BYTES[len(self._frame) - 1]
+                    value = valid & 3 if name == "reset_behavior" else valid
+                    self.registers[name] = self.registers[name] & ~(0xFF << shift) | value << shift
+            elif k == self._deadline:
+                self._deadline = None
+                if not self._sweep_frame:
+                    self.registers.update(self._undo)
+                self._handler = HANDLER_IDLE
+        elif self._handler == HANDLER_SWEEP_OP:
+            if valid is not None:
+                if valid >> 2:
+                    self._tx_data = valid
+                    self._handler = HANDLER_SEND_ECHO
+                elif valid == protocol.SWEEP_OPERATIONS["start"] and not self._sweep_valid:
+                    self._tx_data = protocol.CONFIG_ERROR[0]
+                    self._handler = HANDLER_SEND_ECHO
+                else:
+                    sweep_op = valid
+                    self._handler = HANDLER_IDLE
+        elif self._handler in (HANDLER_SEND_SWEEP, HANDLER_SEND_WAVE):
+            if tx_ready and not self._tx_en:
+                self._tx_data = self._report.pop(0)
+                tx_en = 1
+                if not self._report:
+                    self._handler = HANDLER_IDLE
+        elif self._handler == HANDLER_WAVE_ENTRY:
+            if valid is not None:
+                self._frame.append(valid)
+                self._deadline = k + self.timeout
+                if len(self._frame) == len(protocol.wave_entry(0, 0, 0)) - 1:
+                    self._deadline = None
+                    index, width, spacing = self._frame
+                    if index < self.wave_entries:
+                        self.wave_table[index] = (width, spacing)
+                        self._handler = HANDLER_IDLE
+                    else:
+                        self._tx_data = protocol.CONFIG_ERROR[0]
+                        self._handler = HANDLER_SEND_ECHO
+            elif k == self._deadline:
+                self._deadline = None
+                self._handler = HANDLER_IDLE
+        elif self._handler == HANDLER_WAVE_LENGTH:
+            if valid is not None:
+                if valid > self.wave_entries:
+                    self._tx_data = valid
+                    self._handler = HANDLER_SEND_ECHO
+                else:
+                    self.wave_length = valid
+                    self._handler = HANDLER_IDLE
+        elif valid is not None:
+            name, high = self._handler
+            if high:
+                self.registers[name] = (valid << 8) | (self.registers[name] & 0xFF)
+                self._handler = (name, 0)
+            else:
+                mask = 0xFF00 if name in ("delay", "spacing", "reset_length") else 0
+                self.registers[name] = (self.registers[name] & mask) | valid
+                self._handler = HANDLER_IDLE
+
+        self._tx_en, self._uart_pulse_en, self._uart_reset_en, self._uart_arm = tx_en, uart_pulse_en, uart_reset_en, uart_arm
+
+        # Active bank and sweep, an operation from the handler goes last
+        if commit:
+            self.active = self._committed(registers)
+            self.active_wave = wave
+            self._sweep_load = False
+        elif self._sweep_state == protocol.SWEEP_RUNNING and not self._sweep_load and sequence_done:
+            self._advance_sweep(registers)
+        if self._sweep_op == protocol.SWEEP_OPERATIONS["start"]:
+            self._sweep_state, self._sweep_index, self._sweep_load = protocol.SWEEP_RUNNING, 0, True
+        elif self._sweep_op == protocol.SWEEP_OPERATIONS["pause"]:
+            if self._sweep_state == protocol.SWEEP_RUNNING:
+                self._sweep_state = protocol.SWEEP_PAUSED
+        elif self._sweep_op == protocol.SWEEP_OPERATIONS["resume"]:
+            if self._sweep_state == protocol.SWEEP_PAUSED:
+                self._sweep_state = protocol.SWEEP_RUNNING
+        elif self._sweep_op == protocol.SWEEP_OPERATIONS["stop"]:
+            self._sweep_state = protocol.SWEEP_OFF
+        self._sweep_op = sweep_op
+        self._state, self._armed, self._reset_done = state, next_armed, next_reset_done
+        self._sync = [self._trigger, self._sync[0]]
+        self.cycle = k + 1
+        self._output_edges(k)
+
+    def _output_edges(self, cycle):
+        pulse_en = self._uart_pulse_en or (self._armed and self._sync[1]) or (
+            self._reset_done and self.active["reset_behavior"] == protocol.RESET_PULSE
+        )
+        values = {
+            "pulse": int(self._state == PULSE_ACTIVE),
+            "target_reset": int(self._state == RESET_TARGET),
+            "pulse_en": int(bool(pulse_en)),
+            "busy": int(self._state != IDLE),
+            "armed": self._armed,
+        }
+        for name, value in values.items():
+            if value != self._outputs[name]:
+                self._outputs[name] = value
+                self._event(Event(cycle, name, value))
+
+    def _event(self, event):
+        self.events.append(event)
+        if self.listener is not None:
+            self.listener(event)
+
+
+class PtyEmulator:
+    """An Emulator behind a pseudo-terminal, open it at `path` (with PtyTransport, or any serial tool).
+
+    `speed` is how much faster than real time the emulated clock runs, None
+    for as fast as possible. With `log`, a file, every output edge is also
+    written to it as a line of time in ns, signal and value (all of them, not
+    only the ones still in `events`).
+    """
+
+    def __init__(self, *, speed=1.0, emulator=None, log=None):
+        self.emulator = emulator or Emulator()
+        self.speed = speed
+        self.log = log
+        self._master, self._slave = os.openpty()
+        tty.setraw(self._master)
+        # The terminal starts out at the rate of the device
+        self._speeds = {getattr(termios, f"B{rate}"): rate for rate in self.emulator.baud_rates if hasattr(termios, f"B{rate}")}
+        attributes = termios.tcgetattr(self._slave)
+        attributes[4] = attributes[5] = getattr(termios, f"B{self.emulator.baud_rate}", attributes[5])
+        termios.tcsetattr(self._slave, termios.TCSANOW, attributes)
+        self.path = os.ttyname(self._slave)
+        # Events to log, collected as they happen so none are missed when `events` overflows
+        self._unlogged = deque()
+        if log is not None:
+            self._listener = self.emulator.listener
+            self.emulator.listener = self._log_event
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._serve, name="PtyEmulator", daemon=True)
+
+    @property
+    def events(self):
+        return self.emulator.events
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+    def close(self):
+        self.stop()
+        os.close(self._master)
+        os.close(self._slave)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _now(self, started, base):
+        # As fast as possible runs ahead of the wall clock, which catches up while nothing happens
+        elapsed = int((time.monotonic() - started) * self.emulator.clk_freq * (self.speed or 1.0))
+        return max(base + elapsed, self.emulator.cycle)
+
+    def _host_baud_rate(self):
+        """The rate the host set on the terminal, 0 if it is not one the device has."""
+        return self._speeds.get(termios.tcgetattr(self._slave)[5], 0)
+
+    def _serve(self):
+        emulator = self.emulator
+        started, base = time.monotonic(), emulator.cycle
+        while not self._stop.is_set():
+            busy = not emulator.settled or emulator.next_output is not None
+            timeout = 0.001 if (busy and self.speed is not None) or emulator.deadline is not None else 0.05
+            if select.select([self._master], [], [], timeout)[0]:
+                try:
+                    data = os.read(self._master, 4096)
+                except OSError:
+                    # Nothing has the terminal open (EIO)
+                    data = b""
+                if data:
+                    emulator.receive(data, self._now(started, base), self._host_baud_rate())
+
+            emulator.run(self._now(started, base))
+            if self.speed is None:
+                emulator.settle()
+            output = emulator.take()
+            if output:
+                os.write(self._master, output)
+            self._write_log()
+
+    def _log_event(self, event):
+        self._unlogged.append(event)
+        if self._listener is not None:
+            self._listener(event)
+
+    def _write_log(self):
+        if not self._unlogged:
+            return
+        period_ns = 1e9 / self.emulator.clk_freq
+        while self._unlogged:
+            event = self._unlogged.popleft()
+            self.log.write(f"{event.cycle * period_ns:.0f} {event.signal} {event.value}\n")
+        self.log.flush()
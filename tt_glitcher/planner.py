@@ -0,0 +1,195 @@
+"""Sweep planner: order a grid of configurations so consecutive attempts change little.
+
+    plan = SweepPlan([
+        Axis("delay", 100, 2000, 10, exclude=range(500, 600)),
+        Axis("width", 1, 16),
+        Axis("num_pulses", 1, 3),
+    ], fixed={"reset_behavior": RESET_PULSE})
+    print(len(plan), plan.cost(action="reset_target", attempt_seconds=0.05))
+    async for result in campaign.run(plan):
+        ...
+
+Every attempt only sends the registers that changed since the previous one
+(see Glitcher), so the order of the points sets the configuration traffic of
+a sweep. The planner visits exactly the points of the grid, in one of these
+orders:
+
+  "gray"          - reflected mixed-radix Gray code, every step changes one
+                    register by one step. The nesting of the axes is chosen
+                    to send the fewest bytes: cheap registers (1 byte) and
+                    short axes change most often.
+  "serpentine"    - the same, but with the axes nested as given, the first
+                    axis outermost. Each axis walks up and down in turn.
+  "lexicographic" - the plain nested loops, for comparison. Every wrap of an
+                    inner axis changes it as well as the outer one.
+"""
+
+import itertools
+import math
+from typing import NamedTuple
+
+from . import protocol
+
+ORDERS = ["gray", "serpentine", "lexicographic"]
+
+# Bits on the line per byte: start, 8 data and stop
+BITS_PER_BYTE = 10
+
+
+class Axis:
+    """The values of register `name` from `start` to `stop` (inclusive) in steps of `step`.
+
+    Values in `exclude` (any container, like a set or a range) are left out.
+    """
+
+    def __init__(self, name, start, stop, step=1, *, exclude=()):
+        if step < 1:
+            raise ValueError(f"step must be at least 1, not {step}")
+        self.name = name
+        self.values = [value for value in range(start, stop + 1, step) if value not in exclude]
+        if not self.values:
+            raise ValueError(f"Axis {name} has no values")
+        # Checks the name and the range of every value
+        self.command_length = max(len(protocol.set_register(name, value)) for value in (self.values[0], self.values[-1]))
+
+    def __len__(self):
+        return len(self.values)
+
+    def __repr__(self):
+        return f"Axis({self.name!r}, {len(self.values)} values from {self.values[0]} to {self.values[-1]})"
+
+
+class PlanCost(NamedTuple):
+    attempts: int
+    bytes: int
+    seconds: float
+    changes: dict  # Register writes per axis over the whole plan, the first attempt included
+
+
+class SweepPlan:
+    """All combinations of the values of `axes` (Axis), in the order `order` (see ORDERS).
+
+    `fixed` are further configure() arguments that stay the same for the whole
+    plan, like reset_behavior. Iterating yields one configure() dict per point,
+    so a plan can be passed straight to Campaign.run() or Glitcher.attempt(**point).
+    """
+
+    def __init__(self, axes, *, order="gray", fixed=None):
+        if order not in ORDERS:
+            raise ValueError(f"order must be one of {ORDERS}, not {order!r}")
+        names = [axis.name for axis in axes]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Every register can only be one axis, got {names}")
+        self.fixed = dict(fixed or {})
+        if set(self.fixed) & set(names):
+            raise ValueError(f"{sorted(set(self.fixed) & set(names))} are both fixed and an axis")
+        # Checks the fixed values
+        self._fixed_commands = _commands(self.fixed)
+
+        self.order = order
+        if order == "gray":
+            axes = min(itertools.permutations(axes), key=lambda nesting: _reflected_cost(nesting))
+        self.axes = list(axes)
+
+    def __len__(self):
+        return math.prod(len(axis) for axis in self.axes)
+
+    def __iter__(self):
+        sizes = [len(axis) for axis in self.axes]
+        indices = itertools.product(*map(range, sizes)) if self.order == "lexicographic" else _reflected(sizes)
+        for index in indices:
+            point = {axis.name: axis.values[i] for axis, i in zip(self.axes, index)}
+            point.update(self.fixed)
+            yield point
+
+    def changes(self):
+        """Number of attempts on which each axis changes value, the first attempt excluded."""
+        changes = {}
+        prefix = 1
+        for axis in self.axes:
+            outer = prefix
+            prefix *= len(axis)
+            if len(axis) == 1:
+                changes[axis.name] = 0
+            elif self.order == "lexicographic":
+                # Every change of the prefix up to this axis, wraps included
+                changes[axis.name] = prefix - 1
+            else:
+                changes[axis.name] = prefix - outer
+        return changes
+
+    def cost(self, *, action="trigger", registers=None, baud=protocol.BAUD_RATE,
+             clk_freq=protocol.CLK_FREQ, attempt_seconds=0.0):
+        """Projected UART bytes and wall time of running the whole plan, one `action` per point.
+
+        `registers` are the register values the client already knows (Glitcher.registers),
+        registers not in it are sent on the first attempt. The time is that of the bytes on
+        the line, the reset and pulse sequences, plus `attempt_seconds` per attempt for
+        whatever the host waits for (the target booting, say).
+        """
+        registers = registers or {}
+        attempts = len(self)
+
+        first = next(iter(self))
+        data = sum(
+            len(command) for name, command in {**_commands(first), **self._fixed_commands}.items()
+            if registers.get(name) != first[name]
+        )
+        changes = self.changes()
+        data += sum(count * axis.command_length for axis, count in zip(self.axes, changes.values()))
+        data += attempts  # The action
+
+        for axis in self.axes:
+            changes[axis.name] += registers.get(axis.name) != first[axis.name]
+
+        cycles = attempts * self._mean_sequence_cycles(action, registers)
+        seconds = data * BITS_PER_BYTE / baud + cycles / clk_freq + attempts * attempt_seconds
+        return PlanCost(attempts, data, seconds, changes)
+
+    def _mean_sequence_cycles(self, action, registers):
+        # Axes are independent, so the mean of a product is the product of the means
+        mean = {name: registers.get(name, value) for name, value in protocol.DEFAULTS.items()}
+        mean.update(self.fixed)
+        mean.update({axis.name: sum(axis.values) / len(axis) for axis in self.axes})
+
+        cycles = mean["delay"] + mean["num_pulses"] * mean["width"] + max(mean["num_pulses"] - 1, 0) * mean["spacing"]
+        if action == "reset_target":
+            cycles += mean["reset_length"]
+        return cycles
+
+
+def _commands(config):
+    """Command bytes of every value of a configure() dict, by register."""
+    commands = {name: protocol.set_register(name, value) for name, value in config.items() if name != "reset_behavior"}
+    if "reset_behavior" in config:
+        commands["reset_behavior"] = protocol.set_reset_behavior(config["reset_behavior"])
+    return commands
+
+
+def _reflected_cost(axes):
+    """Bytes spent changing registers in a reflected Gray code with this nesting."""
+    data = 0
+    prefix = 1
+    for axis in axes:
+        outer = prefix
+        prefix *= len(axis)
+        data += (prefix - outer) * axis.command_length
+    return data
+
+
+def _reflected(sizes):
+    """Indices of a reflected mixed-radix Gray code, the last position changing fastest."""
+    index = [0] * len(sizes)
+    direction = [1] * len(sizes)
+    yield tuple(index)
+    while True:
+        for i in reversed(range(len(sizes))):
+            step = index[i] + direction[i]
+            if 0 <= step < sizes[i]:
+                index[i] = step
+                yield tuple(index)
+                break
+            # This axis is at its end, turn around and step the next one out
+            direction[i] = -direction[i]
+        else:
+            return
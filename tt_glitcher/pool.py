@@ -0,0 +1,166 @@
+"""Run one campaign on several glitchers at once.
+
+    pool = CampaignPool([Campaign(glitcher, console, classify) for glitcher, console in boards])
+    async for result in pool.run(plan):
+        print(result.index, result.device, result.verdict)
+
+Every board (a glitcher with its own target and console) runs in its own
+worker, and the workers take the attempts of the plan from one shared queue.
+So a board with a slow target simply takes fewer attempts, and the pool keeps
+all boards busy until the plan runs out.
+
+A board is retired when its transport or console fails, or when `max_hangs`
+attempts in a row time out, which is more likely a dead board or target than
+a run of real timeouts. The attempts it had taken on (and those hung ones)
+go back to the queue for the other boards, so no attempt is lost. A board
+whose last attempts timed out when the plan ran out has not shown it is
+alive either, so it is retired the same way, unless it is the last one left,
+which then retries them itself. An attempt is only retried once, a second
+timeout is its result.
+
+The results of all boards are merged into one stream in the order of the plan.
+"""
+
+import asyncio
+from collections import deque
+from contextlib import aclosing
+from typing import NamedTuple
+
+from .campaign import TIMEOUT
+
+
+class PoolResult(NamedTuple):
+    index: int
+    config: dict
+    verdict: str
+    output: bytes
+    seconds: float
+    device: int
+
+
+class CampaignPool:
+    """Shard attempts over `campaigns` (Campaign, one per board).
+
+    `attempts` counts the attempts each board ran, `retired` maps retired boards to the reason.
+    """
+
+    def __init__(self, campaigns, *, max_hangs=3):
+        if not campaigns:
+            raise ValueError("A pool needs at least one campaign")
+        self.campaigns = list(campaigns)
+        self.max_hangs = max_hangs
+        self.attempts = [0] * len(self.campaigns)
+        self.retired = {}
+
+    async def run(self, attempts):
+        """Run every configuration of `attempts`, an async generator of PoolResult in the order of `attempts`."""
+        self._source = enumerate(attempts)
+        self._retry = deque()
+        self._retried = set()
+        self._outstanding = 0  # Taken from the source but without a result yet
+        self._exhausted = False
+        self._results = asyncio.Queue()
+        self._changed = asyncio.Event()
+
+        workers = [asyncio.create_task(self._worker(device)) for device in range(len(self.campaigns))]
+        try:
+            waiting = {}
+            next_index = 0
+            while not self._done():
+                result = await self._results.get()
+                if result is None:
+                    continue
+                if isinstance(result, BaseException):
+                    raise result
+                waiting[result.index] = result
+                while next_index in waiting:
+                    yield waiting.pop(next_index)
+                    next_index += 1
+
+            if len(self.retired) == len(self.campaigns) and not self._finished():
+                raise RuntimeError(f"Every device was retired: {self.retired}")
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+    def _finished(self):
+        return self._exhausted and not self._retry and not self._outstanding and self._results.empty()
+
+    def _done(self):
+        return self._finished() or (len(self.retired) == len(self.campaigns) and self._results.empty())
+
+    def _take(self, taken):
+        """Attempts for one board, retried ones first, recording (index, config) in `taken`."""
+        while True:
+            if self._retry:
+                item = self._retry.popleft()
+            else:
+                item = next(self._source, None)
+                if item is None:
+                    self._exhausted = True
+                    return
+                self._outstanding += 1
+            taken.append(item)
+            yield item[1]
+
+    def _give_back(self, items):
+        for item in items:
+            self._retried.add(item[0])
+        self._retry.extend(items)
+        self._changed.set()
+
+    def _put(self, device, item, result):
+        self._outstanding -= 1
+        self.attempts[device] += 1
+        self._results.put_nowait(PoolResult(item[0], item[1], result.verdict, result.output, result.seconds, device))
+
+    def _retire(self, device, reason, items):
+        self.retired[device] = reason
+        self._give_back(items)
+        # Wake up the merge in case this was the last board
+        self._results.put_nowait(None)
+
+    async def _worker(self, device):
+        campaign = self.campaigns[device]
+        while True:
+            taken = deque()
+            hung = []
+            try:
+                async with aclosing(campaign.run(self._take(taken))) as results:
+                    async for result in results:
+                        item = taken.popleft()
+                        if result.verdict != TIMEOUT:
+                            for hung_item, hung_result in hung:
+                                self._put(device, hung_item, hung_result)
+                            hung.clear()
+                            self._put(device, item, result)
+                        elif item[0] in self._retried:
+                            # Timed out on another board already, so it is a real timeout
+                            self._put(device, item, result)
+                        else:
+                            hung.append((item, result))
+                            if len(hung) >= self.max_hangs:
+                                self._retire(device, f"{len(hung)} attempts in a row timed out", [item for item, _ in hung] + list(taken))
+                                return
+            except OSError as e:
+                self._retire(device, f"{type(e).__name__}: {e}", [item for item, _ in hung] + list(taken))
+                return
+            except Exception as e:
+                # A bug rather than a broken board, so stop the whole pool
+                self._results.put_nowait(e)
+                return
+
+            if hung:
+                items = [item for item, _ in hung]
+                if len(self.retired) < len(self.campaigns) - 1:
+                    self._retire(device, f"{len(hung)} attempts at the end timed out", items)
+                    return
+                self._give_back(items)
+            self._results.put_nowait(None)
+
+            # Out of attempts, but a retired board may still hand some back
+            self._changed.clear()
+            if self._retry:
+                continue
+            await self._changed.wait()
@@ -0,0 +1,275 @@
+"""Encoding of the glitcher UART commands (see uart_handler.v and docs/info.md).
+
+Every function returns the bytes of one command. Values are checked against the
+width of their register, so a bad value raises ValueError instead of silently
+wrapping around on the device.
+"""
+
+BAUD_RATE = 115200
+CLK_FREQ = 50_000_000
+
+# Reset behaviors, the values of reset_behavior in uart_handler.v
+RESET_NONE = 0
+RESET_PULSE = 1
+RESET_ARM = 2
+
+TRIGGER = b't'
+ARM = b'a'
+RESET_TARGET = b'p'
+HELLO = b'h'
+
+HELLO_RESPONSE = b"Erika"
+
+# Baud rates of the 'b' command, by the index it takes. The device starts at BAUD_RATE.
+BAUD_RATES = [BAUD_RATE, 230400, 460800, 1_000_000, 3_000_000]
+SET_BAUD_RATE = b'b'
+# Acknowledges a rate switch in both directions, see uart_handler.v
+BAUD_ACK = b'B'
+
+# Loads every register at once from a frame with a checksum, see config_frame()
+CONFIGURE = b'c'
+CONFIG_LENGTH = 10
+# The answer to a frame with a bad checksum or flags, good frames get none
+CONFIG_ERROR = b'!'
+# Flags byte of the frame: the reset behavior in bits 1-0, then the action to run after loading
+CONFIG_ACTIONS = {
+    None: 0,
+    "trigger": 1 << 2,
+    "reset_target": 1 << 3,
+}
+
+# Sweep settings frame, see sweep_settings(). The registers a sweep can move, in the order
+# of the frame, which is also the nesting order from the innermost loop out. The steps are
+# a byte each, the limits as wide as the registers.
+SWEEP_SETTINGS = b'v'
+SWEEP_LENGTH = 12
+SWEEP_REGISTERS = ["delay", "width", "spacing", "num_pulses"]
+SWEEP_STEP_MAX = 0xFF
+SWEEP_ORDERS = {"nested": 0, "lockstep": 1}
+# Sweep operations, the command byte and the operation after it
+SWEEP = b'g'
+SWEEP_OPERATIONS = {"stop": 0, "start": 1, "pause": 2, "resume": 3}
+# The query answers the index (2 bytes) and the state of the sweep
+SWEEP_QUERY = b'q'
+SWEEP_STATUS_LENGTH = 3
+SWEEP_OFF = 0
+SWEEP_RUNNING = 1
+SWEEP_PAUSED = 2
+
+# Waveform table, a (width, spacing) entry per pulse, a byte each (so the spacing of an entry
+# only goes up to WAVE_SPACING_MAX, unlike the register), see waveform(). WAVE_ENTRY
+# writes an entry, WAVE_LENGTH sets how many are played (0 for none) and WAVE_READ reads
+# back the length, the size of the table and every entry.
+WAVE_ENTRY = b'l'
+WAVE_LENGTH = b'm'
+WAVE_READ = b'k'
+# Entries of the table in the default build, the readback has the size of the device
+WAVE_ENTRIES = 4
+WAVE_SPACING_MAX = 0xFF
+
+# Seconds the device waits for the acknowledgement at a new rate before going back to
+# BAUD_RATE, and for the next byte of a configuration frame before dropping it
+TIMEOUT = 0.05
+
+# Completes any partially received command, and is echoed when there is none. 0xFF is
+# out of range for the commands that check their value (sweep operation, waveform length,
+# baud rate), so it only ever ends up in a register
+RESYNC_FILLER = b"\xff\xff"
+
+RESET_BEHAVIOR_COMMANDS = {
+    RESET_NONE: b'y',
+    RESET_PULSE: b'u',
+    RESET_ARM: b'i',
+}
+
+# Register, command byte and value width in bytes
+REGISTERS = {
+    "delay": (b'd', 2),
+    "width": (b'w', 1),
+    "num_pulses": (b'n', 1),
+    "spacing": (b's', 2),
+    "reset_length": (b'r', 2),
+}
+
+# Register values after a device reset
+DEFAULTS = {
+    "delay": 0,
+    "width": 1,
+    "num_pulses": 1,
+    "spacing": 0,
+    "reset_length": 0,
+    "reset_behavior": RESET_PULSE,
+}
+
+
+def set_register(name, value):
+    """Command setting the register `name` (a key of REGISTERS) to `value`."""
+    if name not in REGISTERS:
+        raise ValueError(f"Unknown register {name!r}, expected one of {list(REGISTERS)}")
+    command, length = REGISTERS[name]
+    limit = (1 << (8 * length)) - 1
+    if not isinstance(value, int) or isinstance(value, bool):
+        raise TypeError(f"{name} must be an int, not {type(value).__name__}")
+    if not 0 <= value <= limit:
+        raise ValueError(f"{name} must be between 0 and {limit}, not {value}")
+    return command + value.to_bytes(length, "big")
+
+
+def set_delay(cycles):
+    return set_register("delay", cycles)
+
+
+def set_width(cycles):
+    return set_register("width", cycles)
+
+
+def set_num_pulses(count):
+    return set_register("num_pulses", count)
+
+
+def set_spacing(cycles):
+    return set_register("spacing", cycles)
+
+
+def set_reset_length(cycles):
+    return set_register("reset_length", cycles)
+
+
+def set_reset_behavior(behavior):
+    if behavior not in RESET_BEHAVIOR_COMMANDS:
+        raise ValueError(f"reset_behavior must be one of {sorted(RESET_BEHAVIOR_COMMANDS)}, not {behavior!r}")
+    return RESET_BEHAVIOR_COMMANDS[behavior]
+
+
+def config_frame(*, delay, width, num_pulses, spacing, reset_length, reset_behavior, action=None):
+    """Command loading all registers at once, then running `action` (None, "trigger" or "reset_target").
+
+    The device applies the registers in the same clock cycle once the checksum
+    is right, so it never runs with half of them changed.
+    """
+    if action not in CONFIG_ACTIONS:
+        raise ValueError(f"action must be one of {list(CONFIG_ACTIONS)}, not {action!r}")
+    set_reset_behavior(reset_behavior)
+    values = {"delay": delay, "width": width, "num_pulses": num_pulses, "spacing": spacing, "reset_length": reset_length}
+    payload = b"".join(set_register(name, value)[1:] for name, value in values.items())
+    payload += bytes([reset_behavior | CONFIG_ACTIONS[action]])
+    # The checksum makes the bytes after the command add up to zero
+    return CONFIGURE + payload + bytes([-sum(payload) & 0xFF])
+
+
+def sweep_settings(*, delay=None, width=None, spacing=None, num_pulses=None, order="nested"):
+    """Command setting the sweep of each register to a (step, limit) pair, None for a register that stays put.
+
+    A sweep starts at the register values, adds the step (up to SWEEP_STEP_MAX)
+    after every pulse sequence and starts over where the next value would pass
+    the limit. See sweep_points() for the order of the points. The command stops
+    a running sweep.
+    """
+    if order not in SWEEP_ORDERS:
+        raise ValueError(f"order must be one of {list(SWEEP_ORDERS)}, not {order!r}")
+    sweeps = {"delay": delay, "width": width, "spacing": spacing, "num_pulses": num_pulses}
+    payload = b""
+    for name in SWEEP_REGISTERS:
+        step, limit = sweeps[name] or (0, 0)
+        if not isinstance(step, int) or isinstance(step, bool):
+            raise TypeError(f"{name} step must be an int, not {type(step).__name__}")
+        if not 0 <= step <= SWEEP_STEP_MAX:
+            raise ValueError(f"{name} step must be between 0 and {SWEEP_STEP_MAX}, not {step}")
+        payload += bytes([step]) + set_register(name, limit)[1:]
+    payload += bytes([SWEEP_ORDERS[order]])
+    return SWEEP_SETTINGS + payload + bytes([-sum(payload) & 0xFF])
+
+
+def sweep(operation):
+    """Command to "start" (from the register values), "stop", "pause" or "resume" the sweep."""
+    if operation not in SWEEP_OPERATIONS:
+        raise ValueError(f"operation must be one of {list(SWEEP_OPERATIONS)}, not {operation!r}")
+    return SWEEP + bytes([SWEEP_OPERATIONS[operation]])
+
+
+def sweep_points(start, *, delay=None, width=None, spacing=None, num_pulses=None, order="nested"):
+    """The values of the swept registers at sweep index 0, 1, 2, ..., like the device steps through them.
+
+    `start` has the values the swept registers start from, the other arguments
+    are as for sweep_settings(). A nested sweep ends after its last point, a
+    lockstep sweep never does.
+    """
+    sweeps = {"delay": delay, "width": width, "spacing": spacing, "num_pulses": num_pulses}
+    # The others stay at their register values, so they never hold up the carry
+    swept = [name for name in SWEEP_REGISTERS if sweeps[name] is not None]
+    point = {name: start[name] for name in swept}
+    while True:
+        yield dict(point)
+        carry = True
+        for name in swept:
+            step, limit = sweeps[name]
+            wrap = step == 0 or point[name] + step > limit
+            if carry or order == "lockstep":
+                point[name] = start[name] if wrap else point[name] + step
+            carry = carry and wrap
+        if carry and order == "nested":
+            return
+
+
+def parse_sweep_status(data):
+    """The (index, state) in the answer to SWEEP_QUERY."""
+    if len(data) != SWEEP_STATUS_LENGTH:
+        raise ValueError(f"Expected {SWEEP_STATUS_LENGTH} bytes, got {data!r}")
+    return int.from_bytes(data[:2], "big"), data[2]
+
+
+def wave_entry(index, width, spacing):
+    """Command setting table entry `index` to a pulse of `width` cycles followed by `spacing` cycles.
+
+    The spacing of an entry is a single byte, up to WAVE_SPACING_MAX.
+    """
+    for name, value in (("index", index), ("spacing", spacing)):
+        if not isinstance(value, int) or isinstance(value, bool):
+            raise TypeError(f"{name} must be an int, not {type(value).__name__}")
+    if not 0 <= index <= 0xFF:
+        raise ValueError(f"index must be in range(256), not {index}")
+    if not 0 <= spacing <= WAVE_SPACING_MAX:
+        raise ValueError(f"spacing must be between 0 and {WAVE_SPACING_MAX}, not {spacing}")
+    return WAVE_ENTRY + bytes([index]) + set_register("width", width)[1:] + bytes([spacing])
+
+
+def set_wave_length(length):
+    """Command making the sequences play the first `length` table entries, 0 goes back to the registers."""
+    if not isinstance(length, int) or isinstance(length, bool):
+        raise TypeError(f"length must be an int, not {type(length).__name__}")
+    if not 0 <= length <= 0xFF:
+        raise ValueError(f"length must be in range(256), not {length}")
+    return WAVE_LENGTH + bytes([length])
+
+
+def waveform(pulses):
+    """Commands loading the (width, spacing) `pulses` into the table and playing them, [] for no table.
+
+    The spacing of the last pulse is not used.
+    """
+    pulses = list(pulses)
+    return b"".join(wave_entry(index, width, spacing) for index, (width, spacing) in enumerate(pulses)) + set_wave_length(len(pulses))
+
+
+def parse_wave_entries(data):
+    """The (width, spacing) entries in the body of the answer to WAVE_READ."""
+    if len(data) % 2:
+        raise ValueError(f"Expected 2 bytes per entry, got {len(data)} bytes")
+    return [(data[i], data[i + 1]) for i in range(0, len(data), 2)]
+
+
+def set_baud_rate(rate):
+    """Command switching the device to `rate` (one of BAUD_RATES), see Glitcher.set_baud_rate() for the handshake."""
+    if rate not in BAUD_RATES:
+        raise ValueError(f"baud rate must be one of {BAUD_RATES}, not {rate!r}")
+    return SET_BAUD_RATE + bytes([BAUD_RATES.index(rate)])
+
+
+def bit_time(rate, clk_freq=CLK_FREQ):
+    """Clock cycles per bit at `rate` on the device, in sixteenths of a cycle (as in uart_handler.v).
+
+    The rate after reset uses a whole number of cycles, the others are rounded to a sixteenth.
+    """
+    if rate == BAUD_RATE:
+        return 16 * (clk_freq // rate)
+    return (16 * clk_freq + rate // 2) // rate
@@ -0,0 +1,213 @@
+"""Space-filling sampling plans: Sobol, Halton and Latin hypercube samples of the glitch parameters.
+
+    from tt_glitcher.sampling import SamplingPlan
+
+    plan = SamplingPlan([Axis("delay", 0, 65535), Axis("width", 1, 255), Axis("spacing", 0, 65535)],
+                        1 << 20, method="sobol")
+    async for result in campaign.run(plan):
+        ...
+
+A grid over the 16-bit registers is either huge or coarse. These plans spread
+any number of points evenly over the whole space instead, at the 20 ns (one
+cycle) resolution of the registers, or at the step of the axes. Points are
+generated in chunks with NumPy as the plan is iterated, so a plan of millions
+of points never has to be in memory. Every point is a function of its index
+and the seed only, so a plan with the same seed is the same plan, whatever
+the chunk size.
+
+  "sobol"  - Sobol sequence (Joe and Kuo direction numbers) with a random
+             digital shift. Best balanced when the count is a power of two.
+  "halton" - Halton sequence (bases 2, 3, 5, ...) with a random rotation.
+  "lhs"    - Latin hypercube: the count splits every axis into as many
+             strata as points, and every stratum gets exactly one point.
+
+The device treats 0 and 1 as one cycle for the delay, width, spacing and reset
+length, so on those axes 0 is never sampled when 1 can be. A plan thus does not
+waste attempts on two points that are the same glitch. With unique=True the
+plan also drops points that land on a point it already sampled (this keeps a
+set of every point, so it costs memory).
+
+Needs NumPy.
+"""
+
+import math
+
+import numpy as np
+
+METHODS = ["sobol", "halton", "lhs"]
+
+# Registers where the values 0 and 1 both mean one cycle
+ONE_CYCLE_MINIMUM = {"delay", "width", "spacing", "reset_length"}
+
+# Degree, coefficients and initial direction numbers of the dimensions after
+# the first, from new-joe-kuo-6.21201 (S. Joe and F. Y. Kuo, 2008)
+SOBOL_PARAMETERS = [
+    (1, 0, [1]),
+    (2, 1, [1, 3]),
+    (3, 1, [1, 3, 1]),
+    (3, 2, [1, 1, 1]),
+    (4, 1, [1, 1, 3, 3]),
+]
+
+HALTON_BASES = [2, 3, 5, 7, 11, 13]
+
+SOBOL_BITS = 32
+
+
+def sobol_directions(dimensions):
+    """Direction numbers V[dimension, bit] of the first `dimensions` Sobol dimensions, as uint64."""
+    if dimensions > len(SOBOL_PARAMETERS) + 1:
+        raise ValueError(f"At most {len(SOBOL_PARAMETERS) + 1} Sobol dimensions are supported")
+    directions = np.zeros((dimensions, SOBOL_BITS), dtype=np.uint64)
+    directions[0] = [1 << (SOBOL_BITS - 1 - k) for k in range(SOBOL_BITS)]
+    for d, (degree, coefficients, initial) in enumerate(SOBOL_PARAMETERS[:dimensions - 1], 1):
+        v = [m << (SOBOL_BITS - 1 - k) for k, m in enumerate(initial)]
+        for k in range(degree, SOBOL_BITS):
+            value = v[k - degree] ^ (v[k - degree] >> degree)
+            for j in range(1, degree):
+                if (coefficients >> (degree - 1 - j)) & 1:
+                    value ^= v[k - j]
+            v.append(value)
+        directions[d] = v
+    return directions
+
+
+def sobol(indices, directions, shift):
+    """Points `indices` (uint64) of the Sobol sequence, digitally shifted by `shift`, in [0, 1)."""
+    gray = indices ^ (indices >> np.uint64(1))
+    points = np.zeros((len(indices), len(directions)), dtype=np.uint64)
+    for bit in range(SOBOL_BITS):
+        mask = ((gray >> np.uint64(bit)) & np.uint64(1)).astype(bool)
+        points[mask] ^= directions[:, bit]
+    return (points ^ shift) / float(1 << SOBOL_BITS)
+
+
+def halton(indices, rotation):
+    """Points `indices` of the Halton sequence, rotated by `rotation` (modulo 1), in [0, 1)."""
+    points = np.empty((len(indices), len(rotation)))
+    for d, base in enumerate(HALTON_BASES[:len(rotation)]):
+        remaining = indices.copy()
+        value = np.zeros(len(indices))
+        scale = 1.0 / base
+        while remaining.any():
+            remaining, digit = np.divmod(remaining, np.uint64(base))
+            value += digit * scale
+            scale /= base
+        points[:, d] = value
+    return (points + rotation) % 1.0
+
+
+def mix(values, key):
+    """A 64-bit hash of `values` (uint64) under `key` (the splitmix64 finalizer)."""
+    z = values ^ np.uint64(key)
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return z ^ (z >> np.uint64(31))
+
+
+def permute(indices, count, key):
+    """A random permutation of range(count) under `key`, applied to `indices`.
+
+    A Feistel network over the smallest even number of bits that holds count,
+    walking the cycle until the result is in range, so it needs no table.
+    """
+    half = max(1, math.ceil(math.log2(max(count, 2)) / 2))
+    mask = np.uint64((1 << half) - 1)
+    result = indices.copy()
+    outside = np.ones(len(result), dtype=bool)
+    while outside.any():
+        left, right = result[outside] >> np.uint64(half), result[outside] & mask
+        for round_key in range(4):
+            left, right = right, left ^ (mix(right, key + round_key) & mask)
+        result[outside] = (left << np.uint64(half)) | right
+        outside = result >= np.uint64(count)
+    return result
+
+
+def latin_hypercube(indices, count, keys):
+    """Points `indices` of a Latin hypercube of `count` points, one per stratum of every axis, in [0, 1)."""
+    points = np.empty((len(indices), len(keys)))
+    for d, key in enumerate(keys):
+        stratum = permute(indices, count, key)
+        jitter = (mix(indices, key ^ 0x5EED) >> np.uint64(11)) / float(1 << 53)
+        points[:, d] = (stratum + jitter) / count
+    return points
+
+
+class SamplingPlan:
+    """`count` points of the space of `axes` (planner.Axis) sampled with `method` (see METHODS).
+
+    Iterating yields configure() dicts (with `fixed` added to each), chunks()
+    yields the same points as arrays. `seed` randomizes the sequence, by
+    default a random seed is drawn and kept in `seed` so the plan can be
+    repeated.
+    """
+
+    def __init__(self, axes, count, *, method="sobol", seed=None, fixed=None, unique=False, chunk=1 << 16):
+        if method not in METHODS:
+            raise ValueError(f"method must be one of {METHODS}, not {method!r}")
+        if count < 1:
+            raise ValueError(f"count must be at least 1, not {count}")
+        self.axes = list(axes)
+        self.count = count
+        self.method = method
+        self.seed = int(np.random.SeedSequence(seed).entropy) if seed is None else seed
+        self.fixed = dict(fixed or {})
+        self.unique = unique
+        self.chunk = chunk
+
+        self._values = []
+        for axis in self.axes:
+            values = np.array(axis.values, dtype=np.int64)
+            if axis.name in ONE_CYCLE_MINIMUM and 1 in axis.values:
+                values = values[values != 0]
+            self._values.append(values)
+
+    def chunks(self):
+        """The points in chunks of up to `chunk`, as a dict of an int64 array per axis name."""
+        dimensions = len(self.axes)
+        rng = np.random.default_rng(self.seed)
+        if self.method == "sobol":
+            directions = sobol_directions(dimensions)
+            shift = rng.integers(0, 1 << SOBOL_BITS, dimensions, dtype=np.uint64)
+        elif self.method == "halton":
+            if dimensions > len(HALTON_BASES):
+                raise ValueError(f"At most {len(HALTON_BASES)} Halton dimensions are supported")
+            rotation = rng.random(dimensions)
+        else:
+            keys = [int(key) for key in rng.integers(0, 1 << 62, dimensions, dtype=np.uint64)]
+
+        sizes = [len(values) for values in self._values]
+        seen = set()
+        for start in range(0, self.count, self.chunk):
+            indices = np.arange(start, min(start + self.chunk, self.count), dtype=np.uint64)
+            if self.method == "sobol":
+                points = sobol(indices, directions, shift)
+            elif self.method == "halton":
+                points = halton(indices, rotation)
+            else:
+                points = latin_hypercube(indices, self.count, keys)
+
+            quantised = np.minimum((points * sizes).astype(np.int64), np.array(sizes) - 1)
+            if self.unique:
+                quantised = self._new(quantised, sizes, seen)
+            yield {axis.name: values[quantised[:, d]] for d, (axis, values) in enumerate(zip(self.axes, self._values))}
+
+    def _new(self, quantised, sizes, seen):
+        """The rows of `quantised` not seen before, in order, adding them to `seen`."""
+        keys = np.zeros(len(quantised), dtype=np.uint64)
+        for d, size in enumerate(sizes):
+            keys = keys * np.uint64(size) + quantised[:, d].astype(np.uint64)
+        _, first = np.unique(keys, return_index=True)
+        first.sort()
+        new = [i for i in first.tolist() if int(keys[i]) not in seen]
+        seen.update(int(keys[i]) for i in new)
+        return quantised[new]
+
+    def __iter__(self):
+        for chunk in self.chunks():
+            columns = [chunk[axis.name].tolist() for axis in self.axes]
+            for values in zip(*columns):
+                point = dict(zip((axis.name for axis in self.axes), values))
+                point.update(self.fixed)
+                yield point
@@ -0,0 +1,244 @@
+"""Adaptive search: spend the attempts of a campaign where the glitches are.
+
+    search = AdaptiveSearch([Axis("delay", 0, 20000), Axis("width", 1, 40)],
+                            budget=5000, fixed={"reset_behavior": RESET_PULSE})
+    async for result in search.run(campaign):
+        ...
+    print(search.found)
+
+The space starts out cut into a coarse grid of regions. Each attempt goes to
+a random point of the region with the best upper confidence bound on its
+score (a bandit). The score is the rate of faults, plus a small bonus for
+regions where some attempts crash and some do not, since faults tend to sit
+at the border between a target that runs and one that dies. A region that
+has been sampled enough and has faulted is halved along its widest axis, its
+samples going to the halves. So the attempts close in on the faults, while
+the rest of the space keeps being explored at a falling rate.
+
+Every point that faults is repeated to see if the glitch is reproducible. The
+points that fault often enough end up in `found`, and by default the search
+stops at the first one.
+"""
+
+import math
+import random
+from collections import Counter
+from contextlib import aclosing
+from typing import NamedTuple
+
+from .campaign import TIMEOUT
+
+FAULT = "fault"
+CRASH = "crash"
+NORMAL = "normal"
+
+
+class Found(NamedTuple):
+    config: dict
+    faults: int
+    attempts: int
+
+
+class Region:
+    """A box of the search space, an inclusive (low, high) range of value indices per axis."""
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = Counter()
+        self.samples = []  # (point, outcome)
+
+    @property
+    def attempts(self):
+        return len(self.samples)
+
+    def contains(self, point):
+        return all(low <= i <= high for i, (low, high) in zip(point, self.bounds))
+
+    def add(self, point, outcome):
+        self.samples.append((point, outcome))
+        self.counts[outcome] += 1
+
+    def split(self):
+        """The two halves along the widest axis, or None if the region is a single point."""
+        axis = max(range(len(self.bounds)), key=lambda i: self.bounds[i][1] - self.bounds[i][0])
+        low, high = self.bounds[axis]
+        if low == high:
+            return None
+        middle = (low + high) // 2
+        halves = [
+            Region(self.bounds[:axis] + [(low, middle)] + self.bounds[axis + 1:]),
+            Region(self.bounds[:axis] + [(middle + 1, high)] + self.bounds[axis + 1:]),
+        ]
+        for point, outcome in self.samples:
+            halves[point[axis] > middle].add(point, outcome)
+        return halves
+
+    def __repr__(self):
+        return f"Region({self.bounds}, {dict(self.counts)})"
+
+
+class AdaptiveSearch:
+    """Search the grid of `axes` (planner.Axis) for reproducible faults within `budget` attempts.
+
+    `faults` and `crashes` are the verdicts (see Campaign) that count as a fault
+    and as a crash, anything else counts as normal. `crash_weight` is the score
+    of a region where half of the attempts crash, relative to a fault rate of
+    1. `exploration` scales the confidence bound (0 only exploits).
+
+    A region is split once it has `split_after` samples and any fault. A point
+    that faults is repeated until it has `confirm` attempts, it is found if at
+    least `reproducible` of them faulted. With `stop_on_found` the search ends
+    at the first found point, otherwise it uses the whole budget.
+
+    `fixed` are configure() arguments added to every point. The search is
+    deterministic for a given `seed` and sequence of verdicts.
+    """
+
+    def __init__(self, axes, *, budget, fixed=None, faults=("glitch", FAULT), crashes=(CRASH, TIMEOUT),
+                 initial_splits=4, split_after=8, crash_weight=0.1, exploration=1.0,
+                 confirm=5, reproducible=0.6, stop_on_found=True, seed=None):
+        self.axes = list(axes)
+        self._indices = [{value: i for i, value in enumerate(axis.values)} for axis in self.axes]
+        self.budget = budget
+        self.fixed = dict(fixed or {})
+        self.faults = set(faults)
+        self.crashes = set(crashes)
+        self.split_after = split_after
+        self.crash_weight = crash_weight
+        self.exploration = exploration
+        self.confirm = confirm
+        self.reproducible = reproducible
+        self.stop_on_found = stop_on_found
+        self._rng = random.Random(seed)
+
+        self.attempts = 0
+        self.found = []
+        self.regions = [Region(list(bounds)) for bounds in self._initial_bounds(initial_splits)]
+        self._repeats = {}  # Point that faulted -> Counter of outcomes
+        self._confirming = []
+        self._pending = []  # Points asked for but not told yet
+
+    def _initial_bounds(self, splits):
+        ranges = []
+        for axis in self.axes:
+            count = min(splits, len(axis))
+            edges = [len(axis) * i // count for i in range(count + 1)]
+            ranges.append([(edges[i], edges[i + 1] - 1) for i in range(count)])
+
+        bounds = [[]]
+        for axis_ranges in ranges:
+            bounds = [previous + [axis_range] for previous in bounds for axis_range in axis_ranges]
+        return bounds
+
+    @property
+    def done(self):
+        return self.attempts >= self.budget or (self.stop_on_found and bool(self.found))
+
+    def outcome(self, verdict):
+        if verdict in self.faults:
+            return FAULT
+        if verdict in self.crashes:
+            return CRASH
+        return NORMAL
+
+    def score(self, region, total):
+        """Upper confidence bound of the score of `region` after `total` attempts in all."""
+        counts = region.counts
+        # One imaginary fault and one imaginary normal, so unsampled regions are worth a look
+        attempts = region.attempts + 2
+        crashes = counts[CRASH] / attempts
+        # 1 when half of the attempts crash, 0 when all or none do
+        border = 4 * crashes * (1 - crashes)
+        rate = (counts[FAULT] + 1) / attempts + self.crash_weight * border
+        return rate + self.exploration * math.sqrt(math.log(total + 1) / (region.attempts + 1))
+
+    def ask(self):
+        """Configuration of the next attempt."""
+        if self._confirming:
+            point = self._confirming.pop(0)
+        else:
+            total = sum(region.attempts for region in self.regions)
+            region = max(self.regions, key=lambda region: self.score(region, total))
+            point = tuple(self._rng.randint(low, high) for low, high in region.bounds)
+        self._pending.append(point)
+        return self.config(point)
+
+    def config(self, point):
+        config = {axis.name: axis.values[i] for axis, i in zip(self.axes, point)}
+        config.update(self.fixed)
+        return config
+
+    def point(self, config):
+        return tuple(indices[config[axis.name]] for axis, indices in zip(self.axes, self._indices))
+
+    def tell(self, config, verdict):
+        """Record the verdict of an attempt with `config` (as returned by ask())."""
+        point = self.point(config)
+        self._pending.remove(point)
+        outcome = self.outcome(verdict)
+        self.attempts += 1
+
+        region = next(region for region in self.regions if region.contains(point))
+        region.add(point, outcome)
+        if region.attempts >= self.split_after and region.counts[FAULT]:
+            halves = region.split()
+            if halves:
+                self.regions.remove(region)
+                self.regions += halves
+
+        if outcome == FAULT and point not in self._repeats:
+            self._repeats[point] = Counter()
+            self._confirming += [point] * (self.confirm - 1)
+        if point in self._repeats:
+            repeats = self._repeats[point]
+            repeats[outcome] += 1
+            attempts = sum(repeats.values())
+            if attempts == self.confirm and repeats[FAULT] >= self.reproducible * attempts:
+                self.found.append(Found(self.config(point), repeats[FAULT], attempts))
+
+    def state(self):
+        """The state of the search as JSON-compatible data, see restore()."""
+        return {
+            "rng": self._rng.getstate(),
+            "attempts": self.attempts,
+            "found": [list(found) for found in self.found],
+            "regions": [[region.bounds, region.samples] for region in self.regions],
+            "repeats": [[point, dict(repeats)] for point, repeats in self._repeats.items()],
+            # Asked for but never told, so asked again first
+            "confirming": self._pending + self._confirming,
+        }
+
+    def restore(self, state):
+        """Continue from `state` (from state()) of a search with the same axes and settings."""
+        version, internal, gauss = state["rng"]
+        self._rng.setstate((version, tuple(internal), gauss))
+        self.attempts = state["attempts"]
+        self.found = [Found(*found) for found in state["found"]]
+        self.regions = []
+        for bounds, samples in state["regions"]:
+            region = Region([tuple(bound) for bound in bounds])
+            for point, outcome in samples:
+                region.add(tuple(point), outcome)
+            self.regions.append(region)
+        self._repeats = {tuple(point): Counter(repeats) for point, repeats in state["repeats"]}
+        self._confirming = [tuple(point) for point in state["confirming"]]
+        self._pending = []
+
+    def __iter__(self):
+        """Configurations until the search is done, for a caller that tell()s the verdicts.
+
+        The caller may ask one attempt ahead (Campaign encodes the next attempt before
+        the verdict of the current one is in), so this stops once the attempts asked
+        for cover the budget.
+        """
+        while not self.done and self.attempts + len(self._pending) < self.budget:
+            yield self.ask()
+
+    async def run(self, campaign):
+        """Run the search on `campaign` (a Campaign), an async generator of its Results."""
+        async with aclosing(campaign.run(self)) as results:
+            async for result in results:
+                self.tell(result.config, result.verdict)
+                yield result
+                if self.done:
+                    break
@@ -0,0 +1,275 @@
+"""Append-only columnar store of campaign results, memory-mapped for reading.
+
+    with ResultStore("run1", mode="a", registers={"reset_behavior": RESET_PULSE}) as store:
+        async for result in campaign.run(plan):
+            store.append(result)
+
+    store = ResultStore("run1")
+    store.records["delay"]                  # A column, straight from the page cache
+    store.rate("glitch", by=("delay", "width"))
+    store.output(12345)                     # The console output of one attempt
+
+A store is a directory with three files:
+
+  records.bin - one fixed-width record (RECORD) per attempt
+  output.bin  - the console output of all attempts back to back, records
+                point into it with output_offset and output_length
+  store.json  - the format version, the record layout and the verdict names
+                (records keep a verdict code, an index into them)
+
+Appending writes the output first and the record after it, so a record never
+points at output that is not there. After a crash, opening the store to append
+drops a torn last record and any output without a record. Readers map only
+the complete records, so they can read a store while a campaign is still
+writing to it (see refresh()).
+
+Needs NumPy.
+"""
+
+import json
+import math
+import os
+import time
+
+import numpy as np
+
+from . import protocol
+
+VERSION = 1
+
+RECORD = np.dtype([
+    ("index", "<u8"),
+    ("delay", "<u2"),
+    ("width", "u1"),
+    ("num_pulses", "u1"),
+    ("spacing", "<u2"),
+    ("reset_length", "<u2"),
+    ("reset_behavior", "u1"),
+    ("verdict", "u1"),
+    ("device", "u1"),
+    ("finished", "<f8"),  # Unix time the attempt was recorded
+    ("seconds", "<f4"),   # Duration of the attempt
+    ("output_offset", "<u8"),
+    ("output_length", "<u4"),
+])
+
+# Largest number of cells rate() counts in a table of counters instead of by sorting
+DENSE_CELLS = 1 << 22
+
+REGISTERS = ["delay", "width", "num_pulses", "spacing", "reset_length", "reset_behavior"]
+
+
+class ResultStore:
+    """The store in directory `path`, read-only (`mode` "r") or to append to ("a", created if missing).
+
+    `registers` are the values recorded for registers an attempt configuration
+    does not set (by default the reset values of the device). With `sync`
+    every append is flushed to disk before it returns.
+    """
+
+    def __init__(self, path, *, mode="r", registers=None, sync=False):
+        if mode not in ("r", "a"):
+            raise ValueError(f"mode must be 'r' or 'a', not {mode!r}")
+        self.path = path
+        self.mode = mode
+        self.registers = {**protocol.DEFAULTS, **(registers or {})}
+        self.sync = sync
+        self._records_path = os.path.join(path, "records.bin")
+        self._output_path = os.path.join(path, "output.bin")
+        self._meta_path = os.path.join(path, "store.json")
+
+        if mode == "a" and not os.path.exists(self._meta_path):
+            os.makedirs(path, exist_ok=True)
+            self._verdicts = []
+            self._write_meta()
+        self._read_meta()
+
+        self._map = np.zeros(0, dtype=RECORD)
+        self._output = None
+        if mode == "a":
+            self._recover()
+            self._records_file = open(self._records_path, "ab", buffering=0)
+            self._output_file = open(self._output_path, "ab", buffering=0)
+            self._output_end = os.path.getsize(self._output_path)
+            self._count = os.path.getsize(self._records_path) // RECORD.itemsize
+        self.refresh()
+
+    def _read_meta(self):
+        with open(self._meta_path) as f:
+            meta = json.load(f)
+        if meta["version"] != VERSION or np.dtype([tuple(field) for field in meta["record"]]) != RECORD:
+            raise ValueError(f"{self.path} is a version {meta['version']} store with another record layout")
+        self._verdicts = meta["verdicts"]
+
+    def _write_meta(self):
+        # Replaced in one rename, so a reader never sees half of it
+        temporary = self._meta_path + ".tmp"
+        with open(temporary, "w") as f:
+            json.dump({"version": VERSION, "record": RECORD.descr, "verdicts": self._verdicts}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, self._meta_path)
+
+    def _recover(self):
+        """Drop what a crash in the middle of an append left behind."""
+        for name in (self._records_path, self._output_path):
+            if not os.path.exists(name):
+                open(name, "wb").close()
+
+        count = os.path.getsize(self._records_path) // RECORD.itemsize
+        output_size = os.path.getsize(self._output_path)
+        records = np.fromfile(self._records_path, dtype=RECORD, count=count)
+        ends = records["output_offset"] + records["output_length"]
+        # The output is written first, so only the last record can point past it
+        while count and ends[count - 1] > output_size:
+            count -= 1
+        with open(self._records_path, "r+b") as f:
+            f.truncate(count * RECORD.itemsize)
+        with open(self._output_path, "r+b") as f:
+            f.truncate(int(ends[count - 1]) if count else 0)
+
+    @property
+    def verdicts(self):
+        """Verdict names, by code."""
+        return list(self._verdicts)
+
+    def verdict_code(self, verdict):
+        """Code of `verdict` in the records, or None if no record has it."""
+        try:
+            return self._verdicts.index(verdict)
+        except ValueError:
+            return None
+
+    def append(self, result, **registers):
+        """Record `result` (a campaign Result or PoolResult), returns its record number.
+
+        Registers not in the configuration of the result are taken from
+        `registers`, or else from the ones given to the store.
+        """
+        if self.mode != "a":
+            raise ValueError("The store is open read-only")
+        code = self.verdict_code(result.verdict)
+        if code is None:
+            if len(self._verdicts) > np.iinfo(RECORD["verdict"]).max:
+                raise ValueError(f"Too many different verdicts, cannot add {result.verdict!r}")
+            self._verdicts.append(result.verdict)
+            self._write_meta()
+            code = len(self._verdicts) - 1
+
+        values = {**self.registers, **registers, **result.config}
+        record = np.zeros(1, dtype=RECORD)
+        record["index"] = result.index
+        for name in REGISTERS:
+            record[name] = values[name]
+        record["verdict"] = code
+        record["device"] = getattr(result, "device", 0)
+        record["finished"] = time.time()
+        record["seconds"] = result.seconds
+        record["output_offset"] = self._output_end
+        record["output_length"] = len(result.output)
+
+        self._output_file.write(result.output)
+        self._output_end += len(result.output)
+        if self.sync:
+            os.fsync(self._output_file.fileno())
+        self._records_file.write(record.tobytes())
+        if self.sync:
+            os.fsync(self._records_file.fileno())
+
+        self._count += 1
+        return self._count - 1
+
+    def refresh(self):
+        """Map the records appended since the last refresh (by this or another process)."""
+        if os.path.exists(self._meta_path):
+            self._read_meta()
+        count = os.path.getsize(self._records_path) // RECORD.itemsize if os.path.exists(self._records_path) else 0
+        if count != len(self._map):
+            self._map = np.memmap(self._records_path, dtype=RECORD, mode="r", shape=(count,)) if count else np.zeros(0, dtype=RECORD)
+            self._output = None
+
+    @property
+    def records(self):
+        """All records, a read-only structured array mapped from the file. Appending refreshes it."""
+        if self.mode == "a" and self._count != len(self._map):
+            self.refresh()
+        return self._map
+
+    def __len__(self):
+        return len(self.records)
+
+    def output(self, record):
+        """Console output of record number `record`."""
+        entry = self.records[record]
+        if self._output is None or len(self._output) < entry["output_offset"] + entry["output_length"]:
+            size = os.path.getsize(self._output_path)
+            self._output = np.memmap(self._output_path, dtype=np.uint8, mode="r") if size else np.zeros(0, dtype=np.uint8)
+        start = int(entry["output_offset"])
+        return self._output[start:start + int(entry["output_length"])].tobytes()
+
+    def count(self, verdict):
+        """Number of records with `verdict`."""
+        code = self.verdict_code(verdict)
+        return 0 if code is None else int(np.count_nonzero(self.records["verdict"] == code))
+
+    def rate(self, verdict, by=("delay", "width"), where=None):
+        """Rate of `verdict` per distinct combination of the fields `by`.
+
+        `where` is an optional boolean mask over the records. Returns a
+        structured array with the fields of `by`, then attempts, hits (records
+        with the verdict) and rate, sorted by the fields of `by`.
+        """
+        records = self.records if where is None else self.records[where]
+        by = list(by)
+        table = np.zeros(0, dtype=[(name, RECORD[name]) for name in by] + [
+            ("attempts", "<i8"), ("hits", "<i8"), ("rate", "<f8")
+        ])
+        if not len(records):
+            return table
+
+        # Number every cell between the smallest and largest value of each field
+        lows = [int(records[name].min()) for name in by]
+        spans = [int(records[name].max()) - low + 1 for name, low in zip(by, lows)]
+        if math.prod(spans) >= 1 << 63:
+            raise ValueError(f"Too many cells to count by {by}")
+        cell = np.zeros(len(records), dtype=np.int64)
+        for name, low, span in zip(by, lows, spans):
+            cell = cell * span + (records[name].astype(np.int64) - low)
+        code = self.verdict_code(verdict)
+        hit = records["verdict"] == code if code is not None else np.zeros(len(records), dtype=bool)
+
+        if math.prod(spans) <= DENSE_CELLS:
+            # Few enough cells for a counter per cell
+            attempts = np.bincount(cell, minlength=math.prod(spans))
+            hits = np.bincount(cell, weights=hit, minlength=math.prod(spans)).astype(np.int64)
+            cells = np.flatnonzero(attempts)
+            attempts, hits = attempts[cells], hits[cells]
+        else:
+            order = np.argsort(cell)
+            cell = cell[order]
+            starts = np.flatnonzero(np.diff(cell, prepend=-1))
+            cells = cell[starts]
+            attempts = np.diff(starts, append=len(cell))
+            hits = np.add.reduceat(hit[order].astype(np.int64), starts)
+
+        table = np.zeros(len(cells), dtype=table.dtype)
+        for name, low, span in reversed(list(zip(by, lows, spans))):
+            cells, value = np.divmod(cells, span)
+            table[name] = value + low
+        table["attempts"] = attempts
+        table["hits"] = hits
+        table["rate"] = hits / attempts
+        return table
+
+    def close(self):
+        if self.mode == "a":
+            self._records_file.close()
+            self._output_file.close()
+        self._map = np.zeros(0, dtype=RECORD)
+        self._output = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,151 @@
+"""Byte transports between the host and the glitcher.
+
+A transport has write(data), read(count, timeout), set_baud_rate(rate) and
+close(). write() hands the bytes to the OS in one call and never flushes or
+waits for them to be sent. read() returns exactly `count` bytes or raises
+TimeoutError.
+"""
+
+import os
+import select
+from abc import ABC, abstractmethod
+import termios
+import time
+import tty
+
+from .protocol import BAUD_RATE
+
+
+class Transport(ABC):
+    @abstractmethod
+    def write(self, data):
+        pass
+
+    @abstractmethod
+    def read(self, count, timeout=1.0):
+        pass
+
+    @abstractmethod
+    def set_baud_rate(self, rate):
+        """Talk at `rate` from now on, after the bytes already written are sent."""
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class SerialTransport(Transport):
+    """A serial port through pyserial (an optional dependency, `pip install pyserial`)."""
+
+    def __init__(self, port, baudrate=BAUD_RATE, **kwargs):
+        try:
+            import serial
+        except ImportError as e:
+            raise ImportError("SerialTransport needs pyserial, install it with `pip install pyserial`") from e
+        self._serial = serial.Serial(port, baudrate=baudrate, **kwargs)
+
+    def write(self, data):
+        self._serial.write(data)
+
+    def read(self, count, timeout=1.0):
+        self._serial.timeout = timeout
+        data = self._serial.read(count)
+        if len(data) < count:
+            raise TimeoutError(f"Expected {count} bytes, got {len(data)} before the timeout: {data!r}")
+        return data
+
+    def set_baud_rate(self, rate):
+        self._serial.flush()
+        self._serial.baudrate = rate
+
+    def close(self):
+        self._serial.close()
+
+
+class PtyTransport(Transport):
+    """A pseudo-terminal (or any tty device) at `path`, put in raw mode.
+
+    Needs no dependencies, which makes it the transport for emulated devices
+    and serial adapters on systems without pyserial.
+    """
+
+    def __init__(self, path):
+        self._fd = os.open(path, os.O_RDWR | os.O_NOCTTY)
+        tty.setraw(self._fd)
+
+    def fileno(self):
+        return self._fd
+
+    def write(self, data):
+        view = memoryview(data)
+        while view:
+            view = view[os.write(self._fd, view):]
+
+    def read(self, count, timeout=1.0):
+        deadline = time.monotonic() + timeout
+        data = bytearray()
+        while len(data) < count:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not select.select([self._fd], [], [], remaining)[0]:
+                raise TimeoutError(f"Expected {count} bytes, got {len(data)} before the timeout: {bytes(data)!r}")
+            data += os.read(self._fd, count - len(data))
+        return bytes(data)
+
+    def set_baud_rate(self, rate):
+        speed = getattr(termios, f"B{rate}", None)
+        if speed is None:
+            raise ValueError(f"This system has no baud rate {rate} for terminals")
+        attributes = termios.tcgetattr(self._fd)
+        attributes[4] = attributes[5] = speed
+        termios.tcsetattr(self._fd, termios.TCSADRAIN, attributes)
+
+    def close(self):
+        os.close(self._fd)
+
+
+class InProcessTransport(Transport):
+    """A transport to a device living in the same process, like a simulation or an emulator.
+
+    Written bytes are appended to `written` (and the number of write() calls counted
+    in `writes`), or passed to `device(data)` if given, which returns the bytes the
+    device answers with. Answers can also be queued with feed(). read() never waits,
+    there is nothing that could produce bytes in the meantime.
+    """
+
+    def __init__(self, device=None):
+        self._device = device
+        self._received = bytearray()
+        self.written = bytearray()
+        self.writes = 0
+        self.baud_rate = BAUD_RATE
+
+    def write(self, data):
+        self.writes += 1
+        if self._device is None:
+            self.written += data
+        else:
+            self.feed(self._device(bytes(data)))
+
+    def take(self):
+        """Return and forget the bytes written so far."""
+        data = bytes(self.written)
+        self.written.clear()
+        return data
+
+    def feed(self, data):
+        self._received += data
+
+    def read(self, count, timeout=1.0):
+        if len(self._received) < count:
+            raise TimeoutError(f"Expected {count} bytes, only {len(self._received)} are available: {bytes(self._received)!r}")
+        data = bytes(self._received[:count])
+        del self._received[:count]
+        return data
+
+    def set_baud_rate(self, rate):
+        self.baud_rate = rate